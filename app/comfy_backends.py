@@ -0,0 +1,347 @@
+"""
+Pool of ComfyUI backends (one per GPU box) with capability- and load-aware routing.
+
+Every ComfyUI job is bound to one backend when it starts (acquire) and stays there: the
+prompt is queued, watched, interrupted/dequeued and collected on that server, and the
+backend name is kept in job.result["comfy_backend"] so restart recovery asks the same
+server. Backends declare which workflows (fnmatch patterns) and custom nodes they have,
+and a workflow the backend's own /object_info rejects (comfy_schema) is never sent there;
+among the healthy, capable ones a job goes to the least loaded, preferring one that served
+the same model last (no checkpoint swap) while its load is within affinity_slack jobs.
+A periodic health check takes backends that fail fail_threshold times in a row out of
+rotation and puts them back on the first success.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from .comfy_client import ComfyUIClient, http_pool_for
+from .comfy_schema import node_schema_for
+from .config import COMFY_BACKEND_CONFIG, COMFY_INPUT_DIR, COMFY_OUTPUT_DIR, SERVER_CONFIG
+
+
+class NoBackendAvailable(RuntimeError):
+    """No healthy backend can run the workflow (or the job's sticky backend is gone)."""
+
+
+class ComfyBackend:
+    def __init__(
+        self,
+        name: str,
+        address: str,
+        *,
+        workflows: Optional[Sequence[str]] = None,
+        nodes: Optional[Sequence[str]] = None,
+        input_dir: Optional[str] = None,
+        output_dir: Optional[str] = None,
+    ):
+        self.name = str(name)
+        self.address = str(address)
+        # None = every workflow / every custom node the pool knows about
+        self.workflows = [str(p) for p in workflows] if workflows else None
+        self.nodes = frozenset(str(n) for n in nodes) if nodes is not None else None
+        self.input_dir = input_dir or None
+        self.output_dir = output_dir or None
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.inflight = 0
+        self.assigned = 0
+        self.loaded_model: Optional[str] = None
+        self.last_assigned_at = 0.0
+        self.last_error: Optional[str] = None
+        # Configured workflows this server's node schema rejects (comfy_schema.WorkflowAvailability)
+        self.unavailable_workflows: frozenset = frozenset()
+
+    def client(self) -> ComfyUIClient:
+        client = ComfyUIClient.shared(self.address)
+        client.output_dir = self.output_dir
+        return client
+
+    def http_base(self) -> str:
+        return ComfyUIClient(self.address)._http_base()
+
+    def supports(self, workflow_id: str, node_types: Iterable[str], custom_nodes: frozenset) -> bool:
+        if self.workflows is not None and not any(fnmatch.fnmatchcase(workflow_id, p) for p in self.workflows):
+            return False
+        if workflow_id in self.unavailable_workflows:
+            return False
+        if self.nodes is None:
+            return True
+        # Only nodes some backend declares count as custom; core nodes are everywhere.
+        return all(node in self.nodes for node in node_types if node in custom_nodes)
+
+
+class ComfyBackendPool:
+    def __init__(
+        self,
+        backends: Sequence[ComfyBackend],
+        *,
+        routing: str = "affinity",
+        affinity_slack: int = 1,
+        fail_threshold: int = 2,
+        clock: Callable[[], float] = time.time,
+    ):
+        if not backends:
+            raise ValueError("ComfyBackendPool needs at least one backend")
+        self._backends: Dict[str, ComfyBackend] = {}
+        for backend in backends:
+            if backend.name in self._backends:
+                raise ValueError(f"duplicate ComfyUI backend name: {backend.name}")
+            self._backends[backend.name] = backend
+        self.routing = routing if routing in ("affinity", "least_loaded") else "affinity"
+        self.affinity_slack = max(0, int(affinity_slack))
+        self.fail_threshold = max(1, int(fail_threshold))
+        self._clock = clock
+        self._custom_nodes = frozenset().union(*(b.nodes or () for b in backends))
+        self._lock = threading.Lock()
+        # job_id -> (backend name, model key)
+        self._leases: Dict[str, tuple] = {}
+        self._metrics = {"acquired": 0, "affinity_hits": 0, "rejected": 0, "failovers": 0}
+        self._logger = logging.getLogger("comfyui_app")
+
+    def backends(self) -> List[ComfyBackend]:
+        return list(self._backends.values())
+
+    def get(self, name: Optional[str]) -> Optional[ComfyBackend]:
+        return self._backends.get(str(name)) if name else None
+
+    @property
+    def primary(self) -> ComfyBackend:
+        return next(iter(self._backends.values()))
+
+    def healthy_count(self) -> int:
+        with self._lock:
+            return sum(1 for b in self._backends.values() if b.healthy)
+
+    def acquire(
+        self,
+        job_id: str,
+        workflow_id: str,
+        *,
+        node_types: Iterable[str] = (),
+        model_key: Optional[str] = None,
+        sticky: Optional[str] = None,
+    ) -> ComfyBackend:
+        """
+        Bind job_id to a backend and count it as in flight until release(job_id).
+
+        sticky: backend that already has this job's prompt (restart recovery); it is used even
+        while marked unhealthy (the prompt only exists there) but must still be configured.
+        """
+        node_types = frozenset(str(n) for n in node_types)
+        with self._lock:
+            if job_id in self._leases:
+                return self._backends[self._leases[job_id][0]]
+            if sticky:
+                chosen = self._backends.get(str(sticky))
+                if chosen is None:
+                    self._metrics["rejected"] += 1
+                    raise NoBackendAvailable(f"ComfyUI 서버 '{sticky}'가 설정에 없습니다.")
+            else:
+                chosen = self._choose_locked(workflow_id, node_types, model_key)
+            chosen.inflight += 1
+            chosen.assigned += 1
+            chosen.last_assigned_at = self._clock()
+            if model_key:
+                chosen.loaded_model = model_key
+            self._leases[job_id] = (chosen.name, model_key)
+            self._metrics["acquired"] += 1
+        try:
+            self._logger.info({
+                "event": "comfy_backend_assigned",
+                "job_id": job_id,
+                "backend": chosen.name,
+                "workflow_id": workflow_id,
+                "inflight": chosen.inflight,
+                "sticky": bool(sticky),
+            })
+        except Exception:
+            pass
+        return chosen
+
+    def release(self, job_id: str):
+        with self._lock:
+            lease = self._leases.pop(job_id, None)
+            backend = self._backends.get(lease[0]) if lease else None
+            if backend is not None:
+                backend.inflight = max(0, backend.inflight - 1)
+
+    def jobs_on(self, name: str) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, lease in self._leases.items() if lease[0] == name]
+
+    def _choose_locked(self, workflow_id: str, node_types: frozenset, model_key: Optional[str]) -> ComfyBackend:
+        capable = [b for b in self._backends.values() if b.supports(workflow_id, node_types, self._custom_nodes)]
+        candidates = [b for b in capable if b.healthy]
+        if not candidates:
+            self._metrics["rejected"] += 1
+            if capable:
+                raise NoBackendAvailable("이 워크플로우를 실행할 수 있는 ComfyUI 서버가 모두 응답하지 않습니다. 잠시 후 다시 시도해 주세요.")
+            raise NoBackendAvailable(f"'{workflow_id}' 워크플로우를 실행할 수 있는 ComfyUI 서버가 없습니다.")
+        if len(candidates) < len(capable):
+            self._metrics["failovers"] += 1
+        # Least loaded first; ties go to the backend that has waited longest for work.
+        least = min(candidates, key=lambda b: (b.inflight, b.last_assigned_at))
+        if self.routing == "affinity" and model_key:
+            warm = [b for b in candidates if b.loaded_model == model_key and b.inflight <= least.inflight + self.affinity_slack]
+            if warm:
+                self._metrics["affinity_hits"] += 1
+                return min(warm, key=lambda b: (b.inflight, b.last_assigned_at))
+        return least
+
+    def record_health(self, name: str, ok: bool, error: Optional[str] = None) -> Optional[str]:
+        """Returns "down"/"up" when the backend changes rotation state, else None."""
+        with self._lock:
+            backend = self._backends.get(name)
+            if backend is None:
+                return None
+            if ok:
+                backend.consecutive_failures = 0
+                backend.last_error = None
+                if backend.healthy:
+                    return None
+                backend.healthy = True
+                change = "up"
+            else:
+                backend.consecutive_failures += 1
+                backend.last_error = error
+                if not backend.healthy or backend.consecutive_failures < self.fail_threshold:
+                    return None
+                backend.healthy = False
+                # Whatever was loaded is gone after a restart.
+                backend.loaded_model = None
+                change = "down"
+        try:
+            log = self._logger.warning if change == "down" else self._logger.info
+            log({"event": f"comfy_backend_{change}", "backend": name, "error": error})
+        except Exception:
+            pass
+        return change
+
+    def check_health(self, timeout: float = 5.0) -> Dict[str, str]:
+        """Probe every backend's /system_stats once; returns {name: "down"|"up"} for state changes."""
+        changes: Dict[str, str] = {}
+        for backend in self.backends():
+            ok, error = False, None
+            try:
+                base = backend.http_base()
+                response = http_pool_for(base).request("health", "GET", f"{base}/system_stats", timeout=timeout)
+                ok = response.status_code == 200
+                if not ok:
+                    error = f"HTTP {response.status_code}"
+            except Exception as e:
+                error = str(e)
+            change = self.record_health(backend.name, ok, error)
+            if change:
+                changes[backend.name] = change
+        return changes
+
+    def refresh_schemas(self, names: Optional[Iterable[str]] = None, timeout: float = 30.0) -> int:
+        """Refetch /object_info of the given (default: every healthy) backend; returns how many answered."""
+        wanted = set(names) if names is not None else None
+        fetched = 0
+        for backend in self.backends():
+            if wanted is not None and backend.name not in wanted:
+                continue
+            if wanted is None and not backend.healthy:
+                continue
+            cache = node_schema_for(backend.http_base())
+            before = cache.current()
+            schema = cache.refresh(timeout=timeout)
+            if schema is not None and schema is not before:
+                fetched += 1
+        return fetched
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = dict(self._metrics)
+            data["routing"] = self.routing
+            data["backends"] = {
+                b.name: {
+                    "address": b.address,
+                    "healthy": b.healthy,
+                    "inflight": b.inflight,
+                    "assigned": b.assigned,
+                    "consecutive_failures": b.consecutive_failures,
+                    "loaded_model": b.loaded_model,
+                    "workflows": b.workflows,
+                    "nodes": sorted(b.nodes) if b.nodes is not None else None,
+                    "local_input": bool(b.input_dir),
+                    "local_output": bool(b.output_dir),
+                    "unavailable_workflows": sorted(b.unavailable_workflows),
+                    "last_error": b.last_error,
+                }
+                for b in self._backends.values()
+            }
+        return data
+
+
+def parse_backends(
+    raw: str,
+    *,
+    default_address: str,
+    default_input_dir: Optional[str] = None,
+    default_output_dir: Optional[str] = None,
+) -> List[ComfyBackend]:
+    """
+    COMFYUI_SERVERS -> backends. Empty means the single COMFYUI_SERVER backend ("default").
+
+    Accepts a JSON list of objects, or "name=host:port,..." (names default to backend<N>).
+    """
+    raw = str(raw or "").strip()
+    if not raw:
+        return [ComfyBackend("default", default_address, input_dir=default_input_dir, output_dir=default_output_dir)]
+    backends: List[ComfyBackend] = []
+    if raw.startswith("["):
+        for index, item in enumerate(json.loads(raw)):
+            if isinstance(item, str):
+                item = {"address": item}
+            if not isinstance(item, dict) or not item.get("address"):
+                raise ValueError(f"COMFYUI_SERVERS[{index}] needs an address")
+            backends.append(ComfyBackend(
+                str(item.get("name") or f"backend{index + 1}"),
+                str(item["address"]),
+                workflows=item.get("workflows"),
+                nodes=item.get("nodes"),
+                input_dir=item.get("input_dir"),
+                output_dir=item.get("output_dir"),
+            ))
+        return backends
+    for index, part in enumerate(p.strip() for p in raw.split(",")):
+        if not part:
+            continue
+        name, sep, address = part.partition("=")
+        if not sep:
+            name, address = f"backend{index + 1}", part
+        backends.append(ComfyBackend(name.strip(), address.strip()))
+    return backends
+
+
+def _build_pool() -> ComfyBackendPool:
+    try:
+        backends = parse_backends(
+            COMFY_BACKEND_CONFIG["servers"],
+            default_address=SERVER_CONFIG["server_address"],
+            default_input_dir=COMFY_INPUT_DIR,
+            default_output_dir=COMFY_OUTPUT_DIR,
+        )
+    except (ValueError, TypeError) as e:
+        # A broken pool definition must not take the app down: fall back to COMFYUI_SERVER.
+        logging.getLogger("comfyui_app").error({"event": "comfy_backends_config_invalid", "error": str(e)})
+        backends = parse_backends("", default_address=SERVER_CONFIG["server_address"],
+                                  default_input_dir=COMFY_INPUT_DIR, default_output_dir=COMFY_OUTPUT_DIR)
+    return ComfyBackendPool(
+        backends,
+        routing=COMFY_BACKEND_CONFIG["routing"],
+        affinity_slack=COMFY_BACKEND_CONFIG["affinity_slack"],
+        fail_threshold=COMFY_BACKEND_CONFIG["fail_threshold"],
+    )
+
+
+backend_pool = _build_pool()
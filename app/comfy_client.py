@@ -4,11 +4,144 @@ import json
 import urllib.request
 import urllib.parse
 import asyncio
-from typing import Callable, Optional
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
 import logging
 from urllib.parse import urlparse
 
-from .config import HTTP_TIMEOUTS, WS_TIMEOUTS
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import comfy_events
+from .comfy_schema import NodeSchemaCache, WorkflowValidationError, node_schema_for
+from .config import (
+    COMFY_HTTP_POOL_SIZE,
+    COMFY_OUTPUT_DIR,
+    COMFY_OUTPUT_TRANSPORT,
+    COMFY_SHARED_EVENTS_ENABLED,
+    HTTP_TIMEOUTS,
+    WS_TIMEOUTS,
+)
+from .workflow_templates import workflow_templates
+
+
+class ComfyHttpPool:
+    """
+    백엔드별 keep-alive requests.Session (모든 ComfyUIClient/작업이 공유).
+
+    urllib3 풀의 연결 생성 수(num_connections)와 요청 수(num_requests)로 재사용 횟수를 계산합니다.
+    """
+
+    def __init__(self, pool_size: int = 8):
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, int(pool_size)))
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        self._lock = threading.Lock()
+        self._by_stage: Dict[str, int] = {}
+
+    def request(self, stage: str, method: str, url: str, **kwargs) -> requests.Response:
+        with self._lock:
+            self._by_stage[stage] = self._by_stage.get(stage, 0) + 1
+        return self.session.request(method, url, **kwargs)
+
+    def metrics(self) -> Dict[str, Any]:
+        opened = sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += int(getattr(pool, "num_connections", 0))
+            sent += int(getattr(pool, "num_requests", 0))
+        with self._lock:
+            by_stage = dict(self._by_stage)
+        return {
+            "requests": sent,
+            "connections_opened": opened,
+            "connections_reused": max(0, sent - opened),
+            "reuse_ratio": round(max(0, sent - opened) / sent, 3) if sent else None,
+            "requests_by_stage": by_stage,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_http_pools: Dict[str, ComfyHttpPool] = {}
+_http_pools_lock = threading.Lock()
+
+
+def http_pool_for(http_base: str) -> ComfyHttpPool:
+    with _http_pools_lock:
+        pool = _http_pools.get(http_base)
+        if pool is None:
+            pool = ComfyHttpPool(COMFY_HTTP_POOL_SIZE)
+            _http_pools[http_base] = pool
+        return pool
+
+
+def http_pool_metrics() -> Dict[str, Any]:
+    with _http_pools_lock:
+        pools = dict(_http_pools)
+    return {base: pool.metrics() for base, pool in pools.items()}
+
+
+def close_http_pools():
+    with _http_pools_lock:
+        pools = list(_http_pools.values())
+        _http_pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# /view 스트리밍 다운로드 단위 (결과 전체를 메모리에 올리지 않음)
+_DOWNLOAD_CHUNK_BYTES = 256 * 1024
+# 대기열에서 지웠지만 아직 아무도 기다리지 않은 prompt를 기억하는 최대 개수
+_DELETED_PROMPTS_MAX = 256
+
+_output_metrics_lock = threading.Lock()
+_output_metrics: Dict[str, int] = {
+    "local_link": 0,
+    "local_move": 0,
+    "local_copy": 0,
+    "http_stream": 0,
+    "local_failures": 0,
+    "failures": 0,
+    "bytes": 0,
+}
+
+
+def _record_output(method: str, size: int = 0):
+    with _output_metrics_lock:
+        _output_metrics[method] = _output_metrics.get(method, 0) + 1
+        _output_metrics["bytes"] += max(0, int(size))
+
+
+def output_transport_metrics() -> Dict[str, Any]:
+    with _output_metrics_lock:
+        data = dict(_output_metrics)
+    data["transport"] = COMFY_OUTPUT_TRANSPORT
+    data["local_dir_configured"] = bool(COMFY_OUTPUT_DIR)
+    return data
+
+
+def _place_local_output(src: str, dest_path: str, transport: str) -> str:
+    """ComfyUI output 파일을 dest_path에 놓고 사용한 방식을 반환합니다 (실패 시 OSError)."""
+    if transport == "move":
+        shutil.move(src, dest_path)
+        return "local_move"
+    try:
+        # 하드링크: 데이터 복사 없음. 이후 저장 단계는 파일을 교체(os.replace)만 하므로 ComfyUI 쪽 파일은 그대로입니다.
+        os.link(src, dest_path)
+        return "local_link"
+    except OSError:
+        # 다른 파일시스템/링크 미지원: 로컬 복사 (HTTP 왕복은 여전히 생략)
+        shutil.copyfile(src, dest_path)
+        return "local_copy"
 
 
 class ComfyUIClient:
@@ -25,7 +158,27 @@ class ComfyUIClient:
         self.server_address = server_address
         self.client_id = client_id if client_id else str(uuid.uuid4())
         self.manager = manager
+        # 이 백엔드의 ComfyUI output 폴더가 로컬에 있을 때 (백엔드 풀에서는 서버마다 다름)
+        self.output_dir: Optional[str] = COMFY_OUTPUT_DIR
         self._logger = logging.getLogger("comfyui_app")
+        # 공유 이벤트 스트림 (ComfyUIClient.shared 참고). None이면 작업마다 웹소켓을 엽니다.
+        self.event_stream: Optional[comfy_events.ComfyEventStream] = None
+        # prompt_id -> 큐잉 시점의 스트림 연결 세대
+        self._queued_generation: dict[str, int] = {}
+        # cancel_prompt가 ComfyUI 대기열에서 지운 prompt (대기 루프 종료용). 대기가 끝나면 지우고,
+        # 아무도 기다리지 않은 항목은 오래된 것부터 버립니다.
+        self._deleted_prompts: "OrderedDict[str, None]" = OrderedDict()
+
+    @classmethod
+    def shared(cls, server_address="127.0.0.1:8188", manager=None) -> "ComfyUIClient":
+        """백엔드별 공유 이벤트 스트림에 묶인 클라이언트 (COMFY_SHARED_WS=false면 기존 방식)."""
+        client = cls(server_address, manager=manager)
+        if COMFY_SHARED_EVENTS_ENABLED:
+            stream = comfy_events.event_stream_for(client._ws_base())
+            client.event_stream = stream
+            # ComfyUI는 prompt를 큐잉한 client_id로만 실행 이벤트를 보냅니다.
+            client.client_id = stream.client_id
+        return client
 
     def _normalize_server(self) -> tuple[str, str]:
         """
@@ -54,6 +207,13 @@ class ComfyUIClient:
         scheme, hostport = self._normalize_server()
         return f"{scheme}://{hostport}"
 
+    def _http(self) -> ComfyHttpPool:
+        return http_pool_for(self._http_base())
+
+    def node_schema(self) -> NodeSchemaCache:
+        """이 백엔드의 /object_info 캐시 (refresh()로 갱신, 시작 시와 주기적으로 main에서 갱신)."""
+        return node_schema_for(self._http_base())
+
     def _ws_base(self) -> str:
         scheme, hostport = self._normalize_server()
         ws_scheme = "wss" if scheme == "https" else "ws"
@@ -82,12 +242,11 @@ class ComfyUIClient:
 
     def queue_prompt(self, workflow_json_path, prompt_overrides):
         """
-        워크플로우를 기반으로 ComfyUI 서버에 이미지 생성을 요청합니다. (버그 수정 및 requests 사용)
+        워크플로우를 기반으로 ComfyUI 서버에 이미지 생성을 요청합니다. (버그 수정 및 공유 세션 사용)
         """
-        # 1. 워크플로우 JSON 파일 로드
+        # 1. 워크플로우 템플릿 로드 (경로+mtime 기준 캐시, 파일이 바뀌면 다시 파싱)
         try:
-            with open(workflow_json_path, 'r', encoding='utf-8') as f:
-                prompt = json.load(f)
+            template = workflow_templates.get(workflow_json_path)
         except FileNotFoundError:
             try:
                 self._logger.error({"event": "workflow_json_missing", "path": workflow_json_path})
@@ -101,20 +260,25 @@ class ComfyUIClient:
                 pass
             return {}
 
-        # 2. 프롬프트 오버라이드 적용 (⭐️⭐️⭐️ 버그 수정된 핵심 로직 ⭐️⭐️⭐️)
-        for node_id, overrides in prompt_overrides.items():
-            if node_id in prompt:
-                # 'inputs' 딕셔너리 내부의 값들만 업데이트하여 기존 연결 정보를 보존합니다.
-                if 'inputs' in prompt[node_id] and 'inputs' in overrides:
-                        prompt[node_id]['inputs'].update(overrides['inputs'])
-                else: # 'inputs'가 아닌 다른 최상위 키를 덮어쓰는 경우 (예: class_type)
-                        prompt[node_id].update(overrides)
-            else:
-                try:
-                    self._logger.warning({"event": "override_missing_node", "node_id": node_id})
-                except Exception:
-                    pass
-        
+        # 2. 프롬프트 오버라이드 적용: 바뀌는 노드만 복사하고 나머지는 템플릿과 공유 (copy-on-write)
+        for node_id in template.missing_nodes(prompt_overrides):
+            try:
+                self._logger.warning({"event": "override_missing_node", "node_id": node_id})
+            except Exception:
+                pass
+        prompt = template.build(prompt_overrides)
+
+        # 2-1. 노드 스키마 검증: 템플릿은 시작 시 검증했으므로 요청이 바꾼 노드만 확인합니다.
+        problems = self.node_schema().validate(prompt, [n for n in prompt_overrides if n in prompt])
+        if problems:
+            try:
+                self._logger.error({"event": "workflow_validation_failed", "path": workflow_json_path, "problems": problems})
+            except Exception:
+                pass
+            raise WorkflowValidationError(
+                "ComfyUI 워크플로우 입력이 올바르지 않습니다: " + "; ".join(problems[:3]), problems
+            )
+
         # Note: 출력 노드(Preview/SaveImage)는 워크플로우에 직접 포함하는 정책으로 유지합니다.
 
         # 3. client_id와 prompt 데이터를 API 형식에 맞게 구성
@@ -123,20 +287,22 @@ class ComfyUIClient:
             "client_id": self.client_id
         }
         
-        # 4. HTTP POST 요청 보내기 (requests 라이브러리 사용)
+        # 4. HTTP POST 요청 보내기 (백엔드별 keep-alive 세션)
         url = f"{self._http_base()}/prompt"
+        stream = self.event_stream
+        generation = None
+        if stream is not None:
+            # 첫 작업에서 스트림 연결 전에 큐잉하면 이벤트를 놓치므로 잠시 연결을 기다립니다.
+            if stream.connected or stream.wait_connected(self._ws_connect_timeout()):
+                generation = stream.generation
         try:
-            import requests
             timeout_tuple = self._http_timeouts()
-            response = requests.post(url, json=data, timeout=timeout_tuple)
+            response = self._http().request("queue_prompt", "POST", url, json=data, timeout=timeout_tuple)
             response.raise_for_status() # 2xx 상태 코드가 아니면 에러를 발생시킴
-            return response.json()
-        except ImportError:
-            try:
-                self._logger.error({"event": "requests_missing"})
-            except Exception:
-                pass
-            return {}
+            result = response.json()
+            if generation is not None and isinstance(result, dict) and result.get("prompt_id"):
+                self._queued_generation[str(result["prompt_id"])] = generation
+            return result
         except requests.exceptions.Timeout as e:
             try:
                 self._logger.error({"event": "comfy_timeout", "stage": "queue_prompt", "url": url, "error": str(e)})
@@ -210,11 +376,10 @@ class ComfyUIClient:
         """
         url = f"{self._http_base()}/upload/image"
         try:
-            import requests
             files = {"image": (filename, data, mime)}
             form = {"type": "input"}
             timeout_tuple = self._http_timeouts()
-            resp = requests.post(url, files=files, data=form, timeout=timeout_tuple)
+            resp = self._http().request("upload_image", "POST", url, files=files, data=form, timeout=timeout_tuple)
             resp.raise_for_status()
             try:
                 j = resp.json()
@@ -239,39 +404,127 @@ class ComfyUIClient:
                 pass
             return None
         
-    # 기존 get_images 메서드를 아래 코드로 완전히 교체해주세요.
-    def get_images(self, prompt_id, on_progress: Optional[Callable[[float], None]] = None):
+    def get_images(
+        self,
+        prompt_id,
+        on_progress: Optional[Callable[[float], None]] = None,
+        *,
+        limit: Optional[int] = 1,
+        output_nodes=None,
+    ):
         """
         웹소켓을 통해 이미지 생성 진행 상황을 수신하고,
         콜백을 통해 진행률을 보고합니다.
+
+        결과는 순위가 높은 출력부터 limit개만 내려받습니다 (기본 1개, None이면 전부).
+
+        공유 이벤트 스트림(event_stream)이 있으면 그 연결로 완료를 기다리고 history는 완료 시 한 번만
+        조회합니다. 없으면 작업마다 웹소켓을 열고 history를 폴링하는 기존 방식으로 동작합니다.
         """
-        ws_url = f"{self._ws_base()}/ws?clientId={self.client_id}"
+        self.wait_for_prompt(prompt_id, on_progress)
+        return self._download_outputs(prompt_id, limit=limit, output_nodes=output_nodes)
 
-        ws = None
-        import time as _t
+    def wait_for_prompt(
+        self,
+        prompt_id,
+        on_progress: Optional[Callable[[float], None]] = None,
+        on_start: Optional[Callable[[], None]] = None,
+        on_preview: Optional[Callable[[bytes], None]] = None,
+    ):
+        """
+        prompt 실행이 끝날 때까지 기다립니다 (결과는 내려받지 않음).
 
-        def _history_has_any_images() -> bool:
-            """History 기반으로 prompt_id 결과가 준비되었는지 확인합니다.
+        on_start는 ComfyUI가 이 prompt를 실제로 실행하기 시작할 때 호출됩니다
+        (파이프라이닝으로 앞 prompt 뒤에서 대기하다 시작하는 시점).
+        on_preview는 ComfyUI가 보내는 잠재 이미지 미리보기(JPEG/PNG 바이트)마다 호출됩니다.
+        """
+        try:
+            if self.event_stream is not None:
+                self._wait_on_event_stream(prompt_id, on_progress, on_start, on_preview)
+            else:
+                self._wait_on_dedicated_ws(prompt_id, on_progress, on_start, on_preview)
+        finally:
+            self._deleted_prompts.pop(str(prompt_id), None)
 
-            - ComfyUI는 작업이 매우 빠르게 끝나면, 웹소켓 연결 전에 완료 이벤트를 이미 보내버릴 수 있습니다.
-              그 경우 웹소켓에서 '완료 신호'를 못 받고 무한 대기가 발생할 수 있어,
-              history(/history/{prompt_id})로 결과 준비 여부를 보조 판단합니다.
-            """
-            try:
-                h_all = self.get_history(prompt_id)
-                h = (h_all.get(prompt_id) if isinstance(h_all, dict) else None) or {}
-                outputs = (h.get("outputs", {}) or {}) if isinstance(h, dict) else {}
-                if not isinstance(outputs, dict) or not outputs:
-                    return False
-                for _node_id, node_output in outputs.items():
-                    if not isinstance(node_output, dict):
-                        continue
-                    imgs = node_output.get("images")
-                    if isinstance(imgs, list) and len(imgs) > 0:
-                        return True
-                return False
-            except Exception:
+    def _history_ready(self, prompt_id) -> bool:
+        """History 기반으로 prompt_id 결과가 준비되었는지 확인합니다.
+
+        - ComfyUI는 작업이 매우 빠르게 끝나면, 웹소켓 연결 전에 완료 이벤트를 이미 보내버릴 수 있습니다.
+          그 경우 웹소켓에서 '완료 신호'를 못 받고 무한 대기가 발생할 수 있어,
+          history(/history/{prompt_id})로 결과 준비 여부를 보조 판단합니다.
+        """
+        try:
+            h_all = self.get_history(prompt_id)
+            h = (h_all.get(prompt_id) if isinstance(h_all, dict) else None) or {}
+            outputs = (h.get("outputs", {}) or {}) if isinstance(h, dict) else {}
+            if not isinstance(outputs, dict) or not outputs:
                 return False
+            for _node_id, node_output in outputs.items():
+                if not isinstance(node_output, dict):
+                    continue
+                imgs = node_output.get("images") or node_output.get("audio")
+                if isinstance(imgs, list) and len(imgs) > 0:
+                    return True
+            return False
+        except Exception:
+            return False
+
+    def _wait_on_event_stream(
+        self,
+        prompt_id,
+        on_progress: Optional[Callable[[float], None]] = None,
+        on_start: Optional[Callable[[], None]] = None,
+        on_preview: Optional[Callable[[bytes], None]] = None,
+    ):
+        stream = self.event_stream
+        waiter = stream.watch(prompt_id)
+
+        def _check() -> bool:
+            stream.record("history_checks")
+            return self._history_ready(prompt_id)
+
+        try:
+            # 스트림이 연결된 상태에서 큐잉한 prompt만 이벤트를 놓치지 않았다고 봅니다.
+            # (재시작 복구로 이어받은 prompt, 큐잉 후 재연결된 경우 등은 history를 한 번 확인)
+            queued_generation = self._queued_generation.pop(str(prompt_id), None)
+            if (queued_generation is None or queued_generation != stream.generation) and _check():
+                try:
+                    self._logger.info({"event": "comfy_history_ready_fastpath", "prompt_id": prompt_id})
+                except Exception:
+                    pass
+                return
+            outcome = waiter.wait(
+                on_progress=on_progress,
+                on_start=on_start,
+                on_preview=on_preview,
+                check=_check,
+                state=lambda: self.prompt_state(prompt_id),
+                idle_timeout=self._ws_idle_timeout(),
+            )
+        except TimeoutError:
+            raise RuntimeError("ComfyUI에서 결과 이미지를 받지 못했습니다. (시간 초과)")
+        finally:
+            stream.unwatch(waiter)
+        if outcome == comfy_events.FAILED:
+            raise RuntimeError(f"ComfyUI 오류: {waiter.error}")
+        if outcome == comfy_events.INTERRUPTED:
+            raise RuntimeError("ComfyUI 작업이 중단되었습니다.")
+        try:
+            self._logger.info({"event": "comfy_ws_complete", "prompt_id": prompt_id, "shared": True})
+        except Exception:
+            pass
+
+    def _wait_on_dedicated_ws(
+        self,
+        prompt_id,
+        on_progress: Optional[Callable[[float], None]] = None,
+        on_start: Optional[Callable[[], None]] = None,
+        on_preview: Optional[Callable[[bytes], None]] = None,
+    ):
+        ws_url = f"{self._ws_base()}/ws?clientId={self.client_id}"
+
+        ws = None
+        import time as _t
 
         try:
             ws = websocket.create_connection(ws_url, timeout=self._ws_connect_timeout())
@@ -288,7 +541,7 @@ class ComfyUIClient:
             last_hist_check = 0.0
             # Fast-path: 이미 history가 준비돼 있으면 WS 없이 바로 결과 다운로드로 진행
             try:
-                if _history_has_any_images():
+                if self._history_ready(prompt_id):
                     try:
                         self._logger.info({"event": "comfy_history_ready_fastpath", "prompt_id": prompt_id})
                     except Exception:
@@ -305,16 +558,20 @@ class ComfyUIClient:
                     opcode, data = ws.recv_data()
                 except websocket.WebSocketTimeoutException as e:
                     # Regular poll loop: on timeout, check history to see whether the prompt already completed.
-                    pass
+                    opcode, data = None, None
                 except StopIteration:
                     raise
 
+                if str(prompt_id) in self._deleted_prompts:
+                    # ComfyUI 대기열에서 삭제됨: 이벤트가 오지 않으므로 바로 끝냅니다.
+                    raise RuntimeError("ComfyUI 작업이 중단되었습니다.")
+
                 # Periodic history polling to avoid missing completion events (or getting stuck on pongs).
                 try:
                     now = _t.time()
                     if (now - last_hist_check) >= 0.75:
                         last_hist_check = now
-                        if _history_has_any_images():
+                        if self._history_ready(prompt_id):
                             try:
                                 self._logger.info({"event": "comfy_history_ready", "prompt_id": prompt_id})
                             except Exception:
@@ -334,6 +591,13 @@ class ComfyUIClient:
                 if opcode == 1:
                     message = json.loads(data.decode('utf-8'))
 
+                    if message['type'] == 'execution_start' and on_start:
+                        if (message.get('data') or {}).get('prompt_id') == prompt_id:
+                            try:
+                                on_start()
+                            except Exception:
+                                pass
+
                     if message['type'] == 'executing':
                         node_data = message['data']
                         if node_data['node'] is None and node_data['prompt_id'] == prompt_id:
@@ -365,7 +629,14 @@ class ComfyUIClient:
                                 pass
 
                 elif opcode == 2:
-                    pass # Pong frame, 무시
+                    # 바이너리 프레임: 잠재 이미지 미리보기 (이 연결은 이 작업의 client_id 전용)
+                    if on_preview:
+                        decoded = comfy_events.decode_preview(data)
+                        if decoded is not None and decoded[0] in (None, str(prompt_id)):
+                            try:
+                                on_preview(decoded[1])
+                            except Exception:
+                                pass
 
         except websocket.WebSocketConnectionClosedException:
             try:
@@ -393,6 +664,109 @@ class ComfyUIClient:
                 except Exception:
                     pass
 
+    def _download_outputs(self, prompt_id, limit: Optional[int] = 1, output_nodes=None) -> dict[str, bytes]:
+        """순위가 높은 출력부터 bytes로 내려받습니다 (fetch_outputs 참고)."""
+        return self._collect_outputs(
+            prompt_id,
+            lambda img: self.get_image(img["filename"], img.get("subfolder", ""), img.get("type", "")),
+            limit=limit,
+            output_nodes=output_nodes,
+        )
+
+    def fetch_outputs(self, prompt_id, dest_dir: str, *, limit: Optional[int] = 1, output_nodes=None) -> dict[str, str]:
+        """
+        순위가 높은 출력부터 dest_dir에 파일로 받아 {원본 파일명: 경로}를 반환합니다.
+
+        COMFY_OUTPUT_DIR가 로컬에 있으면 HTTP 없이 하드링크/이동하고, 아니면 /view를 청크 단위로
+        스트리밍해 디스크에 씁니다. 호출자가 반환된 파일을 옮기거나 지워야 합니다.
+        """
+        os.makedirs(dest_dir, exist_ok=True)
+
+        def _fetch(img: dict) -> Optional[str]:
+            _, ext = os.path.splitext(str(img["filename"]))
+            dest_path = os.path.join(dest_dir, f"{uuid.uuid4().hex}{ext.lower()}")
+            return dest_path if self.fetch_output(img, dest_path) else None
+
+        return self._collect_outputs(prompt_id, _fetch, limit=limit, output_nodes=output_nodes)
+
+    def _collect_outputs(self, prompt_id, fetch: Callable[[dict], Any], *, limit: Optional[int], output_nodes) -> dict:
+        """
+        순위가 높은 출력부터 하나씩 받아 limit개를 채우면 멈춥니다 (None이면 전부).
+        1순위가 실패하면 다음 후보로 넘어갑니다.
+        """
+        ranked = self.rank_outputs(prompt_id, output_nodes=output_nodes)
+        collected: dict = {}
+        attempts = 0
+        for img in ranked:
+            if limit is not None and len(collected) >= max(1, int(limit)):
+                break
+            filename = img.get("filename")
+            if not filename:
+                continue
+            attempts += 1
+            try:
+                value = fetch(img)
+            except Exception:
+                value = None
+            if value:
+                collected[str(filename)] = value
+            else:
+                try:
+                    self._logger.warning({"event": "comfy_output_fetch_failed", "prompt_id": prompt_id, "filename": filename})
+                except Exception:
+                    pass
+        try:
+            self._logger.info({
+                "event": "comfy_outputs_downloaded",
+                "prompt_id": prompt_id,
+                "candidates": len(ranked),
+                "attempts": attempts,
+                "downloaded": len(collected),
+            })
+        except Exception:
+            pass
+        return collected
+
+    def local_output_path(self, filename, subfolder, folder_type) -> Optional[str]:
+        """ComfyUI output 폴더를 공유할 때 결과 파일의 로컬 경로 (아니면 None)."""
+        if COMFY_OUTPUT_TRANSPORT == "http" or not self.output_dir or folder_type != "output" or not filename:
+            return None
+        root = os.path.realpath(self.output_dir)
+        path = os.path.realpath(os.path.join(root, str(subfolder or ""), str(filename)))
+        # history 값으로 output 폴더 밖을 가리키지 못하게 합니다.
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return None
+        return path
+
+    def fetch_output(self, img: dict, dest_path: str) -> bool:
+        """결과 파일 하나를 dest_path에 놓습니다: 로컬 링크/이동, 실패하면 HTTP 스트리밍."""
+        filename, subfolder, folder_type = img.get("filename"), img.get("subfolder", ""), img.get("type", "")
+        src = self.local_output_path(filename, subfolder, folder_type)
+        if src is not None:
+            try:
+                method = _place_local_output(src, dest_path, COMFY_OUTPUT_TRANSPORT)
+                _record_output(method, os.path.getsize(dest_path))
+                return True
+            except OSError as e:
+                _record_output("local_failures")
+                try:
+                    self._logger.warning({"event": "comfy_output_local_failed", "path": src, "error": str(e)})
+                except Exception:
+                    pass
+        size = self.download_image(filename, subfolder, folder_type, dest_path)
+        if size is None:
+            _record_output("failures")
+            return False
+        _record_output("http_stream", size)
+        return True
+
+    def rank_outputs(self, prompt_id, output_nodes=None) -> list[dict]:
+        """
+        history의 출력 파일 목록을 우선순위 순으로 반환합니다 (다운로드하지 않음).
+
+        output_nodes(워크플로우 설정)가 있으면 그 노드들의 출력만 나열 순서대로 사용하고,
+        해당 노드에 출력이 없을 때만 기본 순위로 돌아갑니다.
+        """
         # --- 결과 이미지 선택 ---
         # ComfyUI history에는 "최종 결과"뿐 아니라 입력/중간 단계의 이미지도 outputs에 포함될 수 있습니다.
         # 예: LoadImage 출력(원본), 중간 프리뷰, 최종 Preview/SaveImage 결과 등.
@@ -421,7 +795,7 @@ class ComfyUIClient:
         except Exception:
             prompt_graph = {}
 
-        candidates: list[tuple[int, int, int, dict]] = []
+        candidates: list[tuple[int, int, int, dict, str]] = []
 
         def _node_num(node_id: str) -> int:
             try:
@@ -471,7 +845,7 @@ class ComfyUIClient:
                 if not isinstance(img, dict):
                     continue
                 tpri = _type_priority(img.get("type"))
-                candidates.append((cpri, tpri, nid, img))
+                candidates.append((cpri, tpri, nid, img, str(node_id)))
 
         # Filter 1: output/temp 가 하나라도 있으면 input 타입은 제외(가능한 경우)
         try:
@@ -484,19 +858,18 @@ class ComfyUIClient:
         # 우선순위: class > type(output/temp/input) > node_id(큰 것이 보통 더 마지막)
         candidates.sort(key=lambda t: (t[0], t[1], t[2]), reverse=True)
 
-        images_output: dict[str, bytes] = {}
-        for cpri, tpri, nid, img in candidates:
-            try:
-                filename = img.get("filename")
-                subfolder = img.get("subfolder", "")
-                folder_type = img.get("type", "")
-                if not filename:
-                    continue
-                image_data = self.get_image(filename, subfolder, folder_type)
-                if image_data:
-                    images_output[str(filename)] = image_data
-            except Exception:
-                continue
+        wanted = [str(n) for n in (output_nodes or []) if str(n)]
+        if wanted:
+            explicit = [t for t in candidates if t[4] in wanted]
+            if explicit:
+                # 설정된 노드 순서가 우선, 같은 노드 안에서는 기본 순위 유지 (stable sort)
+                explicit.sort(key=lambda t: wanted.index(t[4]))
+                candidates = explicit
+            else:
+                try:
+                    self._logger.warning({"event": "comfy_output_nodes_missing", "prompt_id": prompt_id, "output_nodes": wanted})
+                except Exception:
+                    pass
 
         # (디버깅 힌트) 어떤 후보가 1순위였는지 + 상위 후보 몇 개를 로그
         try:
@@ -533,26 +906,24 @@ class ComfyUIClient:
         except Exception:
             pass
 
-        return images_output
+        return [t[3] for t in candidates]
 
-    def interrupt(self):
+    def interrupt(self, prompt_id: Optional[str] = None):
         """
         현재 client_id로 ComfyUI 서버에 인터럽트 요청을 보냅니다.
-        실행 중인 작업이 있다면 즉시 중단됩니다.
+
+        prompt_id를 주면 ComfyUI는 그 prompt가 실행 중일 때만 중단합니다 (그 사이 다른 작업이
+        시작됐어도 건드리지 않음). 없으면 실행 중인 작업을 무조건 중단합니다.
         """
         url = f"{self._http_base()}/interrupt"
+        body = {"client_id": self.client_id}
+        if prompt_id:
+            body["prompt_id"] = str(prompt_id)
         try:
-            import requests
             timeout_tuple = self._http_timeouts()
-            response = requests.post(url, json={"client_id": self.client_id}, timeout=timeout_tuple)
+            response = self._http().request("interrupt", "POST", url, json=body, timeout=timeout_tuple)
             response.raise_for_status()
             return True
-        except ImportError:
-            try:
-                self._logger.error({"event": "requests_missing"})
-            except Exception:
-                pass
-            return False
         except requests.exceptions.Timeout as e:
             try:
                 self._logger.error({"event": "comfy_timeout", "stage": "interrupt", "url": url, "error": str(e)})
@@ -570,13 +941,91 @@ class ComfyUIClient:
                 pass
             return False
 
+    def delete_queued_prompt(self, prompt_id: str) -> bool:
+        """아직 시작하지 않은 prompt를 ComfyUI 대기열에서 지웁니다 (/queue delete)."""
+        url = f"{self._http_base()}/queue"
+        try:
+            response = self._http().request(
+                "delete_queued", "POST", url, json={"delete": [str(prompt_id)]}, timeout=self._http_timeouts()
+            )
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            try:
+                self._logger.error({"event": "comfy_http_error", "stage": "delete_queued", "url": url, "error": str(e)})
+            except Exception:
+                pass
+            return False
+
+    def cancel_prompt(self, prompt_id: str) -> bool:
+        """
+        prompt 하나만 취소합니다.
+
+        대기 중이면 ComfyUI 대기열에서 지우고(실행 중인 다른 작업은 그대로), 실행 중일 때만
+        prompt_id를 지정한 /interrupt를 보냅니다 (이벤트 스트림이 연결돼 있으면 스트림이 보는 실행 중
+        prompt도 같아야 함). 이미 끝났거나 없으면 아무것도 하지 않습니다.
+        무엇을 멈췄는지는 comfy_prompt_cancel 로그에 남깁니다.
+        """
+        prompt_id = str(prompt_id)
+        state = self.prompt_state(prompt_id)
+        stream = self.event_stream
+        action = "none"
+        if state == "pending":
+            action = self._dequeue(prompt_id)
+        # 오래된 ComfyUI는 /interrupt의 prompt_id를 무시하고 실행 중인 작업을 무조건 멈춥니다. 상태 확인 뒤
+        # 이 prompt가 끝나고 다음 작업이 시작됐을 수도 있으므로, 이벤트 스트림이 연결돼 있으면 지금 실행 중인
+        # prompt가 이 prompt일 때만 보냅니다.
+        executing = stream.executing_prompt() if stream is not None else None
+        confirmed = stream is None or not stream.connected or executing == prompt_id
+        if state == "running" or action == "started":
+            if confirmed:
+                action = "interrupted" if self.interrupt(prompt_id) else "interrupt_failed"
+            else:
+                action = "skipped_not_executing"
+        elif state == "unknown":
+            if executing in (None, prompt_id):
+                action = "interrupted" if self.interrupt(prompt_id) else "interrupt_failed"
+            else:
+                # 대기열은 못 읽었지만 이벤트 스트림상 다른 prompt가 실행 중: 그 작업은 건드리지 않습니다.
+                action = "skipped_other_executing"
+        try:
+            self._logger.info({
+                "event": "comfy_prompt_cancel",
+                "prompt_id": prompt_id,
+                "state": state,
+                "action": action,
+                "executing_prompt_id": executing,
+                "backend": self._http_base(),
+            })
+        except Exception:
+            pass
+        return action in ("dequeued", "interrupted")
+
+    def _dequeue(self, prompt_id: str) -> str:
+        """대기 중인 prompt 삭제: "dequeued" | "started" | "finished" | "dequeue_failed"."""
+        if not self.delete_queued_prompt(prompt_id):
+            return "dequeue_failed"
+        # 확인과 삭제 사이에 실행이 시작됐으면 삭제는 아무 효과가 없습니다 (호출한 쪽에서 중단).
+        after = self.prompt_state(prompt_id)
+        if after == "running":
+            return "started"
+        if after == "pending":
+            return "dequeue_failed"
+        if after in ("complete", "failed"):
+            return "finished"
+        self._deleted_prompts[prompt_id] = None
+        while len(self._deleted_prompts) > _DELETED_PROMPTS_MAX:
+            self._deleted_prompts.popitem(last=False)
+        if self.event_stream is not None:
+            self.event_stream.finish(prompt_id, comfy_events.INTERRUPTED)
+        return "dequeued"
+
     def get_history(self, prompt_id):
         """HTTP를 통해 특정 prompt_id의 히스토리를 가져옵니다."""
-        import requests
         url = f"{self._http_base()}/history/{prompt_id}"
         try:
             timeout_tuple = self._http_timeouts()
-            response = requests.get(url, timeout=timeout_tuple)
+            response = self._http().request("get_history", "GET", url, timeout=timeout_tuple)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.Timeout as e:
@@ -592,14 +1041,85 @@ class ComfyUIClient:
                 pass
             return {}
 
+    def get_queue(self) -> Optional[dict]:
+        """HTTP로 ComfyUI 대기열(/queue)을 가져옵니다. 실패 시 None."""
+        url = f"{self._http_base()}/queue"
+        try:
+            response = self._http().request("get_queue", "GET", url, timeout=self._http_timeouts())
+            response.raise_for_status()
+            data = response.json()
+            return data if isinstance(data, dict) else None
+        except Exception as e:
+            try:
+                self._logger.error({"event": "comfy_http_error", "stage": "get_queue", "url": url, "error": str(e)})
+            except Exception:
+                pass
+            return None
+
+    def prompt_state(self, prompt_id: str) -> str:
+        """
+        prompt_id의 현재 상태: "complete" | "running" | "pending" | "failed" | "missing" | "unknown".
+        재시작 복구에서 결과를 다시 받을지(재생성 없이) 판단할 때 사용합니다.
+        """
+        history = self.get_history(prompt_id)
+        entry = history.get(prompt_id) if isinstance(history, dict) else None
+        if isinstance(entry, dict):
+            status = entry.get("status") if isinstance(entry.get("status"), dict) else {}
+            if status.get("status_str") == "error":
+                return "failed"
+            outputs = entry.get("outputs")
+            if isinstance(outputs, dict) and outputs:
+                return "complete"
+            if status.get("completed"):
+                return "failed"
+        queue = self.get_queue()
+        if queue is None:
+            return "unknown"
+        for key, state in (("queue_running", "running"), ("queue_pending", "pending")):
+            for item in queue.get(key) or []:
+                if isinstance(item, (list, tuple)) and len(item) > 1 and item[1] == prompt_id:
+                    return state
+        return "missing"
+
+    def download_image(self, filename, subfolder, folder_type, dest_path: str) -> Optional[int]:
+        """/view 응답을 청크 단위로 dest_path에 씁니다. 받은 바이트 수, 실패하면 None."""
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        url = f"{self._http_base()}/view"
+        part_path = f"{dest_path}.part"
+        try:
+            size = 0
+            with self._http().request("get_image", "GET", url, params=params, timeout=self._http_timeouts(), stream=True) as response:
+                response.raise_for_status()
+                with open(part_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_BYTES):
+                        if chunk:
+                            f.write(chunk)
+                            size += len(chunk)
+            if size <= 0:
+                raise ValueError("empty response")
+            os.replace(part_path, dest_path)
+            return size
+        except Exception as e:
+            try:
+                event = "comfy_timeout" if isinstance(e, requests.exceptions.Timeout) else "comfy_http_error"
+                self._logger.error({"event": event, "stage": "get_image", "url": url, "error": str(e)})
+            except Exception:
+                pass
+            return None
+        finally:
+            try:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            except OSError:
+                pass
+
     def get_image(self, filename, subfolder, folder_type):
         """HTTP를 통해 특정 이미지를 가져옵니다."""
-        import requests
         params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         url = f"{self._http_base()}/view"
         try:
             timeout_tuple = self._http_timeouts()
-            response = requests.get(url, params=params, timeout=timeout_tuple)
+            response = self._http().request("get_image", "GET", url, params=params, timeout=timeout_tuple)
             response.raise_for_status()
             return response.content
         except requests.exceptions.Timeout as e:
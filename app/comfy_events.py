@@ -0,0 +1,446 @@
+"""
+One long-lived ComfyUI event WebSocket per backend, shared by every job.
+
+ComfyUI only sends execution events to the client_id that queued the prompt, so prompts
+are queued with the stream's client_id and the stream routes `executing` / `progress` /
+`executed` / `execution_*` messages to waiters by prompt_id. Binary latent preview frames
+go to the waiter of the executing prompt (and are dropped when nobody waits for it). The
+connection reconnects on its own; waiters do a single /history check after a reconnect
+(events may have been missed) instead of polling for the whole generation.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import websocket
+
+from .config import WS_TIMEOUTS
+
+
+# Waiter outcomes
+COMPLETE = "complete"
+FAILED = "error"
+INTERRUPTED = "interrupted"
+
+# ComfyUI binary message types (server.BinaryEventTypes)
+PREVIEW_IMAGE = 1
+PREVIEW_IMAGE_WITH_METADATA = 4
+
+
+def decode_preview(data: bytes) -> Optional[tuple[Optional[str], bytes]]:
+    """
+    (prompt_id or None, encoded JPEG/PNG bytes) of a binary preview frame, else None.
+
+    PREVIEW_IMAGE is `>I event, >I image type, image`; PREVIEW_IMAGE_WITH_METADATA is
+    `>I event, >I metadata length, metadata JSON (prompt_id, node_id, ...), image`.
+    """
+    if not isinstance(data, (bytes, bytearray)) or len(data) < 8:
+        return None
+    event, second = struct.unpack(">II", bytes(data[:8]))
+    if event == PREVIEW_IMAGE:
+        image = bytes(data[8:])
+        return (None, image) if image else None
+    if event == PREVIEW_IMAGE_WITH_METADATA:
+        end = 8 + second
+        if second <= 0 or end >= len(data):
+            return None
+        try:
+            metadata = json.loads(bytes(data[8:end]).decode("utf-8"))
+        except Exception:
+            metadata = {}
+        prompt_id = metadata.get("prompt_id") if isinstance(metadata, dict) else None
+        return (str(prompt_id) if prompt_id else None, bytes(data[end:]))
+    return None
+
+
+class PromptWaiter:
+    """Events for one prompt_id; consumed by the job's worker thread."""
+
+    def __init__(self, prompt_id: str):
+        self.prompt_id = prompt_id
+        self.events: "queue.Queue[tuple[str, Any]]" = queue.Queue()
+        self.outcome: Optional[str] = None
+        self.error: Optional[str] = None
+        # node_id -> `executed` output payload, in arrival order
+        self.outputs: Dict[str, Any] = {}
+
+    def wait(
+        self,
+        *,
+        on_progress: Optional[Callable[[float], None]] = None,
+        on_start: Optional[Callable[[], None]] = None,
+        on_preview: Optional[Callable[[bytes], None]] = None,
+        check: Optional[Callable[[], bool]] = None,
+        state: Optional[Callable[[], str]] = None,
+        idle_timeout: float = 120.0,
+    ) -> str:
+        """
+        Block until the prompt finishes and return its outcome.
+
+        check() (a /history lookup) runs only after a reconnect or when no event arrived for
+        idle_timeout seconds. A pipelined prompt gets no events while it waits behind another
+        one in ComfyUI's queue, so until it starts executing an idle period asks state()
+        (ComfyUIClient.prompt_state) and keeps waiting while it is "pending"; the idle limit
+        applies once it has started. Otherwise the wait fails with TimeoutError.
+        on_start() runs when ComfyUI starts executing the prompt (it may have waited in
+        ComfyUI's own queue until then). Callbacks run in the calling thread.
+        """
+        started = False
+
+        def _start():
+            nonlocal started
+            started = True
+            if on_start:
+                try:
+                    on_start()
+                except Exception:
+                    pass
+
+        while True:
+            try:
+                kind, value = self.events.get(timeout=max(0.05, idle_timeout))
+            except queue.Empty:
+                if check is not None and check():
+                    self.outcome = COMPLETE
+                    return COMPLETE
+                current = state() if (state is not None and not started) else None
+                if current == "pending":
+                    continue
+                if current == "running":
+                    # The start event was missed: from here on the idle limit applies.
+                    _start()
+                    continue
+                raise TimeoutError(self.prompt_id)
+            if kind == "progress":
+                if on_progress:
+                    try:
+                        on_progress(float(value))
+                    except Exception:
+                        pass
+            elif kind == "preview":
+                if on_preview:
+                    try:
+                        on_preview(value)
+                    except Exception:
+                        pass
+            elif kind == "started":
+                _start()
+            elif kind == "executed":
+                node_id, output = value
+                self.outputs[str(node_id)] = output
+            elif kind == "reconnected":
+                if check is not None and check():
+                    self.outcome = COMPLETE
+                    return COMPLETE
+            elif kind == "done":
+                outcome, error = value
+                self.outcome, self.error = outcome, error
+                if outcome == COMPLETE and on_progress:
+                    try:
+                        on_progress(100.0)
+                    except Exception:
+                        pass
+                return outcome
+
+
+class ComfyEventStream:
+    """Shared reconnecting event connection for one ComfyUI backend."""
+
+    def __init__(
+        self,
+        ws_url_base: str,
+        *,
+        client_id: Optional[str] = None,
+        connect: Optional[Callable[..., Any]] = None,
+        recent_size: int = 512,
+    ):
+        self.ws_url_base = ws_url_base.rstrip("/")
+        self.client_id = client_id or str(uuid.uuid4())
+        self._connect_fn = connect or websocket.create_connection
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, PromptWaiter] = {}
+        # Outcomes of prompts that finished before anyone waited on them (fast jobs finish
+        # before the /prompt response reaches the caller).
+        self._recent: "OrderedDict[str, tuple[str, Optional[str]]]" = OrderedDict()
+        self._recent_size = max(16, int(recent_size))
+        self._current_prompt: Optional[str] = None
+        self._connected = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ws = None
+        self._logger = logging.getLogger("comfyui_app")
+        # Bumped on every (re)connect; a prompt queued in an older generation may have missed events.
+        self.generation = 0
+        self._metrics = {"connects": 0, "reconnects": 0, "connect_failures": 0, "messages": 0, "routed": 0, "history_checks": 0, "previews": 0}
+
+    # ---- lifecycle ----
+
+    def start(self) -> "ComfyEventStream":
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="comfy-events", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: float = 2.0):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        self._thread = None
+
+    def wait_connected(self, timeout: float) -> bool:
+        return self._connected.wait(timeout)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def executing_prompt(self) -> Optional[str]:
+        """prompt_id ComfyUI last reported as executing (None when idle, unknown or disconnected)."""
+        with self._lock:
+            current = self._current_prompt
+        return current if self.connected else None
+
+    # ---- waiters ----
+
+    def watch(self, prompt_id: str) -> PromptWaiter:
+        """Register interest in prompt_id; replays an outcome that already arrived."""
+        prompt_id = str(prompt_id)
+        with self._lock:
+            waiter = self._waiters.get(prompt_id)
+            if waiter is None:
+                waiter = PromptWaiter(prompt_id)
+                self._waiters[prompt_id] = waiter
+            finished = self._recent.pop(prompt_id, None)
+        if finished is not None:
+            waiter.events.put(("done", finished))
+        return waiter
+
+    def unwatch(self, waiter: PromptWaiter):
+        with self._lock:
+            if self._waiters.get(waiter.prompt_id) is waiter:
+                self._waiters.pop(waiter.prompt_id, None)
+
+    def finish(self, prompt_id: str, outcome: str, error: Optional[str] = None):
+        """End a wait locally, e.g. for a prompt deleted from ComfyUI's queue (no events follow)."""
+        event = ("done", (outcome, error))
+        with self._lock:
+            waiter = self._route_locked(str(prompt_id), event)
+        if waiter is not None:
+            waiter.events.put(event)
+
+    def record(self, name: str, count: int = 1):
+        with self._lock:
+            self._metrics[name] = self._metrics.get(name, 0) + count
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._metrics)
+            data["waiters"] = len(self._waiters)
+        data["connected"] = self.connected
+        data["client_id"] = self.client_id
+        return data
+
+    # ---- reader thread ----
+
+    def _run(self):
+        backoff = 0.5
+        first = True
+        while not self._stop.is_set():
+            try:
+                ws = self._connect_fn(
+                    f"{self.ws_url_base}/ws?clientId={self.client_id}",
+                    timeout=float(WS_TIMEOUTS.get("comfy_ws_connect", 5.0)),
+                )
+            except Exception as e:
+                with self._lock:
+                    self._metrics["connect_failures"] += 1
+                try:
+                    self._logger.debug({"event": "comfy_events_connect_failed", "error": str(e)})
+                except Exception:
+                    pass
+                self._stop.wait(backoff)
+                backoff = min(10.0, backoff * 2)
+                continue
+            backoff = 0.5
+            self._ws = ws
+            with self._lock:
+                self.generation += 1
+                # Whatever was executing before the disconnect may have finished since.
+                self._current_prompt = None
+                self._metrics["connects"] += 1
+                if not first:
+                    self._metrics["reconnects"] += 1
+                waiters = list(self._waiters.values())
+            self._connected.set()
+            try:
+                self._logger.info({"event": "comfy_events_connected", "reconnect": not first})
+            except Exception:
+                pass
+            if not first:
+                # Events sent while we were disconnected are lost: let each waiter check once.
+                for waiter in waiters:
+                    waiter.events.put(("reconnected", None))
+            first = False
+            try:
+                self._read(ws)
+            except Exception as e:
+                if not self._stop.is_set():
+                    try:
+                        self._logger.info({"event": "comfy_events_disconnected", "error": str(e)})
+                    except Exception:
+                        pass
+            finally:
+                self._connected.clear()
+                self._ws = None
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+            if not self._stop.is_set():
+                self._stop.wait(backoff)
+
+    def _read(self, ws):
+        idle = float(WS_TIMEOUTS.get("comfy_ws_idle", 120.0))
+        try:
+            # Short recv timeout so a dead peer is noticed (ping) without blocking close().
+            ws.settimeout(min(30.0, max(1.0, idle / 4)))
+        except Exception:
+            pass
+        while not self._stop.is_set():
+            try:
+                opcode, data = ws.recv_data()
+            except websocket.WebSocketTimeoutException:
+                ws.ping()
+                continue
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                raise websocket.WebSocketConnectionClosedException("closed by server")
+            if opcode == websocket.ABNF.OPCODE_BINARY:
+                self.dispatch_binary(data)
+                continue
+            if opcode != websocket.ABNF.OPCODE_TEXT:
+                continue
+            try:
+                message = json.loads(data.decode("utf-8") if isinstance(data, (bytes, bytearray)) else data)
+            except Exception:
+                continue
+            if isinstance(message, dict):
+                self.dispatch(message)
+
+    def dispatch(self, message: Dict[str, Any]):
+        """Route one ComfyUI message (public for tests and replay)."""
+        kind = message.get("type")
+        data = message.get("data") if isinstance(message.get("data"), dict) else {}
+        prompt_id = data.get("prompt_id")
+        with self._lock:
+            self._metrics["messages"] += 1
+            if kind == "executing":
+                if data.get("node") is None:
+                    if prompt_id and prompt_id == self._current_prompt:
+                        self._current_prompt = None
+                else:
+                    self._current_prompt = prompt_id or self._current_prompt
+            # Older ComfyUI builds omit prompt_id on progress: use the executing prompt.
+            prompt_id = prompt_id or self._current_prompt
+            if not prompt_id:
+                return
+            event = None
+            if kind == "progress":
+                try:
+                    event = ("progress", float(data["value"]) / float(data["max"]) * 100.0)
+                except Exception:
+                    event = None
+            elif kind == "execution_start":
+                event = ("started", None)
+            elif kind == "executed" and data.get("node") is not None:
+                event = ("executed", (data.get("node"), data.get("output")))
+            elif kind == "executing" and data.get("node") is None:
+                event = ("done", (COMPLETE, None))
+            elif kind == "execution_error":
+                error = str(data.get("exception_message") or data.get("exception_type") or "execution error")
+                event = ("done", (FAILED, error))
+            elif kind == "execution_interrupted":
+                event = ("done", (INTERRUPTED, None))
+            if event is None:
+                return
+            waiter = self._route_locked(prompt_id, event)
+        if waiter is not None:
+            waiter.events.put(event)
+
+    def dispatch_binary(self, data: bytes):
+        """Route a binary preview frame to the waiter of its (or the executing) prompt."""
+        decoded = decode_preview(data)
+        if decoded is None:
+            return
+        prompt_id, image = decoded
+        with self._lock:
+            prompt_id = prompt_id or self._current_prompt
+            waiter = self._waiters.get(prompt_id) if prompt_id else None
+            if waiter is None or waiter.outcome is not None:
+                return
+            self._metrics["previews"] += 1
+        waiter.events.put(("preview", image))
+
+    def _route_locked(self, prompt_id: str, event: tuple) -> Optional[PromptWaiter]:
+        """Waiter that should receive event, or None (lock held)."""
+        waiter = self._waiters.get(prompt_id)
+        if waiter is None:
+            if event[0] == "done":
+                # A failure is reported before the final executing(None); keep the first outcome.
+                self._recent.setdefault(prompt_id, event[1])
+                self._recent.move_to_end(prompt_id)
+                while len(self._recent) > self._recent_size:
+                    self._recent.popitem(last=False)
+            return None
+        if event[0] == "done":
+            if waiter.outcome is not None:
+                return None
+            waiter.outcome = event[1][0]
+        self._metrics["routed"] += 1
+        return waiter
+
+
+_streams: Dict[str, ComfyEventStream] = {}
+_streams_lock = threading.Lock()
+
+
+def event_stream_for(ws_url_base: str) -> ComfyEventStream:
+    """Process-wide stream for one backend (started on first use)."""
+    key = ws_url_base.rstrip("/")
+    with _streams_lock:
+        stream = _streams.get(key)
+        if stream is None:
+            stream = ComfyEventStream(key)
+            _streams[key] = stream
+    return stream.start()
+
+
+def event_stream_metrics() -> Dict[str, Any]:
+    with _streams_lock:
+        streams = dict(_streams)
+    return {key: stream.metrics() for key, stream in streams.items()}
+
+
+def close_event_streams():
+    with _streams_lock:
+        streams = list(_streams.values())
+        _streams.clear()
+    for stream in streams:
+        stream.close()
@@ -0,0 +1,266 @@
+"""
+Content-addressed cache of images uploaded to ComfyUI's input folder.
+
+Img2img/RMBG jobs used to downscale and upload their reference image under a job-unique
+name, wait for it to appear, and delete it again when the job ended. Uploads are now named
+after sha256(source bytes) + the downscale setting, so every job that reuses the same image
+(repeated edits, retries) points LoadImage at the file that is already there: no downscale,
+no upload, no visibility wait. Entries are reference counted while jobs use them; a periodic
+janitor deletes idle ones (LRU beyond the entry/byte budget, or unused for idle_seconds).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import COMFY_INPUT_CACHE, COMFY_INPUT_DIR
+
+
+CACHE_PREFIX = "cas_"
+
+
+class _Entry:
+    def __init__(self, key: str):
+        self.key = key
+        self.name: Optional[str] = None
+        self.size = 0
+        self.refs = 0
+        self.last_used = time.time()
+        self.meta: Optional[dict] = None
+        self.ready = threading.Event()
+
+
+class ComfyInputCache:
+    def __init__(
+        self,
+        input_dir: Optional[str] = None,
+        *,
+        max_entries: int = 256,
+        max_bytes: int = 512 * 1024 * 1024,
+        idle_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        # Only with a local input_dir can the cache check presence and delete evicted files.
+        self.input_dir = input_dir or None
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self.idle_seconds = max(0.0, float(idle_seconds))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._by_name: Dict[str, _Entry] = {}
+        # key -> set once sweep() has deleted the evicted file; acquire() of that key waits for it
+        # so a fresh upload of the same cas_<key>.png is not removed by the pending delete.
+        self._evicting: Dict[str, threading.Event] = {}
+        self._metrics = {"hits": 0, "misses": 0, "upload_failures": 0, "evictions": 0, "adopted": 0}
+        self._logger = logging.getLogger("comfyui_app")
+
+    @staticmethod
+    def key_for(data: bytes, max_side: int) -> str:
+        return f"{hashlib.sha256(data).hexdigest()}-ds{int(max_side)}"
+
+    def acquire(
+        self,
+        data: bytes,
+        *,
+        max_side: int,
+        prepare: Callable[[bytes], Tuple[bytes, Optional[dict]]],
+        upload: Callable[[str, bytes], Optional[str]],
+        wait_timeout: float = 60.0,
+    ) -> Tuple[Optional[str], Optional[dict], bool]:
+        """
+        Return (stored ComfyUI input name, downscale meta, cache hit) and take a reference.
+
+        On a miss prepare(data) produces the upload bytes and upload(name, bytes) stores them
+        (returning the stored name or None). Concurrent jobs with the same image wait for the
+        first upload instead of uploading again. Call release(name) when the job ends.
+        """
+        key = self.key_for(data, max_side)
+        while True:
+            with self._lock:
+                evicting = self._evicting.get(key)
+                if evicting is None:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.ready.is_set() and not self._present(entry):
+                        self._forget(entry)
+                        entry = None
+                    owner = entry is None
+                    if owner:
+                        entry = _Entry(key)
+                        self._entries[key] = entry
+                    entry.refs += 1
+                    entry.last_used = self._clock()
+                    break
+            evicting.wait(wait_timeout)
+
+        if not owner:
+            entry.ready.wait(wait_timeout)
+            with self._lock:
+                if entry.name:
+                    self._metrics["hits"] += 1
+                    return entry.name, dict(entry.meta) if entry.meta else None, True
+                entry.refs = max(0, entry.refs - 1)
+            return None, None, False
+
+        stored = None
+        try:
+            upload_bytes, meta = prepare(data)
+            stored = upload(f"{CACHE_PREFIX}{key}.png", upload_bytes)
+            with self._lock:
+                if stored:
+                    entry.name, entry.size, entry.meta = str(stored), len(upload_bytes), meta
+                    self._by_name[entry.name] = entry
+                    self._metrics["misses"] += 1
+                else:
+                    self._metrics["upload_failures"] += 1
+                    self._entries.pop(key, None)
+        except Exception:
+            with self._lock:
+                self._metrics["upload_failures"] += 1
+                self._entries.pop(key, None)
+            raise
+        finally:
+            entry.ready.set()
+        return (entry.name, dict(entry.meta) if entry.meta else None, False) if stored else (None, None, False)
+
+    def release(self, name: str):
+        with self._lock:
+            entry = self._by_name.get(str(name))
+            if entry is not None:
+                entry.refs = max(0, entry.refs - 1)
+                entry.last_used = self._clock()
+
+    def adopt_existing(self) -> int:
+        """Index cache files left in input_dir by a previous run (unreferenced, LRU by mtime)."""
+        if not self.input_dir or not os.path.isdir(self.input_dir):
+            return 0
+        adopted = 0
+        with os.scandir(self.input_dir) as it:
+            for item in it:
+                if not item.name.startswith(CACHE_PREFIX) or not item.name.endswith(".png") or not item.is_file():
+                    continue
+                key = item.name[len(CACHE_PREFIX):-len(".png")]
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                with self._lock:
+                    if key in self._entries:
+                        continue
+                    entry = _Entry(key)
+                    entry.name, entry.size, entry.last_used = item.name, st.st_size, st.st_mtime
+                    entry.ready.set()
+                    self._entries[key] = entry
+                    self._by_name[entry.name] = entry
+                    self._metrics["adopted"] += 1
+                adopted += 1
+        return adopted
+
+    def sweep(self) -> int:
+        """Evict unreferenced entries: idle too long, then least recently used over budget."""
+        now = self._clock()
+        evicted = []
+        with self._lock:
+            idle = sorted(
+                (e for e in self._entries.values() if e.refs == 0 and e.ready.is_set()),
+                key=lambda e: e.last_used,
+            )
+            count = len(self._entries)
+            total = sum(e.size for e in self._entries.values())
+            for entry in idle:
+                over_budget = count > self.max_entries or (self.max_bytes and total > self.max_bytes)
+                expired = self.idle_seconds and now - entry.last_used > self.idle_seconds
+                if not over_budget and not expired:
+                    break
+                self._forget(entry)
+                self._evicting[entry.key] = threading.Event()
+                count -= 1
+                total -= entry.size
+                evicted.append(entry)
+            self._metrics["evictions"] += len(evicted)
+        for entry in evicted:
+            try:
+                self._delete_file(entry.name)
+            finally:
+                with self._lock:
+                    done = self._evicting.pop(entry.key, None)
+                if done is not None:
+                    done.set()
+        if evicted:
+            try:
+                self._logger.info({"event": "comfy_input_cache_evicted", "count": len(evicted), "entries": count})
+            except Exception:
+                pass
+        return len(evicted)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._metrics)
+            data["entries"] = len(self._entries)
+            data["in_use"] = sum(1 for e in self._entries.values() if e.refs > 0)
+            data["bytes"] = sum(e.size for e in self._entries.values())
+        lookups = data["hits"] + data["misses"]
+        data["hit_ratio"] = round(data["hits"] / lookups, 3) if lookups else None
+        return data
+
+    def _present(self, entry: _Entry) -> bool:
+        # Someone may have cleaned the input folder by hand; re-upload instead of failing the job.
+        if not self.input_dir or not entry.name:
+            return bool(entry.name)
+        return os.path.exists(os.path.join(self.input_dir, entry.name))
+
+    def _forget(self, entry: _Entry):
+        self._entries.pop(entry.key, None)
+        if entry.name:
+            self._by_name.pop(entry.name, None)
+
+    def _delete_file(self, name: Optional[str]):
+        if not self.input_dir or not name:
+            return
+        try:
+            os.remove(os.path.join(self.input_dir, name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            try:
+                self._logger.info({"event": "comfy_input_cache_delete_failed", "name": name, "error": str(e)})
+            except Exception:
+                pass
+
+
+_caches: Dict[str, ComfyInputCache] = {}
+_caches_lock = threading.Lock()
+
+
+def input_cache_for(http_base: str, input_dir: Optional[str] = COMFY_INPUT_DIR) -> Optional[ComfyInputCache]:
+    """Per-backend cache, or None when COMFY_INPUT_CACHE_ENABLED=false. input_dir: the backend's local input folder."""
+    if not COMFY_INPUT_CACHE["enabled"]:
+        return None
+    with _caches_lock:
+        cache = _caches.get(http_base)
+        if cache is None:
+            cache = ComfyInputCache(
+                input_dir,
+                max_entries=COMFY_INPUT_CACHE["max_entries"],
+                max_bytes=COMFY_INPUT_CACHE["max_bytes"],
+                idle_seconds=COMFY_INPUT_CACHE["idle_seconds"],
+            )
+            _caches[http_base] = cache
+        return cache
+
+
+def sweep_input_caches() -> int:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return sum(cache.sweep() for cache in caches)
+
+
+def input_cache_metrics() -> Dict[str, Any]:
+    with _caches_lock:
+        caches = dict(_caches)
+    return {base: cache.metrics() for base, cache in caches.items()}
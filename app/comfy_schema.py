@@ -0,0 +1,293 @@
+"""
+ComfyUI node schema (/object_info) per backend, and workflow graph validation against it.
+
+A missing custom node, an unknown model file or an out-of-range value used to surface only
+as a 4xx from POST /prompt, after the job was admitted, queued and had its inputs uploaded.
+Each backend's /object_info is fetched once (and refreshed periodically / when the backend
+comes back) and every configured workflow graph is checked against it: a workflow no
+backend can run is rejected at admission and hidden from /api/v1/workflows, and a backend
+that cannot run a workflow is skipped by the pool. queue_prompt re-checks only the nodes a
+request overrides, which is a few dict lookups.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from .workflow_templates import workflow_templates
+
+
+# Combo inputs with an upload button list ComfyUI's input folder; job uploads are never in it.
+_UPLOAD_FLAGS = ("image_upload", "audio_upload", "video_upload", "upload")
+_MAX_PROBLEMS = 20
+
+
+class WorkflowValidationError(RuntimeError):
+    """The request graph does not match the backend's node schema (raised before POST /prompt)."""
+
+    def __init__(self, message: str, problems: List[str]):
+        super().__init__(message)
+        self.problems = problems
+
+
+def _combo_options(spec: Any) -> Optional[List[Any]]:
+    """Allowed values of a combo input spec, or None when the input is not a checked combo."""
+    if not isinstance(spec, (list, tuple)) or not spec:
+        return None
+    kind = spec[0]
+    options = spec[1] if len(spec) > 1 and isinstance(spec[1], Mapping) else {}
+    if any(options.get(flag) for flag in _UPLOAD_FLAGS):
+        return None
+    if isinstance(kind, (list, tuple)):
+        return list(kind)
+    if kind == "COMBO" and isinstance(options.get("options"), (list, tuple)):
+        return list(options["options"])
+    return None
+
+
+def _is_link(value: Any) -> bool:
+    return (
+        isinstance(value, (list, tuple))
+        and len(value) == 2
+        and isinstance(value[0], (str, int))
+        and isinstance(value[1], int)
+        and not isinstance(value[1], bool)
+    )
+
+
+class NodeSchema:
+    def __init__(self, object_info: Mapping[str, Any], fetched_at: float):
+        self.nodes: Dict[str, Mapping[str, Any]] = {
+            str(name): info for name, info in object_info.items() if isinstance(info, Mapping)
+        }
+        self.classes = frozenset(self.nodes)
+        self.fetched_at = fetched_at
+
+    def validate(self, graph: Mapping[str, Any], node_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """Problems found in graph (only node_ids when given); empty when it can be queued."""
+        problems: List[str] = []
+        ids = [str(n) for n in node_ids] if node_ids is not None else [str(n) for n in graph]
+        for node_id in ids:
+            node = graph.get(node_id)
+            if not isinstance(node, Mapping):
+                continue
+            problems.extend(self._validate_node(node_id, node, graph))
+            if len(problems) >= _MAX_PROBLEMS:
+                break
+        return problems[:_MAX_PROBLEMS]
+
+    def _validate_node(self, node_id: str, node: Mapping[str, Any], graph: Mapping[str, Any]) -> List[str]:
+        class_type = str(node.get("class_type") or "")
+        info = self.nodes.get(class_type)
+        if info is None:
+            return [f"node {node_id}: unknown node type '{class_type}' (custom node not installed?)"]
+        spec = info.get("input") if isinstance(info.get("input"), Mapping) else {}
+        required = spec.get("required") if isinstance(spec.get("required"), Mapping) else {}
+        optional = spec.get("optional") if isinstance(spec.get("optional"), Mapping) else {}
+        inputs = node.get("inputs") if isinstance(node.get("inputs"), Mapping) else {}
+        problems: List[str] = []
+        for name in required:
+            if name not in inputs:
+                problems.append(f"node {node_id} ({class_type}): missing required input '{name}'")
+        for name, value in inputs.items():
+            input_spec = required.get(name, optional.get(name))
+            if input_spec is None:
+                continue
+            if _is_link(value):
+                if str(value[0]) not in graph:
+                    problems.append(f"node {node_id} ({class_type}): input '{name}' links to missing node {value[0]}")
+                continue
+            options = _combo_options(input_spec)
+            if options is not None:
+                if value not in options:
+                    problems.append(f"node {node_id} ({class_type}): '{name}' value {value!r} is not available")
+                continue
+            kind = input_spec[0] if isinstance(input_spec, (list, tuple)) and input_spec else None
+            if kind in ("INT", "FLOAT"):
+                bounds = input_spec[1] if len(input_spec) > 1 and isinstance(input_spec[1], Mapping) else {}
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    problems.append(f"node {node_id} ({class_type}): '{name}' must be a number")
+                elif (bounds.get("min") is not None and value < bounds["min"]) or (
+                    bounds.get("max") is not None and value > bounds["max"]
+                ):
+                    problems.append(
+                        f"node {node_id} ({class_type}): '{name}'={value} is outside [{bounds.get('min')}, {bounds.get('max')}]"
+                    )
+        return problems
+
+
+class NodeSchemaCache:
+    """Last /object_info of one backend; refreshed on demand, at most every min_refresh_seconds on a miss."""
+
+    def __init__(self, http_base: str, *, min_refresh_seconds: float = 30.0, clock: Callable[[], float] = time.time):
+        self.http_base = http_base
+        self.min_refresh_seconds = max(0.0, float(min_refresh_seconds))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._schema: Optional[NodeSchema] = None
+        self._metrics = {"fetches": 0, "fetch_failures": 0, "rejected": 0}
+        self._last_error: Optional[str] = None
+        self._logger = logging.getLogger("comfyui_app")
+
+    def current(self) -> Optional[NodeSchema]:
+        with self._lock:
+            return self._schema
+
+    def refresh(self, timeout: float = 30.0) -> Optional[NodeSchema]:
+        """Fetch /object_info; keeps the previous schema when the backend does not answer."""
+        from .comfy_client import http_pool_for  # comfy_client imports this module
+
+        try:
+            response = http_pool_for(self.http_base).request(
+                "object_info", "GET", f"{self.http_base}/object_info", timeout=timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+            if not isinstance(data, Mapping) or not data:
+                raise ValueError("empty /object_info")
+        except Exception as e:
+            with self._lock:
+                self._metrics["fetch_failures"] += 1
+                self._last_error = str(e)
+            try:
+                self._logger.info({"event": "comfy_schema_fetch_failed", "backend": self.http_base, "error": str(e)})
+            except Exception:
+                pass
+            return self.current()
+        schema = NodeSchema(data, self._clock())
+        with self._lock:
+            self._schema = schema
+            self._metrics["fetches"] += 1
+            self._last_error = None
+        return schema
+
+    def validate(self, graph: Mapping[str, Any], node_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Problems of graph against the cached schema ([] when no schema is known yet).
+
+        A schema older than min_refresh_seconds is refetched once before rejecting, so a model
+        file or node installed since the last refresh does not fail the request.
+        """
+        schema = self.current()
+        if schema is None:
+            return []
+        node_ids = list(node_ids) if node_ids is not None else None
+        problems = schema.validate(graph, node_ids)
+        if problems and self._clock() - schema.fetched_at >= self.min_refresh_seconds:
+            refreshed = self.refresh()
+            if refreshed is not None and refreshed is not schema:
+                problems = refreshed.validate(graph, node_ids)
+        if problems:
+            with self._lock:
+                self._metrics["rejected"] += 1
+        return problems
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = dict(self._metrics)
+            schema = self._schema
+            data["last_error"] = self._last_error
+        data["node_types"] = len(schema.classes) if schema is not None else None
+        data["fetched_at"] = schema.fetched_at if schema is not None else None
+        return data
+
+
+_schema_caches: Dict[str, NodeSchemaCache] = {}
+_schema_caches_lock = threading.Lock()
+
+
+def node_schema_for(http_base: str) -> NodeSchemaCache:
+    with _schema_caches_lock:
+        cache = _schema_caches.get(http_base)
+        if cache is None:
+            cache = NodeSchemaCache(http_base)
+            _schema_caches[http_base] = cache
+        return cache
+
+
+class WorkflowAvailability:
+    """Which configured ComfyUI workflows each backend can run (from its last node schema)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # workflow_id -> {backend name: problems}; backends without a schema are not listed
+        self._verdicts: Dict[str, Dict[str, List[str]]] = {}
+        # workflow_id -> number of backends with a known schema
+        self._checked: Dict[str, int] = {}
+        self._logger = logging.getLogger("comfyui_app")
+
+    def check(self, workflow_configs: Mapping[str, Mapping[str, Any]], workflow_dir: str, backends: Iterable[Any]) -> Dict[str, List[str]]:
+        """
+        Validate every ComfyUI workflow file against every backend's schema.
+
+        Sets backend.unavailable_workflows and returns {workflow_id: problems} for workflows
+        that no backend with a known schema can run.
+        """
+        backends = list(backends)
+        schemas = {b.name: node_schema_for(b.http_base()).current() for b in backends}
+        verdicts: Dict[str, Dict[str, List[str]]] = {}
+        checked: Dict[str, int] = {}
+        for workflow_id, cfg in (workflow_configs or {}).items():
+            provider = str((cfg or {}).get("provider", "comfyui") or "comfyui").strip().lower()
+            path = os.path.join(workflow_dir, f"{workflow_id}.json")
+            if provider != "comfyui" or not os.path.exists(path):
+                continue
+            try:
+                graph = workflow_templates.get(path).graph
+            except Exception:
+                continue  # reported by workflow_templates.warm
+            verdicts[workflow_id] = {
+                name: schema.validate(graph) for name, schema in schemas.items() if schema is not None
+            }
+            checked[workflow_id] = len(verdicts[workflow_id])
+        for backend in backends:
+            backend.unavailable_workflows = frozenset(
+                workflow_id for workflow_id, by_backend in verdicts.items() if by_backend.get(backend.name)
+            )
+        with self._lock:
+            self._verdicts = verdicts
+            self._checked = checked
+        unavailable = {workflow_id: problems for workflow_id in verdicts if (problems := self.problems(workflow_id))}
+        for workflow_id, problems in unavailable.items():
+            try:
+                self._logger.warning({"event": "workflow_unavailable", "workflow_id": workflow_id, "problems": problems})
+            except Exception:
+                pass
+        return unavailable
+
+    def problems(self, workflow_id: str) -> Optional[List[str]]:
+        """None when some backend can run it (or nothing is known yet), else why none can."""
+        with self._lock:
+            by_backend = self._verdicts.get(str(workflow_id))
+        if not by_backend or any(not problems for problems in by_backend.values()):
+            return None
+        return [f"{name}: {problem}" for name, problems in by_backend.items() for problem in problems][:_MAX_PROBLEMS]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            verdicts = {k: dict(v) for k, v in self._verdicts.items()}
+        return {
+            "workflows_checked": len(verdicts),
+            "unavailable": sorted(workflow_id for workflow_id in verdicts if self.problems(workflow_id)),
+            "partial": {
+                workflow_id: sorted(name for name, problems in by_backend.items() if problems)
+                for workflow_id, by_backend in verdicts.items()
+                if any(by_backend.values()) and not self.problems(workflow_id)
+            },
+        }
+
+
+workflow_availability = WorkflowAvailability()
+
+
+def node_schema_metrics() -> Dict[str, Any]:
+    with _schema_caches_lock:
+        caches = dict(_schema_caches)
+    return {
+        "backends": {base: cache.metrics() for base, cache in caches.items()},
+        "workflows": workflow_availability.metrics(),
+    }
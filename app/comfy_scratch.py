@@ -0,0 +1,313 @@
+"""
+Manifest of the scratch files a job leaves in ComfyUI's input/output folders.
+
+Job-unique uploads (img2img inputs that bypass the content-addressed cache, downscaled copies
+of preuploaded images) and SeeThrough layer outputs used to be deleted in the job's finally
+block, retrying up to 5 s per file while ComfyUI held a handle, followed by an os.listdir
+sweep of the whole input folder. Each path is now recorded in sqlite (JOB_DB_PATH) before the
+file is created; when the job ends its rows are released and a background janitor deletes
+them, retrying with exponential backoff. A crash leaves the rows behind: reconcile() at the
+next start releases every job that is not being resumed.
+
+A pattern row holds a filename prefix (SeeThrough's filename_prefix): every file starting
+with it is deleted.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .config import COMFY_SCRATCH, JOB_DB_PATH
+
+
+# Rows tried per sweep(); the janitor sweeps again at once when a batch was full.
+SWEEP_BATCH = 256
+
+
+def scratch_path(root: Optional[str], name: Optional[str]) -> Optional[str]:
+    """Absolute path of name inside root, or None when either is empty or name escapes root."""
+    if not isinstance(root, str) or not root or not isinstance(name, str) or not name:
+        return None
+    base = os.path.realpath(root)
+    # An absolute name (SeeThrough layer files) is kept as is and must still be under root.
+    path = os.path.realpath(os.path.join(base, name.replace("\\", "/")))
+    try:
+        if path == base or os.path.commonpath([base, path]) != base:
+            return None
+    except ValueError:  # another drive on Windows
+        return None
+    return path
+
+
+class ScratchManifest:
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 600.0,
+        max_attempts: int = 12,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.db_path = db_path
+        self.retry_base_seconds = max(0.0, float(retry_base_seconds))
+        self.retry_max_seconds = max(self.retry_base_seconds, float(retry_max_seconds))
+        self.max_attempts = max(1, int(max_attempts))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._metrics = {"tracked": 0, "removed": 0, "retries": 0, "abandoned": 0, "reconciled": 0}
+        self._logger = logging.getLogger("comfyui_app")
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.db_path, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA busy_timeout=5000")
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            # due_at is NULL while the job may still use the file; otherwise the next delete attempt.
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS comfy_scratch_files (
+                    path TEXT PRIMARY KEY,
+                    job_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    pattern INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    due_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_comfy_scratch_job ON comfy_scratch_files(job_id)")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_comfy_scratch_due ON comfy_scratch_files(due_at)")
+
+    def track(self, job_id: str, path: str, kind: str, *, pattern: bool = False) -> None:
+        """Record path (absolute) as belonging to job_id; call before the file is created."""
+        with self._lock:
+            with self._connect() as connection:
+                connection.execute(
+                    """
+                    INSERT INTO comfy_scratch_files (path, job_id, kind, pattern, created_at, due_at, attempts)
+                    VALUES (?, ?, ?, ?, ?, NULL, 0)
+                    ON CONFLICT(path) DO UPDATE SET
+                        job_id = excluded.job_id, kind = excluded.kind, pattern = excluded.pattern,
+                        due_at = NULL, attempts = 0, last_error = NULL
+                    """,
+                    (str(path), str(job_id), str(kind), 1 if pattern else 0, self._clock()),
+                )
+            self._metrics["tracked"] += 1
+
+    def release(self, job_id: str) -> int:
+        """Hand job_id's files to the janitor; returns how many were released. Never touches the disk."""
+        with self._lock:
+            with self._connect() as connection:
+                released = connection.execute(
+                    "UPDATE comfy_scratch_files SET due_at = ? WHERE job_id = ? AND due_at IS NULL",
+                    (self._clock(), str(job_id)),
+                ).rowcount
+        if released:
+            self._wake.set()
+        return released
+
+    def reconcile(self, keep_job_ids: Iterable[str] = ()) -> int:
+        """
+        Startup: release files of jobs that did not finish before the last stop.
+
+        keep_job_ids are jobs being resumed (their ComfyUI prompt may still read its inputs);
+        they release their files when they end.
+        """
+        keep = {str(job_id) for job_id in keep_job_ids}
+        now = self._clock()
+        with self._lock:
+            with self._connect() as connection:
+                orphaned = [
+                    row["job_id"]
+                    for row in connection.execute(
+                        "SELECT DISTINCT job_id FROM comfy_scratch_files WHERE due_at IS NULL"
+                    ).fetchall()
+                    if row["job_id"] not in keep
+                ]
+                released = 0
+                for job_id in orphaned:
+                    released += connection.execute(
+                        "UPDATE comfy_scratch_files SET due_at = ? WHERE job_id = ? AND due_at IS NULL",
+                        (now, job_id),
+                    ).rowcount
+                pending = connection.execute(
+                    "SELECT COUNT(*) FROM comfy_scratch_files WHERE due_at IS NOT NULL"
+                ).fetchone()[0]
+            self._metrics["reconciled"] += released
+        try:
+            self._logger.info({
+                "event": "comfy_scratch_reconciled",
+                "orphan_jobs": len(orphaned),
+                "orphan_files": released,
+                "pending": int(pending),
+                "kept_jobs": len(keep),
+            })
+        except Exception:
+            pass
+        if pending:
+            self._wake.set()
+        return released
+
+    def sweep(self, limit: int = SWEEP_BATCH) -> int:
+        """Try every due file once; returns how many rows were processed."""
+        now = self._clock()
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT * FROM comfy_scratch_files WHERE due_at IS NOT NULL AND due_at <= ? ORDER BY due_at LIMIT ?",
+                (now, max(1, int(limit))),
+            ).fetchall()
+        if not rows:
+            return 0
+        # Filesystem work happens outside the lock and the connection.
+        outcomes = [(row, self._remove(row["path"], bool(row["pattern"]))) for row in rows]
+        abandoned = []
+        with self._lock:
+            with self._connect() as connection:
+                for row, error in outcomes:
+                    attempts = int(row["attempts"]) + 1
+                    if error is None:
+                        connection.execute("DELETE FROM comfy_scratch_files WHERE path = ?", (row["path"],))
+                        self._metrics["removed"] += 1
+                    elif attempts >= self.max_attempts:
+                        connection.execute("DELETE FROM comfy_scratch_files WHERE path = ?", (row["path"],))
+                        self._metrics["abandoned"] += 1
+                        abandoned.append((row, error))
+                    else:
+                        delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** (attempts - 1)))
+                        connection.execute(
+                            "UPDATE comfy_scratch_files SET attempts = ?, due_at = ?, last_error = ? WHERE path = ?",
+                            (attempts, now + delay, error, row["path"]),
+                        )
+                        self._metrics["retries"] += 1
+        for row, error in abandoned:
+            try:
+                self._logger.warning({
+                    "event": "comfy_scratch_abandoned",
+                    "path": row["path"],
+                    "job_id": row["job_id"],
+                    "kind": row["kind"],
+                    "attempts": self.max_attempts,
+                    "error": error,
+                })
+            except Exception:
+                pass
+        return len(rows)
+
+    def _remove(self, path: str, pattern: bool) -> Optional[str]:
+        """None when path (or every file matching the prefix) is gone, else the last error."""
+        targets = glob.glob(glob.escape(path) + "*") if pattern else [path]
+        error = None
+        for target in targets:
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Windows: ComfyUI may still hold the file open; retried later.
+                error = str(e)
+        return error
+
+    def start(self, interval_seconds: float = 5.0) -> None:
+        """Run sweep() in a daemon thread every interval_seconds, and right after a release."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        interval = max(0.05, float(interval_seconds))
+
+        def _loop():
+            while not self._stopping.is_set():
+                self._wake.wait(interval)
+                self._wake.clear()
+                if self._stopping.is_set():
+                    break
+                try:
+                    while self.sweep() >= SWEEP_BATCH and not self._stopping.is_set():
+                        pass
+                except Exception as e:
+                    try:
+                        self._logger.debug({"event": "comfy_scratch_sweep_failed", "error": str(e)})
+                    except Exception:
+                        pass
+
+        self._thread = threading.Thread(target=_loop, name="comfy-scratch-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._wake.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = dict(self._metrics)
+        with self._connect() as connection:
+            active, pending, retrying = connection.execute(
+                """
+                SELECT
+                    COALESCE(SUM(CASE WHEN due_at IS NULL THEN 1 ELSE 0 END), 0),
+                    COALESCE(SUM(CASE WHEN due_at IS NOT NULL THEN 1 ELSE 0 END), 0),
+                    COALESCE(SUM(CASE WHEN attempts > 0 THEN 1 ELSE 0 END), 0)
+                FROM comfy_scratch_files
+                """
+            ).fetchone()
+        data.update({"active": int(active), "pending": int(pending), "retrying": int(retrying)})
+        return data
+
+
+_shared: Optional[ScratchManifest] = None
+_shared_lock = threading.Lock()
+
+
+def shared_scratch_manifest() -> Optional[ScratchManifest]:
+    """Process-wide manifest in JOB_DB_PATH, or None when it cannot be opened."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            try:
+                _shared = ScratchManifest(
+                    JOB_DB_PATH,
+                    retry_base_seconds=COMFY_SCRATCH["retry_base_seconds"],
+                    retry_max_seconds=COMFY_SCRATCH["retry_max_seconds"],
+                    max_attempts=COMFY_SCRATCH["max_attempts"],
+                )
+            except (OSError, sqlite3.Error) as e:
+                logging.getLogger("comfyui_app").warning({"event": "comfy_scratch_unavailable", "error": str(e)})
+                return None
+        return _shared
+
+
+def scratch_metrics() -> Dict[str, Any]:
+    with _shared_lock:
+        manifest = _shared
+    if manifest is None:
+        return {"enabled": False}
+    return {"enabled": True, **manifest.metrics()}
@@ -34,18 +34,124 @@ SERVER_CONFIG = {
     "server_address": os.getenv("COMFYUI_SERVER", "127.0.0.1:8188"),
 }
 
+# --- 3.0a ComfyUI 백엔드 풀 (여러 GPU 서버) ---
+# COMFYUI_SERVERS가 비어 있으면 COMFYUI_SERVER 하나(+ COMFY_INPUT_DIR/COMFY_OUTPUT_DIR)만 사용합니다.
+# 형식: "gpu1=10.0.0.11:8188,gpu2=10.0.0.12:8188" 또는 JSON 목록
+#   [{"name": "gpu1", "address": "10.0.0.11:8188", "workflows": ["*"], "nodes": ["SeeThrough_SavePSD"],
+#     "input_dir": "...", "output_dir": "..."}]
+# workflows: 처리할 수 있는 workflow id 패턴(fnmatch), nodes: 설치된 커스텀 노드(class_type) 목록
+COMFY_BACKEND_CONFIG = {
+    "servers": os.getenv("COMFYUI_SERVERS", "").strip(),
+    # affinity(같은 모델이 올라가 있는 서버 우선, 부하 차이가 affinity_slack 이하일 때) | least_loaded
+    "routing": (os.getenv("COMFY_BACKEND_ROUTING", "affinity") or "affinity").strip().lower(),
+    "affinity_slack": max(0, int(os.getenv("COMFY_BACKEND_AFFINITY_SLACK", "1"))),
+    # 헬스체크 주기(초)와 로테이션에서 빼기까지의 연속 실패 횟수
+    "health_interval_seconds": max(1.0, float(os.getenv("COMFY_BACKEND_HEALTH_INTERVAL_SECONDS", "15"))),
+    "fail_threshold": max(1, int(os.getenv("COMFY_BACKEND_FAIL_THRESHOLD", "2"))),
+}
+# ComfyUI 노드 스키마(/object_info) 캐시: 시작 시와 refresh_seconds마다(서버 복귀 시에도) 다시 받아
+# WORKFLOW_CONFIGS의 워크플로우를 검증합니다. 실행할 수 없는 워크플로우는 접수 단계에서 거절(503)하고 목록에서 숨깁니다.
+COMFY_SCHEMA_CONFIG = {
+    "enabled": os.getenv("COMFY_SCHEMA_VALIDATION", "true").strip().lower() in ("1", "true", "yes", "on"),
+    "refresh_seconds": max(30.0, float(os.getenv("COMFY_SCHEMA_REFRESH_SECONDS", "600"))),
+    "timeout_seconds": max(1.0, float(os.getenv("COMFY_SCHEMA_TIMEOUT_SECONDS", "30"))),
+}
+
 # --- 3.0 ComfyUI local paths (optional) ---
 # Used for housekeeping, e.g., deleting uploaded control images after job completion
 COMFY_INPUT_DIR = os.getenv("COMFY_INPUT_DIR", None)
 COMFY_OUTPUT_DIR = os.getenv("COMFY_OUTPUT_DIR", None)
+# ComfyUI input 업로드 캐시: 같은 참조 이미지(sha256 + 다운스케일 설정)는 한 번만 업로드해 재사용
+COMFY_INPUT_CACHE = {
+    "enabled": os.getenv("COMFY_INPUT_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on"),
+    "max_entries": int(os.getenv("COMFY_INPUT_CACHE_MAX_ENTRIES", "256")),
+    "max_bytes": int(float(os.getenv("COMFY_INPUT_CACHE_MAX_MB", "512")) * 1024 * 1024),
+    # 사용하지 않은 지 이 시간이 지나면 정리 (초)
+    "idle_seconds": float(os.getenv("COMFY_INPUT_CACHE_IDLE_SECONDS", "3600")),
+    "sweep_interval_seconds": float(os.getenv("COMFY_INPUT_CACHE_SWEEP_SECONDS", "300")),
+}
+# 작업이 ComfyUI input/output 폴더에 남기는 임시 파일(업로드 입력, SeeThrough 레이어)은 JOB_DB_PATH의
+# 목록에 기록되고, 작업이 끝나면 백그라운드 정리기가 지웁니다 (실패하면 지수 백오프로 재시도).
+COMFY_SCRATCH = {
+    "sweep_interval_seconds": max(0.5, float(os.getenv("COMFY_SCRATCH_SWEEP_SECONDS", "5"))),
+    "retry_base_seconds": max(0.1, float(os.getenv("COMFY_SCRATCH_RETRY_BASE_SECONDS", "1"))),
+    "retry_max_seconds": max(1.0, float(os.getenv("COMFY_SCRATCH_RETRY_MAX_SECONDS", "600"))),
+    # 이 횟수만큼 지우지 못하면 목록에서 빼고 경고를 남깁니다
+    "max_attempts": max(1, int(os.getenv("COMFY_SCRATCH_MAX_ATTEMPTS", "12"))),
+}
+# 결정적 결과 캐시: WORKFLOW_CONFIGS에서 "result_cache": True인 워크플로우만, 같은 입력(프롬프트 오버라이드·
+# 입력 이미지 sha256·시드·워크플로우 파일)이면 GPU 실행 없이 이전 결과를 재사용 (LRU, 개수/용량 상한)
+RESULT_CACHE = {
+    "enabled": os.getenv("RESULT_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on"),
+    # OUTPUT_DIR와 같은 파일시스템이어야 결과를 복사 없이 하드링크합니다.
+    "dir": os.getenv("RESULT_CACHE_DIR") or os.path.join(SERVER_CONFIG["output_dir"], ".result_cache"),
+    "max_entries": int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2000")),
+    "max_bytes": int(float(os.getenv("RESULT_CACHE_MAX_MB", "2048")) * 1024 * 1024),
+}
+# 결과 파일 전달 방식 (COMFY_OUTPUT_DIR가 로컬에 있을 때):
+# link(하드링크, 다른 파일시스템이면 복사) | move(ComfyUI output에서 이동) | http(항상 /view 스트리밍)
+COMFY_OUTPUT_TRANSPORT = (os.getenv("COMFY_OUTPUT_TRANSPORT", "link") or "link").strip().lower()
+if COMFY_OUTPUT_TRANSPORT not in ("link", "move", "http"):
+    COMFY_OUTPUT_TRANSPORT = "link"
 
 # --- 3.1 큐/타임아웃 환경 설정 ---
 QUEUE_CONFIG = {
     "max_per_user_queue": int(os.getenv("MAX_PER_USER_QUEUE", "5")),
     "max_per_user_concurrent": int(os.getenv("MAX_PER_USER_CONCURRENT", "1")),
     "job_timeout_seconds": float(os.getenv("JOB_TIMEOUT_SECONDS", "180")),
+    # 메모리에 유지할 종료된 작업 수/보존 시간 (초과분은 JobStore에서 조회)
+    "finished_job_retention": int(os.getenv("FINISHED_JOB_RETENTION", "500")),
+    "finished_job_ttl_seconds": float(os.getenv("FINISHED_JOB_TTL_SECONDS", "3600")),
+    # 사용자 간 디스패치 정책: sejf(예상 소요시간 짧은 작업 우선 + aging) | round_robin
+    "scheduling_policy": os.getenv("JOB_SCHEDULING_POLICY", "sejf"),
+    "scheduling_aging_factor": float(os.getenv("JOB_SCHEDULING_AGING_FACTOR", "0.5")),
+    "scheduling_max_wait_seconds": float(os.getenv("JOB_SCHEDULING_MAX_WAIT_SECONDS", "600")),
+    # ComfyUI lane: 같은 모델 작업을 이어서 처리해 체크포인트 교체를 줄임 (최대 유예 시간/연속 수 제한)
+    "comfy_model_affinity": os.getenv("COMFY_MODEL_AFFINITY", "true").strip().lower() in ("1", "true", "yes", "on"),
+    "comfy_affinity_max_deferral_seconds": float(os.getenv("COMFY_AFFINITY_MAX_DEFERRAL_SECONDS", "120")),
+    "comfy_affinity_max_consecutive": int(os.getenv("COMFY_AFFINITY_MAX_CONSECUTIVE", "6")),
+    "comfy_model_swap_cost_seconds": float(os.getenv("COMFY_MODEL_SWAP_COST_SECONDS", "8")),
+    # ComfyUI 파이프라이닝: GPU에서 prompt가 실행되는 동안 준비/큐잉·후처리 중일 수 있는 작업 수 (1 = 순차 실행)
+    "comfy_pipeline_depth": max(1, int(os.getenv("COMFY_PIPELINE_DEPTH", "2"))),
+    # 재시작 시 JobStore의 대기 작업을 원래 순서로 복구 (false면 미완료 작업을 모두 실패 처리)
+    "durable_queue": os.getenv("DURABLE_QUEUE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on"),
+    "durable_queue_max_age_seconds": float(os.getenv("DURABLE_QUEUE_MAX_AGE_SECONDS", "86400")),
+}
+
+# 실행 클래스별 lane: workflow의 mcp_execution_class(예: RMBG2 = "fast")마다 별도 대기열/타임아웃.
+# ComfyUI lane들은 GPU 실행 슬롯 1개를 가중치(LANE_<CLASS>_WEIGHT) 비율로 나눠 씀.
+EXECUTION_LANES_ENABLED = os.getenv("EXECUTION_LANES_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# OpenRouter lane들을 이벤트 루프 하나에서 실행 (httpx 비동기 요청): OPENROUTER_MAX_CONCURRENT는 스레드 수가 아니라
+# 동시에 진행 중인 작업 수가 됩니다. false면 작업마다 워커 스레드를 쓰는 기존 방식.
+OPENROUTER_ASYNC_LANE = os.getenv("OPENROUTER_ASYNC_LANE", "true").strip().lower() in ("1", "true", "yes", "on")
+
+_EXECUTION_LANE_DEFAULTS = {
+    "default": {"weight": 1.0},
+    "fast": {"weight": 4.0, "max_per_user_queue": 10, "job_timeout_seconds": 120.0},
 }
 
+
+def execution_lane_config(execution_class: str) -> Dict[str, Any]:
+    """LANE_<CLASS>_* env 설정 (미지정 시 클래스 기본값 → QUEUE_CONFIG 값)."""
+    name = str(execution_class or "default").strip().lower() or "default"
+    defaults = {
+        "weight": 1.0,
+        "workers": 1,
+        "max_per_user_queue": QUEUE_CONFIG["max_per_user_queue"],
+        "job_timeout_seconds": QUEUE_CONFIG["job_timeout_seconds"],
+        **_EXECUTION_LANE_DEFAULTS.get(name, {}),
+    }
+    prefix = "LANE_" + "".join(c if c.isalnum() else "_" for c in name.upper()) + "_"
+    casts = {"weight": float, "workers": int, "max_per_user_queue": int, "job_timeout_seconds": float}
+    resolved: Dict[str, Any] = {}
+    for key, cast in casts.items():
+        raw = os.getenv(prefix + key.upper())
+        try:
+            resolved[key] = cast(raw) if raw not in (None, "") else cast(defaults[key])
+        except ValueError:
+            resolved[key] = cast(defaults[key])
+    return resolved
+
 # --- 3.2 작업 DB 경로 ---
 JOB_DB_PATH = os.getenv("JOB_DB_PATH", "db/app_data.db")
 
@@ -68,12 +174,24 @@ HTTP_TIMEOUTS = {
     "comfy_http_connect": float(os.getenv("COMFY_HTTP_CONNECT_TIMEOUT", "3")),
     "comfy_http_read": float(os.getenv("COMFY_HTTP_READ_TIMEOUT", "10")),
 }
+# ComfyUI HTTP keep-alive 풀 크기 (백엔드별 공유 세션의 최대 유지 연결 수)
+COMFY_HTTP_POOL_SIZE = int(os.getenv("COMFY_HTTP_POOL_SIZE", "8"))
 
 # WebSocket 타임아웃 (초)
 WS_TIMEOUTS = {
     "comfy_ws_connect": float(os.getenv("COMFY_WS_CONNECT_TIMEOUT", "5")),
     "comfy_ws_idle": float(os.getenv("COMFY_WS_IDLE_TIMEOUT", "120")),
 }
+# 백엔드당 하나의 ComfyUI 이벤트 웹소켓을 모든 작업이 공유 (false면 작업마다 연결 + history 폴링)
+COMFY_SHARED_EVENTS_ENABLED = os.getenv("COMFY_SHARED_WS", "true").strip().lower() in ("1", "true", "yes", "on")
+# ComfyUI 잠재 이미지 미리보기 전달: 작업당 max_fps 이하(가장 최근 프레임만), max_side px WEBP로 줄여
+# 미리보기를 구독한 웹소켓(/ws/status?previews=1)에만 보냅니다.
+PREVIEW_CONFIG = {
+    "enabled": os.getenv("COMFY_PREVIEWS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on"),
+    "max_fps": max(0.1, float(os.getenv("COMFY_PREVIEW_MAX_FPS", "2"))),
+    "max_side": max(32, int(os.getenv("COMFY_PREVIEW_MAX_SIDE", "256"))),
+    "quality": min(100, max(1, int(os.getenv("COMFY_PREVIEW_QUALITY", "60")))),
+}
 
 # Progress logging controls
 PROGRESS_LOG_CONFIG = {
@@ -1,14 +1,28 @@
+import asyncio
 import threading
 import time
 import uuid
-from collections import deque, defaultdict
-from typing import Any, Callable, Deque, Dict, Optional
+import heapq
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque, defaultdict
+from itertools import islice
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
 import logging
 from .config import PROGRESS_LOG_CONFIG
+from .scheduling import (
+    DurationEstimator,
+    RoundRobinPolicy,
+    SchedulingPolicy,
+    predict_dispatch_order,
+    predict_start_offset,
+)
 
 
 JobStatus = str  # queued | running | complete | error | cancelled
 
+TERMINAL_STATUSES = frozenset({"complete", "error", "cancelled"})
+
 
 class Job:
     def __init__(self, owner_id: str, job_type: str, payload: Dict[str, Any]):
@@ -25,13 +39,350 @@ class Job:
         # Arbitrary results (e.g., image_path)
         self.result: Dict[str, Any] = {}
 
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Job":
+        """Rebuild a read-only Job snapshot from a JobStore row (see JobStore.fetch_by_id)."""
+        payload = record.get("payload")
+        job = cls(
+            owner_id=str(record.get("owner_id") or ""),
+            job_type=str(record.get("type") or "generate"),
+            payload=payload if isinstance(payload, dict) else {},
+        )
+        job.id = str(record.get("id") or job.id)
+        job.status = str(record.get("status") or "error")
+        try:
+            job.progress = float(record.get("progress") or 0.0)
+        except Exception:
+            job.progress = 0.0
+        job.created_at = record.get("created_at") or job.created_at
+        job.started_at = record.get("started_at")
+        job.ended_at = record.get("ended_at")
+        job.error_message = record.get("error")
+        result = record.get("result")
+        job.result = result if isinstance(result, dict) else {}
+        return job
+
+
+class DeadlineWatchdog:
+    """
+    One thread enforcing every running job's deadline (min-heap with lazy deletion).
+
+    Replaces a threading.Timer per job: scheduling/cancelling is a heap push or a dict
+    update, deadlines can be moved while the job runs, and upcoming() lists them for
+    the admin view. Callbacks run on the watchdog thread and must not block (JobManager
+    only marks the cancel there and hands provider cancels to its lane's timeout threads).
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._heap: list[tuple[float, int, str]] = []
+        # key -> (deadline, seq, callback, info); heap entries with another seq are stale
+        self._entries: Dict[str, tuple[float, int, Callable[[], None], Dict[str, Any]]] = {}
+        self._seq = 0
+        self._thread: Optional[threading.Thread] = None
+        self._fired = 0
+        self._scheduled = 0
+        self._logger = logging.getLogger("comfyui_app")
+
+    def schedule(self, key: str, deadline: float, callback: Callable[[], None], info: Optional[Dict[str, Any]] = None):
+        """Arm (or move) the deadline for key."""
+        with self._cond:
+            self._seq += 1
+            self._scheduled += 1
+            self._entries[key] = (float(deadline), self._seq, callback, dict(info or {}))
+            heapq.heappush(self._heap, (float(deadline), self._seq, key))
+            self._ensure_thread()
+            self._cond.notify()
+
+    def cancel(self, key: str):
+        with self._cond:
+            self._entries.pop(key, None)
+            # Drop stale heap heads eagerly so the heap does not grow with finished jobs.
+            while self._heap and self._heap[0][2] not in self._entries:
+                heapq.heappop(self._heap)
+
+    def deadline_for(self, key: str) -> Optional[float]:
+        with self._cond:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def upcoming(self, limit: int = 50) -> list[Dict[str, Any]]:
+        now = self._clock()
+        with self._cond:
+            items = sorted(self._entries.items(), key=lambda kv: kv[1][0])[: max(0, int(limit))]
+        return [
+            {**info, "job_id": key, "deadline_at": deadline, "remaining_sec": round(deadline - now, 3)}
+            for key, (deadline, _seq, _cb, info) in items
+        ]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"active": len(self._entries), "heap_size": len(self._heap), "scheduled": self._scheduled, "fired": self._fired}
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="JobDeadlineWatchdog", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                callback = None
+                while callback is None:
+                    while self._heap and self._entries.get(self._heap[0][2], (None, None))[1] != self._heap[0][1]:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, _seq, key = self._heap[0]
+                    remaining = deadline - self._clock()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    heapq.heappop(self._heap)
+                    callback = self._entries.pop(key)[2]
+                    self._fired += 1
+            try:
+                callback()
+            except Exception as e:
+                try:
+                    self._logger.warning({"event": "job_deadline_callback_failed", "job_id": key, "error": str(e)})
+                except Exception:
+                    pass
+
+
+_shared_watchdog: Optional[DeadlineWatchdog] = None
+_shared_watchdog_lock = threading.Lock()
+
+
+def shared_watchdog() -> DeadlineWatchdog:
+    """Process-wide watchdog used by every JobManager unless one is injected."""
+    global _shared_watchdog
+    with _shared_watchdog_lock:
+        if _shared_watchdog is None:
+            _shared_watchdog = DeadlineWatchdog()
+        return _shared_watchdog
+
+
+class _RoundRobinIndex:
+    """
+    Order statistics for the round-robin dispatch order, kept alongside ``_users_rr``.
+
+    - Each user in the rotation holds a slot number; moving a user to the back of the
+      rotation assigns a fresh (largest) slot, so slot order == rotation order.
+    - ``_levels[i]`` is the sorted list of slots of users with more than ``i`` queued jobs.
+    - A user's queued jobs carry increasing ordinals, so the per-user rank is a bisect.
+
+    With strict round-robin the k-th queued job of a user dispatches after the first k
+    jobs of every user plus the k-th job of each user ahead in the rotation, i.e.
+    ``sum(len(levels[i]) for i < k) + bisect(levels[k], slot)``. k is bounded by the
+    per-user queue limit, so lookups are O(limit + log users).
+    """
+
+    def __init__(self):
+        self._next_slot = 0
+        self._next_ordinal = 0
+        self._slots: Dict[str, int] = {}
+        self._levels: list[list[int]] = []
+        self._ordinals: Dict[str, list[int]] = defaultdict(list)
+        self._job_ordinal: Dict[str, int] = {}
+
+    def has_user(self, owner_id: str) -> bool:
+        return owner_id in self._slots
+
+    def add_user(self, owner_id: str) -> None:
+        self._slots[owner_id] = self._next_slot
+        self._next_slot += 1
+
+    def drop_user(self, owner_id: str) -> None:
+        self._slots.pop(owner_id, None)
+        if not self._ordinals.get(owner_id):
+            self._ordinals.pop(owner_id, None)
+
+    def move_to_back(self, owner_id: str) -> None:
+        old = self._slots.get(owner_id)
+        if old is None:
+            return
+        new = self._next_slot
+        self._next_slot += 1
+        self._slots[owner_id] = new
+        for level in range(len(self._ordinals.get(owner_id) or ())):
+            self._discard_slot(level, old)
+            # The new slot is the largest one, so it always belongs at the end.
+            self._levels[level].append(new)
+
+    def add_job(self, owner_id: str, job_id: str) -> None:
+        ordinals = self._ordinals[owner_id]
+        level = len(ordinals)
+        ordinal = self._next_ordinal
+        self._next_ordinal += 1
+        ordinals.append(ordinal)
+        self._job_ordinal[job_id] = ordinal
+        while len(self._levels) <= level:
+            self._levels.append([])
+        insort(self._levels[level], self._slots[owner_id])
+
+    def remove_job(self, owner_id: str, job_id: str) -> None:
+        ordinal = self._job_ordinal.pop(job_id, None)
+        ordinals = self._ordinals.get(owner_id)
+        if ordinal is None or not ordinals:
+            return
+        idx = bisect_left(ordinals, ordinal)
+        if idx < len(ordinals) and ordinals[idx] == ordinal:
+            ordinals.pop(idx)
+            slot = self._slots.get(owner_id)
+            if slot is not None:
+                # The user drops out of its highest level regardless of which job left.
+                self._discard_slot(len(ordinals), slot)
+
+    def rank(self, owner_id: str, job_id: str) -> Optional[int]:
+        ordinal = self._job_ordinal.get(job_id)
+        if ordinal is None:
+            return None
+        return bisect_left(self._ordinals.get(owner_id) or [], ordinal)
+
+    def jobs_ahead(self, owner_id: str, job_id: str) -> Optional[int]:
+        k = self.rank(owner_id, job_id)
+        slot = self._slots.get(owner_id)
+        if k is None or slot is None:
+            return None
+        ahead = sum(len(self._levels[i]) for i in range(min(k, len(self._levels))))
+        if k < len(self._levels):
+            ahead += bisect_left(self._levels[k], slot)
+        return ahead
+
+    def total(self) -> int:
+        return len(self._job_ordinal)
+
+    def _discard_slot(self, level: int, slot: int) -> None:
+        if level >= len(self._levels):
+            return
+        bucket = self._levels[level]
+        idx = bisect_left(bucket, slot)
+        if idx < len(bucket) and bucket[idx] == slot:
+            bucket.pop(idx)
+
+
+class ExecutionGate:
+    """
+    Shared execution slots for several lanes that compete for one resource (e.g. the
+    ComfyUI GPU). When lanes contend, slots are granted by weighted share: the waiting
+    lane with the lowest served/weight goes first, so a weight-4 lane gets ~4 of every
+    5 slots while both have work and never waits behind the other lane's backlog.
+
+    capacity is the number of jobs in flight; parallelism is how many of them the resource
+    actually executes at once. A pipelined ComfyUI backend has capacity = pipeline depth
+    (the next prompt is prepared and queued while the current one runs) and parallelism 1.
+    """
+
+    def __init__(self, capacity: int = 1, parallelism: Optional[int] = None):
+        self._cond = threading.Condition()
+        self.capacity = max(1, int(capacity))
+        self.parallelism = max(1, int(parallelism or self.capacity))
+        self._in_use = 0
+        self._weights: Dict[str, float] = {}
+        self._virtual: Dict[str, float] = defaultdict(float)
+        self._waiting: Dict[str, int] = defaultdict(int)
+        self._grants: Dict[str, int] = defaultdict(int)
+        self._members: Dict[str, Any] = {}
+        self._closed = False
+
+    def register(self, lane_key: str, weight: float = 1.0, member: Any = None):
+        with self._cond:
+            self._weights[lane_key] = max(0.01, float(weight))
+            if member is not None:
+                self._members[lane_key] = member
+
+    def members(self) -> Dict[str, Any]:
+        """lane_key -> the lane (JobManager) registered with it, for cross-lane predictions."""
+        with self._cond:
+            return dict(self._members)
+
+    def _next_lane(self) -> Optional[str]:
+        waiting = [lane for lane, n in self._waiting.items() if n > 0]
+        if not waiting:
+            return None
+        return min(waiting, key=lambda lane: (self._virtual[lane], lane))
+
+    def acquire(self, lane_key: str) -> bool:
+        """Block until this lane is granted a slot. Returns False if the gate was closed."""
+        with self._cond:
+            if self._waiting[lane_key] == 0:
+                # A lane that was idle does not bank credit: it rejoins at the current minimum.
+                active = [self._virtual[lane] for lane, n in self._waiting.items() if n > 0]
+                if active:
+                    self._virtual[lane_key] = max(self._virtual[lane_key], min(active))
+            self._waiting[lane_key] += 1
+            try:
+                while not self._closed:
+                    if self._in_use < self.capacity and self._next_lane() == lane_key:
+                        self._in_use += 1
+                        self._grants[lane_key] += 1
+                        self._virtual[lane_key] += 1.0 / self._weights.get(lane_key, 1.0)
+                        return True
+                    self._cond.wait()
+                return False
+            finally:
+                self._waiting[lane_key] -= 1
+                self._cond.notify_all()
+
+    def release(self, lane_key: str):
+        with self._cond:
+            self._in_use = max(0, self._in_use - 1)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "parallelism": self.parallelism,
+                "in_use": self._in_use,
+                "weights": dict(self._weights),
+                "waiting": {lane: n for lane, n in self._waiting.items() if n > 0},
+                "grants": dict(self._grants),
+            }
+
 
 class JobManager:
+    # Threads per lane for timeout follow-ups (provider cancel handle + notification)
+    TIMEOUT_THREADS = 2
+
     def __init__(self, worker_count: int = 1):
         self._lock = threading.RLock()
+        # Workers sleep on this condition until enqueue/stop signals runnable work.
+        self._work_available = threading.Condition(self._lock)
+        # In-memory job table: active jobs plus a bounded window of finished ones.
         self._jobs: Dict[str, Job] = {}
+        # Indexes so lookups don't scan the table
+        self._ids_by_status: Dict[JobStatus, set[str]] = defaultdict(set)
+        self._running_ids_by_owner: Dict[str, set[str]] = defaultdict(set)
+        # Finished jobs in LRU order (least recently used first) -> last use timestamp.
+        # Eviction drops the front while over the cap or idle longer than the TTL.
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self.max_finished_jobs: int = 500
+        self.finished_job_ttl_seconds: Optional[float] = 3600.0
+        # (ended_at, duration_sec, workflow_id) of recently completed jobs for averages
+        self._recent_completions: Deque[tuple[float, float, Optional[str]]] = deque(maxlen=1000)
+        # Optional JobStore used by get() once a job has been evicted from memory
+        self._job_store: Any = None
+        # Dispatch order among users (see app/scheduling.py); clock is injectable for replay
+        self._scheduling_policy: SchedulingPolicy = RoundRobinPolicy()
+        self._clock: Callable[[], float] = time.time
+        # Service-time estimates for wait prediction (fed on completion unless the policy does)
+        self._duration_estimator: Optional[DurationEstimator] = None
         self._user_queues: Dict[str, Deque[str]] = defaultdict(deque)
         self._users_rr: Deque[str] = deque()
+        self._rr_index = _RoundRobinIndex()
         self._stop_event = threading.Event()
         self._worker_threads: list[threading.Thread] = []
         try:
@@ -51,13 +402,36 @@ class JobManager:
         # Optional event sink for external notifications
         # signature: (owner_id: str, event: Dict[str, Any]) -> None
         self._notify: Optional[Callable[[str, Dict[str, Any]], None]] = None
-        # Job timeout seconds (None to disable)
-        self.job_timeout_seconds: Optional[float] = 180.0
+        # Job timeout seconds (None to disable); per-job overrides come from the deadline resolver
+        self._job_timeout_seconds: Optional[float] = 180.0
+        self._deadline_resolver: Optional[Callable[[Job], Optional[float]]] = None
+        self._watchdog: DeadlineWatchdog = shared_watchdog()
+        # Started on the first timeout; runs cancel handles/notifications off the watchdog thread
+        self._timeout_executor: Optional[ThreadPoolExecutor] = None
         self._logger = logging.getLogger("comfyui_app")
         # Backpressure configs
         self.max_per_user_queue: int = 5
         self.max_per_user_concurrent: int = 1
         self._running_by_user: Dict[str, int] = defaultdict(int)
+        # Lane identity and optional shared execution gate (see RoutingJobManager)
+        self.lane_key: str = "default"
+        self._execution_gate: Optional[ExecutionGate] = None
+        # Queue wait (started_at - created_at) of recently started jobs
+        self._recent_waits: Deque[float] = deque(maxlen=500)
+        # Jobs executing at once when workers pipeline onto a serial backend (None: worker_count)
+        self.execution_parallelism: Optional[int] = None
+        # job_id -> when the backend actually started executing it (see mark_execution_started)
+        self._execution_started_at: Dict[str, float] = {}
+
+    @property
+    def job_timeout_seconds(self) -> Optional[float]:
+        return self._job_timeout_seconds
+
+    @job_timeout_seconds.setter
+    def job_timeout_seconds(self, value: Optional[float]):
+        # Applies to running jobs too: their deadlines move to started_at + new timeout.
+        self._job_timeout_seconds = value
+        self._rearm_running_deadlines()
 
     # ---- Registration ----
     def register_processor(self, job_type: str, processor: Callable[[Job, Callable[[float], None]], None]):
@@ -66,43 +440,362 @@ class JobManager:
     def set_notifier(self, notify: Callable[[str, Dict[str, Any]], None]):
         self._notify = notify
 
+    def set_job_store(self, job_store: Any):
+        self._job_store = job_store
+
+    def set_duration_estimator(self, estimator: Optional[DurationEstimator]):
+        self._duration_estimator = estimator
+
+    def predict(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Expected start/finish (epoch seconds) of a queued or running job; None if unknown."""
+        peers = self._gate_peer_running()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or self._duration_estimator is None:
+                return None
+            if job.status == "running":
+                run = self._duration_estimator.estimate(job.payload)
+                now = self._clock()
+                started = float(self._execution_started_at.get(job_id, job.started_at) or now)
+                return self._prediction(now, started - now, run, jobs_ahead=0)
+            if job.status != "queued" or self._rr_index.rank(job.owner_id, job_id) is None:
+                return None
+            return self._predict_locked(job, peers)
+
+    def predict_new(self, owner_id: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Prediction for a job that owner_id would enqueue now (admission control)."""
+        peers = self._gate_peer_running()
+        with self._lock:
+            if self._duration_estimator is None:
+                return None
+            probe = Job(owner_id, "generate", payload)
+            probe.created_at = self._clock()
+            return self._predict_locked(probe, peers, queued=False)
+
+    def running_remaining(self) -> list[tuple[str, float]]:
+        """(owner, expected remaining seconds) of this lane's running jobs; empty without an estimator."""
+        with self._lock:
+            if self._duration_estimator is None:
+                return []
+            return self._running_remaining_locked(self._clock())
+
+    def _running_remaining_locked(self, now: float) -> list[tuple[str, float]]:
+        estimate = self._duration_estimator.estimate
+        running = []
+        for jid in self._ids_by_status.get("running") or ():
+            running_job = self._jobs.get(jid)
+            if running_job is None:
+                continue
+            started = self._execution_started_at.get(jid, running_job.started_at)
+            elapsed = now - float(started or now)
+            running.append((running_job.owner_id, max(0.0, estimate(running_job.payload) - elapsed)))
+        return running
+
+    def _gate_peer_running(self) -> list[tuple[str, float]]:
+        """Running jobs of the other lanes on this lane's execution gate (called without self._lock)."""
+        gate = self._execution_gate
+        if gate is None:
+            return []
+        running: list[tuple[str, float]] = []
+        for lane_key, lane in gate.members().items():
+            if lane is self:
+                continue
+            try:
+                # Tagged with the lane: another lane's job never holds this lane's per-user slot.
+                running.extend((f"{lane_key}/{owner}", remaining) for owner, remaining in lane.running_remaining())
+            except Exception:
+                continue
+        return running
+
+    def _prediction_parallelism(self) -> int:
+        if self._execution_gate is not None:
+            return self._execution_gate.parallelism
+        return max(1, int(self.execution_parallelism or self.worker_count or 1))
+
+    def _jobs_ahead_locked(self, job: Job, queued: bool = True) -> list[Job]:
+        """Queued jobs this lane dispatches before `job` (queued=False: a job enqueued now)."""
+        policy = self._scheduling_policy
+        if isinstance(policy, RoundRobinPolicy):
+            # Round-robin: the first `index` jobs of every user, plus the index-th job of users
+            # ahead in the rotation.
+            if queued:
+                index = self._rr_index.rank(job.owner_id, job.id) or 0
+            else:
+                index = len(self._user_queues.get(job.owner_id) or ())
+            rotation = list(self._users_rr)
+            position = rotation.index(job.owner_id) if job.owner_id in rotation else len(rotation)
+            rounds: list[list[Job]] = [[] for _ in range(index + 1)]
+            for order, user_id in enumerate(rotation):
+                limit = index + 1 if order < position else index
+                for depth, jid in enumerate(islice(self._user_queues.get(user_id) or (), limit)):
+                    queued_job = self._jobs.get(jid)
+                    if queued_job is not None:
+                        rounds[depth].append(queued_job)
+            return [item for level in rounds for item in level]
+        # Other policies reorder users: replay the policy over the current queues.
+        queues: list[tuple[str, list[Job]]] = []
+        for user_id in self._users_rr:
+            jobs = [self._jobs[jid] for jid in self._user_queues.get(user_id) or () if jid in self._jobs]
+            if not queued and user_id == job.owner_id:
+                jobs.append(job)
+            queues.append((user_id, jobs))
+        if not queued and not self._rr_index.has_user(job.owner_id):
+            queues.append((job.owner_id, [job]))
+        estimator = self._duration_estimator
+        parallelism = self._prediction_parallelism()
+
+        def step(queued_job: Job) -> float:
+            return estimator.estimate(queued_job.payload) / parallelism if estimator is not None else 0.0
+
+        return predict_dispatch_order(policy, queues, self._clock(), step, stop_at=job)
+
+    def _predict_locked(self, job: Job, peer_running: list[tuple[str, float]], queued: bool = True) -> Dict[str, Any]:
+        estimate = self._duration_estimator.estimate
+        now = self._clock()
+        # Lanes sharing a gate hold the same execution slots, so their running jobs count too.
+        running = self._running_remaining_locked(now) + list(peer_running)
+        ahead = [(queued_job.owner_id, estimate(queued_job.payload)) for queued_job in self._jobs_ahead_locked(job, queued)]
+        wait = predict_start_offset(running, ahead, job.owner_id, self._prediction_parallelism(), self.max_per_user_concurrent)
+        return self._prediction(now, wait, estimate(job.payload), jobs_ahead=len(ahead))
+
+    @staticmethod
+    def _prediction(now: float, wait: float, run: float, jobs_ahead: int) -> Dict[str, Any]:
+        start = now + wait
+        return {
+            "expected_wait_seconds": round(max(0.0, wait), 1),
+            "expected_start_at": round(start, 3),
+            "expected_finish_at": round(max(now, start + run), 3),
+            "expected_run_seconds": round(run, 1),
+            "jobs_ahead": jobs_ahead,
+        }
+
+    def set_deadline_resolver(self, resolver: Optional[Callable[[Job], Optional[float]]]):
+        """resolver(job) -> timeout seconds for that job, or None for the lane default."""
+        self._deadline_resolver = resolver
+        self._rearm_running_deadlines()
+
+    def set_watchdog(self, watchdog: DeadlineWatchdog):
+        self._watchdog = watchdog
+
+    def _timeout_for(self, job: Job) -> Optional[float]:
+        timeout = None
+        if self._deadline_resolver is not None:
+            try:
+                timeout = self._deadline_resolver(job)
+            except Exception:
+                timeout = None
+        if timeout is None:
+            timeout = self._job_timeout_seconds
+        if isinstance(timeout, (int, float)) and timeout > 0:
+            return float(timeout)
+        return None
+
+    def _arm_deadline(self, job: Job, start: Optional[float] = None):
+        timeout = self._timeout_for(job)
+        if timeout is None:
+            self._watchdog.cancel(job.id)
+            return
+        base = start if start is not None else (job.started_at or time.time())
+        self._watchdog.schedule(
+            job.id,
+            base + timeout,
+            lambda: self._on_deadline(job),
+            {
+                "lane": self.lane_key,
+                "owner_id": job.owner_id,
+                "workflow_id": job.payload.get("workflow_id") if isinstance(job.payload, dict) else None,
+                "timeout_sec": timeout,
+            },
+        )
+        if job.status != "running":
+            # Finished while being (re)armed: don't leave a stale deadline behind.
+            self._watchdog.cancel(job.id)
+
+    def _rearm_running_deadlines(self):
+        if not hasattr(self, "_ids_by_status"):
+            return
+        with self._lock:
+            running = [self._jobs[jid] for jid in self._ids_by_status.get("running") or () if jid in self._jobs]
+        for job in running:
+            self._arm_deadline(job)
+
+    def extend_deadline(self, job_id: str, from_time: Optional[float] = None):
+        """Restart a running job's timeout from from_time (default: now)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "running":
+                return
+        self._arm_deadline(job, start=from_time if from_time is not None else time.time())
+
+    def mark_execution_started(self, job_id: str):
+        """
+        The backend started executing a running job that had been waiting in its own queue
+        (pipelined submission). The timeout restarts from now, and the duration fed to the
+        estimator/policy is measured from here, so backend queue time counts as neither.
+        """
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "running":
+                return
+            self._execution_started_at[job_id] = now
+        self._arm_deadline(job, start=now)
+
+    def upcoming_deadlines(self, limit: int = 50) -> list[Dict[str, Any]]:
+        return [d for d in self._watchdog.upcoming(limit=10_000) if d.get("lane") == self.lane_key][: max(0, int(limit))]
+
+    def _on_deadline(self, job: Job):
+        with self._lock:
+            still_running = (job.status == "running")
+            if still_running:
+                self._cancel_requests.add(job.id)
+                cancel = self._cancel_handles.get(job.id)
+            else:
+                cancel = None
+        if not still_running:
+            return
+        try:
+            self._logger.info({"event": "job_timeout", "job_id": job.id, "owner_id": job.owner_id, "lane": self.lane_key})
+        except Exception:
+            pass
+        if cancel is None and self._notify is None:
+            return
+        # The cancel handle (e.g. ComfyUI HTTP calls) and the notifier can block: run them on this
+        # lane's timeout threads so the shared watchdog keeps firing other lanes' deadlines on time.
+        with self._lock:
+            if self._timeout_executor is None:
+                self._timeout_executor = ThreadPoolExecutor(self.TIMEOUT_THREADS, thread_name_prefix=f"JobTimeout-{self.lane_key}")
+            executor = self._timeout_executor
+        try:
+            executor.submit(self._cancel_timed_out, job, cancel)
+        except RuntimeError:  # executor shut down by stop()
+            self._cancel_timed_out(job, cancel)
+
+    def _cancel_timed_out(self, job: Job, cancel: Optional[Callable[[], bool]]):
+        if cancel:
+            try:
+                cancel()
+            except Exception:
+                pass
+        # Let normal error/cancel flow handle final state via _mark_error
+        if self._notify:
+            try:
+                self._notify(job.owner_id, {"status": "cancelling", "job_id": job.id})
+            except Exception as e:
+                try:
+                    self._logger.warning({"event": "job_timeout_notify_failed", "job_id": job.id, "error": str(e)})
+                except Exception:
+                    pass
+
+    def set_execution_gate(self, gate: Optional[ExecutionGate], lane_key: Optional[str] = None, weight: float = 1.0):
+        """Make workers take a slot from a gate shared with other lanes before running a job."""
+        if lane_key:
+            self.lane_key = lane_key
+        if gate is not None:
+            gate.register(self.lane_key, weight, member=self)
+        self._execution_gate = gate
+
+    def set_scheduling_policy(self, policy: Optional[SchedulingPolicy]):
+        with self._lock:
+            self._scheduling_policy = policy or RoundRobinPolicy()
+
+    def scheduling_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                return self._scheduling_policy.metrics()
+            except Exception:
+                return {"policy": getattr(self._scheduling_policy, "name", "unknown")}
+
     # ---- Enqueue / Status / Cancel ----
     def enqueue(self, owner_id: str, job_type: str, payload: Dict[str, Any]) -> Job:
         job = Job(owner_id=owner_id, job_type=job_type, payload=payload)
+        return self._admit(job, enforce_limit=True)
+
+    def restore(self, job: Job) -> Job:
+        """
+        Re-enqueue a persisted job (startup recovery), keeping its id and created_at.
+        Call in the original order; the per-user queue limit is not applied.
+        """
+        with self._lock:
+            if job.id in self._jobs:
+                return self._jobs[job.id]
+        job.status = "queued"
+        job.progress = 0.0
+        job.started_at = None
+        job.ended_at = None
+        job.error_message = None
+        return self._admit(job, enforce_limit=False)
+
+    def _admit(self, job: Job, enforce_limit: bool) -> Job:
+        owner_id = job.owner_id
         with self._lock:
             # Enforce per-user queue limit
             q = self._user_queues[owner_id]
-            if len(q) >= self.max_per_user_queue:
+            if enforce_limit and len(q) >= self.max_per_user_queue:
                 raise RuntimeError("Queue limit reached for user")
             self._jobs[job.id] = job
-            was_empty = (len(q) == 0)
-            q.append(job.id)
-            if was_empty and owner_id not in self._users_rr:
+            self._ids_by_status["queued"].add(job.id)
+            self._evict_finished()
+            if not self._rr_index.has_user(owner_id):
                 self._users_rr.append(owner_id)
+                self._rr_index.add_user(owner_id)
+            q.append(job.id)
+            self._rr_index.add_job(owner_id, job.id)
+            # Only wake a worker when this job can start right away; otherwise the
+            # owner's running job hands its slot over on completion.
+            if self._running_by_user.get(owner_id, 0) < self.max_per_user_concurrent:
+                self._work_available.notify(1)
         if self._notify:
             self._notify(owner_id, {"status": "queued", "job_id": job.id})
         return job
 
     def get(self, job_id: str) -> Optional[Job]:
         with self._lock:
-            return self._jobs.get(job_id)
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job_id in self._finished:
+                    self._finished[job_id] = time.time()
+                    self._finished.move_to_end(job_id)
+                return job
+        return self._load_evicted(job_id)
+
+    def owns(self, job_id: str) -> bool:
+        """True when the job is held in this manager's memory (no JobStore lookup)."""
+        with self._lock:
+            return job_id in self._jobs
+
+    def running_job_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._ids_by_status.get("running") or ())
 
     def get_position(self, job_id: str) -> Optional[int]:
+        """Position of a queued job within its owner's queue (0 when not queued)."""
         with self._lock:
             job = self._jobs.get(job_id)
             if not job:
                 return None
-            q = self._user_queues.get(job.owner_id)
-            if not q:
-                return 0
-            try:
-                idx = list(q).index(job_id)
-                return idx
-            except ValueError:
-                # Not in queue; if running/completed return 0
+            rank = self._rr_index.rank(job.owner_id, job_id)
+            # Not in queue; if running/completed return 0
+            return rank if rank is not None else 0
+
+    def get_global_position(self, job_id: str) -> Optional[int]:
+        """Number of queued jobs (all users) the lane's scheduling policy dispatches before this one."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            if self._rr_index.rank(job.owner_id, job_id) is None:
                 return 0
+            if isinstance(self._scheduling_policy, RoundRobinPolicy):
+                return self._rr_index.jobs_ahead(job.owner_id, job_id) or 0
+            return len(self._jobs_ahead_locked(job))
+
+    def queued_count(self) -> int:
+        with self._lock:
+            return self._rr_index.total()
 
     def list_jobs(self, limit: int = 100) -> list[dict]:
+        # The table is bounded by the retention policy, so this stays cheap.
         with self._lock:
             jobs = list(self._jobs.values())
         jobs.sort(key=lambda j: j.created_at, reverse=True)
@@ -121,8 +814,10 @@ class JobManager:
                         q.remove(job_id)
                     except ValueError:
                         pass
-                job.status = "cancelled"
+                    self._rr_index.remove_job(job.owner_id, job_id)
+                self._set_status(job, "cancelled")
                 job.ended_at = time.time()
+                self._retire(job)
                 if self._notify:
                     self._notify(job.owner_id, {"status": "cancelled", "job_id": job.id})
                 return True
@@ -145,6 +840,8 @@ class JobManager:
         if any(t.is_alive() for t in (self._worker_threads or [])):
             return
         self._stop_event.clear()
+        if self._execution_gate is not None:
+            self._execution_gate.reopen()
         self._worker_threads = []
         count = 1
         try:
@@ -157,144 +854,179 @@ class JobManager:
             t.start()
 
     def stop(self):
-        self._stop_event.set()
+        self._signal_stop()
         for t in list(self._worker_threads or []):
             try:
                 t.join(timeout=2)
             except Exception:
                 continue
+        with self._lock:
+            executor, self._timeout_executor = self._timeout_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _signal_stop(self):
+        self._stop_event.set()
+        with self._work_available:
+            self._work_available.notify_all()
+        if self._execution_gate is not None:
+            self._execution_gate.close()
+
+    def _wait_for_next_job(self) -> Optional[Job]:
+        """Block until a job is runnable for this worker, or return None on stop."""
+        gate = self._execution_gate
+        while not self._stop_event.is_set():
+            with self._work_available:
+                while not self._stop_event.is_set():
+                    if gate is None:
+                        job = self._next_job()
+                        if job:
+                            return job
+                    elif self._has_runnable_job():
+                        break
+                    self._work_available.wait()
+                if self._stop_event.is_set():
+                    return None
+            # Gated lanes only compete for a shared slot while they actually have work,
+            # and pick the job after the grant so the freshest policy decision is used.
+            if not gate.acquire(self.lane_key):
+                return None
+            job = self._next_job()
+            if job:
+                return job
+            gate.release(self.lane_key)
+        return None
+
+    def _has_runnable_job(self) -> bool:
+        with self._lock:
+            for user_id in self._users_rr:
+                if self._user_queues.get(user_id) and self._running_by_user.get(user_id, 0) < self.max_per_user_concurrent:
+                    return True
+            return False
 
     def _run_loop(self):
         while not self._stop_event.is_set():
-            job = self._next_job_round_robin()
+            job = self._wait_for_next_job()
             if not job:
-                time.sleep(0.05)
                 continue
             processor = self._processors.get(job.type)
             if not processor:
-                self._mark_error(job, "No processor for job type")
+                # Dispatch already took the user slot (and gate slot): retire through _end_job too.
+                try:
+                    self._mark_error(job, "No processor for job type")
+                finally:
+                    self._end_job(job)
                 continue
+            progress_cb = self._begin_job(job)
+            try:
+                processor(job, progress_cb)
+                self._complete_job(job)
+            except Exception as e:
+                self._mark_error(job, str(e))
+            finally:
+                self._end_job(job)
 
-            # Throttled/stepped progress logger state
-            _last_logged_pct = -1.0
-            _last_logged_ts = 0.0
-
-            def progress_cb(p: float):
-                nonlocal _last_logged_pct, _last_logged_ts
-                with self._lock:
-                    job.progress = max(0.0, min(100.0, float(p)))
-                if self._notify:
-                    self._notify(job.owner_id, {"status": "running", "job_id": job.id, "progress": job.progress})
-                # Step/interval gating for logs
-                try:
-                    step = int(PROGRESS_LOG_CONFIG.get("step_percent", 10) or 0)
-                    min_ms = int(PROGRESS_LOG_CONFIG.get("min_interval_ms", 500))
-                except Exception:
-                    step = 10
-                    min_ms = 500
-                now = time.time()
-                should_log = True
-                if step > 0:
-                    # Only log when crossing multiples of 'step'
-                    rounded = int(round(job.progress))
-                    if rounded % max(1, step) != 0 and rounded != 100:
-                        should_log = False
-                    # Avoid duplicate logs at the same step
-                    if should_log and _last_logged_pct == rounded:
-                        should_log = False
-                    if should_log:
-                        _last_logged_pct = rounded
-                # Interval throttle
-                if should_log and min_ms > 0 and (now - _last_logged_ts) * 1000.0 < min_ms:
-                    should_log = False
-                if should_log:
-                    _last_logged_ts = now
-                    payload = {"event": "job_progress", "job_id": job.id, "owner_id": job.owner_id, "progress": round(job.progress, 2)}
-                    try:
-                        level = (PROGRESS_LOG_CONFIG.get("level") or "info").lower()
-                    except Exception:
-                        level = "info"
-                    if level == "debug":
-                        self._logger.debug(payload)
-                    else:
-                        self._logger.info(payload)
+    def _progress_callback(self, job: Job) -> Callable[[float], None]:
+        # Throttled/stepped progress logger state
+        _last_logged_pct = -1.0
+        _last_logged_ts = 0.0
 
+        def progress_cb(p: float):
+            nonlocal _last_logged_pct, _last_logged_ts
             with self._lock:
-                job.status = "running"
-                job.started_at = time.time()
+                job.progress = max(0.0, min(100.0, float(p)))
             if self._notify:
-                self._notify(job.owner_id, {"status": "running", "job_id": job.id, "progress": 0.0})
+                self._notify(job.owner_id, {"status": "running", "job_id": job.id, "progress": job.progress})
+            # Step/interval gating for logs
             try:
-                self._logger.info({"event": "job_start", "job_id": job.id, "owner_id": job.owner_id, "type": job.type})
+                step = int(PROGRESS_LOG_CONFIG.get("step_percent", 10) or 0)
+                min_ms = int(PROGRESS_LOG_CONFIG.get("min_interval_ms", 500))
             except Exception:
-                pass
-
-            # The processor may set a cancel handle via set_cancel_handle(job_id, handle)
-            with self._lock:
-                self._cancel_handles.pop(job.id, None)
-            # Timeout watchdog
-            timeout_timer = None
-            if isinstance(self.job_timeout_seconds, (int, float)) and self.job_timeout_seconds and self.job_timeout_seconds > 0:
-                def _timeout_job():
-                    try:
-                        with self._lock:
-                            still_running = (job.status == "running")
-                            if still_running:
-                                self._cancel_requests.add(job.id)
-                                cancel = self._cancel_handles.get(job.id)
-                            else:
-                                cancel = None
-                        if cancel:
-                            try:
-                                cancel()
-                            except Exception:
-                                pass
-                        # Let normal error/cancel flow handle final state via _mark_error
-                        if self._notify:
-                            self._notify(job.owner_id, {"status": "cancelling", "job_id": job.id})
-                    except Exception:
-                        pass
-                timeout_timer = threading.Timer(self.job_timeout_seconds, _timeout_job)
-                timeout_timer.daemon = True
-                timeout_timer.start()
-            try:
-                start_ts = time.time()
-                processor(job, progress_cb)
-                # If processor completes without exception
-                with self._lock:
-                    if job.status != "cancelled":
-                        job.status = "complete"
-                        job.progress = 100.0
-                        job.ended_at = time.time()
-                if self._notify:
-                    payload = {"status": "complete", "job_id": job.id}
-                    payload.update(job.result or {})
-                    self._notify(job.owner_id, payload)
+                step = 10
+                min_ms = 500
+            now = time.time()
+            should_log = True
+            if step > 0:
+                # Only log when crossing multiples of 'step'
+                rounded = int(round(job.progress))
+                if rounded % max(1, step) != 0 and rounded != 100:
+                    should_log = False
+                # Avoid duplicate logs at the same step
+                if should_log and _last_logged_pct == rounded:
+                    should_log = False
+                if should_log:
+                    _last_logged_pct = rounded
+            # Interval throttle
+            if should_log and min_ms > 0 and (now - _last_logged_ts) * 1000.0 < min_ms:
+                should_log = False
+            if should_log:
+                _last_logged_ts = now
+                payload = {"event": "job_progress", "job_id": job.id, "owner_id": job.owner_id, "progress": round(job.progress, 2)}
                 try:
-                    self._logger.info({"event": "job_complete", "job_id": job.id, "owner_id": job.owner_id})
+                    level = (PROGRESS_LOG_CONFIG.get("level") or "info").lower()
                 except Exception:
-                    pass
-            except Exception as e:
-                self._mark_error(job, str(e))
-            finally:
-                if timeout_timer is not None:
-                    try:
-                        timeout_timer.cancel()
-                    except Exception:
-                        pass
-                with self._lock:
-                    self._cancel_handles.pop(job.id, None)
-                    self._cancel_requests.discard(job.id)
-                    try:
-                        self._logger.info({"event": "job_end", "job_id": job.id, "owner_id": job.owner_id, "status": job.status})
-                    except Exception:
-                        pass
-                    # Decrement running per-user counter
-                    try:
-                        if job.owner_id in self._running_by_user and self._running_by_user[job.owner_id] > 0:
-                            self._running_by_user[job.owner_id] -= 1
-                    except Exception:
-                        pass
+                    level = "info"
+                if level == "debug":
+                    self._logger.debug(payload)
+                else:
+                    self._logger.info(payload)
+
+        return progress_cb
+
+    def _begin_job(self, job: Job) -> Callable[[float], None]:
+        """Mark a dispatched job running and arm its deadline; returns its progress callback."""
+        progress_cb = self._progress_callback(job)
+        with self._lock:
+            self._set_status(job, "running")
+            job.started_at = time.time()
+            self._recent_waits.append(max(0.0, job.started_at - float(job.created_at or job.started_at)))
+        if self._notify:
+            self._notify(job.owner_id, {"status": "running", "job_id": job.id, "progress": 0.0})
+        try:
+            self._logger.info({"event": "job_start", "job_id": job.id, "owner_id": job.owner_id, "type": job.type})
+        except Exception:
+            pass
+
+        # The processor may set a cancel handle via set_cancel_handle(job_id, handle)
+        with self._lock:
+            self._cancel_handles.pop(job.id, None)
+        # Deadline enforced by the shared watchdog thread
+        self._arm_deadline(job)
+        return progress_cb
+
+    def _complete_job(self, job: Job):
+        """The processor returned without an exception."""
+        with self._lock:
+            if job.status != "cancelled":
+                self._set_status(job, "complete")
+                job.progress = 100.0
+                job.ended_at = time.time()
+        if self._notify:
+            payload = {"status": "complete", "job_id": job.id}
+            payload.update(job.result or {})
+            self._notify(job.owner_id, payload)
+        try:
+            self._logger.info({"event": "job_complete", "job_id": job.id, "owner_id": job.owner_id})
+        except Exception:
+            pass
+
+    def _end_job(self, job: Job):
+        """Retire a finished job and give back its per-user and execution slots."""
+        self._watchdog.cancel(job.id)
+        with self._lock:
+            self._cancel_handles.pop(job.id, None)
+            self._cancel_requests.discard(job.id)
+            self._retire(job)
+            try:
+                self._logger.info({"event": "job_end", "job_id": job.id, "owner_id": job.owner_id, "status": job.status})
+            except Exception:
+                pass
+            # Decrement running per-user counter
+            self._release_slot(job)
+        if self._execution_gate is not None:
+            self._execution_gate.release(self.lane_key)
+            # No wakeup needed here: this worker re-enters dispatch right away
+            # and picks up whatever the freed slot made runnable.
 
     def set_cancel_handle(self, job_id: str, handle: Optional[Callable[[], bool]]):
         """
@@ -317,7 +1049,7 @@ class JobManager:
     # Backward-compatible alias (older processors may call this without job_id).
     def set_active_cancel_handle(self, handle: Optional[Callable[[], bool]]):
         with self._lock:
-            running = [j.id for j in self._jobs.values() if getattr(j, "status", None) == "running"]
+            running = list(self._ids_by_status.get("running") or ())
             if len(running) == 1 and running[0]:
                 if handle is None:
                     self._cancel_handles.pop(running[0], None)
@@ -325,33 +1057,109 @@ class JobManager:
                     self._cancel_handles[running[0]] = handle
 
     # ---- Helpers ----
-    def _next_job_round_robin(self) -> Optional[Job]:
+    def _next_job(self) -> Optional[Job]:
+        """
+        Pick the next job to run (lock held by caller or taken here).
+
+        Candidates are the head jobs of users that are under the per-user concurrency
+        limit, in rotation order; the scheduling policy picks one. The served user moves
+        to the back of the rotation, drained users leave it.
+        """
         with self._lock:
             if not self._users_rr:
                 return None
-            # Rotate users until a queue with items is found
-            for _ in range(len(self._users_rr)):
-                user_id = self._users_rr[0]
+            drained: list[str] = []
+            candidates: list[Job] = []
+            for user_id in self._users_rr:
                 q = self._user_queues.get(user_id)
-                running = self._running_by_user.get(user_id, 0)
-                if q and len(q) > 0 and running < self.max_per_user_concurrent:
-                    job_id = q.popleft()
-                    self._running_by_user[user_id] = running + 1
-                    # If queue now empty, still keep user in RR to preserve order for future jobs
-                    return self._jobs.get(job_id)
-                # Rotate
-                self._users_rr.rotate(-1)
-            return None
+                if not q:
+                    drained.append(user_id)
+                    continue
+                if self._running_by_user.get(user_id, 0) < self.max_per_user_concurrent:
+                    head = self._jobs.get(q[0])
+                    if head is not None:
+                        candidates.append(head)
+            for user_id in drained:
+                # Drained (or fully cancelled) users leave the rotation; they rejoin
+                # at the back on their next enqueue.
+                self._drop_from_rotation(user_id)
+            if not candidates:
+                return None
+            now = self._clock()
+            index = 0
+            if len(candidates) > 1:
+                try:
+                    index = int(self._scheduling_policy.select(candidates, now))
+                except Exception as e:
+                    try:
+                        self._logger.warning({"event": "scheduling_policy_failed", "error": str(e)})
+                    except Exception:
+                        pass
+                    index = 0
+                if index < 0 or index >= len(candidates):
+                    index = 0
+            job = candidates[index]
+            user_id = job.owner_id
+            q = self._user_queues[user_id]
+            q.popleft()
+            self._rr_index.remove_job(user_id, job.id)
+            self._running_by_user[user_id] = self._running_by_user.get(user_id, 0) + 1
+            if q:
+                # Served users go to the back so the next dispatch moves on to another user
+                if self._users_rr[0] == user_id:
+                    self._users_rr.rotate(-1)
+                else:
+                    self._users_rr.remove(user_id)
+                    self._users_rr.append(user_id)
+                self._rr_index.move_to_back(user_id)
+            else:
+                self._drop_from_rotation(user_id)
+            try:
+                self._scheduling_policy.on_dispatch(job, now)
+            except Exception:
+                pass
+            return job
+
+    def _drop_from_rotation(self, user_id: str):
+        if self._users_rr and self._users_rr[0] == user_id:
+            self._users_rr.popleft()
+        else:
+            try:
+                self._users_rr.remove(user_id)
+            except ValueError:
+                pass
+        self._rr_index.drop_user(user_id)
+        if not self._user_queues.get(user_id):
+            self._user_queues.pop(user_id, None)
+
+    def _release_slot(self, job: Job):
+        """Give back the per-user running slot of a finished job (lock held)."""
+        try:
+            if job.owner_id in self._running_by_user and self._running_by_user[job.owner_id] > 0:
+                self._running_by_user[job.owner_id] -= 1
+                if self._running_by_user[job.owner_id] == 0:
+                    self._running_by_user.pop(job.owner_id, None)
+        except Exception:
+            pass
+
+    def _finish_simulated(self, job: Job, now: float):
+        """Complete a job without running a processor (used by scheduling.simulate_trace)."""
+        with self._lock:
+            self._set_status(job, "complete")
+            job.progress = 100.0
+            job.ended_at = now
+            self._release_slot(job)
+            self._retire(job)
 
     def _mark_error(self, job: Job, message: str):
         with self._lock:
             # If a cancel was requested, prefer cancelled state
             if job.id in self._cancel_requests:
-                job.status = "cancelled"
+                self._set_status(job, "cancelled")
                 # Provide a friendly cancellation message for UI instead of a generic fetch failure
                 message = "생성이 취소되었습니다."
             else:
-                job.status = "error"
+                self._set_status(job, "error")
             job.error_message = message
             job.ended_at = time.time()
         if self._notify:
@@ -362,6 +1170,71 @@ class JobManager:
         except Exception:
             pass
 
+    def _set_status(self, job: Job, status: JobStatus):
+        """Change a job's status and keep the status/owner indexes in sync (lock held)."""
+        previous = job.status
+        if previous == status:
+            return
+        self._ids_by_status[previous].discard(job.id)
+        if previous == "running":
+            owned = self._running_ids_by_owner.get(job.owner_id)
+            if owned is not None:
+                owned.discard(job.id)
+                if not owned:
+                    self._running_ids_by_owner.pop(job.owner_id, None)
+        job.status = status
+        self._ids_by_status[status].add(job.id)
+        if status == "running":
+            self._running_ids_by_owner[job.owner_id].add(job.id)
+
+    def _retire(self, job: Job):
+        """Move a finished job into the retention window and evict what falls out (lock held)."""
+        if job.status not in TERMINAL_STATUSES or job.id not in self._jobs:
+            return
+        ended = float(job.ended_at or time.time())
+        self._finished[job.id] = time.time()
+        self._finished.move_to_end(job.id)
+        executed_at = self._execution_started_at.pop(job.id, None)
+        if job.status == "complete" and job.started_at:
+            wf = job.payload.get("workflow_id") if isinstance(job.payload, dict) else None
+            duration = max(0.0, ended - float(executed_at or job.started_at))
+            self._recent_completions.append((ended, duration, wf))
+            try:
+                self._scheduling_policy.on_complete(job, duration)
+            except Exception:
+                pass
+            estimator = self._duration_estimator
+            if estimator is not None and not self._scheduling_policy.observes(estimator):
+                estimator.observe(job.payload, duration)
+        self._evict_finished()
+
+    def _evict_finished(self):
+        """Drop finished jobs beyond the count cap or idle longer than the TTL (lock held)."""
+        try:
+            cap = max(0, int(self.max_finished_jobs))
+        except Exception:
+            cap = 500
+        ttl = self.finished_job_ttl_seconds
+        cutoff = (time.time() - float(ttl)) if isinstance(ttl, (int, float)) and ttl > 0 else None
+        while self._finished:
+            job_id, last_used = next(iter(self._finished.items()))
+            if len(self._finished) <= cap and (cutoff is None or last_used >= cutoff):
+                break
+            self._finished.popitem(last=False)
+            evicted = self._jobs.pop(job_id, None)
+            if evicted is not None:
+                self._ids_by_status[evicted.status].discard(job_id)
+
+    def _load_evicted(self, job_id: str) -> Optional[Job]:
+        store = self._job_store
+        if store is None or not job_id:
+            return None
+        try:
+            record = store.fetch_by_id(job_id)
+        except Exception:
+            return None
+        return Job.from_record(record) if record else None
+
     def _to_public(self, j: Job) -> Dict[str, Any]:
         return {
             "id": j.id,
@@ -383,120 +1256,447 @@ class JobManager:
 
     def get_active_for_owner(self, owner_id: str) -> Optional[Job]:
         with self._lock:
-            for j in self._jobs.values():
-                try:
-                    if j.owner_id == owner_id and j.status == "running":
-                        return j
-                except Exception:
-                    continue
-            return None
+            running = [self._jobs[jid] for jid in (self._running_ids_by_owner.get(owner_id) or ()) if jid in self._jobs]
+            if not running:
+                return None
+            return max(running, key=lambda j: j.started_at or 0)
+
+    def lane_metrics(self) -> Dict[str, Any]:
+        """Queue depth / wait snapshot for admin metrics."""
+        now = time.time()
+        with self._lock:
+            queued_ids = list(self._ids_by_status.get("queued") or ())
+            oldest = min((self._jobs[jid].created_at for jid in queued_ids if jid in self._jobs), default=None)
+            waits = sorted(self._recent_waits)
+            running = len(self._ids_by_status.get("running") or ())
+        return {
+            "executor": "threads",
+            "workers": self.worker_count,
+            "queued": len(queued_ids),
+            "running": running,
+            "max_per_user_queue": self.max_per_user_queue,
+            "job_timeout_seconds": self.job_timeout_seconds,
+            "oldest_queued_wait_sec": (now - oldest) if oldest else None,
+            "wait_avg_sec": (sum(waits) / len(waits)) if waits else None,
+            "wait_p95_sec": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else None,
+            "wait_samples": len(waits),
+            "gate": self._execution_gate.metrics() if self._execution_gate is not None else None,
+        }
+
+    def recent_completions(self) -> list[tuple[float, float, Optional[str]]]:
+        with self._lock:
+            return list(self._recent_completions)
 
     def get_recent_averages(self, limit: int = 100) -> Dict[str, Any]:
         """Compute rolling average durations overall and per workflow_id for last N completed jobs.
         Returns dict: { 'overall_avg_sec': float|None, 'per_workflow_avg_sec': {wf: float}, 'count': int }
         """
+        return _averages_from_completions(self.recent_completions(), limit)
+
+
+def _averages_from_completions(completions: list[tuple[float, float, Optional[str]]], limit: int) -> Dict[str, Any]:
+    try:
+        lim = max(0, int(limit))
+    except Exception:
+        lim = 100
+    # Newest first, last N completed
+    window = sorted(completions, key=lambda c: c[0], reverse=True)[:lim]
+    if not window:
+        return {"overall_avg_sec": None, "per_workflow_avg_sec": {}, "count": 0}
+    durations = [c[1] for c in window]
+    overall = sum(durations) / len(durations)
+    per: Dict[str, list[float]] = {}
+    for _, duration, wf in window:
+        if wf:
+            per.setdefault(wf, []).append(duration)
+    per_avg = {wf: (sum(vals) / len(vals)) for wf, vals in per.items() if vals}
+    return {"overall_avg_sec": overall, "per_workflow_avg_sec": per_avg, "count": len(durations)}
+
+
+async def to_thread_uncancelled(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    asyncio.to_thread that always runs func to the end and returns its result.
+
+    Cancelling the awaiting task (job cancel / deadline) cannot stop the thread, so giving up on
+    it would leave func's side effects (saved files, status writes) behind a job recorded as
+    cancelled. The cancellation is absorbed instead; func itself decides, as it does on the
+    thread lanes.
+    """
+    return await _uncancelled(asyncio.to_thread(func, *args, **kwargs))
+
+
+async def _uncancelled(awaitable: Awaitable[Any]) -> Any:
+    future = asyncio.ensure_future(awaitable)
+    while True:
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                raise
+            task = asyncio.current_task()
+            if task is not None and hasattr(task, "uncancel"):
+                task.uncancel()
+
+
+class AsyncJobManager(JobManager):
+    """
+    Lane whose jobs run as coroutines on one event loop thread.
+
+    Queueing, scheduling policy, per-user limits, deadlines and the enqueue/cancel/get_position
+    interface are JobManager's. worker_count is the number of jobs in flight, not threads: a
+    dispatcher thread picks jobs and hands them to the loop, so jobs that mostly wait on
+    provider sockets cost a fixed handful of threads in total. Processors registered with
+    register_async_processor are awaited; a job type with only a blocking processor runs it via
+    asyncio.to_thread. cancel() and the deadline watchdog also cancel the job's task, which
+    aborts an in-flight provider request. Status transitions (job store, notifier callbacks)
+    block, so they run on a small per-lane executor and never stall the other jobs on the loop.
+    """
+
+    # Threads for status transitions; shared by every job in flight on the lane.
+    STATUS_THREADS = 2
+
+    def __init__(self, worker_count: int = 1):
+        super().__init__(worker_count)
+        self._async_processors: Dict[str, Callable[..., Awaitable[None]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._slots: Optional[threading.Semaphore] = None
+        self._status_executor: Optional[ThreadPoolExecutor] = None
+        # job_id -> task of a running job
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+        self._peak_in_flight = 0
+
+    def register_async_processor(self, job_type: str, processor: Callable[..., Awaitable[None]]):
+        """processor(job, progress_cb) is a coroutine function; progress_cb blocks, call it from a thread."""
+        self._async_processors[job_type] = processor
+
+    def start(self):
+        if any(t.is_alive() for t in (self._worker_threads or [])):
+            return
+        self._stop_event.clear()
+        if self._execution_gate is not None:
+            self._execution_gate.reopen()
+        try:
+            count = max(1, int(self.worker_count or 1))
+        except Exception:
+            count = 1
+        self._slots = threading.Semaphore(count)
+        self._status_executor = ThreadPoolExecutor(self.STATUS_THREADS, thread_name_prefix=f"JobStatus-{self.lane_key}")
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name=f"JobLoop-{self.lane_key}", daemon=True)
+        self._loop_thread.start()
+        dispatcher = threading.Thread(target=self._run_loop, name=f"JobDispatcher-{self.lane_key}", daemon=True)
+        self._worker_threads = [dispatcher]
+        dispatcher.start()
+
+    def stop(self):
+        super().stop()
+        loop, thread = self._loop, self._loop_thread
+        if loop is None:
+            return
+        # Like the thread lanes, in-flight jobs get a short grace period; the rest are left
+        # running (startup recovery handles them) rather than cancelled.
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._tasks:
+                    break
+            time.sleep(0.02)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=2)
+        if self._status_executor is not None:
+            self._status_executor.shutdown(wait=False)
+        self._loop = None
+        self._loop_thread = None
+        self._status_executor = None
+
+    def _run_loop(self):
+        slots, loop = self._slots, self._loop
+        while not self._stop_event.is_set():
+            if not slots.acquire(timeout=0.5):
+                continue
+            job = self._wait_for_next_job()
+            if not job:
+                slots.release()
+                continue
+            if job.type not in self._async_processors and job.type not in self._processors:
+                try:
+                    self._mark_error(job, "No processor for job type")
+                finally:
+                    self._end_job(job)
+                    slots.release()
+                continue
+            asyncio.run_coroutine_threadsafe(self._run_job(job), loop)
+
+    async def _run_job(self, job: Job):
+        task = asyncio.current_task()
         with self._lock:
-            jobs = list(self._jobs.values())
-        # Sort by ended_at desc and take last N completed
-        completed = [j for j in jobs if j.status == "complete" and j.started_at and j.ended_at]
-        completed.sort(key=lambda j: j.ended_at or 0, reverse=True)
-        window = completed[: max(0, limit)]
-        if not window:
-            return {"overall_avg_sec": None, "per_workflow_avg_sec": {}, "count": 0}
-        # Overall
-        durations = [(j.ended_at - j.started_at) for j in window if j.started_at and j.ended_at]
-        overall = (sum(durations) / len(durations)) if durations else None
-        # Per workflow: payload may include workflow_id
-        per: Dict[str, list[float]] = {}
-        for j in window:
+            self._tasks[job.id] = task
+            self._peak_in_flight = max(self._peak_in_flight, len(self._tasks))
+        try:
+            progress_cb = await self._off_loop(self._begin_job, job)
+            error: Optional[str] = None
             try:
-                wf = None
-                if isinstance(j.payload, dict):
-                    wf = j.payload.get("workflow_id")
-                if (j.started_at and j.ended_at and wf):
-                    per.setdefault(wf, []).append(j.ended_at - j.started_at)
-            except Exception:
-                continue
-        per_avg = {wf: (sum(vals) / len(vals)) for wf, vals in per.items() if vals}
-        return {"overall_avg_sec": overall, "per_workflow_avg_sec": per_avg, "count": len(durations)}
+                if self.is_cancel_requested(job.id):
+                    # Cancelled while _begin_job ran (that step absorbs the task cancellation).
+                    raise asyncio.CancelledError()
+                processor = self._async_processors.get(job.type)
+                if processor is not None:
+                    await processor(job, progress_cb)
+                else:
+                    await asyncio.to_thread(self._processors[job.type], job, progress_cb)
+            except asyncio.CancelledError:
+                # cancel()/deadline: _mark_error reports it as cancelled.
+                error = "cancelled"
+            except Exception as e:
+                error = str(e)
+            await self._off_loop(self._finish_job, job, error)
+        finally:
+            with self._work_available:
+                self._tasks.pop(job.id, None)
+                # A finished job may unblock its owner's next one: wake the dispatcher.
+                self._work_available.notify_all()
+            self._slots.release()
+
+    async def _off_loop(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await _uncancelled(loop.run_in_executor(self._status_executor, func, *args))
+
+    def _finish_job(self, job: Job, error: Optional[str]):
+        try:
+            if error is None:
+                self._complete_job(job)
+            else:
+                self._mark_error(job, error)
+        finally:
+            self._end_job(job)
+
+    def _cancel_task(self, job_id: str):
+        with self._lock:
+            task = self._tasks.get(job_id)
+        loop = self._loop
+        if task is not None and loop is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def cancel(self, job_id: str) -> bool:
+        cancelled = super().cancel(job_id)
+        if cancelled:
+            self._cancel_task(job_id)
+        return cancelled
+
+    def _on_deadline(self, job: Job):
+        super()._on_deadline(job)
+        self._cancel_task(job.id)
+
+    def lane_metrics(self) -> Dict[str, Any]:
+        data = super().lane_metrics()
+        with self._lock:
+            data.update({"executor": "asyncio", "in_flight": len(self._tasks), "peak_in_flight": self._peak_in_flight})
+        return data
 
 
 class RoutingJobManager:
     """
-    Route jobs to separate managers (local ComfyUI vs external OpenRouter).
+    Route jobs to separate lanes (one JobManager each), keyed "<provider>:<execution class>".
 
     Motivation:
     - ComfyUI is effectively single-lane on one machine; queue must be managed strictly.
     - OpenRouter jobs can run concurrently; we cap concurrent workers and keep a separate queue
       to avoid interleaving/queue confusion with ComfyUI jobs.
+    - Workflows tagged with an "mcp_execution_class" (e.g. RMBG2 = "fast") get their own lane
+      when one is configured, with separate queue limits/timeouts, so short utility jobs never
+      queue behind long generative ones. ComfyUI class lanes share the GPU through an
+      ExecutionGate with weighted shares instead of running concurrently.
+
+    The comfy/external managers are the "comfyui:default" and "openrouter:default" lanes.
     """
 
-    def __init__(self, comfy: JobManager, external: JobManager, workflow_configs: Dict[str, Dict[str, Any]]):
+    DEFAULT_CLASS = "default"
+
+    def __init__(
+        self,
+        comfy: JobManager,
+        external: JobManager,
+        workflow_configs: Dict[str, Dict[str, Any]],
+        lanes: Optional[Dict[str, JobManager]] = None,
+    ):
         self._comfy = comfy
         self._external = external
         self._wf = workflow_configs or {}
+        self._lanes: Dict[str, JobManager] = {"comfyui:default": comfy, "openrouter:default": external}
+        for key, lane in (lanes or {}).items():
+            self._lanes[key] = lane
+        for key, lane in self._lanes.items():
+            if lane.lane_key == "default":
+                lane.lane_key = key
+
+    @staticmethod
+    def lane_key_for_config(cfg: Optional[Dict[str, Any]]) -> str:
+        cfg = cfg or {}
+        provider = str(cfg.get("provider", "comfyui") or "comfyui").strip().lower()
+        if provider != "openrouter":
+            provider = "comfyui"
+        execution_class = str(cfg.get("mcp_execution_class") or RoutingJobManager.DEFAULT_CLASS).strip().lower()
+        return f"{provider}:{execution_class or RoutingJobManager.DEFAULT_CLASS}"
+
+    @classmethod
+    def execution_class_lane_keys(cls, workflow_configs: Dict[str, Dict[str, Any]]) -> list[str]:
+        """Non-default lane keys referenced by the workflow configs (e.g. ["comfyui:fast"])."""
+        keys = set()
+        for cfg in (workflow_configs or {}).values():
+            key = cls.lane_key_for_config(cfg)
+            if not key.endswith(f":{cls.DEFAULT_CLASS}"):
+                keys.add(key)
+        return sorted(keys)
 
     def _is_external_workflow(self, workflow_id: str) -> bool:
         try:
             cfg = self._wf.get(workflow_id) if isinstance(self._wf, dict) else None
-            provider = str((cfg or {}).get("provider", "comfyui") or "comfyui").strip().lower()
-            return provider == "openrouter"
+            return self.lane_key_for_config(cfg).startswith("openrouter:")
         except Exception:
             return False
 
+    def lane_key_for_workflow(self, workflow_id: str) -> str:
+        try:
+            cfg = self._wf.get(workflow_id) if isinstance(self._wf, dict) else None
+            key = self.lane_key_for_config(cfg)
+        except Exception:
+            key = "comfyui:default"
+        if key in self._lanes:
+            return key
+        # Class lane not configured: fall back to the provider's default lane.
+        provider = key.split(":", 1)[0]
+        return f"{provider}:{self.DEFAULT_CLASS}"
+
     def _pick_manager_for_payload(self, payload: Dict[str, Any]) -> JobManager:
         try:
             wf_id = payload.get("workflow_id") if isinstance(payload, dict) else None
             wf_id = str(wf_id or "").strip()
         except Exception:
             wf_id = ""
-        if wf_id and self._is_external_workflow(wf_id):
-            return self._external
-        return self._comfy
+        if not wf_id:
+            return self._comfy
+        return self._lanes.get(self.lane_key_for_workflow(wf_id), self._comfy)
+
+    def lanes(self) -> Dict[str, JobManager]:
+        return dict(self._lanes)
+
+    def lanes_for_provider(self, provider: str) -> list[JobManager]:
+        prefix = f"{str(provider or '').strip().lower()}:"
+        return [lane for key, lane in self._lanes.items() if key.startswith(prefix)]
 
     # ---- registration / lifecycle ----
     def register_processor(self, job_type: str, processor: Callable[[Job, Callable[[float], None]], None]):
-        self._comfy.register_processor(job_type, processor)
-        self._external.register_processor(job_type, processor)
+        for lane in self._lanes.values():
+            lane.register_processor(job_type, processor)
+
+    def register_async_processor(self, job_type: str, processor: Callable[..., Awaitable[None]]):
+        """Coroutine processor for the lanes that run on an event loop (AsyncJobManager)."""
+        for lane in self._lanes.values():
+            if isinstance(lane, AsyncJobManager):
+                lane.register_async_processor(job_type, processor)
 
     def set_notifier(self, notify: Callable[[str, Dict[str, Any]], None]):
-        self._comfy.set_notifier(notify)
-        self._external.set_notifier(notify)
+        for lane in self._lanes.values():
+            lane.set_notifier(notify)
 
     def start(self):
-        self._comfy.start()
-        self._external.start()
+        for lane in self._lanes.values():
+            lane.start()
 
     def stop(self):
-        try:
-            self._comfy.stop()
-        finally:
-            self._external.stop()
+        # Signal every lane first so lanes sharing a closed gate don't spin while others join.
+        for lane in self._lanes.values():
+            lane._signal_stop()
+        errors: list[Exception] = []
+        for lane in self._lanes.values():
+            try:
+                lane.stop()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def set_job_store(self, job_store: Any):
+        for lane in self._lanes.values():
+            lane.set_job_store(job_store)
+
+    def scheduling_metrics(self) -> Dict[str, Any]:
+        metrics = {key: lane.scheduling_metrics() for key, lane in self._lanes.items()}
+        # Backward-compatible aliases for the original two lanes
+        metrics["comfyui"] = metrics.get("comfyui:default")
+        metrics["openrouter"] = metrics.get("openrouter:default")
+        return metrics
+
+    def lane_metrics(self) -> Dict[str, Any]:
+        return {key: lane.lane_metrics() for key, lane in self._lanes.items()}
+
+    def upcoming_deadlines(self, limit: int = 50) -> list[Dict[str, Any]]:
+        merged: list[Dict[str, Any]] = []
+        for lane in self._lanes.values():
+            merged.extend(lane.upcoming_deadlines(limit=limit))
+        merged.sort(key=lambda d: d.get("deadline_at") or 0)
+        return merged[: max(0, int(limit))]
+
+    def set_duration_estimator(self, estimator: Optional[DurationEstimator]):
+        for lane in self._lanes.values():
+            lane.set_duration_estimator(estimator)
+
+    def predict(self, job_id: str) -> Optional[Dict[str, Any]]:
+        mgr = self._manager_for_job(job_id)
+        return mgr.predict(job_id) if mgr else None
+
+    def predict_new(self, owner_id: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._pick_manager_for_payload(payload).predict_new(owner_id, payload)
+
+    def mark_execution_started(self, job_id: str):
+        mgr = self._manager_for_job(job_id)
+        if mgr:
+            mgr.mark_execution_started(job_id)
+
+    def set_deadline_resolver(self, provider: str, resolver: Optional[Callable[[Job], Optional[float]]]):
+        for lane in self.lanes_for_provider(provider):
+            lane.set_deadline_resolver(resolver)
+
+    def _manager_for_job(self, job_id: str) -> Optional[JobManager]:
+        # In-memory ownership only; evicted jobs are served read-only from the JobStore.
+        for lane in self._lanes.values():
+            if lane.owns(job_id):
+                return lane
+        return None
 
     # ---- enqueue / status / cancel ----
     def enqueue(self, owner_id: str, job_type: str, payload: Dict[str, Any]) -> Job:
         mgr = self._pick_manager_for_payload(payload)
         return mgr.enqueue(owner_id, job_type, payload)
 
+    def restore(self, job: Job) -> Job:
+        return self._pick_manager_for_payload(job.payload).restore(job)
+
     def get(self, job_id: str) -> Optional[Job]:
-        j = self._comfy.get(job_id)
-        if j:
-            return j
-        return self._external.get(job_id)
+        mgr = self._manager_for_job(job_id)
+        if mgr:
+            return mgr.get(job_id)
+        # All lanes share one JobStore, so a single fallback lookup is enough.
+        return self._comfy.get(job_id)
 
     def get_position(self, job_id: str) -> Optional[int]:
-        j = self._comfy.get(job_id)
-        if j:
-            return self._comfy.get_position(job_id)
-        j2 = self._external.get(job_id)
-        if j2:
-            return self._external.get_position(job_id)
-        return None
+        mgr = self._manager_for_job(job_id)
+        return mgr.get_position(job_id) if mgr else None
+
+    def get_global_position(self, job_id: str) -> Optional[int]:
+        # Lanes dispatch independently, so "jobs ahead" only counts the job's own lane.
+        mgr = self._manager_for_job(job_id)
+        return mgr.get_global_position(job_id) if mgr else None
 
     def list_jobs(self, limit: int = 100) -> list[dict]:
-        a = self._comfy.list_jobs(limit=limit)
-        b = self._external.list_jobs(limit=limit)
-        merged = (a or []) + (b or [])
+        merged: list[dict] = []
+        for lane in self._lanes.values():
+            merged.extend(lane.list_jobs(limit=limit) or [])
         try:
             merged.sort(key=lambda j: j.get("created_at", 0) or 0, reverse=True)
         except Exception:
@@ -504,88 +1704,43 @@ class RoutingJobManager:
         return merged[: max(0, int(limit))]
 
     def cancel(self, job_id: str) -> bool:
-        if self._comfy.get(job_id):
-            return self._comfy.cancel(job_id)
-        if self._external.get(job_id):
-            return self._external.cancel(job_id)
-        return False
+        mgr = self._manager_for_job(job_id)
+        return mgr.cancel(job_id) if mgr else False
 
     def set_cancel_handle(self, job_id: str, handle: Optional[Callable[[], bool]]):
-        if self._comfy.get(job_id):
-            return self._comfy.set_cancel_handle(job_id, handle)
-        if self._external.get(job_id):
-            return self._external.set_cancel_handle(job_id, handle)
-        return None
+        mgr = self._manager_for_job(job_id)
+        return mgr.set_cancel_handle(job_id, handle) if mgr else None
 
     # Backward-compatible passthrough
     def set_active_cancel_handle(self, handle: Optional[Callable[[], bool]]):
-        # Prefer comfy (single worker), otherwise external.
-        try:
-            self._comfy.set_active_cancel_handle(handle)
-        except Exception:
-            pass
-        try:
-            self._external.set_active_cancel_handle(handle)
-        except Exception:
-            pass
+        # Each lane only applies it when exactly one of its jobs is running.
+        for lane in self._lanes.values():
+            try:
+                lane.set_active_cancel_handle(handle)
+            except Exception:
+                pass
 
     def is_cancel_requested(self, job_id: str) -> bool:
-        if self._comfy.get(job_id):
-            return self._comfy.is_cancel_requested(job_id)
-        if self._external.get(job_id):
-            return self._external.is_cancel_requested(job_id)
-        return False
+        mgr = self._manager_for_job(job_id)
+        return mgr.is_cancel_requested(job_id) if mgr else False
 
     def get_active_for_owner(self, owner_id: str) -> Optional[Job]:
-        # If both exist (rare), prefer the most recently started.
-        c = self._comfy.get_active_for_owner(owner_id)
-        n = self._external.get_active_for_owner(owner_id)
-        if c and n:
-            try:
-                cs = float(c.started_at or 0)
-            except Exception:
-                cs = 0
-            try:
-                ns = float(n.started_at or 0)
-            except Exception:
-                ns = 0
-            return n if ns >= cs else c
-        return n or c
+        # If several lanes run a job for this owner (rare), prefer the most recently started.
+        active = [j for j in (lane.get_active_for_owner(owner_id) for lane in self._lanes.values()) if j]
+        if not active:
+            return None
 
-    def get_recent_averages(self, limit: int = 100) -> Dict[str, Any]:
-        # Combine jobs from both managers and reuse the same computation pattern.
-        try:
-            lim = max(0, int(limit))
-        except Exception:
-            lim = 100
-        jobs: list[Job] = []
-        try:
-            jobs.extend(list(getattr(self._comfy, "_jobs", {}).values()))
-        except Exception:
-            pass
-        try:
-            jobs.extend(list(getattr(self._external, "_jobs", {}).values()))
-        except Exception:
-            pass
-        completed = [j for j in jobs if j.status == "complete" and j.started_at and j.ended_at]
-        completed.sort(key=lambda j: j.ended_at or 0, reverse=True)
-        window = completed[:lim]
-        if not window:
-            return {"overall_avg_sec": None, "per_workflow_avg_sec": {}, "count": 0}
-        durations = [(j.ended_at - j.started_at) for j in window if j.started_at and j.ended_at]
-        overall = (sum(durations) / len(durations)) if durations else None
-        per: Dict[str, list[float]] = {}
-        for j in window:
+        def _started(j: Job) -> float:
             try:
-                wf = None
-                if isinstance(j.payload, dict):
-                    wf = j.payload.get("workflow_id")
-                if (j.started_at and j.ended_at and wf):
-                    per.setdefault(str(wf), []).append(j.ended_at - j.started_at)
+                return float(j.started_at or 0)
             except Exception:
-                continue
-        per_avg = {wf: (sum(vals) / len(vals)) for wf, vals in per.items() if vals}
-        return {"overall_avg_sec": overall, "per_workflow_avg_sec": per_avg, "count": len(durations)}
-
+                return 0.0
 
+        return max(active, key=_started)
 
+    def get_recent_averages(self, limit: int = 100) -> Dict[str, Any]:
+        # Combine completions from all lanes and reuse the same computation.
+        completions: list[tuple[float, float, Optional[str]]] = []
+        for lane in self._lanes.values():
+            completions.extend(lane.recent_completions())
+        return _averages_from_completions(completions, limit)
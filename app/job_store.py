@@ -1,7 +1,14 @@
+import logging
 import os
 import sqlite3
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
-from typing import Any, Dict, Optional
+from typing import Any, Deque, Dict, Iterable, Optional
+
+
+_TERMINAL_JOB_STATUSES = frozenset({"complete", "error", "cancelled"})
 
 
 class JobStore:
@@ -66,59 +73,76 @@ class JobStore:
             except Exception:
                 pass
 
+    _UPSERT_SQL = """
+        INSERT INTO jobs (id, owner_id, type, status, progress, created_at, started_at, ended_at, error, result_json, artifact_available, workflow_id, payload_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, json(?), ?, ?, json(?))
+        ON CONFLICT(id) DO UPDATE SET
+            owner_id=excluded.owner_id,
+            type=excluded.type,
+            status=excluded.status,
+            progress=excluded.progress,
+            created_at=excluded.created_at,
+            started_at=excluded.started_at,
+            ended_at=excluded.ended_at,
+            error=excluded.error,
+            result_json=excluded.result_json,
+            artifact_available=excluded.artifact_available,
+            workflow_id=excluded.workflow_id,
+            payload_json=excluded.payload_json
+        """
+
+    @staticmethod
+    def _upsert_params(j: Dict[str, Any]) -> tuple:
+        payload = j.get("payload") if isinstance(j, dict) else None
+        workflow_id = None
+        try:
+            if isinstance(j.get("workflow_id"), str) and j.get("workflow_id"):
+                workflow_id = str(j.get("workflow_id")).strip()
+        except Exception:
+            workflow_id = None
+        if not workflow_id:
+            try:
+                if isinstance(payload, dict):
+                    wf = payload.get("workflow_id")
+                    if isinstance(wf, str) and wf.strip():
+                        workflow_id = wf.strip()
+            except Exception:
+                workflow_id = None
+        return (
+            j.get("id"),
+            j.get("owner_id"),
+            j.get("type"),
+            j.get("status"),
+            float(j.get("progress") or 0.0),
+            j.get("created_at"),
+            j.get("started_at"),
+            j.get("ended_at"),
+            j.get("error"),
+            json_dumps_safe(j.get("result") or {}),
+            1 if j.get("artifact_available") else 0,
+            workflow_id,
+            json_dumps_safe(payload or {}),
+        )
+
     def upsert_job(self, j: Dict[str, Any]):
+        # 단건 write-through 호출자(admin, recovery)는 예외를 기대하지 않음: 기존처럼 로그만 남기고 삼킨다
+        try:
+            self.upsert_jobs([j])
+        except Exception as e:
+            try:
+                logging.getLogger("comfyui_app").warning({"event": "job_upsert_failed", "job_id": j.get("id"), "error": str(e)})
+            except Exception:
+                pass
+
+    def upsert_jobs(self, jobs: Iterable[Dict[str, Any]]):
+        """Upsert several job snapshots in one connection/transaction (group commit)."""
+        params = [self._upsert_params(j) for j in jobs]
+        if not params:
+            return
+
         def _exec():
             with self._connect() as con:
-                payload = j.get("payload") if isinstance(j, dict) else None
-                workflow_id = None
-                try:
-                    if isinstance(j.get("workflow_id"), str) and j.get("workflow_id"):
-                        workflow_id = str(j.get("workflow_id")).strip()
-                except Exception:
-                    workflow_id = None
-                if not workflow_id:
-                    try:
-                        if isinstance(payload, dict):
-                            wf = payload.get("workflow_id")
-                            if isinstance(wf, str) and wf.strip():
-                                workflow_id = wf.strip()
-                    except Exception:
-                        workflow_id = None
-
-                con.execute(
-                    """
-                    INSERT INTO jobs (id, owner_id, type, status, progress, created_at, started_at, ended_at, error, result_json, artifact_available, workflow_id, payload_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, json(?), ?, ?, json(?))
-                    ON CONFLICT(id) DO UPDATE SET
-                        owner_id=excluded.owner_id,
-                        type=excluded.type,
-                        status=excluded.status,
-                        progress=excluded.progress,
-                        created_at=excluded.created_at,
-                        started_at=excluded.started_at,
-                        ended_at=excluded.ended_at,
-                        error=excluded.error,
-                        result_json=excluded.result_json,
-                        artifact_available=excluded.artifact_available,
-                        workflow_id=excluded.workflow_id,
-                        payload_json=excluded.payload_json
-                    """,
-                    (
-                        j.get("id"),
-                        j.get("owner_id"),
-                        j.get("type"),
-                        j.get("status"),
-                        float(j.get("progress") or 0.0),
-                        j.get("created_at"),
-                        j.get("started_at"),
-                        j.get("ended_at"),
-                        j.get("error"),
-                        json_dumps_safe(j.get("result") or {}),
-                        1 if j.get("artifact_available") else 0,
-                        workflow_id,
-                        json_dumps_safe(payload or {}),
-                    ),
-                )
+                con.executemany(self._UPSERT_SQL, params)
         try:
             _exec()
         except Exception as e:
@@ -128,6 +152,8 @@ class JobStore:
                 if isinstance(e, _sq.OperationalError):
                     self._init_db()
                     _exec()
+                else:
+                    raise
             except Exception:
                 raise
 
@@ -183,6 +209,24 @@ class JobStore:
             ).fetchone()
         if row is None:
             return None
+        return self._row_to_dict(row)
+
+    def fetch_by_statuses(self, statuses: Iterable[str]) -> list[Dict[str, Any]]:
+        """Jobs in the given states, oldest first (startup recovery of queued/running jobs)."""
+        wanted = [str(s) for s in statuses if s]
+        if not wanted:
+            return []
+        placeholders = ",".join("?" for _ in wanted)
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT id, owner_id, type, status, progress, created_at, started_at, ended_at, error, result_json, COALESCE(artifact_available,0), workflow_id, payload_json "
+                f"FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at ASC, rowid ASC",
+                wanted,
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
         return {
             "id": row[0],
             "owner_id": row[1],
@@ -200,6 +244,251 @@ class JobStore:
         }
 
 
+class JobSnapshotWriter:
+    """
+    Write-behind persistence for job snapshots.
+
+    - upsert_job() only records the latest snapshot per job_id (latest wins) and returns.
+    - A background thread writes pending snapshots in group commits via JobStore.upsert_jobs.
+    - Terminal states (and new jobs) wake the writer immediately; progress ticks wait for
+      the next flush interval so bursts coalesce into one row write.
+    - fetch_by_id() sees pending snapshots, so readers never observe an older row.
+    - A group commit that fails on lock/busy is retried with backoff; any other failure is
+      retried row by row so one bad snapshot is dropped (and logged) without holding back the rest.
+    """
+
+    # Failed flushes back off exponentially up to this delay; after stop() the writer gives up
+    # (and logs the dropped rows) after STOP_MAX_RETRIES consecutive failures.
+    MAX_RETRY_DELAY_SECONDS = 5.0
+    STOP_MAX_RETRIES = 3
+
+    def __init__(self, store: JobStore, flush_interval_seconds: float = 0.5, max_batch: int = 200):
+        self._store = store
+        self.flush_interval_seconds = max(0.01, float(flush_interval_seconds))
+        self.max_batch = max(1, int(max_batch))
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # Batch being written: still served by fetch_by_id until its commit finishes.
+        self._flushing: Dict[str, Dict[str, Any]] = {}
+        self._urgent = False
+        self._in_flight = 0
+        self._stop = False
+        self._failures = 0
+        self._thread: Optional[threading.Thread] = None
+        self._logger = logging.getLogger("comfyui_app")
+        # Metrics
+        self._submitted = 0
+        self._coalesced = 0
+        self._rows_written = 0
+        self._flushes = 0
+        self._errors = 0
+        self._dropped = 0
+        self._max_depth = 0
+        self._flush_ms: Deque[float] = deque(maxlen=200)
+
+    # ---- lifecycle ----
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="JobSnapshotWriter", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Drain pending snapshots and stop the writer thread."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        t = self._thread
+        if t is not None:
+            t.join(timeout=timeout)
+        self._thread = None
+        # Anything left when the thread never started is written inline. A thread still alive
+        # after the join owns its batch and gives up after STOP_MAX_RETRIES failed flushes.
+        if t is None or not t.is_alive():
+            self._flush_once()
+
+    def is_running(self) -> bool:
+        t = self._thread
+        return bool(t is not None and t.is_alive())
+
+    # ---- write / read ----
+    def upsert_job(self, j: Dict[str, Any]):
+        if not self.is_running():
+            # Write-through until started (scripts/tests that never run app startup)
+            self._store.upsert_job(j)
+            return
+        snapshot = dict(j)
+        # Copy mutable dicts; serialization happens later on the writer thread.
+        for key in ("result", "payload"):
+            if isinstance(snapshot.get(key), dict):
+                snapshot[key] = dict(snapshot[key])
+        job_id = str(snapshot.get("id") or "")
+        if not job_id:
+            return
+        status = str(snapshot.get("status") or "")
+        with self._cond:
+            self._submitted += 1
+            if job_id in self._pending:
+                self._coalesced += 1
+            self._pending[job_id] = snapshot
+            depth = len(self._pending)
+            self._max_depth = max(self._max_depth, depth)
+            if status in _TERMINAL_JOB_STATUSES or status == "queued" or depth >= self.max_batch:
+                self._urgent = True
+                self._cond.notify_all()
+
+    def fetch_by_id(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            key = str(job_id or "").strip()
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._flushing.get(key)
+            if pending is not None:
+                return dict(pending)
+        return self._store.fetch_by_id(job_id)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything submitted so far is written. Returns False on timeout."""
+        if not self.is_running():
+            self._flush_once()
+            return True
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            self._urgent = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            latencies = sorted(self._flush_ms)
+            depth = len(self._pending)
+            return {
+                "running": self.is_running(),
+                "queue_depth": depth,
+                "max_queue_depth": self._max_depth,
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "rows_written": self._rows_written,
+                "flushes": self._flushes,
+                "errors": self._errors,
+                "dropped": self._dropped,
+                "flush_latency_ms_avg": (sum(latencies) / len(latencies)) if latencies else None,
+                "flush_latency_ms_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+                "flush_latency_ms_max": latencies[-1] if latencies else None,
+            }
+
+    # ---- internals ----
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._stop:
+                    self._cond.wait()
+                if not self._urgent and not self._stop:
+                    # Let progress ticks coalesce for one interval unless something urgent arrives.
+                    self._cond.wait(self.flush_interval_seconds)
+                stopping = self._stop
+            if self._flush_once():
+                self._failures = 0
+            else:
+                self._failures += 1
+                if stopping and self._failures >= self.STOP_MAX_RETRIES:
+                    self._drop_pending()
+                    return
+                # Back off (also while stopping) instead of retrying a broken DB in a busy loop.
+                time.sleep(min(self.MAX_RETRY_DELAY_SECONDS, self.flush_interval_seconds * (2 ** (self._failures - 1))))
+            if stopping:
+                with self._cond:
+                    if not self._pending:
+                        return
+
+    def _drop_pending(self):
+        with self._cond:
+            dropped = len(self._pending)
+            self._pending.clear()
+            self._dropped += dropped
+            self._cond.notify_all()
+        try:
+            self._logger.error({"event": "job_snapshot_dropped", "rows": dropped, "attempts": self._failures})
+        except Exception:
+            pass
+
+    def _flush_once(self) -> bool:
+        """Write the pending batch; False when the write failed (the batch is re-queued)."""
+        with self._cond:
+            if not self._pending:
+                self._urgent = False
+                return True
+            self._flushing = self._pending
+            self._pending = {}
+            batch = list(self._flushing.values())
+            self._urgent = False
+            self._in_flight = len(batch)
+        started = time.perf_counter()
+        ok = False
+        failed = False
+        written = 0
+        bad: list[Dict[str, Any]] = []
+        try:
+            self._store.upsert_jobs(batch)
+            ok = True
+            written = len(batch)
+        except Exception as e:
+            failed = True
+            try:
+                self._logger.warning({"event": "job_snapshot_flush_failed", "rows": len(batch), "error": str(e)})
+            except Exception:
+                pass
+            if not _is_transient_db_error(e):
+                # Not a lock/busy error: one bad row must not hold back the rest, so write row by row
+                # and drop only the rows that still fail.
+                ok = True
+                for snapshot in batch:
+                    try:
+                        self._store.upsert_jobs([snapshot])
+                        written += 1
+                    except Exception as row_error:
+                        if _is_transient_db_error(row_error):
+                            ok = False
+                            break
+                        bad.append({"job_id": snapshot.get("id"), "status": snapshot.get("status"), "error": str(row_error)})
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._cond:
+            self._in_flight = 0
+            self._flushing = {}
+            self._flushes += 1
+            self._flush_ms.append(elapsed_ms)
+            self._rows_written += written
+            self._dropped += len(bad)
+            if failed:
+                self._errors += 1
+            if not ok:
+                # Re-queue what was not written unless a newer snapshot arrived meanwhile; retry later.
+                for snapshot in batch[written + len(bad):]:
+                    self._pending.setdefault(str(snapshot.get("id")), snapshot)
+            self._cond.notify_all()
+        for row in bad:
+            try:
+                self._logger.error({"event": "job_snapshot_dropped", "rows": 1, **row})
+            except Exception:
+                pass
+        return ok
+
+
+def _is_transient_db_error(e: BaseException) -> bool:
+    """SQLite lock/busy errors clear up on their own; anything else is about the rows themselves."""
+    if not isinstance(e, sqlite3.OperationalError):
+        return False
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
 def json_dumps_safe(obj: Any) -> str:
     try:
         import json
@@ -22,13 +22,20 @@ try:
 except Exception:
     Image = None
 
-from .comfy_client import ComfyUIClient
+from .comfy_backends import backend_pool
+from .comfy_client import close_http_pools
+from .comfy_events import close_event_streams
+from .comfy_inputs import input_cache_for, sweep_input_caches
+from .comfy_scratch import shared_scratch_manifest
+from .comfy_schema import workflow_availability
+from .workflow_templates import workflow_templates
 from .config import SERVER_CONFIG, WORKFLOW_CONFIGS, get_prompt_overrides, get_default_values, get_workflow_default_prompt
-from .config import QUEUE_CONFIG, JOB_DB_PATH
+from .config import QUEUE_CONFIG, JOB_DB_PATH, EXECUTION_LANES_ENABLED, OPENROUTER_ASYNC_LANE, execution_lane_config
 from .config import HEALTHZ_CONFIG
-from .config import COMFY_INPUT_DIR
-from .job_manager import JobManager, RoutingJobManager, Job
-from .job_store import JobStore
+from .config import COMFY_INPUT_DIR, COMFY_INPUT_CACHE, COMFY_BACKEND_CONFIG, COMFY_SCHEMA_CONFIG, COMFY_SCRATCH
+from .job_manager import AsyncJobManager, ExecutionGate, JobManager, RoutingJobManager, Job
+from .job_store import JobSnapshotWriter, JobStore
+from .scheduling import DurationEstimator, ModelAffinityPolicy, build_policy, job_model_key
 from .asset_store import AssetStore
 from .logging_utils import setup_logging
 from .config import UPLOAD_CONFIG
@@ -63,15 +70,17 @@ from .routers.admin_feed import router as admin_feed_router
 from .routers.assets import router as assets_router
 from .routers.principal_links import router as principal_links_router
 from .ws.manager import manager
+from .ws.previews import preview_forwarder_for
 from .ws.routes import router as ws_router
 from .schemas.api_models import EnqueueResponse, JobStatusResponse, CancelActiveResponse, TranslateResponse
-from .services.generation import run_generation_processor
+from .services.generation import run_generation_processor, run_generation_processor_async
 from .services.generation_commands import (
     dispatch_legacy_web_request,
     generation_context_from_http_request,
     resolve_client_ip,
 )
 from .services.generation_controls import GenerationControlService, GenerationPolicyError
+from .services.job_recovery import JobRecoveryService
 from .services.generation_submission import GenerationSubmissionService
 from .services.asset_service import AssetService
 from .services.asset_runtime import configure_asset_service
@@ -252,10 +261,29 @@ Filesystem helpers were extracted to app/services/media_store.py.
 Imports above wire them in; local duplicates removed to reduce main.py size.
 """
 
+def _lane_manager(lane_key: str, worker_count: int) -> JobManager:
+    # OpenRouter lanes wait on the API: with OPENROUTER_ASYNC_LANE their jobs are coroutines on one loop.
+    if OPENROUTER_ASYNC_LANE and lane_key.startswith("openrouter:"):
+        return AsyncJobManager(worker_count=worker_count)
+    return JobManager(worker_count=worker_count)
+
+
 _comfy_job_manager = JobManager(worker_count=1)
-_external_job_manager = JobManager(worker_count=4)  # env에서 startup 시 재설정
-job_manager = RoutingJobManager(_comfy_job_manager, _external_job_manager, WORKFLOW_CONFIGS)
+_external_job_manager = _lane_manager("openrouter:default", 4)  # env에서 startup 시 재설정
+# mcp_execution_class별 추가 lane (예: "comfyui:fast"); ComfyUI lane들은 GPU 실행 슬롯 하나를 공유
+_execution_class_job_managers = {
+    key: _lane_manager(key, 1)
+    for key in (RoutingJobManager.execution_class_lane_keys(WORKFLOW_CONFIGS) if EXECUTION_LANES_ENABLED else [])
+}
+_comfy_execution_gate = ExecutionGate(capacity=1)
+job_manager = RoutingJobManager(
+    _comfy_job_manager, _external_job_manager, WORKFLOW_CONFIGS, lanes=_execution_class_job_managers
+)
 job_store = JobStore(JOB_DB_PATH)
+# Job snapshots are persisted write-behind so worker threads never wait on sqlite.
+job_snapshot_writer = JobSnapshotWriter(job_store)
+# Finished jobs evicted from memory are served from the persisted (or pending) snapshot.
+job_manager.set_job_store(job_snapshot_writer)
 generation_controls = GenerationControlService(JOB_DB_PATH)
 generation_submissions = GenerationSubmissionService(job_manager, generation_controls)
 from .feed_store import FeedStore
@@ -268,6 +296,7 @@ try:
     app.state.connection_manager = manager
     app.state.job_manager = job_manager
     app.state.job_store = job_store
+    app.state.job_snapshot_writer = job_snapshot_writer
     app.state.generation_controls = generation_controls
     app.state.feed_store = feed_store
     app.state.asset_service = asset_service
@@ -357,6 +386,9 @@ async def private_sidecar_middleware(request: Request, call_next):
     prefix = "/outputs/users/"
     if path.startswith("/outputs/feed/") and path.lower().endswith(".json"):
         return Response(status_code=404)
+    # Deterministic result cache (RESULT_CACHE_DIR defaults to OUTPUT_DIR/.result_cache): never served.
+    if path.startswith("/outputs/.result_cache/"):
+        return Response(status_code=404)
     if not path.startswith(prefix):
         return await call_next(request)
     if path.lower().endswith(".json"):
@@ -513,6 +545,23 @@ async def feed_page(request: Request):
 
 # Workflows routes moved to app/routers/workflows.py
 
+def _openrouter_job_deadline(job: Job) -> Optional[float]:
+    """Timeout for one OpenRouter job, or None to use the lane's OPENROUTER_JOB_TIMEOUT_SECONDS."""
+    payload = job.payload if isinstance(job.payload, dict) else {}
+    cfg = WORKFLOW_CONFIGS.get(str(payload.get("workflow_id") or "")) or {}
+    openrouter_cfg = cfg.get("openrouter") if isinstance(cfg.get("openrouter"), dict) else {}
+    model = str(payload.get("resolved_model") or payload.get("image_model") or openrouter_cfg.get("model") or "").strip()
+    if model == "openai/gpt-image-2":
+        return max(float(_external_job_manager.job_timeout_seconds or 0), gpt_image_timeout_seconds() + 30.0)
+    return None
+
+
+def _comfy_prompt_state(prompt_id: str, backend: Optional[str] = None) -> str:
+    # Restart recovery: ask the backend the job was bound to (older jobs: the primary one).
+    target = backend_pool.get(backend) or backend_pool.primary
+    return target.client().prompt_state(prompt_id)
+
+
 def _processor_generate(job: Job, progress_cb):
     def _set_cancel_handle(handle):
         try:
@@ -520,7 +569,29 @@ def _processor_generate(job: Job, progress_cb):
             job_manager.set_cancel_handle(job.id, handle)
         except Exception:
             pass
-    run_generation_processor(job, progress_cb, _set_cancel_handle)
+    def _execution_started():
+        # Pipelined ComfyUI prompts may wait behind the running one: the job timeout starts here.
+        job_manager.mark_execution_started(job.id)
+
+    run_generation_processor(
+        job,
+        progress_cb,
+        _set_cancel_handle,
+        on_execution_start=_execution_started,
+        preview=preview_forwarder_for(job.id, job.owner_id),
+    )
+
+
+async def _processor_generate_async(job: Job, progress_cb):
+    # Asyncio lane (OPENROUTER_ASYNC_LANE): job_manager.cancel also cancels the job's task.
+    def _set_cancel_handle(handle):
+        try:
+            job_manager.set_cancel_handle(job.id, handle)
+        except Exception:
+            pass
+
+    await run_generation_processor_async(job, progress_cb, _set_cancel_handle)
+
 
 @app.post("/api/v1/generate", tags=["Image Generation"], response_model=EnqueueResponse)
 async def generate_image(request: GenerateRequest, http_request: Request):
@@ -574,7 +645,9 @@ async def generate_image(request: GenerateRequest, http_request: Request):
                 "path": "/api/v1/generate",
             }
         )
-        raise HTTPException(status_code=e.status_code, detail=e.api_detail())
+        retry_after = (e.details or {}).get("retry_after_seconds")
+        headers = {"Retry-After": str(int(retry_after))} if retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.api_detail(), headers=headers)
     except RuntimeError as e:
         logger.info({"event": "enqueue_rejected", "owner_id": anon_id, "reason": str(e), "path": "/api/v1/generate"})
         raise HTTPException(status_code=429, detail=str(e))
@@ -611,6 +684,7 @@ async def generate_image(request: GenerateRequest, http_request: Request):
             "provider": resolved.provider,
             "model": resolved.model,
             "estimated_cost_usd": submission.estimated_cost_usd,
+            "expected_wait_sec": (submission.prediction or {}).get("expected_wait_seconds"),
         }
     )
     return {
@@ -619,6 +693,7 @@ async def generate_image(request: GenerateRequest, http_request: Request):
         "position": submission.position,
         "estimated_cost_usd": submission.estimated_cost_usd,
         "cost_estimate_available": submission.estimated_cost_usd is not None,
+        **_prediction_fields(submission.prediction),
     }
 
 
@@ -647,6 +722,11 @@ async def cancel_generation_by_id(job_id: str):
         raise HTTPException(status_code=400, detail="Job not found or not cancellable")
     return {"ok": True}
 
+def _prediction_fields(prediction: Optional[dict]) -> dict:
+    keys = ("expected_wait_seconds", "expected_start_at", "expected_finish_at")
+    return {key: (prediction or {}).get(key) for key in keys}
+
+
 @app.get("/api/v1/jobs/{job_id}", tags=["Image Generation"], response_model=JobStatusResponse)
 async def job_status(job_id: str):
     j = job_manager.get(job_id)
@@ -657,6 +737,8 @@ async def job_status(job_id: str):
         "status": j.status,
         "progress": j.progress,
         "position": job_manager.get_position(job_id),
+        "jobs_ahead": job_manager.get_global_position(job_id),
+        **_prediction_fields(job_manager.predict(job_id)),
         "result": j.result,
         "error": j.error_message,
     }
@@ -859,6 +941,7 @@ async def on_startup():
                 pos = job_manager.get_position(jid)
                 event = dict(event)
                 event["position"] = pos
+                event["jobs_ahead"] = job_manager.get_global_position(jid)
         except Exception as e:
             logger.debug({"event": "job_notifier_upsert_failed", "error": str(e)})
         # Persist job snapshot if exists
@@ -869,7 +952,7 @@ async def on_startup():
                     # Detect artifact availability on completion (best-effort)
                     artifact_available = False
                     try:
-                        p = (j.result.get("image_path") or j.result.get("audio_path")) if isinstance(j.result, dict) else None
+                        p = (j.result.get("image_path") or j.result.get("audio_path")) if (isinstance(j.result, dict) and j.status == "complete") else None
                         if isinstance(p, str) and p:
                             if p.startswith('/outputs/'):
                                 rel = p[len('/outputs/') : ]
@@ -882,7 +965,7 @@ async def on_startup():
                                 artifact_available = os.path.exists(fs_path)
                     except Exception:
                         pass
-                    job_store.upsert_job({
+                    job_snapshot_writer.upsert_job({
                         "id": j.id,
                         "owner_id": j.owner_id,
                         "type": j.type,
@@ -900,7 +983,9 @@ async def on_startup():
         except Exception:
             pass
         try:
-            if jid:
+            # Progress ticks never change the control status; skip the per-tick sqlite round trip.
+            is_progress_tick = event.get("status") == "running" and float(event.get("progress") or 0.0) > 0.0
+            if jid and not is_progress_tick:
                 controlled_job = job_manager.get(jid)
                 if controlled_job:
                     generation_controls.sync_job(controlled_job)
@@ -909,20 +994,76 @@ async def on_startup():
         manager.send_from_worker(owner_id, event)
 
     job_manager.register_processor("generate", _processor_generate)
+    job_manager.register_async_processor("generate", _processor_generate_async)
     job_manager.set_notifier(notifier)
+    job_snapshot_writer.start()
     # Apply queue/timeouts from env
     try:
         # ComfyUI lane: 기존 설정 유지
         _comfy_job_manager.max_per_user_queue = int(QUEUE_CONFIG.get("max_per_user_queue", 5))
         _comfy_job_manager.max_per_user_concurrent = int(QUEUE_CONFIG.get("max_per_user_concurrent", 1))
         _comfy_job_manager.job_timeout_seconds = float(QUEUE_CONFIG.get("job_timeout_seconds", 180))
+        # Pipelined submission: up to `depth` ComfyUI jobs in flight per backend (next prompt prepared
+        # and queued, previous one post-processing) while each GPU still executes one prompt at a time.
+        comfy_pipeline_depth = max(1, int(QUEUE_CONFIG.get("comfy_pipeline_depth", 1)))
+        comfy_backend_count = len(backend_pool.backends())
+        comfy_slots = comfy_pipeline_depth * comfy_backend_count
+        _comfy_execution_gate.capacity = comfy_slots
+        _comfy_execution_gate.parallelism = comfy_backend_count
+        _comfy_job_manager.worker_count = max(_comfy_job_manager.worker_count, comfy_slots)
+        _comfy_job_manager.execution_parallelism = comfy_backend_count
+        # In-memory retention of finished jobs (both lanes); older ones are read from JobStore.
+        for lane in job_manager.lanes().values():
+            lane.max_finished_jobs = max(0, int(QUEUE_CONFIG.get("finished_job_retention", 500)))
+            lane.finished_job_ttl_seconds = max(0.0, float(QUEUE_CONFIG.get("finished_job_ttl_seconds", 3600)))
+        # Scheduling policy per lane; duration estimates are warmed up from persisted jobs.
+        duration_estimator = DurationEstimator()
+        try:
+            seeded = await asyncio.to_thread(
+                lambda: duration_estimator.seed_from_rows(reversed(job_store.fetch_recent(limit=1000)))
+            )
+            logger.info({"event": "duration_estimator_seeded", "jobs": seeded})
+        except Exception as e:
+            logger.debug({"event": "duration_estimator_seed_failed", "error": str(e)})
+        def _lane_policy():
+            return build_policy(
+                QUEUE_CONFIG.get("scheduling_policy"),
+                estimator=duration_estimator,
+                aging_factor=QUEUE_CONFIG.get("scheduling_aging_factor", 0.5),
+                max_wait_seconds=QUEUE_CONFIG.get("scheduling_max_wait_seconds", 600),
+            )
+
+        comfy_policy = _lane_policy()
+        if QUEUE_CONFIG.get("comfy_model_affinity", True):
+            # One GPU: group jobs that share a loaded model, within a bounded deferral window.
+            comfy_policy = ModelAffinityPolicy(
+                comfy_policy,
+                key_fn=lambda j: job_model_key(j.payload, WORKFLOW_CONFIGS),
+                max_deferral_seconds=QUEUE_CONFIG.get("comfy_affinity_max_deferral_seconds", 120),
+                max_consecutive=QUEUE_CONFIG.get("comfy_affinity_max_consecutive", 6),
+                swap_cost_seconds=QUEUE_CONFIG.get("comfy_model_swap_cost_seconds", 8),
+            )
+        _comfy_job_manager.set_scheduling_policy(comfy_policy)
+        _external_job_manager.set_scheduling_policy(_lane_policy())
+        # Wait prediction (job status / enqueue responses, admission by predicted wait)
+        job_manager.set_duration_estimator(duration_estimator)
+        generation_controls.set_wait_predictor(
+            lambda payload: job_manager.predict_new(str(payload.get("principal_id") or ""), dict(payload))
+        )
+        # Workflows no ComfyUI backend can run (node schema check) are refused before quota is reserved.
+        generation_controls.set_workflow_checker(
+            lambda payload: workflow_availability.problems(
+                str(payload.get("resolved_workflow_id") or payload.get("workflow_id") or "")
+            )
+        )
 
         # OpenRouter lane: 동시 실행(풀) + 사용자 대기열 길이만 별도 env로 제어
         try:
             external_workers = int(os.getenv("OPENROUTER_MAX_CONCURRENT", "4") or "4")
         except Exception:
             external_workers = 4
-        external_workers = max(1, min(32, int(external_workers)))
+        # Thread lane: one thread per job. Asyncio lane: jobs in flight on one event loop.
+        external_workers = max(1, min(512 if isinstance(_external_job_manager, AsyncJobManager) else 32, int(external_workers)))
         _external_job_manager.worker_count = external_workers
         try:
             external_q = int(os.getenv("OPENROUTER_MAX_PER_USER_QUEUE", "5") or "5")
@@ -936,54 +1077,120 @@ async def on_startup():
         except Exception:
             external_timeout = 330.0
         external_timeout = max(90.0, min(900.0, external_timeout))
-        minimum_external_timeout = gpt_image_timeout_seconds() + 30.0
-        if external_timeout < minimum_external_timeout:
-            logger.warning({
-                "event": "openrouter_job_timeout_adjusted",
-                "configured_seconds": external_timeout,
-                "minimum_seconds": minimum_external_timeout,
-            })
-            external_timeout = minimum_external_timeout
         _external_job_manager.job_timeout_seconds = external_timeout
+        # Per-job deadline: GPT Image 2 calls may legitimately take up to its HTTP timeout.
+        job_manager.set_deadline_resolver("openrouter", _openrouter_job_deadline)
+
+        # Execution-class lanes: own queue limit/timeout; ComfyUI ones take weighted GPU turns.
+        for lane_key, lane in _execution_class_job_managers.items():
+            provider, execution_class = lane_key.split(":", 1)
+            lane_cfg = execution_lane_config(execution_class)
+            lane.worker_count = max(1, min(32, int(lane_cfg["workers"])))
+            lane.max_per_user_queue = max(0, min(50, int(lane_cfg["max_per_user_queue"])))
+            lane.max_per_user_concurrent = int(QUEUE_CONFIG.get("max_per_user_concurrent", 1))
+            lane.job_timeout_seconds = max(10.0, float(lane_cfg["job_timeout_seconds"]))
+            lane.set_scheduling_policy(_lane_policy())
+            if provider == "comfyui":
+                lane.worker_count = max(lane.worker_count, comfy_slots)
+                lane.execution_parallelism = comfy_backend_count
+                lane.set_execution_gate(_comfy_execution_gate, lane_key, weight=lane_cfg["weight"])
+        if any(key.startswith("comfyui:") for key in _execution_class_job_managers):
+            _comfy_job_manager.set_execution_gate(
+                _comfy_execution_gate, "comfyui:default", weight=execution_lane_config("default")["weight"]
+            )
     except Exception as e:
         logger.debug({"event": "job_manager_env_apply_failed", "error": str(e)})
+
+    # Durable queue: rebuild queued/interrupted jobs from the JobStore before workers start.
+    resumed_job_ids: list[str] = []
+    try:
+        recovery = JobRecoveryService(
+            job_store,
+            job_manager,
+            workflow_configs=WORKFLOW_CONFIGS,
+            controls=generation_controls,
+            prompt_state=_comfy_prompt_state,
+        )
+        report = await asyncio.to_thread(
+            recovery.recover,
+            requeue=bool(QUEUE_CONFIG.get("durable_queue", True)),
+            max_age_seconds=QUEUE_CONFIG.get("durable_queue_max_age_seconds", 86400),
+        )
+        app.state.job_recovery = report.summary()
+        resumed_job_ids = list(report.resumed)
+    except Exception as e:
+        logger.warning({"event": "job_recovery_failed", "error": str(e)})
     job_manager.start()
+    # Parse workflow templates once and report config node references missing from the graphs.
+    try:
+        invalid = await asyncio.to_thread(workflow_templates.warm, WORKFLOW_CONFIGS, WORKFLOW_DIR)
+        logger.info({"event": "workflow_templates_warmed", **workflow_templates.metrics(), "invalid": invalid})
+    except Exception as e:
+        logger.debug({"event": "workflow_templates_warm_failed", "error": str(e)})
+    # Open the shared ComfyUI event connections now so the first job does not wait for the handshake.
+    for backend in backend_pool.backends():
+        try:
+            backend.client()
+        except Exception as e:
+            logger.debug({"event": "comfy_events_start_failed", "backend": backend.name, "error": str(e)})
+
+    # --- ComfyUI 노드 스키마(/object_info) 캐시와 워크플로우 검증 ---
+    # 시작을 막지 않도록 백그라운드에서 받습니다. 받기 전에는 모든 워크플로우를 실행 가능으로 봅니다.
+    async def _refresh_comfy_schemas(names=None):
+        if not COMFY_SCHEMA_CONFIG["enabled"]:
+            return
+        try:
+            fetched = await asyncio.to_thread(
+                backend_pool.refresh_schemas, names, COMFY_SCHEMA_CONFIG["timeout_seconds"]
+            )
+            unavailable = await asyncio.to_thread(
+                workflow_availability.check, WORKFLOW_CONFIGS, WORKFLOW_DIR, backend_pool.backends()
+            )
+            logger.info({"event": "comfy_schema_refreshed", "backends": fetched, "unavailable": sorted(unavailable)})
+        except Exception as e:
+            logger.debug({"event": "comfy_schema_refresh_failed", "error": str(e)})
+
+    async def _comfy_schema_refresher():
+        while True:
+            await _refresh_comfy_schemas()
+            await asyncio.sleep(COMFY_SCHEMA_CONFIG["refresh_seconds"])
+
+    asyncio.create_task(_comfy_schema_refresher())
 
     # --- ComfyUI 헬스체크 워치독 ---
-    # ComfyUI가 크래시하면 실행 중인 작업이 영원히 대기하는 문제를 방지
+    # ComfyUI가 크래시하면 실행 중인 작업이 영원히 대기하는 문제를 방지.
+    # 백엔드마다 연속 COMFY_BACKEND_FAIL_THRESHOLD회 실패하면 로테이션에서 빼고, 그 서버에 묶인 작업만 실패 처리합니다.
     async def _comfyui_health_watchdog():
-        """15초마다 ComfyUI 상태를 확인. 연결 불가 시 실행 중인 ComfyUI 작업을 자동 실패 처리."""
-        consecutive_failures = 0
-        FAIL_THRESHOLD = 2  # 연속 2회 실패 시 (30초간 응답 없음)
+        """주기적으로 각 ComfyUI 백엔드의 /system_stats를 확인합니다."""
         while True:
-            await asyncio.sleep(15)
+            await asyncio.sleep(COMFY_BACKEND_CONFIG["health_interval_seconds"])
             try:
-                import requests as _req
-                r = _req.get(f"http://{SERVER_ADDRESS}/system_stats", timeout=5)
-                if r.status_code == 200:
-                    consecutive_failures = 0
-                    continue
+                changes = await asyncio.to_thread(backend_pool.check_health)
             except Exception:
-                pass
-            consecutive_failures += 1
-            if consecutive_failures >= FAIL_THRESHOLD:
-                # ComfyUI 응답 없음 — 실행 중인 ComfyUI 작업 강제 실패
+                continue
+            if not changes:
+                continue
+            # Wait prediction: only healthy GPUs run prompts in parallel.
+            _comfy_execution_gate.parallelism = max(1, backend_pool.healthy_count())
+            recovered = [name for name, change in changes.items() if change == "up"]
+            if recovered:
+                # 재시작한 서버는 커스텀 노드/모델 구성이 바뀌었을 수 있습니다.
+                asyncio.create_task(_refresh_comfy_schemas(recovered))
+            for name, change in changes.items():
+                if change != "down":
+                    continue
+                # 응답 없는 백엔드 — 그 서버에서 실행 중인 ComfyUI 작업 강제 실패
                 try:
-                    for jm in [_comfy_job_manager]:
-                        with jm._lock:
-                            for job in list(jm._jobs.values()):
-                                if job.status == "running":
-                                    jm._cancel_requests.add(job.id)
-                                    cancel = jm._cancel_handles.get(job.id)
-                                    if cancel:
-                                        try:
-                                            cancel()
-                                        except Exception:
-                                            pass
+                    cancelled = []
+                    for job_id in backend_pool.jobs_on(name):
+                        if job_manager.cancel(job_id):
+                            cancelled.append(job_id)
                     logger.warning({
                         "event": "comfyui_watchdog_triggered",
-                        "consecutive_failures": consecutive_failures,
+                        "backend": name,
+                        "healthy_backends": backend_pool.healthy_count(),
                         "action": "cancel_running_comfy_jobs",
+                        "cancelled": len(cancelled),
                     })
                 except Exception:
                     pass
@@ -1025,10 +1232,49 @@ async def on_startup():
 
     asyncio.create_task(_seethrough_cleanup_loop())
 
+    # --- ComfyUI input 업로드 캐시 정리 (참조가 없는 오래된/예산 초과 업로드 삭제) ---
+    for backend in backend_pool.backends():
+        try:
+            input_cache = input_cache_for(backend.http_base(), backend.input_dir)
+            if input_cache is not None:
+                # 이전 실행에서 올린 캐시 파일도 재사용/정리 대상으로 등록
+                adopted = await asyncio.to_thread(input_cache.adopt_existing)
+                logger.info({"event": "comfy_input_cache_ready", "backend": backend.name, "adopted": adopted})
+        except Exception as e:
+            logger.debug({"event": "comfy_input_cache_init_failed", "backend": backend.name, "error": str(e)})
+
+    # --- ComfyUI 임시 파일 정리기 ---
+    # 지난 실행이 정리하지 못한 파일(크래시 등)은 이어서 실행되는 작업의 것만 남기고 정리 대상으로 돌립니다.
+    scratch = shared_scratch_manifest()
+    if scratch is not None:
+        try:
+            await asyncio.to_thread(scratch.reconcile, resumed_job_ids)
+        except Exception as e:
+            logger.debug({"event": "comfy_scratch_reconcile_failed", "error": str(e)})
+        scratch.start(COMFY_SCRATCH["sweep_interval_seconds"])
+
+    async def _comfy_input_cache_janitor():
+        while True:
+            await asyncio.sleep(max(10.0, COMFY_INPUT_CACHE["sweep_interval_seconds"]))
+            try:
+                await asyncio.to_thread(sweep_input_caches)
+            except Exception:
+                pass
+
+    if COMFY_INPUT_CACHE["enabled"]:
+        asyncio.create_task(_comfy_input_cache_janitor())
+
 
 @app.on_event("shutdown")
 async def on_shutdown():
     job_manager.stop()
+    scratch = shared_scratch_manifest()
+    if scratch is not None:
+        scratch.stop()
+    await asyncio.to_thread(close_event_streams)
+    close_http_pools()
+    # Drain pending job snapshots after the workers have emitted their final events.
+    await asyncio.to_thread(job_snapshot_writer.stop)
     mcp_lifespan_context = getattr(app.state, "mcp_lifespan_context", None)
     if mcp_lifespan_context is not None:
         await mcp_lifespan_context.__aexit__(None, None, None)
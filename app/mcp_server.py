@@ -1028,6 +1028,14 @@ class McpGenerationService:
             # Do not reveal whether another caller's job exists.
             raise ValueError("Generation job not found")
         status = str(item.get("status") or "unknown")
+        prediction = None
+        predict = getattr(self.job_manager, "predict", None)
+        if predict is not None and status in {"queued", "running"}:
+            try:
+                prediction = predict(str(item.get("id") or ""))
+            except Exception:
+                prediction = None
+        prediction = prediction or {}
         return {
             "job_id": item.get("id"),
             "status": status,
@@ -1035,6 +1043,9 @@ class McpGenerationService:
             "created_at": item.get("created_at"),
             "started_at": item.get("started_at"),
             "ended_at": item.get("ended_at"),
+            "expected_wait_seconds": prediction.get("expected_wait_seconds"),
+            "expected_start_at": prediction.get("expected_start_at"),
+            "expected_finish_at": prediction.get("expected_finish_at"),
             "error": item.get("error") if status in {"error", "cancelled"} else None,
             "result_ready": status == "complete",
         }
@@ -1253,7 +1264,10 @@ def create_mcp_integration(job_manager, job_store, controls, asset_service: Asse
 
     @server.tool(
         title="Get generation job",
-        description="Read the status and progress of a generation job created by this caller.",
+        description=(
+            "Read the status and progress of a generation job created by this caller. Queued and running jobs "
+            "include expected_wait_seconds / expected_start_at / expected_finish_at estimates."
+        ),
         annotations=read_annotations,
         structured_output=True,
     )
@@ -0,0 +1,289 @@
+"""
+Deterministic generation result cache.
+
+A ComfyUI workflow run with the same resolved prompt overrides, the same input images, the
+same seed and the same workflow file produces the same output, so an opted-in workflow
+("result_cache": True in WORKFLOW_CONFIGS) can skip the GPU and reuse the earlier result.
+The key is a sha256 over a canonical JSON of (workflow_id, overrides with ComfyUI input
+file names replaced by the sha256 of their source bytes, workflow file digest). Results
+are hardlinked into cache_dir (same filesystem as OUTPUT_DIR, so no copy) and indexed in
+sqlite; a hit links the file back into the job's staging folder and the normal save path
+registers a new catalog asset. Entries beyond max_entries/max_bytes are evicted LRU.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Optional
+
+from .config import JOB_DB_PATH, RESULT_CACHE
+
+
+# Bump when the meaning of a key changes (e.g. input downscale policy).
+KEY_VERSION = 1
+
+
+def workflow_cacheable(cfg: Optional[Mapping[str, Any]], seed: Any) -> bool:
+    """Opted in, single-file output, and no random seed (one is drawn when the request has none)."""
+    if not isinstance(cfg, Mapping) or not cfg.get("result_cache"):
+        return False
+    if cfg.get("seethrough_workflow"):
+        return False
+    has_seed = cfg.get("seed_node") is not None or bool(cfg.get("extra_seed_nodes"))
+    return not (has_seed and seed is None)
+
+
+def result_cache_key(
+    workflow_id: str,
+    overrides: Mapping[str, Any],
+    *,
+    workflow_digest: str,
+    input_digests: Mapping[str, str],
+    image_refs: Iterable[str] = (),
+) -> Optional[str]:
+    """
+    Canonical key, or None when an input image's content is unknown.
+
+    input_digests maps the ComfyUI input names used in overrides to the sha256 of their
+    source bytes (upload names may be job-unique); image_refs are the names the workflow's
+    image inputs point at, which must all be known.
+    """
+    if not workflow_digest or any(ref not in input_digests for ref in image_refs):
+        return None
+
+    def _canonical(value: Any) -> Any:
+        if isinstance(value, Mapping):
+            return {str(k): _canonical(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [_canonical(v) for v in value]
+        if isinstance(value, str) and value in input_digests:
+            return f"sha256:{input_digests[value]}"
+        return value
+
+    material = {
+        "v": KEY_VERSION,
+        "workflow_id": str(workflow_id),
+        "workflow": workflow_digest,
+        "overrides": _canonical(overrides),
+    }
+    try:
+        encoded = json.dumps(material, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(src: str, dest: str):
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class ResultCache:
+    def __init__(
+        self,
+        db_path: str,
+        cache_dir: str,
+        *,
+        max_entries: int = 2000,
+        max_bytes: int = 2048 * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "stale": 0}
+        self._hits_by_workflow: Dict[str, int] = {}
+        self._logger = logging.getLogger("comfyui_app")
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.db_path, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA busy_timeout=5000")
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    workflow_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    stored_name TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    source_job_id TEXT,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_result_cache_last_used ON result_cache(last_used_at)"
+            )
+
+    def stage(self, key: str, workflow_id: str, dest_dir: str) -> Optional[Dict[str, Any]]:
+        """
+        On a hit, link the cached result into dest_dir and return
+        {"filename", "path", "source_job_id"}; the caller moves or deletes the staged file.
+        """
+        now = self._clock()
+        with self._lock:
+            with self._connect() as connection:
+                row = connection.execute("SELECT * FROM result_cache WHERE cache_key = ?", (key,)).fetchone()
+                if row is not None:
+                    cached = os.path.join(self.cache_dir, row["stored_name"])
+                    if os.path.isfile(cached):
+                        connection.execute(
+                            "UPDATE result_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+                            (now, key),
+                        )
+                    else:
+                        # Cache folder cleaned by hand: forget the entry and regenerate.
+                        connection.execute("DELETE FROM result_cache WHERE cache_key = ?", (key,))
+                        self._metrics["stale"] += 1
+                        row = None
+            if row is None:
+                self._metrics["misses"] += 1
+                return None
+            self._metrics["hits"] += 1
+            self._hits_by_workflow[workflow_id] = self._hits_by_workflow.get(workflow_id, 0) + 1
+        os.makedirs(dest_dir, exist_ok=True)
+        _, ext = os.path.splitext(row["filename"])
+        staged = os.path.join(dest_dir, f"{uuid.uuid4().hex}{ext.lower()}")
+        try:
+            _link_or_copy(cached, staged)
+        except OSError as e:
+            try:
+                self._logger.info({"event": "result_cache_stage_failed", "key": key, "error": str(e)})
+            except Exception:
+                pass
+            return None
+        return {"filename": row["filename"], "path": staged, "source_job_id": row["source_job_id"]}
+
+    def put(self, key: str, source_path: str, *, filename: str, workflow_id: str, source_job_id: Optional[str] = None) -> bool:
+        """Keep a link to source_path (a staged result, before it is moved into place)."""
+        _, ext = os.path.splitext(str(filename))
+        stored_name = f"{key}{ext.lower()}"
+        target = os.path.join(self.cache_dir, stored_name)
+        try:
+            size = os.path.getsize(source_path)
+            if self.max_bytes and size > self.max_bytes:
+                return False
+            temp = f"{target}.{uuid.uuid4().hex}.tmp"
+            _link_or_copy(source_path, temp)
+            os.replace(temp, target)
+        except OSError as e:
+            try:
+                self._logger.info({"event": "result_cache_store_failed", "key": key, "error": str(e)})
+            except Exception:
+                pass
+            return False
+        now = self._clock()
+        with self._lock:
+            with self._connect() as connection:
+                connection.execute(
+                    """
+                    INSERT OR REPLACE INTO result_cache
+                        (cache_key, workflow_id, filename, stored_name, bytes, source_job_id, created_at, last_used_at, hits)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+                    """,
+                    (key, str(workflow_id), str(filename), stored_name, int(size), source_job_id, now, now),
+                )
+            self._metrics["stores"] += 1
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        """Drop least recently used entries until both the entry and byte budgets hold."""
+        removed = []
+        with self._lock:
+            with self._connect() as connection:
+                count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM result_cache").fetchone()
+                if count <= self.max_entries and (not self.max_bytes or total <= self.max_bytes):
+                    return 0
+                for row in connection.execute(
+                    "SELECT cache_key, stored_name, bytes FROM result_cache ORDER BY last_used_at ASC"
+                ).fetchall():
+                    if count <= self.max_entries and (not self.max_bytes or total <= self.max_bytes):
+                        break
+                    connection.execute("DELETE FROM result_cache WHERE cache_key = ?", (row["cache_key"],))
+                    removed.append(row["stored_name"])
+                    count -= 1
+                    total -= int(row["bytes"])
+            self._metrics["evictions"] += len(removed)
+        for stored_name in removed:
+            try:
+                os.remove(os.path.join(self.cache_dir, stored_name))
+            except OSError:
+                pass
+        return len(removed)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = dict(self._metrics)
+            data["hits_by_workflow"] = dict(self._hits_by_workflow)
+        with self._connect() as connection:
+            count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM result_cache").fetchone()
+        data.update({"entries": int(count), "bytes": int(total), "max_entries": self.max_entries, "max_bytes": self.max_bytes})
+        lookups = data["hits"] + data["misses"]
+        data["hit_ratio"] = round(data["hits"] / lookups, 3) if lookups else None
+        return data
+
+
+_shared: Optional[ResultCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_result_cache() -> Optional[ResultCache]:
+    """Process-wide cache, or None when RESULT_CACHE_ENABLED=false (or it cannot be opened)."""
+    global _shared
+    if not RESULT_CACHE["enabled"]:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            try:
+                _shared = ResultCache(
+                    JOB_DB_PATH,
+                    RESULT_CACHE["dir"],
+                    max_entries=RESULT_CACHE["max_entries"],
+                    max_bytes=RESULT_CACHE["max_bytes"],
+                )
+            except (OSError, sqlite3.Error) as e:
+                logging.getLogger("comfyui_app").warning({"event": "result_cache_unavailable", "error": str(e)})
+                return None
+        return _shared
+
+
+def result_cache_metrics() -> Dict[str, Any]:
+    with _shared_lock:
+        cache = _shared
+    if cache is None:
+        return {"enabled": RESULT_CACHE["enabled"]}
+    return {"enabled": True, **cache.metrics()}
@@ -8,6 +8,15 @@ from fastapi.templating import Jinja2Templates
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
 from ..config import SERVER_CONFIG, WORKFLOW_CONFIGS
+from ..comfy_backends import backend_pool
+from ..comfy_client import http_pool_metrics, output_transport_metrics
+from ..comfy_inputs import input_cache_metrics
+from ..comfy_scratch import scratch_metrics
+from ..comfy_schema import node_schema_metrics
+from ..comfy_events import event_stream_metrics
+from ..result_cache import result_cache_metrics
+from ..workflow_templates import workflow_templates
+from ..ws.manager import manager
 from ..services.media_store import (
     _gather_user_images,
     _gather_user_inputs,
@@ -69,6 +78,7 @@ class GenerationPolicyUpdate(BaseModel):
     daily_request_limit: Optional[int] = None
     daily_cost_limit_usd: Optional[float] = None
     cost_confirmation_threshold_usd: Optional[float] = None
+    max_predicted_wait_seconds: Optional[float] = None
     confirmation_required_capabilities: Optional[list[str]] = None
     capability_enabled: Optional[dict[str, bool]] = None
     cost_estimates_usd: Optional[dict[str, float]] = None
@@ -225,11 +235,41 @@ async def admin_jobs_metrics(request: Request, limit: int = 100):
     try:
         job_manager = getattr(request.app.state, "job_manager", None)
         avg = job_manager.get_recent_averages(limit=limit) if job_manager else {"overall_avg_sec": None, "per_workflow_avg_sec": {}, "count": 0}
+        avg = dict(avg)
+        if job_manager is not None and hasattr(job_manager, "scheduling_metrics"):
+            avg["scheduling"] = job_manager.scheduling_metrics()
+        if job_manager is not None and hasattr(job_manager, "lane_metrics"):
+            avg["lanes"] = job_manager.lane_metrics()
+        writer = getattr(request.app.state, "job_snapshot_writer", None)
+        if writer is not None:
+            avg["persistence"] = writer.metrics()
+        recovery = getattr(request.app.state, "job_recovery", None)
+        if recovery is not None:
+            avg["recovery"] = recovery
+        avg["comfy_backends"] = backend_pool.metrics()
+        avg["comfy_events"] = event_stream_metrics()
+        avg["comfy_http"] = http_pool_metrics()
+        avg["comfy_outputs"] = output_transport_metrics()
+        avg["comfy_inputs"] = input_cache_metrics()
+        avg["comfy_scratch"] = scratch_metrics()
+        avg["comfy_schema"] = node_schema_metrics()
+        avg["previews"] = manager.preview_metrics()
+        avg["workflow_templates"] = workflow_templates.metrics()
+        avg["result_cache"] = result_cache_metrics()
         return avg
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/v1/admin/jobs/deadlines", tags=["Admin"])
+async def admin_jobs_deadlines(request: Request, limit: int = 50):
+    job_manager = getattr(request.app.state, "job_manager", None)
+    if job_manager is None or not hasattr(job_manager, "upcoming_deadlines"):
+        return {"items": []}
+    limit = max(1, min(500, int(limit)))
+    return {"items": job_manager.upcoming_deadlines(limit=limit)}
+
+
 def _generation_controls(request: Request):
     controls = getattr(request.app.state, "generation_controls", None)
     if controls is None:
@@ -5,6 +5,7 @@ import requests
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from ..logging_utils import setup_logging
+from ..comfy_backends import backend_pool
 from ..config import SERVER_CONFIG, HEALTHZ_CONFIG, JOB_DB_PATH
 import os
 
@@ -13,7 +14,6 @@ logger = setup_logging()
 router = APIRouter(tags=["Health"])
 
 OUTPUT_DIR = SERVER_CONFIG["output_dir"]
-SERVER_ADDRESS = SERVER_CONFIG["server_address"]
 
 
 @router.get("/healthz")
@@ -25,15 +25,21 @@ def healthz():
         "llm": {"ok": False, "reason": None},
     }
     status_code = 200
-    try:
-        url = f"http://{SERVER_ADDRESS}/"
-        resp = requests.get(url, timeout=(3.0, 5.0))
-        results["comfyui"]["ok"] = (resp.status_code >= 200 and resp.status_code < 500)
-        if not results["comfyui"]["ok"]:
-            results["comfyui"]["reason"] = f"HTTP {resp.status_code}"
-    except Exception as e:
-        results["comfyui"]["reason"] = str(e)
+    # ComfyUI: ok while at least one backend of the pool answers (others are out of rotation).
+    backends = {}
+    for backend in backend_pool.backends():
+        try:
+            resp = requests.get(f"{backend.http_base()}/", timeout=(3.0, 5.0))
+            ok = (resp.status_code >= 200 and resp.status_code < 500)
+            backends[backend.name] = {"ok": ok, "reason": None if ok else f"HTTP {resp.status_code}"}
+        except Exception as e:
+            backends[backend.name] = {"ok": False, "reason": str(e)}
+    results["comfyui"]["ok"] = any(item["ok"] for item in backends.values())
+    if not results["comfyui"]["ok"]:
+        results["comfyui"]["reason"] = "; ".join(f"{name}: {item['reason']}" for name, item in backends.items())
         status_code = 503
+    if len(backends) > 1:
+        results["comfyui"]["backends"] = backends
     try:
         conn = sqlite3.connect(JOB_DB_PATH)
         conn.execute("CREATE TABLE IF NOT EXISTS __healthz (id INTEGER PRIMARY KEY AUTOINCREMENT, ts INTEGER)")
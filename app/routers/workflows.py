@@ -3,6 +3,7 @@ import json
 from typing import Optional
 from fastapi import APIRouter, Query
 from ..logging_utils import setup_logging
+from ..comfy_schema import workflow_availability
 from ..config import WORKFLOW_CONFIGS
 from ..schemas.api_models import WorkflowsResponse
 from ..services.openrouter_client import public_image_model_options
@@ -34,6 +35,9 @@ async def get_workflows(
         # 필요하면 비용이 드는 외부 API 워크플로우를 목록에서 숨깁니다.
         if provider == "openrouter" and not include_openrouter:
             continue
+        # 어떤 ComfyUI 서버에서도 실행할 수 없는 워크플로우(미설치 노드/모델)는 숨깁니다.
+        if provider == "comfyui" and workflow_availability.problems(workflow_id):
+            continue
         json_path = os.path.join(WORKFLOW_DIR, f"{workflow_id}.json")
         node_count = 0
         if os.path.exists(json_path):
@@ -61,6 +61,9 @@ class EnqueueResponse(BaseModel):
     job_id: str
     status: str
     position: int
+    expected_wait_seconds: Optional[float] = None
+    expected_start_at: Optional[float] = None
+    expected_finish_at: Optional[float] = None
 
 
 class JobStatusResponse(BaseModel):
@@ -68,6 +71,10 @@ class JobStatusResponse(BaseModel):
     status: str
     progress: float
     position: Optional[int] = None
+    jobs_ahead: Optional[int] = None
+    expected_wait_seconds: Optional[float] = None
+    expected_start_at: Optional[float] = None
+    expected_finish_at: Optional[float] = None
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
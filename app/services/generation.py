@@ -1,33 +1,44 @@
+import asyncio
+import hashlib
 import os
+import threading
 import time
 import json
 from typing import Callable, List, Optional
 
 from ..logging_utils import setup_logging
-from ..comfy_client import ComfyUIClient
-from ..config import SERVER_CONFIG, WORKFLOW_CONFIGS, get_prompt_overrides, COMFY_INPUT_DIR, COMFY_OUTPUT_DIR, get_workflow_default_prompt
+from ..comfy_backends import backend_pool
+from ..comfy_inputs import input_cache_for
+from ..comfy_scratch import scratch_path, shared_scratch_manifest
+from ..job_manager import to_thread_uncancelled
+from ..config import SERVER_CONFIG, WORKFLOW_CONFIGS, get_prompt_overrides, COMFY_INPUT_DIR, get_workflow_default_prompt
+from ..result_cache import result_cache_key, shared_result_cache, workflow_cacheable
+from ..scheduling import job_model_key
+from ..workflow_templates import workflow_templates
 from .media_store import (
     _locate_input_png_path,
     _save_image_and_meta,
     _save_game_ui_group,
     _save_audio_and_meta,
     _build_web_path,
+    _incoming_dir,
 )
 
 
 logger = setup_logging()
 
 WORKFLOW_DIR = "./workflows/"
-SERVER_ADDRESS = SERVER_CONFIG["server_address"]
 
 
-def _wait_for_input_visibility(filename: str, timeout_sec: float = 1.5, poll_ms: int = 50) -> bool:
+def _wait_for_input_visibility(
+    filename: str, timeout_sec: float = 1.5, poll_ms: int = 50, input_dir: Optional[str] = COMFY_INPUT_DIR
+) -> bool:
     try:
-        if not isinstance(COMFY_INPUT_DIR, str) or not COMFY_INPUT_DIR or not isinstance(filename, str) or not filename:
+        if not isinstance(input_dir, str) or not input_dir or not isinstance(filename, str) or not filename:
             return True
         import time as _t
         import os as _os
-        target = _os.path.join(COMFY_INPUT_DIR, filename)
+        target = _os.path.join(input_dir, filename)
         deadline = _t.time() + max(0.05, timeout_sec)
         while _t.time() < deadline:
             if _os.path.exists(target):
@@ -158,12 +169,8 @@ def _split_comfy_path(name: str) -> tuple[str, str]:
     return (parts[-1], "/".join(parts[:-1]))
 
 
-def run_generation_processor(job, progress_cb: Callable[[float], None], set_cancel_handle: Callable[[Callable[[], bool]], None]):
-    """Heavyweight generation processor extracted from main.
-
-    - Uses set_cancel_handle to register ComfyUI interrupt back with JobManager.
-    - Mutates job.result with { "image_path": "/outputs/..." } upon success.
-    """
+def _generation_request(job):
+    """(payload dict, request view, seed_requested) with the seed and default prompt filled in."""
     req_dict = job.payload
     # GenerateRequest shape is validated earlier; keep dynamic access for decoupling
     class _Req:
@@ -197,6 +204,8 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
             self.game_ui_grid = d.get("game_ui_grid")
 
     request = _Req(req_dict)
+    # A seed drawn here is random: such runs are never worth keeping in the result cache.
+    seed_requested = getattr(request, "seed", None) is not None
     # Ensure we always have a concrete seed so users can reproduce results later,
     # even when the UI leaves seed empty ("random").
     try:
@@ -253,331 +262,419 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
         })
     except Exception:
         pass
+    return req_dict, request, seed_requested
 
-    # --- Provider routing (OpenRouter vs ComfyUI) ---
-    wf_cfg = WORKFLOW_CONFIGS.get(request.workflow_id, {}) if isinstance(WORKFLOW_CONFIGS, dict) else {}
-    provider = (wf_cfg.get("provider", "comfyui") if isinstance(wf_cfg, dict) else "comfyui") or "comfyui"
-    provider = str(provider).strip().lower()
-    if provider == "openrouter":
-        import threading
-
-        cancel_event = threading.Event()
 
-        def _cancel_openrouter() -> bool:
-            try:
-                cancel_event.set()
-            except Exception:
-                pass
-            return True
+def _record_openrouter_provider_error(job, request, e, *, context: str) -> None:
+    """Keep the classified OpenRouter error on job.result and log what the user was shown."""
+    try:
+        job.result["provider_error"] = {
+            "provider": "openrouter",
+            "kind": getattr(e, "kind", None),
+            "http_status": getattr(e, "http_status", None),
+            "upstream_code": getattr(e, "upstream_code", None),
+            "retry_after": getattr(e, "retry_after", None),
+            "context": str(context or ""),
+        }
+    except Exception:
+        pass
+    try:
+        logger.warning(
+            {
+                "event": "openrouter_user_facing_error",
+                "job_id": job.id,
+                "owner_id": job.owner_id,
+                "workflow_id": getattr(request, "workflow_id", None),
+                "context": str(context or ""),
+                "kind": getattr(e, "kind", None),
+                "http_status": getattr(e, "http_status", None),
+                "upstream_code": getattr(e, "upstream_code", None),
+                "message": str(getattr(e, "public_message", str(e))),
+            }
+        )
+    except Exception:
+        pass
 
-        try:
-            set_cancel_handle(_cancel_openrouter)
-        except Exception:
-            pass
 
-        # Fake progress milestones (best-effort)
-        progress_cb(5)
-        if cancel_event.is_set():
-            raise RuntimeError("생성이 취소되었습니다.")
+def _openrouter_plan(job, request, req_dict, wf_cfg, progress_cb, cancelled: Callable[[], bool]) -> dict:
+    """
+    Everything an OpenRouter job does before the provider call (inputs, prompt, model options).
 
-        openrouter_cfg = wf_cfg.get("openrouter") if isinstance(wf_cfg, dict) else None
+    Returns {"call": generate_image kwargs, "context": error context, "chosen_model", "is_game_ui",
+    "game_ui_options"}. Blocking (disk, Pillow); the asyncio lane runs it in a worker thread.
+    """
+    # Fake progress milestones (best-effort)
+    progress_cb(5)
+    if cancelled():
+        raise RuntimeError("생성이 취소되었습니다.")
+
+    openrouter_cfg = wf_cfg.get("openrouter") if isinstance(wf_cfg, dict) else None
+    model = None
+    mode = None
+    try:
+        if isinstance(openrouter_cfg, dict):
+            model = openrouter_cfg.get("model")
+            mode = openrouter_cfg.get("mode")
+    except Exception:
         model = None
         mode = None
-        try:
-            if isinstance(openrouter_cfg, dict):
-                model = openrouter_cfg.get("model")
-                mode = openrouter_cfg.get("mode")
-        except Exception:
-            model = None
-            mode = None
-
-        mode_norm = str(mode or "").strip().lower()
-        is_txt2img = mode_norm in ("text-to-image", "text_to_image", "txt2img", "")
-        is_img2img = mode_norm in ("image-edit", "image_edit", "img2img")
-
-        progress_cb(20)
-        if cancel_event.is_set():
-            raise RuntimeError("생성이 취소되었습니다.")
-
-        from .openrouter_client import (
-            OpenRouterUpstreamError,
-            build_image_prompt,
-            generate_image,
-            gpt_image_timeout_seconds,
-            image_model_max_references,
-            resolve_image_model_options,
-        )
 
-        def _record_openrouter_provider_error(e: OpenRouterUpstreamError, *, context: str) -> None:
-            try:
-                job.result["provider_error"] = {
-                    "provider": "openrouter",
-                    "kind": getattr(e, "kind", None),
-                    "http_status": getattr(e, "http_status", None),
-                    "upstream_code": getattr(e, "upstream_code", None),
-                    "retry_after": getattr(e, "retry_after", None),
-                    "context": str(context or ""),
-                }
-            except Exception:
-                pass
-            try:
-                logger.warning(
-                    {
-                        "event": "openrouter_user_facing_error",
-                        "job_id": job.id,
-                        "owner_id": job.owner_id,
-                        "workflow_id": getattr(request, "workflow_id", None),
-                        "context": str(context or ""),
-                        "kind": getattr(e, "kind", None),
-                        "http_status": getattr(e, "http_status", None),
-                        "upstream_code": getattr(e, "upstream_code", None),
-                        "message": str(getattr(e, "public_message", str(e))),
-                    }
-                )
-            except Exception:
-                pass
-
-        def _load_input_png_bytes(anon_id: str, image_id: str, ordinal: int) -> bytes:
-            # 1) inputs 저장소
-            local_png = None
-            resolve_source = None
-            try:
-                from .media_store import _locate_input_png_path
+    mode_norm = str(mode or "").strip().lower()
+    is_txt2img = mode_norm in ("text-to-image", "text_to_image", "txt2img", "")
+    is_img2img = mode_norm in ("image-edit", "image_edit", "img2img")
 
-                local_png = _locate_input_png_path(anon_id, image_id)
-                if local_png:
-                    resolve_source = "inputs"
-            except Exception:
-                local_png = None
+    progress_cb(20)
+    if cancelled():
+        raise RuntimeError("생성이 취소되었습니다.")
 
-            # 2) generated images (gallery)
-            try:
-                from .media_store import _locate_image_meta_path
-
-                meta_path = _locate_image_meta_path(anon_id, image_id)
-                if meta_path and os.path.exists(meta_path):
-                    base_dir = os.path.dirname(meta_path)
-                    cand = os.path.join(base_dir, f"{image_id}.png")
-                    if os.path.exists(cand):
-                        local_png = cand
-                        resolve_source = "images"
-            except Exception:
-                pass
+    from .openrouter_client import (
+        build_image_prompt,
+        gpt_image_timeout_seconds,
+        image_model_max_references,
+        resolve_image_model_options,
+    )
 
-            # 3) legacy controls store removed (no longer supported)
+    def _load_input_png_bytes(anon_id: str, image_id: str, ordinal: int) -> bytes:
+        # 1) inputs 저장소
+        local_png = None
+        resolve_source = None
+        try:
+            from .media_store import _locate_input_png_path
 
-            try:
-                logger.info(
-                    {
-                        "event": "openrouter_image_input_resolved",
-                        "job_id": job.id,
-                        "owner_id": anon_id,
-                        "input_image_id": image_id,
-                        "ordinal": ordinal,
-                        "local_png": local_png,
-                        "source": resolve_source,
-                    }
-                )
-            except Exception:
-                pass
+            local_png = _locate_input_png_path(anon_id, image_id)
+            if local_png:
+                resolve_source = "inputs"
+        except Exception:
+            local_png = None
 
-            if not local_png or not os.path.exists(local_png):
-                raise RuntimeError(f"{ordinal}번째 입력 이미지를 찾지 못했습니다. 다시 업로드한 뒤 선택해 주세요.")
+        # 2) generated images (gallery)
+        try:
+            from .media_store import _locate_image_meta_path
+
+            meta_path = _locate_image_meta_path(anon_id, image_id)
+            if meta_path and os.path.exists(meta_path):
+                base_dir = os.path.dirname(meta_path)
+                cand = os.path.join(base_dir, f"{image_id}.png")
+                if os.path.exists(cand):
+                    local_png = cand
+                    resolve_source = "images"
+        except Exception:
+            pass
 
-            try:
-                with open(local_png, "rb") as f:
-                    return f.read()
-            except Exception:
-                raise RuntimeError(f"{ordinal}번째 입력 이미지를 불러오지 못했습니다. 잠시 후 다시 시도해 주세요.")
+        # 3) legacy controls store removed (no longer supported)
 
-        def _load_image_file_as_png_bytes(path_like: str, ordinal: int) -> bytes:
-            """
-            Load an image from disk and return PNG bytes.
-            - Accepts absolute path or repo-root-relative path
-            - Best-effort EXIF transpose
-            """
-            try:
-                raw = str(path_like or "").strip()
-            except Exception:
-                raw = ""
-            if not raw:
-                raise RuntimeError(f"{ordinal}번째 숨김 레퍼런스 이미지 경로가 비어 있습니다.")
+        try:
+            logger.info(
+                {
+                    "event": "openrouter_image_input_resolved",
+                    "job_id": job.id,
+                    "owner_id": anon_id,
+                    "input_image_id": image_id,
+                    "ordinal": ordinal,
+                    "local_png": local_png,
+                    "source": resolve_source,
+                }
+            )
+        except Exception:
+            pass
 
-            abs_path = raw
-            try:
-                if not os.path.isabs(abs_path):
-                    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-                    abs_path = os.path.join(repo_root, raw.replace("/", os.sep))
-            except Exception:
-                abs_path = raw
+        if not local_png or not os.path.exists(local_png):
+            raise RuntimeError(f"{ordinal}번째 입력 이미지를 찾지 못했습니다. 다시 업로드한 뒤 선택해 주세요.")
 
-            if not abs_path or not os.path.exists(abs_path):
-                raise RuntimeError(
-                    "숨김 레퍼런스 이미지를 찾지 못했습니다. "
-                    f"파일을 준비해 주세요: {raw}"
-                )
-            try:
-                from io import BytesIO
-                from PIL import Image
-            except Exception:
-                # Pillow should be installed, but keep a clear message if not.
-                raise RuntimeError("서버에서 이미지 처리(Pillow) 기능이 준비되지 않았습니다.")
-            try:
-                from PIL import ImageOps
-            except Exception:
-                ImageOps = None
+        try:
+            with open(local_png, "rb") as f:
+                return f.read()
+        except Exception:
+            raise RuntimeError(f"{ordinal}번째 입력 이미지를 불러오지 못했습니다. 잠시 후 다시 시도해 주세요.")
+
+    def _load_image_file_as_png_bytes(path_like: str, ordinal: int) -> bytes:
+        """
+        Load an image from disk and return PNG bytes.
+        - Accepts absolute path or repo-root-relative path
+        - Best-effort EXIF transpose
+        """
+        try:
+            raw = str(path_like or "").strip()
+        except Exception:
+            raw = ""
+        if not raw:
+            raise RuntimeError(f"{ordinal}번째 숨김 레퍼런스 이미지 경로가 비어 있습니다.")
 
-            try:
-                with Image.open(abs_path) as im0:
-                    im = im0
-                    try:
-                        if ImageOps is not None:
-                            im = ImageOps.exif_transpose(im)
-                    except Exception:
-                        pass
-                    try:
-                        has_alpha = (
-                            im.mode in ("RGBA", "LA")
-                            or (im.mode == "P" and "transparency" in (im.info or {}))
-                        )
-                    except Exception:
-                        has_alpha = False
-                    im = im.convert("RGBA" if has_alpha else "RGB")
-                    out = BytesIO()
-                    im.save(out, format="PNG")
-                    return out.getvalue()
-            except RuntimeError:
-                raise
-            except Exception:
-                raise RuntimeError(f"{ordinal}번째 숨김 레퍼런스 이미지를 읽지 못했습니다. 파일 형식을 확인해 주세요.")
+        abs_path = raw
+        try:
+            if not os.path.isabs(abs_path):
+                repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+                abs_path = os.path.join(repo_root, raw.replace("/", os.sep))
+        except Exception:
+            abs_path = raw
 
-        # --- Hidden reference images (tool workflows): auto-switch to image-edit even on txt2img ---
-        hidden_ref_bytes_list: list[bytes] | None = None
+        if not abs_path or not os.path.exists(abs_path):
+            raise RuntimeError(
+                "숨김 레퍼런스 이미지를 찾지 못했습니다. "
+                f"파일을 준비해 주세요: {raw}"
+            )
         try:
-            hidden_paths = wf_cfg.get("openrouter_hidden_reference_images") if isinstance(wf_cfg, dict) else None
+            from io import BytesIO
+            from PIL import Image
         except Exception:
-            hidden_paths = None
+            # Pillow should be installed, but keep a clear message if not.
+            raise RuntimeError("서버에서 이미지 처리(Pillow) 기능이 준비되지 않았습니다.")
         try:
-            if is_txt2img and isinstance(hidden_paths, list) and hidden_paths:
-                out_hidden: list[bytes] = []
-                for i, p in enumerate(hidden_paths[:4]):  # safety cap
-                    if cancel_event.is_set():
-                        raise RuntimeError("생성이 취소되었습니다.")
-                    out_hidden.append(_load_image_file_as_png_bytes(str(p or ""), i + 1))
-                if out_hidden:
-                    hidden_ref_bytes_list = out_hidden
-                    try:
-                        request.openrouter_hidden_reference_images = [str(x or "") for x in hidden_paths[:4]]
-                    except Exception:
-                        pass
+            from PIL import ImageOps
+        except Exception:
+            ImageOps = None
+
+        try:
+            with Image.open(abs_path) as im0:
+                im = im0
+                try:
+                    if ImageOps is not None:
+                        im = ImageOps.exif_transpose(im)
+                except Exception:
+                    pass
+                try:
+                    has_alpha = (
+                        im.mode in ("RGBA", "LA")
+                        or (im.mode == "P" and "transparency" in (im.info or {}))
+                    )
+                except Exception:
+                    has_alpha = False
+                im = im.convert("RGBA" if has_alpha else "RGB")
+                out = BytesIO()
+                im.save(out, format="PNG")
+                return out.getvalue()
         except RuntimeError:
             raise
         except Exception:
-            hidden_ref_bytes_list = None
-
-        # --- Game UI element maker: optional references + server-owned prompt contract ---
-        game_ui_options = None
-        game_ui_reference_bytes_list: list[bytes] | None = None
-        is_game_ui = str(getattr(request, "workflow_id", "") or "") == "GameUI_Elements"
-        if is_game_ui:
-            from .game_ui_assets import build_game_ui_generation_prompt, normalize_game_ui_options
-
-            game_ui_options = normalize_game_ui_options(
-                getattr(request, "game_ui_background_mode", None),
-                getattr(request, "game_ui_grid", None),
-            )
-            request.game_ui_background_mode = game_ui_options.background_mode
-            request.game_ui_grid = game_ui_options.grid
-            original_prompt = str(getattr(request, "user_prompt", "") or "").strip()
-            request.game_ui_original_prompt = original_prompt
-
-            ids: list[str] = []
-            seen_ids = set()
-            raw_ids = getattr(request, "input_image_ids", None)
-            if isinstance(raw_ids, list):
-                for raw_id in raw_ids:
-                    image_id = str(raw_id or "").strip()
-                    if image_id and image_id not in seen_ids:
-                        seen_ids.add(image_id)
-                        ids.append(image_id)
-            if not ids:
-                single_id = str(getattr(request, "input_image_id", "") or "").strip()
-                if single_id:
-                    ids = [single_id]
-            ids = ids[:3]
-            if ids:
-                game_ui_reference_bytes_list = [
-                    _load_input_png_bytes(job.owner_id, image_id, index + 1)
-                    for index, image_id in enumerate(ids)
-                ]
-                request.input_image_ids = ids
-                request.input_image_id = ids[0]
-
-            request.user_prompt = build_game_ui_generation_prompt(
-                original_prompt,
-                game_ui_options,
-                reference_count=len(game_ui_reference_bytes_list or []),
-            )
+            raise RuntimeError(f"{ordinal}번째 숨김 레퍼런스 이미지를 읽지 못했습니다. 파일 형식을 확인해 주세요.")
 
-        final_prompt = build_image_prompt(request, wf_cfg)
-
-        progress_cb(45)
-        if cancel_event.is_set():
-            raise RuntimeError("생성이 취소되었습니다.")
-
-        chosen_model, req_size, req_quality = resolve_image_model_options(
-            requested_model=getattr(request, "image_model", None),
-            requested_resolution=(
-                getattr(request, "image_size", None)
-                or ((openrouter_cfg or {}).get("default_resolution") if isinstance(openrouter_cfg, dict) else None)
-            ),
-            requested_quality=getattr(request, "image_quality", None),
-            default_model=str(model or "").strip(),
-            allowed_models=(openrouter_cfg or {}).get("allowed_models") if isinstance(openrouter_cfg, dict) else None,
-            default_quality=(openrouter_cfg or {}).get("default_quality") if isinstance(openrouter_cfg, dict) else None,
+    # --- Hidden reference images (tool workflows): auto-switch to image-edit even on txt2img ---
+    hidden_ref_bytes_list: list[bytes] | None = None
+    try:
+        hidden_paths = wf_cfg.get("openrouter_hidden_reference_images") if isinstance(wf_cfg, dict) else None
+    except Exception:
+        hidden_paths = None
+    try:
+        if is_txt2img and isinstance(hidden_paths, list) and hidden_paths:
+            out_hidden: list[bytes] = []
+            for i, p in enumerate(hidden_paths[:4]):  # safety cap
+                if cancelled():
+                    raise RuntimeError("생성이 취소되었습니다.")
+                out_hidden.append(_load_image_file_as_png_bytes(str(p or ""), i + 1))
+            if out_hidden:
+                hidden_ref_bytes_list = out_hidden
+                try:
+                    request.openrouter_hidden_reference_images = [str(x or "") for x in hidden_paths[:4]]
+                except Exception:
+                    pass
+    except RuntimeError:
+        raise
+    except Exception:
+        hidden_ref_bytes_list = None
+
+    # --- Game UI element maker: optional references + server-owned prompt contract ---
+    game_ui_options = None
+    game_ui_reference_bytes_list: list[bytes] | None = None
+    is_game_ui = str(getattr(request, "workflow_id", "") or "") == "GameUI_Elements"
+    if is_game_ui:
+        from .game_ui_assets import build_game_ui_generation_prompt, normalize_game_ui_options
+
+        game_ui_options = normalize_game_ui_options(
+            getattr(request, "game_ui_background_mode", None),
+            getattr(request, "game_ui_grid", None),
+        )
+        request.game_ui_background_mode = game_ui_options.background_mode
+        request.game_ui_grid = game_ui_options.grid
+        original_prompt = str(getattr(request, "user_prompt", "") or "").strip()
+        request.game_ui_original_prompt = original_prompt
+
+        ids: list[str] = []
+        seen_ids = set()
+        raw_ids = getattr(request, "input_image_ids", None)
+        if isinstance(raw_ids, list):
+            for raw_id in raw_ids:
+                image_id = str(raw_id or "").strip()
+                if image_id and image_id not in seen_ids:
+                    seen_ids.add(image_id)
+                    ids.append(image_id)
+        if not ids:
+            single_id = str(getattr(request, "input_image_id", "") or "").strip()
+            if single_id:
+                ids = [single_id]
+        ids = ids[:3]
+        if ids:
+            game_ui_reference_bytes_list = [
+                _load_input_png_bytes(job.owner_id, image_id, index + 1)
+                for index, image_id in enumerate(ids)
+            ]
+            request.input_image_ids = ids
+            request.input_image_id = ids[0]
+
+        request.user_prompt = build_game_ui_generation_prompt(
+            original_prompt,
+            game_ui_options,
+            reference_count=len(game_ui_reference_bytes_list or []),
         )
-        try:
-            request.image_size = req_size
-            request.image_model = chosen_model
-            request.image_quality = req_quality
-            if isinstance(req_dict, dict):
-                # Keep the persisted Job payload aligned with what the provider
-                # actually received, rather than only the initially requested values.
-                req_dict["resolved_provider"] = "openrouter"
-                req_dict["resolved_model"] = chosen_model
-                req_dict["resolved_image_size"] = req_size
-                req_dict["resolved_image_quality"] = req_quality
-        except Exception:
-            pass
 
-        def _record_provider_usage(usage: dict) -> None:
-            if not isinstance(req_dict, dict) or not isinstance(usage, dict):
-                return
-            # Store the provider's reported amount; do not infer actual spend
-            # from a stale hard-coded price table.
+    final_prompt = build_image_prompt(request, wf_cfg)
+
+    progress_cb(45)
+    if cancelled():
+        raise RuntimeError("생성이 취소되었습니다.")
+
+    chosen_model, req_size, req_quality = resolve_image_model_options(
+        requested_model=getattr(request, "image_model", None),
+        requested_resolution=(
+            getattr(request, "image_size", None)
+            or ((openrouter_cfg or {}).get("default_resolution") if isinstance(openrouter_cfg, dict) else None)
+        ),
+        requested_quality=getattr(request, "image_quality", None),
+        default_model=str(model or "").strip(),
+        allowed_models=(openrouter_cfg or {}).get("allowed_models") if isinstance(openrouter_cfg, dict) else None,
+        default_quality=(openrouter_cfg or {}).get("default_quality") if isinstance(openrouter_cfg, dict) else None,
+    )
+    try:
+        request.image_size = req_size
+        request.image_model = chosen_model
+        request.image_quality = req_quality
+        if isinstance(req_dict, dict):
+            # Keep the persisted Job payload aligned with what the provider
+            # actually received, rather than only the initially requested values.
+            req_dict["resolved_provider"] = "openrouter"
+            req_dict["resolved_model"] = chosen_model
+            req_dict["resolved_image_size"] = req_size
+            req_dict["resolved_image_quality"] = req_quality
+    except Exception:
+        pass
+
+    def _record_provider_usage(usage: dict) -> None:
+        if not isinstance(req_dict, dict) or not isinstance(usage, dict):
+            return
+        # Store the provider's reported amount; do not infer actual spend
+        # from a stale hard-coded price table.
+        try:
+            cost = max(0.0, float(usage.get("cost")))
+        except (TypeError, ValueError):
+            cost = None
+        if cost is not None:
             try:
-                cost = max(0.0, float(usage.get("cost")))
+                previous = float(req_dict.get("actual_cost_usd") or 0)
             except (TypeError, ValueError):
-                cost = None
-            if cost is not None:
+                previous = 0.0
+            req_dict["actual_cost_usd"] = round(previous + cost, 8)
+        # Usage is persisted for later operations analysis. It is bounded
+        # to JSON-compatible scalar/dict/list data by a round trip.
+        try:
+            req_dict["provider_usage"] = json.loads(json.dumps(usage))
+        except (TypeError, ValueError):
+            pass
+
+    image_timeout = (5.0, gpt_image_timeout_seconds()) if chosen_model == "openai/gpt-image-2" else (5.0, 90.0)
+
+    if is_txt2img:
+        # Map UI aspect ratio -> OpenRouter image aspect_ratio
+        ar = str(getattr(request, "aspect_ratio", "") or "").strip().lower()
+        output_aspect = "1:1"
+        if ar == "landscape":
+            output_aspect = "16:9"
+        elif ar == "portrait":
+            output_aspect = "9:16"
+        else:
+            output_aspect = "1:1"
+
+        if hidden_ref_bytes_list or game_ui_reference_bytes_list:
+            # Auto-switch to image-edit when we have any attached reference images.
+            if hidden_ref_bytes_list:
+                images_for_edit = hidden_ref_bytes_list
+            else:
+                images_for_edit = game_ui_reference_bytes_list
+            call = dict(
+                model=chosen_model,
+                prompt=final_prompt,
+                images=images_for_edit,
+                aspect_ratio=output_aspect,
+                resolution=req_size,
+                quality=req_quality,
+                timeout=image_timeout,
+                usage_callback=_record_provider_usage,
+            )
+            context = "imgedit_auto"
+        else:
+            call = dict(
+                model=chosen_model,
+                prompt=final_prompt,
+                aspect_ratio=output_aspect,
+                resolution=req_size,
+                quality=req_quality,
+                timeout=image_timeout,
+                usage_callback=_record_provider_usage,
+            )
+            context = "txt2img"
+    elif is_img2img:
+        # Phase C: 멀티 입력 이미지 편집(img2img)
+        # 규칙: input_image_ids가 비어있지 않으면 우선 사용, 없으면 input_image_id 사용
+        # 제한: 최대 14장
+        def _normalize_ids(v) -> list[str]:
+            out: list[str] = []
+            seen = set()
+            if not isinstance(v, list):
+                return out
+            for x in v:
                 try:
-                    previous = float(req_dict.get("actual_cost_usd") or 0)
-                except (TypeError, ValueError):
-                    previous = 0.0
-                req_dict["actual_cost_usd"] = round(previous + cost, 8)
-            # Usage is persisted for later operations analysis. It is bounded
-            # to JSON-compatible scalar/dict/list data by a round trip.
+                    s = str(x or "").strip()
+                except Exception:
+                    s = ""
+                if not s:
+                    continue
+                if s in seen:
+                    continue
+                seen.add(s)
+                out.append(s)
+            return out
+
+        ids: list[str] = []
+        try:
+            ids = _normalize_ids(getattr(request, "input_image_ids", None))
+        except Exception:
+            ids = []
+
+        if not ids:
+            img_id = None
             try:
-                req_dict["provider_usage"] = json.loads(json.dumps(usage))
-            except (TypeError, ValueError):
-                pass
+                img_id = getattr(request, "input_image_id", None)
+            except Exception:
+                img_id = None
+            if isinstance(img_id, str) and img_id.strip():
+                ids = [img_id.strip()]
 
-        image_timeout = (5.0, gpt_image_timeout_seconds()) if chosen_model == "openai/gpt-image-2" else (5.0, 90.0)
+        # Clamp to the selected provider model's advertised reference limit.
+        ids = ids[:image_model_max_references(chosen_model)]
 
-        if is_txt2img:
-            # Map UI aspect ratio -> OpenRouter image aspect_ratio
-            ar = str(getattr(request, "aspect_ratio", "") or "").strip().lower()
-            output_aspect = "1:1"
+        if not ids:
+            raise RuntimeError("편집할 입력 이미지가 없습니다. 먼저 이미지를 1장 이상 업로드/선택한 뒤 다시 시도해 주세요.")
+
+        # Backward-compat: always keep input_image_id as the first item
+        try:
+            request.input_image_ids = ids
+        except Exception:
+            pass
+        try:
+            request.input_image_id = ids[0]
+        except Exception:
+            pass
+
+        input_png_bytes_list: list[bytes] = []
+        for i, image_id in enumerate(ids):
+            if cancelled():
+                raise RuntimeError("생성이 취소되었습니다.")
+            input_png_bytes_list.append(_load_input_png_bytes(job.owner_id, image_id, i + 1))
+
+        # 출력 비율 옵션:
+        # - "auto": 입력 비율 유지(기본/권장) => aspectRatio 생략
+        # - square/landscape/portrait => OpenRouter aspect_ratio로 전달
+        ar = str(getattr(request, "aspect_ratio", "") or "").strip().lower()
+        output_aspect = None
+        if ar and ar != "auto":
             if ar == "landscape":
                 output_aspect = "16:9"
             elif ar == "portrait":
@@ -585,179 +682,131 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
             else:
                 output_aspect = "1:1"
 
-            if hidden_ref_bytes_list or game_ui_reference_bytes_list:
-                # Auto-switch to image-edit when we have any attached reference images.
-                if hidden_ref_bytes_list:
-                    images_for_edit = hidden_ref_bytes_list
-                else:
-                    images_for_edit = game_ui_reference_bytes_list
-                try:
-                    image_bytes = generate_image(
-                        model=chosen_model,
-                        prompt=final_prompt,
-                        images=images_for_edit,
-                        aspect_ratio=output_aspect,
-                        resolution=req_size,
-                        quality=req_quality,
-                        timeout=image_timeout,
-                        usage_callback=_record_provider_usage,
-                    )
-                except OpenRouterUpstreamError as e:
-                    _record_openrouter_provider_error(e, context="imgedit_auto")
-                    raise RuntimeError(getattr(e, "public_message", str(e)))
-            else:
-                try:
-                    image_bytes = generate_image(
-                        model=chosen_model,
-                        prompt=final_prompt,
-                        aspect_ratio=output_aspect,
-                        resolution=req_size,
-                        quality=req_quality,
-                        timeout=image_timeout,
-                        usage_callback=_record_provider_usage,
-                    )
-                except OpenRouterUpstreamError as e:
-                    _record_openrouter_provider_error(e, context="txt2img")
-                    raise RuntimeError(getattr(e, "public_message", str(e)))
-        elif is_img2img:
-            # Phase C: 멀티 입력 이미지 편집(img2img)
-            # 규칙: input_image_ids가 비어있지 않으면 우선 사용, 없으면 input_image_id 사용
-            # 제한: 최대 14장
-            def _normalize_ids(v) -> list[str]:
-                out: list[str] = []
-                seen = set()
-                if not isinstance(v, list):
-                    return out
-                for x in v:
-                    try:
-                        s = str(x or "").strip()
-                    except Exception:
-                        s = ""
-                    if not s:
-                        continue
-                    if s in seen:
-                        continue
-                    seen.add(s)
-                    out.append(s)
-                return out
-
-            ids: list[str] = []
+        # GPT Image 2 requires an explicit size for the selected 1K/2K tier.
+        # When the edit UI is on Auto, infer the closest supported orientation
+        # from the first input image instead of silently forcing a square.
+        if chosen_model == "openai/gpt-image-2" and output_aspect is None and input_png_bytes_list:
             try:
-                ids = _normalize_ids(getattr(request, "input_image_ids", None))
+                from io import BytesIO
+                from PIL import Image
+
+                with Image.open(BytesIO(input_png_bytes_list[0])) as source_image:
+                    width, height = source_image.size
+                ratio = (float(width) / float(height)) if height else 1.0
+                if ratio > 1.15:
+                    output_aspect = "16:9"
+                elif ratio < (1.0 / 1.15):
+                    output_aspect = "9:16"
+                else:
+                    output_aspect = "1:1"
             except Exception:
-                ids = []
+                output_aspect = "1:1"
 
-            if not ids:
-                img_id = None
-                try:
-                    img_id = getattr(request, "input_image_id", None)
-                except Exception:
-                    img_id = None
-                if isinstance(img_id, str) and img_id.strip():
-                    ids = [img_id.strip()]
+        call = dict(
+            model=chosen_model,
+            prompt=final_prompt,
+            images=input_png_bytes_list,
+            aspect_ratio=output_aspect,
+            resolution=req_size,
+            quality=req_quality,
+            timeout=image_timeout,
+            usage_callback=_record_provider_usage,
+        )
+        context = "imgedit_user"
+    else:
+        raise RuntimeError("이 AI 이미지 워크플로우의 모드 설정이 올바르지 않습니다. 서버 워크플로우 설정을 확인해 주세요.")
+
+    return {
+        "call": call,
+        "context": context,
+        "chosen_model": chosen_model,
+        "is_game_ui": is_game_ui,
+        "game_ui_options": game_ui_options,
+    }
+
+
+def _openrouter_save(job, request, plan: dict, image_bytes: bytes, progress_cb, cancelled: Callable[[], bool]):
+    """Store the provider's image (Game UI sheets are split into assets) and set job.result."""
+    chosen_model = plan["chosen_model"]
+    is_game_ui = plan["is_game_ui"]
+    game_ui_options = plan["game_ui_options"]
+    progress_cb(85)
+    if cancelled():
+        raise RuntimeError("생성이 취소되었습니다.")
+
+    progress_cb(90)
+    if is_game_ui and game_ui_options is not None:
+        from .game_ui_assets import process_game_ui_sheet
+
+        processed_assets = process_game_ui_sheet(image_bytes, game_ui_options)
+        web_path, asset_group = _save_game_ui_group(
+            job.owner_id,
+            image_bytes,
+            processed_assets,
+            request,
+            f"openrouter:{chosen_model or 'image'}",
+            source_job_id=job.id,
+        )
+        job.result["image_path"] = web_path
+        job.result["asset_group"] = asset_group
+    else:
+        saved_image_path, _ = _save_image_and_meta(
+            job.owner_id,
+            image_bytes,
+            request,
+            f"openrouter:{chosen_model or 'image'}",
+            source_job_id=job.id,
+        )
+        web_path = _build_web_path(saved_image_path)
+        job.result["image_path"] = web_path
+    progress_cb(100)
+
+
+def run_generation_processor(
+    job,
+    progress_cb: Callable[[float], None],
+    set_cancel_handle: Callable[[Callable[[], bool]], None],
+    on_execution_start: Optional[Callable[[], None]] = None,
+    preview=None,
+):
+    """Heavyweight generation processor extracted from main.
 
-            # Clamp to the selected provider model's advertised reference limit.
-            ids = ids[:image_model_max_references(chosen_model)]
+    - Uses set_cancel_handle to register ComfyUI cancellation back with JobManager.
+    - on_execution_start: called when ComfyUI starts executing this job's prompt (with pipelined
+      submission it may first wait behind the previous prompt in ComfyUI's queue).
+    - preview: optional ws.previews.PreviewForwarder receiving ComfyUI's latent preview frames.
+    - Mutates job.result with { "image_path": "/outputs/..." } upon success.
+    """
+    req_dict, request, seed_requested = _generation_request(job)
 
-            if not ids:
-                raise RuntimeError("편집할 입력 이미지가 없습니다. 먼저 이미지를 1장 이상 업로드/선택한 뒤 다시 시도해 주세요.")
+    # --- Provider routing (OpenRouter vs ComfyUI) ---
+    wf_cfg = WORKFLOW_CONFIGS.get(request.workflow_id, {}) if isinstance(WORKFLOW_CONFIGS, dict) else {}
+    provider = (wf_cfg.get("provider", "comfyui") if isinstance(wf_cfg, dict) else "comfyui") or "comfyui"
+    provider = str(provider).strip().lower()
+    if provider == "openrouter":
+        cancel_event = threading.Event()
 
-            # Backward-compat: always keep input_image_id as the first item
-            try:
-                request.input_image_ids = ids
-            except Exception:
-                pass
+        def _cancel_openrouter() -> bool:
             try:
-                request.input_image_id = ids[0]
+                cancel_event.set()
             except Exception:
                 pass
+            return True
 
-            input_png_bytes_list: list[bytes] = []
-            for i, image_id in enumerate(ids):
-                if cancel_event.is_set():
-                    raise RuntimeError("생성이 취소되었습니다.")
-                input_png_bytes_list.append(_load_input_png_bytes(job.owner_id, image_id, i + 1))
-
-            # 출력 비율 옵션:
-            # - "auto": 입력 비율 유지(기본/권장) => aspectRatio 생략
-            # - square/landscape/portrait => OpenRouter aspect_ratio로 전달
-            ar = str(getattr(request, "aspect_ratio", "") or "").strip().lower()
-            output_aspect = None
-            if ar and ar != "auto":
-                if ar == "landscape":
-                    output_aspect = "16:9"
-                elif ar == "portrait":
-                    output_aspect = "9:16"
-                else:
-                    output_aspect = "1:1"
+        try:
+            set_cancel_handle(_cancel_openrouter)
+        except Exception:
+            pass
 
-            # GPT Image 2 requires an explicit size for the selected 1K/2K tier.
-            # When the edit UI is on Auto, infer the closest supported orientation
-            # from the first input image instead of silently forcing a square.
-            if chosen_model == "openai/gpt-image-2" and output_aspect is None and input_png_bytes_list:
-                try:
-                    from io import BytesIO
-                    from PIL import Image
-
-                    with Image.open(BytesIO(input_png_bytes_list[0])) as source_image:
-                        width, height = source_image.size
-                    ratio = (float(width) / float(height)) if height else 1.0
-                    if ratio > 1.15:
-                        output_aspect = "16:9"
-                    elif ratio < (1.0 / 1.15):
-                        output_aspect = "9:16"
-                    else:
-                        output_aspect = "1:1"
-                except Exception:
-                    output_aspect = "1:1"
+        from .openrouter_client import OpenRouterUpstreamError, generate_image
 
-            try:
-                image_bytes = generate_image(
-                    model=chosen_model,
-                    prompt=final_prompt,
-                    images=input_png_bytes_list,
-                    aspect_ratio=output_aspect,
-                    resolution=req_size,
-                    quality=req_quality,
-                    timeout=image_timeout,
-                    usage_callback=_record_provider_usage,
-                )
-            except OpenRouterUpstreamError as e:
-                _record_openrouter_provider_error(e, context="imgedit_user")
-                raise RuntimeError(getattr(e, "public_message", str(e)))
-        else:
-            raise RuntimeError("이 AI 이미지 워크플로우의 모드 설정이 올바르지 않습니다. 서버 워크플로우 설정을 확인해 주세요.")
-
-        progress_cb(85)
-        if cancel_event.is_set():
-            raise RuntimeError("생성이 취소되었습니다.")
-
-        progress_cb(90)
-        if is_game_ui and game_ui_options is not None:
-            from .game_ui_assets import process_game_ui_sheet
-
-            processed_assets = process_game_ui_sheet(image_bytes, game_ui_options)
-            web_path, asset_group = _save_game_ui_group(
-                job.owner_id,
-                image_bytes,
-                processed_assets,
-                request,
-                f"openrouter:{chosen_model or 'image'}",
-                source_job_id=job.id,
-            )
-            job.result["image_path"] = web_path
-            job.result["asset_group"] = asset_group
-        else:
-            saved_image_path, _ = _save_image_and_meta(
-                job.owner_id,
-                image_bytes,
-                request,
-                f"openrouter:{chosen_model or 'image'}",
-                source_job_id=job.id,
-            )
-            web_path = _build_web_path(saved_image_path)
-            job.result["image_path"] = web_path
-        progress_cb(100)
+        plan = _openrouter_plan(job, request, req_dict, wf_cfg, progress_cb, cancel_event.is_set)
+        try:
+            image_bytes = generate_image(**plan["call"])
+        except OpenRouterUpstreamError as e:
+            _record_openrouter_provider_error(job, request, e, context=plan["context"])
+            raise RuntimeError(getattr(e, "public_message", str(e)))
+        _openrouter_save(job, request, plan, image_bytes, progress_cb, cancel_event.is_set)
         return
 
     # --- ComfyUI workflow selection (supports wrapper -> variant mapping) ---
@@ -823,42 +872,29 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
         wf_cfg_effective = wf_cfg_ui
 
     workflow_path = os.path.join(WORKFLOW_DIR, f"{effective_workflow_id}.json")
-    # Some workflows rely on a hidden reference image already present in ComfyUI's input directory.
-    # Example: a fixed LoadImage node used as a style/character reference (user does not upload it).
-    # If that file is missing, ComfyUI will fail with a confusing error. We preflight-check and
-    # return a user-friendly message instead.
-    try:
-        required_inputs = wf_cfg_effective.get("required_comfy_inputs") if isinstance(wf_cfg_effective, dict) else None
-        if isinstance(required_inputs, list) and required_inputs:
-            if not isinstance(COMFY_INPUT_DIR, str) or not COMFY_INPUT_DIR:
-                raise RuntimeError(
-                    "이 워크플로우는 서버의 ComfyUI input 폴더에 미리 준비된 레퍼런스 이미지가 필요합니다. "
-                    "하지만 서버 설정(COMFY_INPUT_DIR)이 비어있어 파일 존재 여부를 확인할 수 없습니다. "
-                    "서버 .env에 COMFY_INPUT_DIR을 설정해 주세요."
-                )
-            missing: List[str] = []
-            for name in required_inputs:
-                try:
-                    if not isinstance(name, str) or not name.strip():
-                        continue
-                    cand = os.path.join(COMFY_INPUT_DIR, name.strip())
-                    if not os.path.exists(cand):
-                        missing.append(name.strip())
-                except Exception:
-                    continue
-            if missing:
-                raise RuntimeError(
-                    "이 워크플로우는 숨겨진 레퍼런스 이미지를 사용합니다. "
-                    f"ComfyUI input 폴더(`COMFY_INPUT_DIR`)에 다음 파일을 넣어주세요: {', '.join(missing)}"
-                )
-    except RuntimeError:
-        raise
-    except Exception:
-        # Fail-safe: do not block generation due to preflight-check errors.
-        pass
-    # Track any uploaded/temporary images in ComfyUI input for cleanup.
-    uploaded_image_input_filenames: list[str] = []
-    uploaded_image_input_requested_names: list[str] = []
+    # Job-unique files in ComfyUI's input/output folders are recorded in the scratch manifest
+    # before they are created; the janitor deletes them after the job (see comfy_scratch).
+    scratch = shared_scratch_manifest()
+
+    def _track_scratch(root: Optional[str], name: str, kind: str, *, pattern: bool = False):
+        # Only files under a local ComfyUI folder can be cleaned up.
+        path = scratch_path(root, name)
+        if scratch is None or path is None:
+            return
+        try:
+            scratch.track(job.id, path, kind, pattern=pattern)
+        except Exception as e:
+            try:
+                logger.info({"event": "comfy_scratch_track_failed", "job_id": job.id, "path": path, "error": str(e)})
+            except Exception:
+                pass
+    # (cache, stored name) references into the shared input upload cache, released when the job ends.
+    cached_input_leases: list = []
+    # ComfyUI results staged under the user's output root (moved into place on save).
+    staged_outputs: dict[str, str] = {}
+    # Result cache: ComfyUI input name -> sha256 of its source bytes, and the names image inputs use.
+    comfy_input_digests: dict[str, str] = {}
+    comfy_image_refs: list[str] = []
 
     prompt_overrides = get_prompt_overrides(
         user_prompt=getattr(request, "user_prompt", ""),
@@ -951,14 +987,83 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
     except Exception:
         pass
 
-    client = ComfyUIClient(SERVER_ADDRESS)
-    # Allow cancellation from job manager via provided setter
+    # Bind the job to one ComfyUI backend: its prompt is queued, cancelled and collected there.
+    # A resumed job goes back to the backend that already has its prompt.
+    try:
+        node_types = {
+            str(node.get("class_type"))
+            for node in workflow_templates.get(workflow_path).graph.values()
+            if isinstance(node, dict) and node.get("class_type")
+        }
+    except Exception:
+        node_types = set()
+    backend = backend_pool.acquire(
+        job.id,
+        effective_workflow_id,
+        node_types=node_types,
+        model_key=job_model_key(req_dict, WORKFLOW_CONFIGS),
+        sticky=job.result.get("comfy_backend") if isinstance(job.result, dict) else None,
+    )
+    job.result["comfy_backend"] = backend.name
+    comfy_input_dir = backend.input_dir
+    comfy_output_dir = backend.output_dir
+    client = backend.client()
+    # Allow cancellation from job manager via provided setter.
+    # Only this job's prompt is cancelled: with pipelined submission another job's prompt may be
+    # the one running, so a prompt still waiting in ComfyUI's queue is deleted, not interrupted.
+    comfy_cancel = {"requested": False, "prompt_id": None}
+
+    def _cancel_comfy() -> bool:
+        comfy_cancel["requested"] = True
+        prompt_id = comfy_cancel["prompt_id"]
+        if not prompt_id:
+            # Not queued yet: the job stops before submitting.
+            return True
+        return client.cancel_prompt(prompt_id)
+
     try:
-        set_cancel_handle(client.interrupt)
+        set_cancel_handle(_cancel_comfy)
     except Exception:
         pass
 
+    # Startup recovery re-enqueues a job whose prompt already reached ComfyUI with its
+    # prompt_id in job.result: collect that prompt's outputs instead of generating again.
+    resume_prompt_id = job.result.get("comfy_prompt_id") if isinstance(job.result, dict) else None
+
     try:
+        # Some workflows rely on a hidden reference image already present in ComfyUI's input directory.
+        # Example: a fixed LoadImage node used as a style/character reference (user does not upload it).
+        # If that file is missing, ComfyUI will fail with a confusing error. We preflight-check and
+        # return a user-friendly message instead.
+        try:
+            required_inputs = wf_cfg_effective.get("required_comfy_inputs") if isinstance(wf_cfg_effective, dict) else None
+            if isinstance(required_inputs, list) and required_inputs:
+                if not isinstance(comfy_input_dir, str) or not comfy_input_dir:
+                    raise RuntimeError(
+                        "이 워크플로우는 서버의 ComfyUI input 폴더에 미리 준비된 레퍼런스 이미지가 필요합니다. "
+                        "하지만 서버 설정(COMFY_INPUT_DIR, 백엔드 풀이면 COMFYUI_SERVERS의 input_dir)이 비어있어 "
+                        "파일 존재 여부를 확인할 수 없습니다. 서버 .env에 COMFY_INPUT_DIR을 설정해 주세요."
+                    )
+                missing: List[str] = []
+                for name in required_inputs:
+                    try:
+                        if not isinstance(name, str) or not name.strip():
+                            continue
+                        cand = os.path.join(comfy_input_dir, name.strip())
+                        if not os.path.exists(cand):
+                            missing.append(name.strip())
+                    except Exception:
+                        continue
+                if missing:
+                    raise RuntimeError(
+                        "이 워크플로우는 숨겨진 레퍼런스 이미지를 사용합니다. "
+                        f"ComfyUI input 폴더(`COMFY_INPUT_DIR`)에 다음 파일을 넣어주세요: {', '.join(missing)}"
+                    )
+        except RuntimeError:
+            raise
+        except Exception:
+            # Fail-safe: do not block generation due to preflight-check errors.
+            pass
         # --- Optional: image-to-image workflow handling (single or multi input) ---
         io_cfg_single = wf_cfg_effective.get("image_input") if isinstance(wf_cfg_effective, dict) else None
         io_cfg_multi = wf_cfg_effective.get("image_inputs") if isinstance(wf_cfg_effective, dict) else None
@@ -1062,13 +1167,40 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                     try:
                         with open(local_png, "rb") as f:
                             data = f.read()
-                        data_for_upload = data
-                        downscale_meta = None
-                        try:
-                            data_for_upload, downscale_meta = _maybe_downscale_img2img_input_for_comfy(data, max_side=1536)
-                        except Exception:
-                            data_for_upload = data
-                            downscale_meta = None
+
+                        def _prepare_upload(raw: bytes):
+                            try:
+                                return _maybe_downscale_img2img_input_for_comfy(raw, max_side=1536)
+                            except Exception:
+                                return raw, None
+
+                        def _upload_and_wait(name: str, payload: bytes) -> Optional[str]:
+                            stored_name = client.upload_image_to_input(name, payload, "image/png")
+                            if isinstance(stored_name, str) and stored_name:
+                                try:
+                                    _ = _wait_for_input_visibility(stored_name, timeout_sec=1.5, poll_ms=50, input_dir=comfy_input_dir)
+                                except Exception:
+                                    pass
+                                return stored_name
+                            return None
+
+                        # Content-addressed upload: a reference image already in ComfyUI input
+                        # (same bytes + downscale setting) is reused without downscale/upload/wait.
+                        input_cache = input_cache_for(client._http_base(), comfy_input_dir)
+                        cache_hit = False
+                        if input_cache is not None:
+                            stored, downscale_meta, cache_hit = input_cache.acquire(
+                                data, max_side=1536, prepare=_prepare_upload, upload=_upload_and_wait
+                            )
+                            if stored:
+                                cached_input_leases.append((input_cache, stored))
+                        else:
+                            data_for_upload, downscale_meta = _prepare_upload(data)
+                            req_name = f"{img_id}_{job.id}_{ordinal}.png"
+                            _track_scratch(comfy_input_dir, req_name, "img2img_input_requested")
+                            stored = _upload_and_wait(req_name, data_for_upload)
+                            if stored:
+                                _track_scratch(comfy_input_dir, stored, "img2img_input")
                         try:
                             if isinstance(downscale_meta, dict):
                                 downscale_meta["ordinal"] = int(ordinal)
@@ -1077,16 +1209,9 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                         except Exception:
                             pass
 
-                        req_name = f"{img_id}_{job.id}_{ordinal}.png"
-                        uploaded_image_input_requested_names.append(req_name)
-                        stored = client.upload_image_to_input(req_name, data_for_upload, "image/png")
-                        if isinstance(stored, str) and stored:
-                            try:
-                                _ = _wait_for_input_visibility(stored, timeout_sec=1.5, poll_ms=50)
-                            except Exception:
-                                pass
+                        if stored:
                             image_filename = stored
-                            uploaded_image_input_filenames.append(stored)
+                            comfy_input_digests[str(stored)] = hashlib.sha256(data).hexdigest()
                             try:
                                 logger.info(
                                     {
@@ -1097,14 +1222,16 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                                         "stored": stored,
                                         "source": resolve_source,
                                         "downscale": downscale_meta,
+                                        "cache_hit": cache_hit,
                                     }
                                 )
                             except Exception:
                                 pass
-                            try:
-                                time.sleep(0.1)
-                            except Exception:
-                                pass
+                            if not cache_hit:
+                                try:
+                                    time.sleep(0.1)
+                                except Exception:
+                                    pass
                     except Exception as e:
                         try:
                             logger.info(
@@ -1135,11 +1262,11 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                     orig_name = str(image_filename)
                     raw_bytes = None
 
-                    # 1) Try local filesystem when COMFY_INPUT_DIR is configured (best for performance).
+                    # 1) Try local filesystem when the backend's input dir is local (best for performance).
                     try:
                         fn, sub = _split_comfy_path(orig_name)
-                        if isinstance(COMFY_INPUT_DIR, str) and COMFY_INPUT_DIR and fn:
-                            cand = os.path.join(COMFY_INPUT_DIR, sub, fn) if sub else os.path.join(COMFY_INPUT_DIR, fn)
+                        if isinstance(comfy_input_dir, str) and comfy_input_dir and fn:
+                            cand = os.path.join(comfy_input_dir, sub, fn) if sub else os.path.join(comfy_input_dir, fn)
                             if os.path.exists(cand):
                                 with open(cand, "rb") as f:
                                     raw_bytes = f.read()
@@ -1189,15 +1316,15 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                             if not base:
                                 base = "input"
                             req_name = f"{base}_{job.id}_ds1536_{ordinal}.png"
-                            uploaded_image_input_requested_names.append(req_name)
+                            _track_scratch(comfy_input_dir, req_name, "img2img_input_requested")
                             stored = client.upload_image_to_input(req_name, ds_bytes, "image/png")
                             if isinstance(stored, str) and stored:
                                 try:
-                                    _ = _wait_for_input_visibility(stored, timeout_sec=1.5, poll_ms=50)
+                                    _ = _wait_for_input_visibility(stored, timeout_sec=1.5, poll_ms=50, input_dir=comfy_input_dir)
                                 except Exception:
                                     pass
                                 image_filename = stored
-                                uploaded_image_input_filenames.append(stored)
+                                _track_scratch(comfy_input_dir, stored, "img2img_input")
                                 try:
                                     logger.info(
                                         {
@@ -1212,12 +1339,13 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                                     )
                                 except Exception:
                                     pass
+                        comfy_input_digests[str(image_filename)] = hashlib.sha256(raw_bytes).hexdigest()
             except Exception:
                 pass
 
             return image_filename
 
-        if io_mappings:
+        if io_mappings and not resume_prompt_id:
             # Hard gate: when image input is configured, required image ids must exist.
             if not input_ids:
                 try:
@@ -1262,6 +1390,7 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                 if image_node and image_filename:
                     prompt_overrides.setdefault(str(image_node), {"inputs": {}})
                     prompt_overrides[str(image_node)]["inputs"][str(input_field)] = image_filename
+                    comfy_image_refs.append(str(image_filename))
                     try:
                         logger.info(
                             {
@@ -1422,50 +1551,140 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                         prompt_overrides[sn]["inputs"]["seed"] = seed_val
                 # filename_prefix → node 21 (SeeThrough_SavePSD): job ID를 포함시켜 파일 식별
                 seethrough_prefix = f"seethrough_{job.id}"
-                if COMFY_OUTPUT_DIR:
+                if comfy_output_dir:
                     import os as _os
-                    seethrough_out_dir = _os.path.join(COMFY_OUTPUT_DIR, "seethrough")
+                    seethrough_out_dir = _os.path.join(comfy_output_dir, "seethrough")
                     _os.makedirs(seethrough_out_dir, exist_ok=True)
                     seethrough_prefix = _os.path.join(seethrough_out_dir, f"st_{job.id}")
+                    # A crash before post-processing still leaves every st_<job>* file on record.
+                    _track_scratch(seethrough_out_dir, f"st_{job.id}", "seethrough_output", pattern=True)
                 prompt_overrides.setdefault("21", {"inputs": {}})
                 prompt_overrides["21"]["inputs"]["filename_prefix"] = seethrough_prefix
             except Exception:
                 pass
 
-        resp = client.queue_prompt(workflow_path, prompt_overrides)
-        prompt_id = resp.get('prompt_id') if isinstance(resp, dict) else None
-        if not prompt_id:
-            raise RuntimeError("Failed to get prompt_id.")
+        # Deterministic result cache (opted-in workflows, fixed seed): reuse an identical earlier
+        # result instead of running the prompt. The staged copy goes through the normal save path.
+        result_cache = None
+        result_cache_hit = None
+        result_key = None
+        if not resume_prompt_id and workflow_cacheable(wf_cfg_effective, request.seed if seed_requested else None):
+            result_cache = shared_result_cache()
+        if result_cache is not None:
+            try:
+                result_key = result_cache_key(
+                    effective_workflow_id,
+                    prompt_overrides,
+                    workflow_digest=workflow_templates.get(workflow_path).digest,
+                    input_digests=comfy_input_digests,
+                    image_refs=comfy_image_refs,
+                )
+                if result_key:
+                    result_cache_hit = result_cache.stage(result_key, effective_workflow_id, _incoming_dir(job.owner_id))
+            except Exception as e:
+                result_key = None
+                logger.info({"event": "result_cache_lookup_failed", "job_id": job.id, "error": str(e)})
+
+        if result_cache_hit:
+            staged_outputs = {result_cache_hit["filename"]: result_cache_hit["path"]}
+            job.result["result_cache"] = "hit"
+            try:
+                logger.info({
+                    "event": "result_cache_hit",
+                    "job_id": job.id,
+                    "workflow_id": effective_workflow_id,
+                    "source_job_id": result_cache_hit.get("source_job_id"),
+                })
+            except Exception:
+                pass
+        else:
+            if resume_prompt_id:
+                prompt_id = str(resume_prompt_id)
+                try:
+                    logger.info({"event": "comfy_prompt_resumed", "job_id": job.id, "prompt_id": prompt_id})
+                except Exception:
+                    pass
+            else:
+                if comfy_cancel["requested"]:
+                    raise RuntimeError("ComfyUI 작업이 중단되었습니다.")
+                resp = client.queue_prompt(workflow_path, prompt_overrides)
+                prompt_id = resp.get('prompt_id') if isinstance(resp, dict) else None
+                if not prompt_id:
+                    raise RuntimeError("Failed to get prompt_id.")
+                # Persist the prompt_id right away so a restart can pick the result up from /history.
+                job.result["comfy_prompt_id"] = prompt_id
+                progress_cb(0.0)
+            comfy_cancel["prompt_id"] = prompt_id
+            if comfy_cancel["requested"]:
+                # Cancelled while the prompt was being submitted.
+                client.cancel_prompt(prompt_id)
+
+            def on_progress(p: float):
+                progress_cb(p)
+                if preview is not None:
+                    # A frame held back by the rate limit goes out once its interval has passed.
+                    preview.flush()
 
-        def on_progress(p: float):
-            progress_cb(p)
+            try:
+                client.wait_for_prompt(
+                    prompt_id,
+                    on_progress=on_progress,
+                    on_start=on_execution_start,
+                    on_preview=preview.offer if preview is not None else None,
+                )
+            except Exception:
+                # The job fails, so its prompt must not keep the GPU busy or read inputs that the
+                # finally block below hands to the janitors. A cancel request already did this.
+                if not comfy_cancel["requested"]:
+                    try:
+                        client.cancel_prompt(prompt_id)
+                    except Exception as e:
+                        logger.info({"event": "comfy_prompt_cancel_failed", "job_id": job.id, "prompt_id": prompt_id, "error": str(e)})
+                raise
+            # Only the top-ranked output is used: fetch it first, fall back only if it fails.
+            # Hardlinked/moved from the backend's output dir when local, otherwise streamed to disk.
+            staged_outputs = client.fetch_outputs(
+                prompt_id,
+                _incoming_dir(job.owner_id),
+                output_nodes=wf_cfg_effective.get("output_nodes") if isinstance(wf_cfg_effective, dict) else None,
+            )
 
-        images_data = client.get_images(prompt_id, on_progress=on_progress)
+            if result_key and staged_outputs:
+                filename, staged_path = next(iter(staged_outputs.items()))
+                try:
+                    result_cache.put(
+                        result_key, staged_path, filename=filename, workflow_id=effective_workflow_id, source_job_id=job.id
+                    )
+                except Exception as e:
+                    logger.info({"event": "result_cache_store_failed", "job_id": job.id, "error": str(e)})
 
         # --- SeeThrough 전용 후처리 ---
         if is_seethrough:
-            from .psd_builder import build_psd_from_seethrough, collect_seethrough_parts, cleanup_seethrough_output
+            from .psd_builder import (
+                build_psd_from_seethrough,
+                cleanup_seethrough_output,
+                collect_seethrough_parts,
+                seethrough_output_files,
+            )
             import glob as _glob
 
-            # seethrough_psd_info.log 또는 job ID로 layers.json 찾기
+            # SavePSD writes <filename_prefix>*_layers.json; the prefix is known when the output dir is.
             layers_json_path = None
-            search_dirs = []
-            if COMFY_OUTPUT_DIR:
-                search_dirs.append(os.path.join(COMFY_OUTPUT_DIR, "seethrough"))
-                search_dirs.append(COMFY_OUTPUT_DIR)
-            # fallback: ComfyUI 기본 output 디렉토리
-            search_dirs.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", ".."))
-
-            for sd in search_dirs:
-                pattern = os.path.join(sd, f"**/*{job.id}*_layers.json")
-                matches = _glob.glob(pattern, recursive=True)
+            if comfy_output_dir:
+                st_prefix = os.path.join(comfy_output_dir, "seethrough", f"st_{job.id}")
+                matches = sorted(_glob.glob(_glob.escape(st_prefix) + "*_layers.json"))
+                if matches:
+                    layers_json_path = matches[0]
+            else:
+                # fallback: ComfyUI 기본 output 디렉토리 (job ID로 layers.json 찾기)
+                sd = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", "..")
+                matches = _glob.glob(os.path.join(sd, f"**/*{job.id}*_layers.json"), recursive=True)
                 if matches:
                     layers_json_path = matches[0]
-                    break
 
             # fallback: seethrough_psd_info.log
-            if not layers_json_path and COMFY_OUTPUT_DIR:
-                log_path = os.path.join(COMFY_OUTPUT_DIR, "seethrough_psd_info.log")
+            if not layers_json_path and comfy_output_dir:
+                log_path = os.path.join(comfy_output_dir, "seethrough_psd_info.log")
                 if os.path.exists(log_path):
                     with open(log_path, "r") as lf:
                         info_name = lf.read().strip()
@@ -1473,7 +1692,7 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
                     if os.path.isabs(info_name) and os.path.exists(info_name):
                         layers_json_path = info_name
                     else:
-                        candidate = os.path.join(COMFY_OUTPUT_DIR, info_name)
+                        candidate = os.path.join(comfy_output_dir, info_name)
                         if os.path.exists(candidate):
                             layers_json_path = candidate
 
@@ -1511,8 +1730,9 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
 
             # 4) 프리뷰 이미지 (base64 — 디스크 저장 없음)
             preview_data_url = None
-            if images_data:
-                preview_bytes = list(images_data.values())[0]
+            if staged_outputs:
+                with open(list(staged_outputs.values())[0], "rb") as pf:
+                    preview_bytes = pf.read()
                 b64_preview = _b64.b64encode(preview_bytes).decode("ascii")
                 preview_data_url = f"data:image/png;base64,{b64_preview}"
 
@@ -1524,9 +1744,14 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
             if preview_data_url:
                 job.result["preview_data_url"] = preview_data_url
 
-            # 6) ComfyUI output 정리
+            # 6) ComfyUI output 정리: 출력 폴더 안의 레이어 파일은 작업이 끝난 뒤 정리기가 지웁니다
             try:
-                cleanup_seethrough_output(layers_json_path)
+                files = seethrough_output_files(layers_json_path)
+                if scratch is not None and all(scratch_path(comfy_output_dir, f) for f in files):
+                    for fpath in files:
+                        _track_scratch(comfy_output_dir, fpath, "seethrough_output")
+                else:
+                    cleanup_seethrough_output(layers_json_path)
             except Exception:
                 pass
 
@@ -1541,111 +1766,96 @@ def run_generation_processor(job, progress_cb: Callable[[float], None], set_canc
             except Exception:
                 pass
 
-        elif not images_data:
+        elif not staged_outputs:
             is_audio = bool(wf_cfg_effective.get("audio_workflow"))
             raise RuntimeError("Failed to receive generated audio." if is_audio else "Failed to receive generated images.")
 
         else:
-            filename = list(images_data.keys())[0]
-            file_bytes = list(images_data.values())[0]
+            filename, staged_path = next(iter(staged_outputs.items()))
 
             # For audio workflows, save via audio store (date-partitioned + metadata JSON)
             is_audio_wf = bool(wf_cfg_effective.get("audio_workflow"))
             if is_audio_wf:
                 audio_path, _ = _save_audio_and_meta(
-                    job.owner_id, file_bytes, request, filename, source_job_id=job.id
+                    job.owner_id, None, request, filename, source_job_id=job.id, source_path=staged_path
                 )
                 web_path = _build_web_path(audio_path)
                 job.result["audio_path"] = web_path
                 job.result["is_audio"] = True
             else:
+                cache_meta = None
+                if result_cache_hit:
+                    cache_meta = {"result_cache": {"hit": True, "source_job_id": result_cache_hit.get("source_job_id")}}
                 saved_image_path, _ = _save_image_and_meta(
-                    job.owner_id, file_bytes, request, filename, source_job_id=job.id
+                    job.owner_id, None, request, filename,
+                    extra_meta=cache_meta, source_job_id=job.id, source_path=staged_path,
                 )
                 web_path = _build_web_path(saved_image_path)
                 job.result["image_path"] = web_path
     finally:
-        # Best-effort cleanup of any uploaded inputs in ComfyUI input directory (single and multi)
-        try:
-            if isinstance(COMFY_INPUT_DIR, str) and COMFY_INPUT_DIR:
-                def _try_delete(name: str, kind: str):
-                    if not isinstance(name, str) or not name:
-                        return
-                    # ComfyUI가 반환하는 name이 경로를 포함하는 경우가 드물게 있어, 두 가지 후보를 시도합니다.
-                    candidates = []
-                    try:
-                        candidates.append(os.path.join(COMFY_INPUT_DIR, name))
-                    except Exception:
-                        pass
-                    try:
-                        base = os.path.basename(name.replace("\\", "/"))
-                        if base and base != name:
-                            candidates.append(os.path.join(COMFY_INPUT_DIR, base))
-                    except Exception:
-                        pass
-
-                    for cand in candidates:
-                        if not cand:
-                            continue
-                        ok = False
-                        last_err = None
-                        # Windows에서는 ComfyUI가 파일 핸들을 잠깐 잡고 있는 경우가 있어 재시도합니다.
-                        for _ in range(25):
-                            try:
-                                if os.path.exists(cand):
-                                    os.remove(cand)
-                                ok = True
-                                break
-                            except Exception as e:
-                                last_err = str(e)
-                                try:
-                                    time.sleep(0.2)
-                                except Exception:
-                                    pass
-                        try:
-                            logger.info({
-                                "event": "comfy_input_cleanup",
-                                "kind": kind,
-                                "name": name,
-                                "candidate": cand,
-                                "ok": ok,
-                                "error": last_err,
-                            })
-                        except Exception:
-                            pass
-                        if ok:
-                            break
-
-                for n in uploaded_image_input_filenames:
-                    _try_delete(n, "img2img_input")
-                for n in uploaded_image_input_requested_names:
-                    _try_delete(n, "img2img_input_requested")
-
-                # 마지막 안전장치:
-                # ComfyUI가 업로드 파일명에 (1) 같은 접미사를 붙이거나, 반환값 파싱이 어긋나는 경우가 있습니다.
-                # 우리 쪽 업로드 파일명에는 job.id(uuid hex)가 포함되므로, input 폴더에서 job.id가 들어간 파일을
-                # 추가로 찾아 정리합니다.
+        backend_pool.release(job.id)
+        for input_cache, stored_name in cached_input_leases:
+            input_cache.release(stored_name)
+        # Staged files that were not moved into place (failed save, seethrough preview, extra outputs)
+        for staged_path in staged_outputs.values():
+            try:
+                if os.path.exists(staged_path):
+                    os.remove(staged_path)
+            except OSError:
+                pass
+        # Uploaded inputs and SeeThrough layers go to the scratch janitor: no filesystem work here.
+        # A resumed job also releases what it recorded before the restart.
+        if scratch is not None:
+            try:
+                scratch.release(job.id)
+            except Exception as e:
                 try:
-                    jid = getattr(job, "id", None)
-                    if isinstance(jid, str) and jid:
-                        removed = 0
-                        for name in os.listdir(COMFY_INPUT_DIR):
-                            try:
-                                if not isinstance(name, str) or not name:
-                                    continue
-                                low = name.lower()
-                                if (jid.lower() in low) and (low.endswith(".png") or low.endswith(".webp") or low.endswith(".jpg") or low.endswith(".jpeg")):
-                                    _try_delete(name, "sweep_by_job_id")
-                                    removed += 1
-                            except Exception:
-                                continue
-                        try:
-                            logger.info({"event": "comfy_input_cleanup_sweep_done", "job_id": jid, "removed_candidates": removed})
-                        except Exception:
-                            pass
+                    logger.info({"event": "comfy_scratch_release_failed", "job_id": job.id, "error": str(e)})
                 except Exception:
                     pass
-        except Exception:
-            pass
 
 
+
+
+async def run_generation_processor_async(
+    job,
+    progress_cb: Callable[[float], None],
+    set_cancel_handle: Callable[[Callable[[], bool]], None],
+    **options,
+):
+    """run_generation_processor for the asyncio lane (job_manager.AsyncJobManager).
+
+    OpenRouter jobs await the provider over httpx, so a job waiting on the API holds no thread;
+    only preparation and saving (disk, Pillow) borrow one briefly. Cancelling the job cancels the
+    task, which aborts the request. Once the image is back, saving runs to the end and a cancel is
+    decided by _openrouter_save's own check, as on the thread lane. Other providers run the
+    blocking processor in a thread.
+    """
+    wf_id = job.payload.get("workflow_id") if isinstance(job.payload, dict) else None
+    wf_cfg = WORKFLOW_CONFIGS.get(wf_id, {}) if isinstance(WORKFLOW_CONFIGS, dict) else {}
+    provider = (wf_cfg.get("provider", "comfyui") if isinstance(wf_cfg, dict) else "comfyui") or "comfyui"
+    if str(provider).strip().lower() != "openrouter":
+        await asyncio.to_thread(run_generation_processor, job, progress_cb, set_cancel_handle, **options)
+        return
+
+    from .openrouter_client import OpenRouterUpstreamError, agenerate_image
+
+    req_dict, request, _ = _generation_request(job)
+    cancel_event = threading.Event()
+
+    def _cancel_openrouter() -> bool:
+        cancel_event.set()
+        return True
+
+    try:
+        set_cancel_handle(_cancel_openrouter)
+    except Exception:
+        pass
+
+    plan = await asyncio.to_thread(_openrouter_plan, job, request, req_dict, wf_cfg, progress_cb, cancel_event.is_set)
+    try:
+        image_bytes = await agenerate_image(**plan["call"])
+    except OpenRouterUpstreamError as e:
+        await to_thread_uncancelled(_record_openrouter_provider_error, job, request, e, context=plan["context"])
+        raise RuntimeError(getattr(e, "public_message", str(e)))
+    await to_thread_uncancelled(_openrouter_save, job, request, plan, image_bytes, progress_cb, cancel_event.is_set)
@@ -12,7 +12,7 @@ import sqlite3
 from contextlib import contextmanager
 import time
 import uuid
-from typing import Any, Mapping
+from typing import Any, Callable, Mapping
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 
@@ -25,6 +25,8 @@ DEFAULT_POLICY: dict[str, Any] = {
     "confirmation_required_capabilities": [],
     "capability_enabled": {},
     "cost_estimates_usd": {},
+    # Reject up front when the predicted queue wait exceeds this many seconds (0 = off).
+    "max_predicted_wait_seconds": 0.0,
 }
 
 
@@ -116,8 +118,18 @@ class GenerationControlService:
         directory = os.path.dirname(os.path.abspath(db_path))
         if directory:
             os.makedirs(directory, exist_ok=True)
+        # payload -> JobManager prediction dict (expected_wait_seconds, ...) or None
+        self.wait_predictor: Callable[[Mapping[str, Any]], dict[str, Any] | None] | None = None
+        # payload -> reasons the workflow cannot run on any backend, or None
+        self.workflow_checker: Callable[[Mapping[str, Any]], list[str] | None] | None = None
         self._init_db()
 
+    def set_wait_predictor(self, predictor: Callable[[Mapping[str, Any]], dict[str, Any] | None] | None) -> None:
+        self.wait_predictor = predictor
+
+    def set_workflow_checker(self, checker: Callable[[Mapping[str, Any]], list[str] | None] | None) -> None:
+        self.workflow_checker = checker
+
     def _connect(self) -> sqlite3.Connection:
         connection = sqlite3.connect(self.db_path, timeout=10.0)
         connection.row_factory = sqlite3.Row
@@ -244,6 +256,7 @@ class GenerationControlService:
                 "cost_confirmation_threshold_usd": max(
                     0.0, _env_float("GENERATION_COST_CONFIRMATION_THRESHOLD_USD", 0.0)
                 ),
+                "max_predicted_wait_seconds": max(0.0, _env_float("GENERATION_MAX_PREDICTED_WAIT_SECONDS", 0.0)),
             }
         )
         try:
@@ -313,6 +326,7 @@ class GenerationControlService:
         normalized["cost_confirmation_threshold_usd"] = _nonnegative_float(
             normalized["cost_confirmation_threshold_usd"]
         )
+        normalized["max_predicted_wait_seconds"] = _nonnegative_float(normalized["max_predicted_wait_seconds"])
         required = normalized.get("confirmation_required_capabilities")
         normalized["confirmation_required_capabilities"] = sorted(
             {str(value).strip() for value in required or [] if str(value).strip()}
@@ -382,6 +396,9 @@ class GenerationControlService:
         model = str(payload.get("resolved_model") or "").strip()
         client_ip = str(payload.get("client_ip") or "unknown").strip()
         estimate = self.estimate_cost(payload, policy)
+        # Predicted before the write transaction so the queue lock is never held with sqlite.
+        predicted_wait = self._predicted_wait(payload) if policy.get("max_predicted_wait_seconds") else None
+        workflow_problems = self._workflow_problems(payload)
         day_key = self._day_key()
         now = time.time()
 
@@ -400,7 +417,7 @@ class GenerationControlService:
             retryable_duplicate = bool(
                 duplicate
                 and (
-                    duplicate["status"] == "enqueue_failed"
+                    duplicate["status"] in ("enqueue_failed", "released")
                     or (
                         duplicate["status"] == "reserved"
                         and now - float(duplicate["updated_at"] or 0) > 120.0
@@ -458,6 +475,8 @@ class GenerationControlService:
                 day_key=day_key,
                 estimate=estimate,
                 cost_confirmed=cost_confirmed,
+                predicted_wait=predicted_wait,
+                workflow_problems=workflow_problems,
             )
             if rejection:
                 self._event(
@@ -528,6 +547,8 @@ class GenerationControlService:
         day_key: str,
         estimate: float | None,
         cost_confirmed: bool,
+        predicted_wait: float | None = None,
+        workflow_problems: list[str] | None = None,
     ) -> GenerationPolicyError | None:
         if not policy.get("generation_enabled", True):
             return GenerationPolicyError(
@@ -541,6 +562,13 @@ class GenerationControlService:
             return GenerationPolicyError(
                 "capability_disabled", f"현재 {capability} 기능이 중지되었습니다.", status_code=503
             )
+        if workflow_problems:
+            return GenerationPolicyError(
+                "workflow_unavailable",
+                "이 워크플로우는 현재 ComfyUI 서버에서 실행할 수 없습니다. 관리자에게 문의해 주세요.",
+                status_code=503,
+                details={"problems": list(workflow_problems)[:5]},
+            )
 
         active_statuses = ("reserved", "queued", "running", "complete", "error", "cancelled")
         placeholders = ",".join("?" for _ in active_statuses)
@@ -589,6 +617,22 @@ class GenerationControlService:
                 },
             )
 
+        max_wait = float(policy.get("max_predicted_wait_seconds") or 0)
+        if max_wait > 0 and predicted_wait is not None and predicted_wait > max_wait:
+            # The queue drains at roughly real time, so this is when the wait drops below the limit.
+            retry_after = max(1, int(math.ceil(predicted_wait - max_wait)))
+            return GenerationPolicyError(
+                "queue_wait_too_long",
+                f"대기열이 길어 예상 대기 시간이 약 {int(math.ceil(predicted_wait))}초입니다. "
+                f"{retry_after}초 후 다시 시도해 주세요.",
+                status_code=503,
+                details={
+                    "predicted_wait_seconds": round(predicted_wait, 1),
+                    "max_predicted_wait_seconds": max_wait,
+                    "retry_after_seconds": retry_after,
+                },
+            )
+
         required_capabilities = set(policy.get("confirmation_required_capabilities") or [])
         confirmation_required = capability in required_capabilities or (
             threshold > 0 and estimate is not None and estimate >= threshold
@@ -605,6 +649,25 @@ class GenerationControlService:
             )
         return None
 
+    def _predicted_wait(self, payload: Mapping[str, Any]) -> float | None:
+        if self.wait_predictor is None:
+            return None
+        try:
+            prediction = self.wait_predictor(payload)
+        except Exception:
+            return None
+        if not prediction or prediction.get("expected_wait_seconds") is None:
+            return None
+        return float(prediction["expected_wait_seconds"])
+
+    def _workflow_problems(self, payload: Mapping[str, Any]) -> list[str] | None:
+        if self.workflow_checker is None:
+            return None
+        try:
+            return self.workflow_checker(payload) or None
+        except Exception:
+            return None
+
     def sync_job(self, job: Any) -> None:
         payload = job.payload if isinstance(getattr(job, "payload", None), dict) else {}
         control_request_id = str(payload.get("control_request_id") or payload.get("request_id") or "").strip()
@@ -670,6 +733,50 @@ class GenerationControlService:
                 details={"reason": str(reason)[:500]},
             )
 
+    def release_unfinished_requests(self, keep_job_ids: set[str] | frozenset[str], reason: str) -> int:
+        """Release reserved/queued/running requests whose job will not run (startup recovery).
+
+        Released requests no longer count against the daily request/cost limits and the
+        same idempotency key can be retried.
+        """
+        keep = {str(job_id) for job_id in keep_job_ids or ()}
+        now = time.time()
+        released = 0
+        with self._managed_connection() as connection:
+            rows = connection.execute(
+                """
+                SELECT id, job_id, status, workflow_id, provider, model, source, principal_id, capability
+                FROM generation_control_requests
+                WHERE status IN ('reserved', 'queued', 'running')
+                """
+            ).fetchall()
+            for row in rows:
+                if row["job_id"] and str(row["job_id"]) in keep:
+                    continue
+                connection.execute(
+                    "UPDATE generation_control_requests SET status = 'released', updated_at = ? WHERE id = ?",
+                    (now, row["id"]),
+                )
+                self._event(
+                    connection,
+                    event_type="job_status",
+                    decision="released",
+                    reason_code=str(reason)[:100],
+                    request_id=row["id"],
+                    job_id=row["job_id"],
+                    payload={
+                        "request_source": row["source"],
+                        "principal_id": row["principal_id"],
+                        "capability": row["capability"],
+                        "workflow_id": row["workflow_id"],
+                        "resolved_provider": row["provider"],
+                        "resolved_model": row["model"],
+                    },
+                    details={"previous_status": row["status"]},
+                )
+                released += 1
+        return released
+
     def summary(self, day_key: str | None = None) -> dict[str, Any]:
         day = day_key or self._day_key()
         with self._managed_connection() as connection:
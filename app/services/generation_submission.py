@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Any
 
 from .generation_commands import ResolvedGenerationCommand
 from .generation_controls import GenerationControlService
@@ -15,6 +16,8 @@ class GenerationSubmission:
     position: int
     estimated_cost_usd: float | None
     duplicate: bool = False
+    # JobManager.predict(): expected_wait_seconds / expected_start_at / expected_finish_at
+    prediction: dict[str, Any] | None = None
 
 
 class GenerationSubmissionService:
@@ -59,4 +62,14 @@ class GenerationSubmissionService:
             status="queued",
             position=self.job_manager.get_position(job.id) or 0,
             estimated_cost_usd=admission.estimated_cost_usd,
+            prediction=self._predict(job.id),
         )
+
+    def _predict(self, job_id: str) -> dict[str, Any] | None:
+        predict = getattr(self.job_manager, "predict", None)
+        if predict is None:
+            return None
+        try:
+            return predict(job_id)
+        except Exception:
+            return None
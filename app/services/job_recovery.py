@@ -0,0 +1,149 @@
+"""Startup recovery for jobs that were queued or running when the process stopped."""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Mapping, Optional
+
+from ..job_manager import Job, RoutingJobManager
+
+
+INTERRUPTED_BY_RESTART = "서버 재시작으로 작업이 중단되었습니다. 다시 시도해 주세요."
+
+# ComfyUI prompt states (ComfyUIClient.prompt_state) whose outputs can still be collected.
+RESUMABLE_PROMPT_STATES = frozenset({"complete", "running", "pending"})
+
+
+@dataclass
+class RecoveryReport:
+    requeued: list[str] = field(default_factory=list)
+    resumed: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    released_requests: int = 0
+    finished_at: Optional[float] = None
+
+    def summary(self) -> dict[str, Any]:
+        data = asdict(self)
+        data.update({key: len(data[key]) for key in ("requeued", "resumed", "failed")})
+        return data
+
+
+class JobRecoveryService:
+    """
+    Rebuild the in-memory queue from JobStore after a restart.
+
+    - queued jobs are re-enqueued with their original ids, in their original order.
+    - running ComfyUI jobs whose prompt is done (or still queued) in ComfyUI are re-enqueued
+      with their prompt_id; the processor then collects the outputs instead of regenerating.
+      prompt_state(prompt_id, backend) is asked on the backend the job was bound to.
+    - every other running job is marked failed.
+    - control requests of jobs that will not run are released so they stop counting
+      against the daily limits.
+    """
+
+    def __init__(
+        self,
+        job_store,
+        job_manager,
+        *,
+        workflow_configs: Mapping[str, Mapping[str, Any]],
+        controls=None,
+        prompt_state: Optional[Callable[..., str]] = None,
+    ):
+        self.job_store = job_store
+        self.job_manager = job_manager
+        self.workflow_configs = workflow_configs or {}
+        self.controls = controls
+        self.prompt_state = prompt_state
+        self._logger = logging.getLogger("comfyui_app")
+
+    def recover(self, *, requeue: bool = True, max_age_seconds: Optional[float] = None) -> RecoveryReport:
+        """Jobs created more than max_age_seconds ago are failed instead of re-enqueued."""
+        report = RecoveryReport()
+        rows = self.job_store.fetch_by_statuses(("queued", "running"))
+        if max_age_seconds and max_age_seconds > 0:
+            cutoff = time.time() - float(max_age_seconds)
+            stale = [row for row in rows if float(row.get("created_at") or 0) < cutoff]
+            for row in stale:
+                self._mark_failed(row)
+                report.failed.append(str(row.get("id")))
+            rows = [row for row in rows if float(row.get("created_at") or 0) >= cutoff]
+        running = [row for row in rows if row.get("status") == "running"]
+        queued = [row for row in rows if row.get("status") == "queued"]
+
+        # Jobs that were already executing go first so per-user order is preserved.
+        for row in running:
+            prompt_id = self._resume_prompt_id(row) if requeue else None
+            if prompt_id:
+                job = Job.from_record(row)
+                job.result = {"comfy_prompt_id": prompt_id}
+                backend = (row.get("result") or {}).get("comfy_backend")
+                if backend:
+                    # Sticky: outputs are collected from the backend that ran the prompt.
+                    job.result["comfy_backend"] = backend
+                if self._restore(job, row):
+                    report.resumed.append(job.id)
+                    continue
+            self._mark_failed(row)
+            report.failed.append(str(row.get("id")))
+        for row in queued:
+            if requeue:
+                job = Job.from_record(row)
+                job.result = {}
+                if self._restore(job, row):
+                    report.requeued.append(job.id)
+                    continue
+            self._mark_failed(row)
+            report.failed.append(str(row.get("id")))
+
+        if self.controls is not None:
+            keep = frozenset(report.requeued) | frozenset(report.resumed)
+            try:
+                report.released_requests = self.controls.release_unfinished_requests(keep, "restart_recovery")
+            except Exception as e:
+                self._logger.warning({"event": "job_recovery_release_failed", "error": str(e)})
+        report.finished_at = time.time()
+        self._logger.info({"event": "job_recovery", **{k: v for k, v in report.summary().items() if isinstance(v, (int, float))}})
+        return report
+
+    def _resume_prompt_id(self, row: Mapping[str, Any]) -> Optional[str]:
+        result = row.get("result") if isinstance(row.get("result"), dict) else {}
+        prompt_id = str(result.get("comfy_prompt_id") or "").strip()
+        payload = row.get("payload") if isinstance(row.get("payload"), dict) else {}
+        workflow_id = str(row.get("workflow_id") or payload.get("workflow_id") or "")
+        lane_key = RoutingJobManager.lane_key_for_config(self.workflow_configs.get(workflow_id))
+        if not prompt_id or not lane_key.startswith("comfyui:") or self.prompt_state is None:
+            return None
+        # The prompt only exists on the ComfyUI backend the job was bound to.
+        backend = str(result.get("comfy_backend") or "").strip()
+        try:
+            state = self.prompt_state(prompt_id, backend) if backend else self.prompt_state(prompt_id)
+        except Exception as e:
+            state = "unknown"
+            self._logger.debug({"event": "job_recovery_prompt_state_failed", "prompt_id": prompt_id, "error": str(e)})
+        self._logger.info({
+            "event": "job_recovery_prompt_state",
+            "job_id": row.get("id"),
+            "prompt_id": prompt_id,
+            "backend": backend or None,
+            "state": state,
+        })
+        return prompt_id if state in RESUMABLE_PROMPT_STATES else None
+
+    def _restore(self, job: Job, row: Mapping[str, Any]) -> bool:
+        try:
+            self.job_manager.restore(job)
+            return True
+        except Exception as e:
+            self._logger.warning({"event": "job_recovery_restore_failed", "job_id": row.get("id"), "error": str(e)})
+            return False
+
+    def _mark_failed(self, row: Mapping[str, Any]):
+        snapshot = dict(row)
+        snapshot.update({"status": "error", "error": INTERRUPTED_BY_RESTART, "ended_at": time.time()})
+        try:
+            self.job_store.upsert_job(snapshot)
+        except Exception as e:
+            self._logger.warning({"event": "job_recovery_mark_failed_error", "job_id": row.get("id"), "error": str(e)})
@@ -514,6 +514,13 @@ def _remove_grid_borders_and_stitch(im: "Image.Image", cols: int, rows: int) ->
     return base
 
 
+_GRID_POSTPROCESS_WORKFLOWS = frozenset({"NanoBanana_StoryboardCutboard"})
+
+
+def _needs_grid_postprocess(req) -> bool:
+    return str(getattr(req, "workflow_id", None) or "") in _GRID_POSTPROCESS_WORKFLOWS
+
+
 def _maybe_postprocess_grid_image(image_bytes: bytes, req) -> tuple[bytes, Optional[dict]]:
     """
     For specific grid workflows, attempt to remove gutters/borders and stitch panels edge-to-edge.
@@ -522,9 +529,7 @@ def _maybe_postprocess_grid_image(image_bytes: bytes, req) -> tuple[bytes, Optio
     if Image is None:
         return image_bytes, None
 
-    wf_id = getattr(req, "workflow_id", None)
-    wf_id = str(wf_id or "")
-    if wf_id != "NanoBanana_StoryboardCutboard":
+    if not _needs_grid_postprocess(req):
         return image_bytes, None
 
     cols_rows = None
@@ -593,6 +598,44 @@ def _date_partition_path(base_dir: str, dt: datetime) -> str:
     return os.path.join(base_dir, dt.strftime("%Y"), dt.strftime("%m"), dt.strftime("%d"))
 
 
+def _incoming_dir(anon_id: str) -> str:
+    """
+    Staging directory for generated files on their way into the user's dated folder.
+
+    Lives under the user's own output root (same filesystem, same access rules), so the final
+    placement is a rename rather than a copy.
+    """
+    path = os.path.join(_user_base_dir(anon_id), ".incoming")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _place_source_file(source_path: str, target_path: str) -> None:
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        os.replace(source_path, target_path)
+    except OSError:
+        # Different filesystem: copy to a temp sibling, then rename into place.
+        temp = f"{target_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(source_path, temp)
+            os.replace(temp, target_path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        os.remove(source_path)
+
+
+def _file_sha256(path: str) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
 def _build_web_path(abs_path: str) -> str:
     # Assumes OUTPUT_DIR is served at /outputs
     abs_outputs = os.path.realpath(OUTPUT_DIR)
@@ -605,7 +648,7 @@ def _build_web_path(abs_path: str) -> str:
 
 def _save_image_and_meta(
     anon_id: str,
-    image_bytes: bytes,
+    image_bytes: Optional[bytes],
     req,
     original_filename: str,
     *,
@@ -615,7 +658,14 @@ def _save_image_and_meta(
     image_id: Optional[str] = None,
     register_catalog: bool = True,
     created_at: Optional[datetime] = None,
+    source_path: Optional[str] = None,
 ) -> Tuple[str, str]:
+    """
+    Store a generated PNG with its thumbnail and JSON sidecar.
+
+    Pass either image_bytes or source_path (a staged file, see _incoming_dir). A staged file is
+    renamed into place and never read into memory, unless the grid postprocess has to rewrite it.
+    """
     now = created_at or datetime.now(timezone.utc)
     user_dir = _user_base_dir(anon_id)
     dated_dir = _date_partition_path(user_dir, now)
@@ -627,14 +677,23 @@ def _save_image_and_meta(
     image_filename = f"{image_id}.png"
     image_path = os.path.join(dated_dir, image_filename)
 
+    if source_path is not None and postprocess and _needs_grid_postprocess(req):
+        with open(source_path, "rb") as handle:
+            image_bytes = handle.read()
+        os.remove(source_path)
+        source_path = None
+
     post_meta = None
-    if postprocess:
+    if postprocess and image_bytes is not None:
         try:
             image_bytes, post_meta = _maybe_postprocess_grid_image(image_bytes, req)
         except Exception:
             post_meta = None
 
-    atomic_write_bytes(image_path, image_bytes)
+    if source_path is not None:
+        _place_source_file(source_path, image_path)
+    else:
+        atomic_write_bytes(image_path, image_bytes)
 
     # Thumbnail (webp preferred; fallback to jpg)
     thumb_rel_dir = os.path.join(dated_dir, "thumb")
@@ -644,7 +703,7 @@ def _save_image_and_meta(
     thumb_path_written = None
     if Image is not None:
         try:
-            with Image.open(BytesIO(image_bytes)) as im:
+            with Image.open(BytesIO(image_bytes) if image_bytes is not None else image_path) as im:
                 # Preserve alpha for transparent outputs (e.g. background removal)
                 try:
                     has_alpha = (
@@ -674,7 +733,10 @@ def _save_image_and_meta(
             thumb_path_written = None
 
     # Sidecar metadata
-    sha256 = hashlib.sha256(image_bytes).hexdigest()
+    if image_bytes is not None:
+        sha256, size = hashlib.sha256(image_bytes).hexdigest(), len(image_bytes)
+    else:
+        sha256, size = _file_sha256(image_path)
     meta = {
         "id": image_id,
         "owner": anon_id,
@@ -696,7 +758,7 @@ def _save_image_and_meta(
         "comfy_img2img_input_downscale": getattr(req, "comfy_img2img_input_downscale", None),
         "original_filename": original_filename,
         "mime": "image/png",
-        "bytes": len(image_bytes),
+        "bytes": size,
         "sha256": sha256,
         "created_at": now.isoformat(),
         "status": "active",
@@ -1111,6 +1173,8 @@ def _gather_user_images(anon_id: str, include_trash: bool = False) -> List[dict]
                 continue
             if "game_ui_groups" in parts:
                 continue
+            if ".incoming" in parts:
+                continue
         except Exception:
             pass
         for name in files:
@@ -1207,12 +1271,14 @@ def _audio_base_dir(anon_id: str) -> str:
 
 def _save_audio_and_meta(
     anon_id: str,
-    audio_bytes: bytes,
+    audio_bytes: Optional[bytes],
     req,
     original_filename: str,
     source_job_id: Optional[str] = None,
+    *,
+    source_path: Optional[str] = None,
 ) -> Tuple[str, str]:
-    """Save audio file + JSON sidecar, mirroring _save_image_and_meta structure."""
+    """Save audio file + JSON sidecar, mirroring _save_image_and_meta structure (bytes or source_path)."""
     now = datetime.now(timezone.utc)
     base = _audio_base_dir(anon_id)
     dated_dir = _date_partition_path(base, now)
@@ -1230,21 +1296,21 @@ def _save_audio_and_meta(
     audio_filename = f"{audio_id}{ext}"
     audio_path = os.path.join(dated_dir, audio_filename)
 
-    atomic_write_bytes(audio_path, audio_bytes)
+    if source_path is not None:
+        _place_source_file(source_path, audio_path)
+    else:
+        atomic_write_bytes(audio_path, audio_bytes)
     # Master before hashing/catalog registration so metadata always describes
     # the final artifact. A missing optional audio dependency is harmless.
     try:
-        if _master_audio_file(audio_path):
-            with open(audio_path, "rb") as mastered_file:
-                audio_bytes = mastered_file.read()
+        _master_audio_file(audio_path)
     except Exception:
         pass
 
-    # Build metadata
-    import hashlib as _hl
-    sha = ""
+    # Build metadata (hashed from disk in chunks)
+    sha, size = "", 0
     try:
-        sha = _hl.sha256(audio_bytes).hexdigest()
+        sha, size = _file_sha256(audio_path)
     except Exception:
         pass
 
@@ -1262,7 +1328,7 @@ def _save_audio_and_meta(
         "seed": getattr(req, "seed", None) if req else None,
         "original_filename": original_filename,
         "mime": "audio/mpeg" if ext == ".mp3" else f"audio/{ext.lstrip('.')}",
-        "bytes": len(audio_bytes),
+        "bytes": size,
         "sha256": sha,
         "created_at": now.isoformat(),
         "status": "active",
@@ -1,9 +1,16 @@
+import asyncio
 import base64
 import os
+import weakref
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests
 
+try:
+    import httpx
+except Exception:  # httpx is optional: only the async client (agenerate_image) needs it
+    httpx = None
+
 from ..logging_utils import setup_logging
 
 
@@ -213,7 +220,7 @@ def _gpt_image_size(resolution: str, aspect_ratio: Optional[str]) -> str:
     return by_aspect.get(aspect, by_aspect["1:1"])
 
 
-def _parse_error(resp: requests.Response) -> Tuple[Optional[str], Optional[str]]:
+def _parse_error(resp: Any) -> Tuple[Optional[str], Optional[str]]:
     try:
         data = resp.json()
     except Exception:
@@ -226,7 +233,8 @@ def _parse_error(resp: requests.Response) -> Tuple[Optional[str], Optional[str]]
     return (str(code) if code is not None else None, str(message) if message else None)
 
 
-def _raise_for_response(resp: requests.Response, *, context: str) -> None:
+def _raise_for_response(resp: Any, *, context: str) -> None:
+    # resp: a requests or httpx response (status_code, headers, json()).
     status = int(getattr(resp, "status_code", 0) or 0)
     code, detail = _parse_error(resp)
     low = str(detail or "").lower()
@@ -277,40 +285,35 @@ def _raise_for_response(resp: requests.Response, *, context: str) -> None:
     )
 
 
-def _post(path: str, payload: Dict[str, Any], *, timeout: Tuple[float, float], context: str) -> Dict[str, Any]:
-    try:
-        resp = requests.post(
-            f"{_base_url()}/{path.lstrip('/')}",
-            headers=_headers(),
-            json=payload,
-            timeout=timeout,
-        )
-    except requests.exceptions.ReadTimeout as exc:
-        logger.warning({
-            "event": "openrouter_read_timeout",
-            "context": context,
-            "read_timeout_seconds": timeout[1] if isinstance(timeout, tuple) and len(timeout) > 1 else None,
-            "error": str(exc),
-        })
-        timeout_message = (
-            "이미지 생성 시간이 길어 응답 제한시간을 초과했어요. 잠시 후 다시 시도해 주세요."
-            if context == "image"
-            else "외부 AI 응답 시간이 길어 제한시간을 초과했어요. 잠시 후 다시 시도해 주세요."
-        )
-        raise OpenRouterUpstreamError(
-            timeout_message,
-            kind="openrouter_timeout",
-            upstream_message=str(exc),
-        ) from exc
-    except Exception as exc:
-        logger.warning({"event": "openrouter_network_error", "context": context, "error": str(exc)})
-        raise OpenRouterUpstreamError(
-            "외부 AI 서비스 연결이 잠시 불안정해요. 잠시 후 다시 시도해 주세요.",
-            kind="openrouter_network",
-            upstream_message=str(exc),
-        ) from exc
-    if not resp.ok:
-        _raise_for_response(resp, context=context)
+def _timeout_error(exc: Exception, *, context: str, read_timeout: Optional[float]) -> OpenRouterUpstreamError:
+    logger.warning({
+        "event": "openrouter_read_timeout",
+        "context": context,
+        "read_timeout_seconds": read_timeout,
+        "error": str(exc),
+    })
+    timeout_message = (
+        "이미지 생성 시간이 길어 응답 제한시간을 초과했어요. 잠시 후 다시 시도해 주세요."
+        if context == "image"
+        else "외부 AI 응답 시간이 길어 제한시간을 초과했어요. 잠시 후 다시 시도해 주세요."
+    )
+    return OpenRouterUpstreamError(
+        timeout_message,
+        kind="openrouter_timeout",
+        upstream_message=str(exc),
+    )
+
+
+def _network_error(exc: Exception, *, context: str) -> OpenRouterUpstreamError:
+    logger.warning({"event": "openrouter_network_error", "context": context, "error": str(exc)})
+    return OpenRouterUpstreamError(
+        "외부 AI 서비스 연결이 잠시 불안정해요. 잠시 후 다시 시도해 주세요.",
+        kind="openrouter_network",
+        upstream_message=str(exc),
+    )
+
+
+def _response_json(resp: Any) -> Dict[str, Any]:
     try:
         data = resp.json()
     except Exception as exc:
@@ -327,6 +330,68 @@ def _post(path: str, payload: Dict[str, Any], *, timeout: Tuple[float, float], c
     return data
 
 
+def _read_timeout(timeout: Tuple[float, float]) -> Optional[float]:
+    return timeout[1] if isinstance(timeout, tuple) and len(timeout) > 1 else None
+
+
+def _post(path: str, payload: Dict[str, Any], *, timeout: Tuple[float, float], context: str) -> Dict[str, Any]:
+    try:
+        resp = requests.post(
+            f"{_base_url()}/{path.lstrip('/')}",
+            headers=_headers(),
+            json=payload,
+            timeout=timeout,
+        )
+    except requests.exceptions.ReadTimeout as exc:
+        raise _timeout_error(exc, context=context, read_timeout=_read_timeout(timeout)) from exc
+    except Exception as exc:
+        raise _network_error(exc, context=context) from exc
+    if not resp.ok:
+        _raise_for_response(resp, context=context)
+    return _response_json(resp)
+
+
+# One pooled httpx.AsyncClient per event loop (a client cannot be shared across loops).
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def _async_client() -> Any:
+    if httpx is None:
+        raise RuntimeError("비동기 OpenRouter 클라이언트를 쓰려면 서버에 httpx가 설치되어 있어야 합니다.")
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        try:
+            max_connections = max(1, int(os.getenv("OPENROUTER_HTTP_MAX_CONNECTIONS", "256") or "256"))
+        except ValueError:
+            max_connections = 256
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=min(64, max_connections))
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def _apost(path: str, payload: Dict[str, Any], *, timeout: Tuple[float, float], context: str) -> Dict[str, Any]:
+    """_post on the running event loop: the request waits on the socket without holding a thread."""
+    client = _async_client()
+    connect_timeout, read_timeout = (timeout[0], _read_timeout(timeout) or timeout[0])
+    try:
+        resp = await client.post(
+            f"{_base_url()}/{path.lstrip('/')}",
+            headers=_headers(),
+            json=payload,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+    except httpx.ReadTimeout as exc:
+        raise _timeout_error(exc, context=context, read_timeout=read_timeout) from exc
+    except Exception as exc:
+        raise _network_error(exc, context=context) from exc
+    if not resp.is_success:
+        _raise_for_response(resp, context=context)
+    return _response_json(resp)
+
+
 def build_image_prompt(req: Any, wf_cfg: Dict[str, Any]) -> str:
     user_prompt = str(getattr(req, "user_prompt", "") or "").strip()
     if not user_prompt:
@@ -363,17 +428,15 @@ def _extract_image(data: Dict[str, Any]) -> bytes:
         ) from exc
 
 
-def generate_image(
+def _image_payload(
     *,
     model: str,
     prompt: str,
-    images: Optional[List[bytes]] = None,
-    aspect_ratio: Optional[str] = None,
-    resolution: Optional[str] = None,
-    quality: Optional[str] = None,
-    timeout: Tuple[float, float] = (5.0, 90.0),
-    usage_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
-) -> bytes:
+    images: Optional[List[bytes]],
+    aspect_ratio: Optional[str],
+    resolution: Optional[str],
+    quality: Optional[str],
+) -> Dict[str, Any]:
     model = str(model or "").strip()
     if not model:
         raise RuntimeError("이미지 모델 설정이 비어 있습니다. 서버 워크플로우 설정을 확인해 주세요.")
@@ -406,7 +469,12 @@ def generate_image(
         if len(refs) > max_refs:
             raise RuntimeError(f"선택한 모델은 참조 이미지를 최대 {max_refs}장까지 지원합니다.")
         payload["input_references"] = refs
-    data = _post("images", payload, timeout=timeout, context="image")
+    return payload
+
+
+def _image_result(
+    data: Dict[str, Any], *, model: str, usage_callback: Optional[Callable[[Dict[str, Any]], None]]
+) -> bytes:
     usage = data.get("usage") if isinstance(data, dict) else None
     if isinstance(usage, dict):
         logger.info({"event": "openrouter_image_usage", "model": model, "usage": usage})
@@ -418,6 +486,43 @@ def generate_image(
     return _extract_image(data)
 
 
+def generate_image(
+    *,
+    model: str,
+    prompt: str,
+    images: Optional[List[bytes]] = None,
+    aspect_ratio: Optional[str] = None,
+    resolution: Optional[str] = None,
+    quality: Optional[str] = None,
+    timeout: Tuple[float, float] = (5.0, 90.0),
+    usage_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> bytes:
+    payload = _image_payload(
+        model=model, prompt=prompt, images=images, aspect_ratio=aspect_ratio, resolution=resolution, quality=quality
+    )
+    data = _post("images", payload, timeout=timeout, context="image")
+    return _image_result(data, model=payload["model"], usage_callback=usage_callback)
+
+
+async def agenerate_image(
+    *,
+    model: str,
+    prompt: str,
+    images: Optional[List[bytes]] = None,
+    aspect_ratio: Optional[str] = None,
+    resolution: Optional[str] = None,
+    quality: Optional[str] = None,
+    timeout: Tuple[float, float] = (5.0, 90.0),
+    usage_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> bytes:
+    """generate_image for the asyncio lane (AsyncJobManager); same payload, errors and result."""
+    payload = _image_payload(
+        model=model, prompt=prompt, images=images, aspect_ratio=aspect_ratio, resolution=resolution, quality=quality
+    )
+    data = await _apost("images", payload, timeout=timeout, context="image")
+    return _image_result(data, model=payload["model"], usage_callback=usage_callback)
+
+
 def generate_text(
     *,
     prompt: str,
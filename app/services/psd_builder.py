@@ -97,28 +97,36 @@ def collect_seethrough_parts(layers_json_path: str) -> list[dict]:
     return parts
 
 
-def cleanup_seethrough_output(layers_json_path: str) -> int:
+def seethrough_output_files(layers_json_path: str) -> list[str]:
     """
-    See-through가 ComfyUI output 폴더에 생성한 파일들을 삭제.
+    See-through가 ComfyUI output 폴더에 생성한 파일 목록 (layers.json + 레이어/깊이 PNG).
 
-    Returns:
-        삭제된 파일 수
+    metadata JSON을 읽지 못하면 layers.json 하나만 반환합니다.
     """
-    removed = 0
+    files = [layers_json_path]
     try:
         with open(layers_json_path, "r", encoding="utf-8") as f:
             meta = json.load(f)
     except Exception:
-        return 0
+        return files
 
-    files_to_remove = [layers_json_path]
     for layer_info in meta.get("layers", []):
         if layer_info.get("filename"):
-            files_to_remove.append(layer_info["filename"])
+            files.append(layer_info["filename"])
         if layer_info.get("depth_filename"):
-            files_to_remove.append(layer_info["depth_filename"])
+            files.append(layer_info["depth_filename"])
+    return files
+
+
+def cleanup_seethrough_output(layers_json_path: str) -> int:
+    """
+    See-through가 ComfyUI output 폴더에 생성한 파일들을 삭제.
 
-    for fpath in files_to_remove:
+    Returns:
+        삭제된 파일 수
+    """
+    removed = 0
+    for fpath in seethrough_output_files(layers_json_path):
         try:
             if os.path.exists(fpath):
                 os.remove(fpath)
@@ -44,6 +44,10 @@ WORKFLOW_CONFIGS: Dict[str, Dict[str, Any]] = {
         },
         # RMBG 워크플로우 파라미터가 적용되는 노드 정보 (RMBG2.json 기준)
         "rmbg": {"node": "11"},
+        # 결과로 사용할 출력 노드 (PreviewImage). 이 노드의 결과만 내려받습니다.
+        "output_nodes": ["7"],
+        # 같은 입력 이미지 + 같은 파라미터면 결과가 같으므로 이전 결과를 재사용합니다 (RESULT_CACHE_*).
+        "result_cache": True,
     },
 
     "NanoBanana": {
@@ -522,6 +526,8 @@ WORKFLOW_CONFIGS: Dict[str, Dict[str, Any]] = {
 
         # 이미지 사이즈/비율은 사용하지 않음
         "sizes": {},
+        # 결과로 사용할 출력 노드 (SaveAudioMP3)
+        "output_nodes": ["107"],
 
         # 오디오 전용 설정
         "audio_workflow": True,
@@ -0,0 +1,160 @@
+"""
+Parsed ComfyUI workflow graphs (workflows/*.json), cached by path + mtime.
+
+Each job used to re-read and json.load its workflow file and merge prompt overrides into it.
+The cache parses a file once and builds per-request graphs copy-on-write: only the nodes an
+override touches are copied, every other node is shared with the cached template (templates
+are never mutated). A changed file (mtime/size) is re-parsed on the next use.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Mapping, Tuple
+
+
+# Config keys that name a workflow node: prompt_node, seed_node, image_node, node,
+# duration_node_latent, width_node, additionalPromptTargetNode, ...
+_NODE_KEY = re.compile(r"(?:^|_)node(?:_|$)|Node$")
+
+
+class WorkflowTemplate:
+    def __init__(self, path: str, graph: Dict[str, Any], stamp: Tuple[int, int], digest: str = ""):
+        self.path = path
+        self.graph = graph
+        self.stamp = stamp
+        # sha256 of the file bytes (part of the result cache key)
+        self.digest = digest
+        self.node_ids = frozenset(str(node_id) for node_id in graph)
+
+    def missing_nodes(self, overrides: Mapping[str, Any]) -> List[str]:
+        return sorted(str(node_id) for node_id in overrides if str(node_id) not in self.node_ids)
+
+    def build(self, overrides: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Request graph with overrides applied; untouched nodes are shared with the template.
+
+        Same merge rule as before: `inputs` are merged key by key, any other top-level key
+        (e.g. class_type) replaces the node's value.
+        """
+        graph = dict(self.graph)
+        for node_id, override in overrides.items():
+            node = graph.get(node_id)
+            if not isinstance(node, dict) or not isinstance(override, Mapping):
+                continue
+            node = dict(node)
+            if "inputs" in node and "inputs" in override:
+                node["inputs"] = {**node["inputs"], **override["inputs"]}
+            else:
+                node.update(override)
+            graph[node_id] = node
+        return graph
+
+
+class WorkflowTemplateCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates: Dict[str, WorkflowTemplate] = {}
+        self._metrics = {"hits": 0, "misses": 0, "reloads": 0}
+        # workflow_id -> config node references missing from the graph (last warm())
+        self._invalid: Dict[str, List[str]] = {}
+        self._logger = logging.getLogger("comfyui_app")
+
+    def get(self, path: str) -> WorkflowTemplate:
+        """Raises FileNotFoundError / json.JSONDecodeError like the json.load it replaces."""
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._templates.get(key)
+            if cached is not None and cached.stamp == stamp:
+                self._metrics["hits"] += 1
+                return cached
+        with open(key, "rb") as f:
+            raw = f.read()
+        graph = json.loads(raw.decode("utf-8"))
+        if not isinstance(graph, dict):
+            raise json.JSONDecodeError("workflow graph must be a JSON object", "", 0)
+        template = WorkflowTemplate(key, graph, stamp, hashlib.sha256(raw).hexdigest())
+        with self._lock:
+            self._metrics["misses"] += 1
+            if cached is not None:
+                self._metrics["reloads"] += 1
+            self._templates[key] = template
+        return template
+
+    def warm(self, workflow_configs: Mapping[str, Mapping[str, Any]], workflow_dir: str) -> Dict[str, List[str]]:
+        """
+        Parse every workflow file that has a config and check its node references.
+
+        Returns {workflow_id: ["prompt_node=94", ...]} for references missing from the graph;
+        these would otherwise show up as override_missing_node on the first job.
+        """
+        invalid: Dict[str, List[str]] = {}
+        for workflow_id, cfg in (workflow_configs or {}).items():
+            path = os.path.join(workflow_dir, f"{workflow_id}.json")
+            if not os.path.exists(path):
+                continue
+            try:
+                template = self.get(path)
+            except Exception as e:
+                invalid[workflow_id] = [f"unreadable: {e}"]
+                continue
+            missing = [f"{field}={node}" for field, node in config_node_refs(cfg) if node not in template.node_ids]
+            if missing:
+                invalid[workflow_id] = missing
+        with self._lock:
+            self._invalid = invalid
+        for workflow_id, problems in invalid.items():
+            try:
+                self._logger.warning({"event": "workflow_override_missing_node", "workflow_id": workflow_id, "refs": problems})
+            except Exception:
+                pass
+        return invalid
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._metrics)
+            data["templates"] = len(self._templates)
+            data["invalid"] = {k: list(v) for k, v in self._invalid.items()}
+        lookups = data["hits"] + data["misses"]
+        data["hit_ratio"] = round(data["hits"] / lookups, 3) if lookups else None
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+def config_node_refs(cfg: Any, prefix: str = "") -> List[Tuple[str, str]]:
+    """(field path, node id) pairs a workflow config points at; "_"-prefixed ids are virtual."""
+    refs: List[Tuple[str, str]] = []
+
+    def _walk(value: Any, path: str):
+        if isinstance(value, Mapping):
+            for key, item in value.items():
+                child = f"{path}.{key}" if path else str(key)
+                if key == "audio_fixed_params" and isinstance(item, Mapping):
+                    refs.extend((f"{child}.{node}", str(node)) for node in item)
+                elif key == "output_nodes" and isinstance(item, (list, tuple)):
+                    refs.extend((f"{child}[{index}]", str(node)) for index, node in enumerate(item))
+                elif _NODE_KEY.search(str(key)) and isinstance(item, (str, int)) and not isinstance(item, bool):
+                    node = str(item)
+                    if node and not node.startswith("_"):
+                        refs.append((child, node))
+                else:
+                    _walk(item, child)
+        elif isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                _walk(item, f"{path}[{index}]")
+
+    _walk(cfg, prefix)
+    return refs
+
+
+workflow_templates = WorkflowTemplateCache()
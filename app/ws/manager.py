@@ -1,4 +1,5 @@
 import asyncio
+import threading
 from fastapi import WebSocket
 from ..logging_utils import setup_logging
 
@@ -11,6 +12,10 @@ class ConnectionManager:
         self.active_connections: list[WebSocket] = []
         self.user_to_conns: dict[str, list[WebSocket]] = {}
         self.loop: asyncio.AbstractEventLoop | None = None
+        # Sockets that opted in to live preview frames (/ws/status?previews=1 or a "previews" message)
+        self.preview_conns: set[WebSocket] = set()
+        self._preview_lock = threading.Lock()
+        self._preview_metrics = {"frames_sent": 0, "bytes_sent": 0, "deliveries": 0}
 
     def set_loop(self, loop: asyncio.AbstractEventLoop):
         self.loop = loop
@@ -25,6 +30,7 @@ class ConnectionManager:
             self.active_connections.remove(websocket)
         except ValueError:
             pass
+        self.preview_conns.discard(websocket)
         lst = self.user_to_conns.get(user_id)
         if lst and websocket in lst:
             lst.remove(websocket)
@@ -42,6 +48,41 @@ class ConnectionManager:
         tasks = [ws.send_json(data) for ws in list(conns)]
         await asyncio.gather(*tasks, return_exceptions=True)
 
+    def set_previews(self, websocket: WebSocket, enabled: bool):
+        if enabled:
+            self.preview_conns.add(websocket)
+        else:
+            self.preview_conns.discard(websocket)
+
+    def wants_previews(self, user_id: str) -> bool:
+        """Whether any of the user's sockets subscribed to preview frames (checked before encoding)."""
+        return any(ws in self.preview_conns for ws in list(self.user_to_conns.get(user_id, ())))
+
+    async def send_preview_to_user(self, user_id: str, data: dict):
+        conns = [ws for ws in list(self.user_to_conns.get(user_id, ())) if ws in self.preview_conns]
+        if not conns:
+            return
+        with self._preview_lock:
+            self._preview_metrics["deliveries"] += len(conns)
+        await asyncio.gather(*(ws.send_json(data) for ws in conns), return_exceptions=True)
+
+    def send_preview_from_worker(self, user_id: str, data: dict, size: int = 0):
+        if not self.loop:
+            return
+        with self._preview_lock:
+            self._preview_metrics["frames_sent"] += 1
+            self._preview_metrics["bytes_sent"] += int(size)
+        try:
+            asyncio.run_coroutine_threadsafe(self.send_preview_to_user(user_id, data), self.loop)
+        except Exception as e:
+            logger.debug({"event": "ws_preview_send_failed", "owner_id": user_id, "error": str(e)})
+
+    def preview_metrics(self) -> dict:
+        with self._preview_lock:
+            data = dict(self._preview_metrics)
+        data["subscribers"] = len(self.preview_conns)
+        return data
+
     def send_from_worker(self, user_id: str, data: dict):
         if not self.loop:
             return
@@ -0,0 +1,117 @@
+"""
+Live ComfyUI preview frames for the job owner's status socket.
+
+ComfyUI sends a latent preview (JPEG/PNG) every sampler step. Per job, frames are held in a
+single slot (latest frame wins) and forwarded at most max_fps times per second, downscaled to a
+max_side WEBP, and only when one of the owner's sockets opted in to previews; otherwise the
+frame is dropped before it is decoded, so the cost is bounded by subscribers x max_fps.
+"""
+
+import base64
+import threading
+import time
+from io import BytesIO
+from typing import Callable, Optional
+
+try:
+    from PIL import Image
+except Exception:  # Pillow is optional: previews are simply not forwarded
+    Image = None
+
+from ..config import PREVIEW_CONFIG
+from ..logging_utils import setup_logging
+from .manager import ConnectionManager, manager as default_manager
+
+
+logger = setup_logging()
+
+
+def encode_preview(image_bytes: bytes, *, max_side: int, quality: int) -> Optional[tuple[bytes, int, int]]:
+    """(webp bytes, width, height) of a downscaled frame, or None when it cannot be decoded."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(BytesIO(image_bytes)) as im:
+            im = im.convert("RGB")
+            im.thumbnail((max_side, max_side))
+            out = BytesIO()
+            im.save(out, format="WEBP", quality=quality, method=0)
+            return out.getvalue(), im.width, im.height
+    except Exception:
+        return None
+
+
+class PreviewForwarder:
+    """Throttles one job's preview frames; offer() runs in the job's worker thread."""
+
+    def __init__(
+        self,
+        job_id: str,
+        owner_id: str,
+        *,
+        manager: ConnectionManager = default_manager,
+        max_fps: float = 2.0,
+        max_side: int = 256,
+        quality: int = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.job_id = job_id
+        self.owner_id = owner_id
+        self.manager = manager
+        self.interval = 1.0 / max(0.1, float(max_fps))
+        self.max_side = int(max_side)
+        self.quality = int(quality)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: Optional[bytes] = None
+        self._last_sent = float("-inf")
+        self.received = 0
+        self.sent = 0
+
+    def offer(self, image_bytes: bytes):
+        """Keep the newest frame; send it now if the rate allows."""
+        with self._lock:
+            self.received += 1
+            self._pending = image_bytes
+        self.flush()
+
+    def flush(self):
+        """Send the held frame once the interval has passed (also called on progress ticks)."""
+        with self._lock:
+            frame = self._pending
+            now = self._clock()
+            if frame is None or now - self._last_sent < self.interval:
+                return
+            self._pending = None
+            self._last_sent = now
+        if not self.manager.wants_previews(self.owner_id):
+            return
+        encoded = encode_preview(frame, max_side=self.max_side, quality=self.quality)
+        if encoded is None:
+            return
+        data, width, height = encoded
+        self.sent += 1
+        self.manager.send_preview_from_worker(
+            self.owner_id,
+            {
+                "type": "preview",
+                "job_id": self.job_id,
+                "width": width,
+                "height": height,
+                "image": "data:image/webp;base64," + base64.b64encode(data).decode("ascii"),
+            },
+            size=len(data),
+        )
+
+
+def preview_forwarder_for(job_id: str, owner_id: str) -> Optional[PreviewForwarder]:
+    """Forwarder configured from PREVIEW_CONFIG, or None when previews are disabled."""
+    if not PREVIEW_CONFIG["enabled"] or Image is None:
+        return None
+    return PreviewForwarder(
+        job_id,
+        owner_id,
+        max_fps=PREVIEW_CONFIG["max_fps"],
+        max_side=PREVIEW_CONFIG["max_side"],
+        quality=PREVIEW_CONFIG["quality"],
+    )
@@ -1,3 +1,4 @@
+import json
 from fastapi import APIRouter, WebSocket
 from ..logging_utils import setup_logging
 from ..auth.user_management import _get_anon_id_from_ws
@@ -16,9 +17,18 @@ async def websocket_status(websocket: WebSocket):
     user_id = _get_anon_id_from_ws(websocket)
     logger.info({"event": "ws_connect", "owner_id": user_id})
     await manager.connect(websocket, user_id)
+    # Live preview frames are opt-in per socket: ?previews=1, or {"type": "previews", "enabled": true}.
+    if str(websocket.query_params.get("previews") or "").lower() in ("1", "true", "yes", "on"):
+        manager.set_previews(websocket, True)
     try:
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("type") == "previews":
+                manager.set_previews(websocket, bool(message.get("enabled")))
     except Exception as e:
         # Distinguish normal disconnects if needed by checking type
         try:
@@ -0,0 +1,148 @@
+"""Compare the OpenRouter lane executors: one thread per job (JobManager) vs one event loop (AsyncJobManager)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+MODEL = "google/gemini-3-pro-image"
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _manager(executor: str, jobs: int):
+    from app.job_manager import AsyncJobManager, JobManager
+    from app.services.openrouter_client import agenerate_image, generate_image
+
+    # Stub jobs: only the provider call, the part a job spends almost all of its time in.
+    if executor == "asyncio":
+        manager = AsyncJobManager(worker_count=jobs)
+
+        async def _job(job, progress_cb):
+            await agenerate_image(model=MODEL, prompt=job.payload["prompt"])
+
+        manager.register_async_processor("generate", _job)
+    else:
+        manager = JobManager(worker_count=jobs)
+        manager.register_processor("generate", lambda job, progress_cb: generate_image(model=MODEL, prompt=job.payload["prompt"]))
+    return manager
+
+
+def _wait_all(manager, jobs) -> None:
+    while any(manager.get(job.id).status not in ("complete", "error", "cancelled") for job in jobs):
+        time.sleep(0.01)
+
+
+def _run(executor: str, jobs: int) -> dict:
+    """One executor in this process (the parent starts a fresh interpreter per executor)."""
+    import logging
+
+    logging.getLogger("comfyui_app").setLevel(logging.WARNING)
+    manager = _manager(executor, jobs)
+    # Threads and memory count everything the lane adds (its threads, HTTP clients, in-flight jobs);
+    # time and context switches start after one warm-up job.
+    rss_before = _rss_kb()
+    threads_before = threading.active_count()
+    peak = {"threads": threads_before, "rss_kb": rss_before}
+    done = threading.Event()
+
+    def _sample():
+        while not done.wait(0.05):
+            peak["threads"] = max(peak["threads"], threading.active_count())
+            peak["rss_kb"] = max(peak["rss_kb"], _rss_kb())
+
+    sampler = threading.Thread(target=_sample, name="bench-sampler", daemon=True)
+    sampler.start()
+    manager.start()
+    _wait_all(manager, [manager.enqueue("warmup", "generate", {"prompt": "warmup"})])
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    queued = [manager.enqueue(f"user{i}", "generate", {"prompt": f"job {i}"}) for i in range(jobs)]
+    _wait_all(manager, queued)
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    errors = [manager.get(job.id).error for job in queued if manager.get(job.id).status != "complete"]
+    manager.stop()
+    return {
+        "executor": executor,
+        "jobs": jobs,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed_sec": round(elapsed, 2),
+        # the sampler thread is excluded
+        "peak_extra_threads": peak["threads"] - threads_before - 1,
+        "rss_growth_mb": round((peak["rss_kb"] - rss_before) / 1024.0, 1),
+        "voluntary_ctx_switches": usage_after.ru_nvcsw - usage_before.ru_nvcsw,
+        "involuntary_ctx_switches": usage_after.ru_nivcsw - usage_before.ru_nivcsw,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=64, help="concurrent stub jobs (lane concurrency = jobs)")
+    parser.add_argument("--latency", type=float, default=2.0, help="stand-in OpenRouter response time")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--executor", choices=("threads", "asyncio"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    jobs = max(1, args.jobs)
+
+    if args.executor:
+        print(json.dumps(_run(args.executor, jobs)))
+        return
+
+    # The stand-in server runs in its own process so its threads do not count against the lane.
+    server = subprocess.Popen(
+        [sys.executable, "-u", "-m", "scripts.fake_openrouter", "--port", "0", "--latency", str(args.latency)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        base_url = server.stdout.readline().strip().rsplit(" ", 1)[-1]
+        env = {**os.environ, "OPENROUTER_API_KEY": "bench", "OPENROUTER_BASE_URL": base_url}
+        results = {}
+        for executor in ("threads", "asyncio"):
+            out = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_async_lane", "--executor", executor, "--jobs", str(jobs)],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results[executor] = json.loads(out.stdout.strip().splitlines()[-1])
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{jobs} concurrent jobs, {args.latency:g}s provider latency")
+    print(f"{'executor':<9} {'elapsed':>8} {'threads':>8} {'rss +MB':>8} {'vol cs':>8} {'invol cs':>9} {'errors':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:<9} {r['elapsed_sec']:>7.2f}s {r['peak_extra_threads']:>8} {r['rss_growth_mb']:>8.1f} "
+            f"{r['voluntary_ctx_switches']:>8} {r['involuntary_ctx_switches']:>9} {r['errors']:>7}"
+        )
+        if r["first_error"]:
+            print(f"  {name}: {r['first_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compare per-job ComfyUI HTTP overhead: one-off requests vs the shared keep-alive session."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import requests
+
+from app.comfy_client import ComfyUIClient, close_http_pools, http_pool_metrics
+from scripts.fake_comfyui import PNG_BYTES, serve
+
+
+class _OneShotClient(ComfyUIClient):
+    """The previous behaviour: a top-level requests call (new TCP connection) per request."""
+
+    class _Direct:
+        def request(self, stage, method, url, **kwargs):
+            return requests.request(method, url, **kwargs)
+
+    def _http(self):
+        return self._Direct()
+
+
+def _job(client: ComfyUIClient, workflow_path: str) -> None:
+    # The HTTP calls of one img2img job: upload, queue, history once, download.
+    client.upload_image_to_input("input.png", PNG_BYTES)
+    prompt_id = client.queue_prompt(workflow_path, {"1": {"inputs": {"seed": 1}}})["prompt_id"]
+    client._download_outputs(prompt_id)
+
+
+def _run(client_cls, address: str, workflow_path: str, jobs: int) -> dict:
+    timings = []
+    for _ in range(jobs):
+        client = client_cls(address)
+        start = time.perf_counter()
+        _job(client, workflow_path)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {
+        "jobs": jobs,
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "p95_ms": round(timings[int(0.95 * (len(timings) - 1))], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    server, state = serve()
+    address = f"127.0.0.1:{server.server_address[1]}"
+    with tempfile.TemporaryDirectory() as directory:
+        workflow_path = os.path.join(directory, "workflow.json")
+        with open(workflow_path, "w", encoding="utf-8") as f:
+            json.dump({"1": {"class_type": "KSampler", "inputs": {"seed": 0}}}, f)
+
+        results = {}
+        for name, cls in (("one_shot", _OneShotClient), ("pooled", ComfyUIClient)):
+            before = state.connections
+            results[name] = _run(cls, address, workflow_path, max(1, args.jobs))
+            results[name]["tcp_connections"] = state.connections - before
+        results["pooled"]["pool"] = http_pool_metrics().get(f"http://{address}")
+    server.shutdown()
+    close_http_pools()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<10} {'mean/job':>10} {'p95/job':>10} {'tcp conns':>10}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['mean_ms']:>8.2f}ms {result['p95_ms']:>8.2f}ms {result['tcp_connections']:>10}")
+    pool = results["pooled"].get("pool") or {}
+    print(f"pooled session: {pool.get('requests')} requests, {pool.get('connections_reused')} reused connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""Minimal stand-in ComfyUI server (HTTP + /ws events) for tests and local benchmarks (no GPU, no models)."""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+import socket
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+# 1x1 transparent PNG
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_WS_TEXT, _WS_BINARY, _WS_CLOSE, _WS_PING, _WS_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+# server.BinaryEventTypes.PREVIEW_IMAGE_WITH_METADATA
+_PREVIEW_WITH_METADATA = 4
+
+
+def ws_frame(opcode: int, payload: bytes) -> bytes:
+    """One unmasked (server to client) websocket frame."""
+    size = len(payload)
+    if size < 126:
+        header = struct.pack(">BB", 0x80 | opcode, size)
+    elif size < 65536:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, size)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, size)
+    return header + payload
+
+
+def _read_ws_frame(rfile) -> Optional[tuple[int, bytes]]:
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None
+    opcode, size = head[0] & 0x0F, head[1] & 0x7F
+    if size == 126:
+        size = struct.unpack(">H", rfile.read(2))[0]
+    elif size == 127:
+        size = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b""
+    payload = rfile.read(size)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class _WsClient:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, opcode: int, payload: bytes) -> bool:
+        with self.lock:
+            if self.closed:
+                return False
+            try:
+                self.sock.sendall(ws_frame(opcode, payload))
+                return True
+            except OSError:
+                self.closed = True
+                return False
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class FakeComfyState:
+    """
+    Prompts execute one at a time in queue order, run_seconds each (like one GPU).
+
+    Websocket clients (/ws?clientId=) receive the events of the prompts queued with their
+    client_id: execution_start, executing, `steps` progress messages (each followed by a
+    binary preview frame when previews is set), executed and the final executing(node=None),
+    or execution_interrupted. Every HTTP response is delayed by latency seconds, /view
+    returns output, and each prompt produces outputs_per_prompt images on output_node
+    (default: the graph's Save*/Preview* nodes, or "9").
+    """
+
+    def __init__(
+        self,
+        run_seconds: float = 0.0,
+        *,
+        steps: int = 4,
+        previews: bool = False,
+        latency: float = 0.0,
+        output: bytes = PNG_BYTES,
+        output_node: Optional[str] = None,
+        outputs_per_prompt: int = 1,
+    ):
+        self.run_seconds = max(0.0, float(run_seconds))
+        self.steps = max(0, int(steps))
+        self.previews = bool(previews)
+        self.latency = max(0.0, float(latency))
+        self.output = output
+        self.output_node = str(output_node) if output_node else None
+        self.outputs_per_prompt = max(1, int(outputs_per_prompt))
+        self.lock = threading.Lock()
+        self.prompts: dict[str, dict] = {}
+        self.connections = 0
+        self.requests = 0
+        self.interrupts = 0
+        self.interrupted: list[str] = []
+        self.deleted: list[str] = []
+        self.uploads: list[str] = []
+        self.ws_connections = 0
+        self.clients: dict[str, list[_WsClient]] = {}
+        # GET /object_info (node schema); empty = the app treats the schema as unknown
+        self.object_info: dict = {}
+        self._stop = threading.Event()
+
+    def queue(self, prompt: dict, client_id: Optional[str] = None) -> str:
+        prompt_id = str(uuid.uuid4())
+        now = time.time()
+        with self.lock:
+            busy_until = max([item["finish_at"] for item in self.prompts.values()] + [now])
+            self.prompts[prompt_id] = {
+                "prompt": prompt,
+                "client_id": client_id,
+                "queued_at": now,
+                "start_at": busy_until,
+                "finish_at": busy_until + self.run_seconds,
+                "interrupted": False,
+                "sent": "queued",  # websocket events already emitted: queued -> running -> done
+                "progress": 0,
+                "output_nodes": self._output_nodes(prompt),
+            }
+        return prompt_id
+
+    def _output_nodes(self, prompt: dict) -> list[str]:
+        if self.output_node:
+            return [self.output_node]
+        nodes = [
+            str(node_id)
+            for node_id, node in (prompt or {}).items()
+            if isinstance(node, dict) and re.search(r"(^|_)(Save|Preview)", str(node.get("class_type") or ""))
+        ]
+        return nodes or ["9"]
+
+    def _outputs(self, prompt_id: str, output_nodes: list[str]) -> dict:
+        outputs = {}
+        for position, node_id in enumerate(output_nodes):
+            outputs[node_id] = {
+                "images": [
+                    {
+                        "filename": f"{prompt_id}{'' if position == index == 0 else f'_{node_id}_{index}'}.png",
+                        "subfolder": "",
+                        "type": "output",
+                    }
+                    for index in range(self.outputs_per_prompt)
+                ]
+            }
+        return outputs
+
+    def history(self, prompt_id: str) -> dict:
+        with self.lock:
+            item = self.prompts.get(prompt_id)
+        if item is None or time.time() < item["finish_at"]:
+            return {}
+        entry = {"prompt": [0, prompt_id, item["prompt"]]}
+        if item["interrupted"]:
+            entry["outputs"] = {}
+            entry["status"] = {
+                "status_str": "error",
+                "completed": False,
+                "messages": [["execution_interrupted", {"prompt_id": prompt_id}]],
+            }
+        else:
+            entry["outputs"] = self._outputs(prompt_id, item["output_nodes"])
+            entry["status"] = {"status_str": "success", "completed": True}
+        return {prompt_id: entry}
+
+    def queue_state(self) -> dict:
+        now = time.time()
+        running, pending = [], []
+        with self.lock:
+            for number, (prompt_id, item) in enumerate(self.prompts.items()):
+                entry = [number, prompt_id, item["prompt"], {}, []]
+                if item["start_at"] <= now < item["finish_at"]:
+                    running.append(entry)
+                elif now < item["start_at"]:
+                    pending.append(entry)
+        return {"queue_running": running, "queue_pending": pending}
+
+    def _reschedule_locked(self, now: float) -> None:
+        """Prompts that have not started move up behind whatever still runs (lock held)."""
+        busy_until = now
+        for item in self.prompts.values():
+            if item["start_at"] > now:
+                item["start_at"] = max(busy_until, item["queued_at"])
+                item["finish_at"] = item["start_at"] + self.run_seconds
+            busy_until = max(busy_until, item["finish_at"])
+
+    def delete(self, prompt_ids) -> None:
+        """Drop prompts that have not started; later prompts move up."""
+        now = time.time()
+        with self.lock:
+            for prompt_id in prompt_ids:
+                item = self.prompts.get(prompt_id)
+                if item is not None and item["start_at"] > now:
+                    del self.prompts[prompt_id]
+                    self.deleted.append(prompt_id)
+            self._reschedule_locked(now)
+
+    def interrupt(self, prompt_id: Optional[str] = None) -> Optional[str]:
+        """
+        Stop the running prompt (only if it is prompt_id, when given); returns the stopped id.
+
+        Like ComfyUI, an interrupt that arrives when nothing (or another prompt) runs is a no-op.
+        """
+        now = time.time()
+        with self.lock:
+            self.interrupts += 1
+            running = next(
+                (pid for pid, item in self.prompts.items() if item["start_at"] <= now < item["finish_at"]),
+                None,
+            )
+            if running is None or (prompt_id and prompt_id != running):
+                return None
+            item = self.prompts[running]
+            item["interrupted"] = True
+            item["finish_at"] = now
+            self.interrupted.append(running)
+            self._reschedule_locked(now)
+        return running
+
+    # ---- websocket events ----
+
+    def attach(self, client_id: str, sock: socket.socket) -> _WsClient:
+        client = _WsClient(sock)
+        with self.lock:
+            self.clients.setdefault(client_id, []).append(client)
+            self.ws_connections += 1
+        return client
+
+    def detach(self, client_id: str, client: _WsClient) -> None:
+        with self.lock:
+            clients = self.clients.get(client_id) or []
+            if client in clients:
+                clients.remove(client)
+            if not clients:
+                self.clients.pop(client_id, None)
+
+    def _events_locked(self, prompt_id: str, item: dict, now: float) -> list[tuple[int, bytes]]:
+        """Websocket frames that became due for one prompt since the last tick (lock held)."""
+        if item["sent"] == "done" or now < item["start_at"]:
+            return []
+        node = next(iter(item["prompt"] or {}), None)
+        frames: list[tuple[int, bytes]] = []
+
+        def text(kind: str, **data):
+            frames.append((_WS_TEXT, json.dumps({"type": kind, "data": {**data, "prompt_id": prompt_id}}).encode("utf-8")))
+
+        if item["sent"] == "queued":
+            item["sent"] = "running"
+            text("execution_start", timestamp=int(now * 1000))
+            text("executing", node=node, display_node=node)
+        if item["interrupted"]:
+            item["sent"] = "done"
+            text("execution_interrupted", node_id=node, node_type="", executed=[], timestamp=int(now * 1000))
+            return frames
+        duration = item["finish_at"] - item["start_at"]
+        due = self.steps if duration <= 0 else min(self.steps, int(self.steps * (now - item["start_at"]) / duration))
+        while item["progress"] < due:
+            item["progress"] += 1
+            text("progress", value=item["progress"], max=self.steps, node=node)
+            if self.previews:
+                metadata = json.dumps({"prompt_id": prompt_id, "node_id": node, "image_type": "image/png"}).encode("utf-8")
+                frames.append((_WS_BINARY, struct.pack(">II", _PREVIEW_WITH_METADATA, len(metadata)) + metadata + self.output))
+        if now >= item["finish_at"]:
+            item["sent"] = "done"
+            for output_node, output in self._outputs(prompt_id, item["output_nodes"]).items():
+                text("executed", node=output_node, display_node=output_node, output=output)
+            text("executing", node=None)
+        return frames
+
+    def tick(self) -> int:
+        """Send every event that is due; returns the number of frames sent."""
+        now = time.time()
+        pending = []
+        with self.lock:
+            for prompt_id, item in self.prompts.items():
+                frames = self._events_locked(prompt_id, item, now)
+                clients = list(self.clients.get(item["client_id"]) or ()) if frames else []
+                pending.extend((client, frame) for client in clients for frame in frames)
+        sent = 0
+        for client, (opcode, payload) in pending:
+            sent += int(client.send(opcode, payload))
+        return sent
+
+    def run_events(self, interval: float = 0.005) -> None:
+        while not self._stop.wait(interval):
+            self.tick()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self.lock:
+            clients = [client for group in self.clients.values() for client in group]
+        for client in clients:
+            client.close()
+
+
+def make_handler(state: FakeComfyState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        # One write per response; split header/body writes stall keep-alive clients on delayed ACKs.
+        wbufsize = 64 * 1024
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+            if state.latency:
+                time.sleep(state.latency)
+            with state.lock:
+                state.requests += 1
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, data, status: int = 200):
+            self._send(status, json.dumps(data).encode("utf-8"))
+
+        def _websocket(self, client_id: str):
+            key = self.headers.get("Sec-WebSocket-Key")
+            if not key or (self.headers.get("Upgrade") or "").lower() != "websocket":
+                self._json({"error": "websocket upgrade required"}, 400)
+                return
+            accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode("ascii")).digest()).decode("ascii")
+            self.send_response(101, "Switching Protocols")
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+            self.close_connection = True
+            client = state.attach(client_id, self.connection)
+            # ComfyUI greets every socket with the queue status and its session id.
+            queued = state.queue_state()
+            remaining = len(queued["queue_running"]) + len(queued["queue_pending"])
+            status = {"status": {"exec_info": {"queue_remaining": remaining}}, "sid": client_id}
+            client.send(_WS_TEXT, json.dumps({"type": "status", "data": status}).encode("utf-8"))
+            try:
+                while True:
+                    frame = _read_ws_frame(self.rfile)
+                    if frame is None:
+                        break
+                    opcode, payload = frame
+                    if opcode == _WS_CLOSE:
+                        client.send(_WS_CLOSE, payload[:2])
+                        break
+                    if opcode == _WS_PING:
+                        client.send(_WS_PONG, payload)
+            except OSError:
+                pass
+            finally:
+                state.detach(client_id, client)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/ws":
+                self._websocket(parse_qs(url.query).get("clientId", [""])[0] or uuid.uuid4().hex)
+            elif url.path.startswith("/history/"):
+                self._json(state.history(url.path.rsplit("/", 1)[-1]))
+            elif url.path == "/view":
+                self._send(200, state.output, "image/png")
+            elif url.path == "/queue":
+                self._json(state.queue_state())
+            elif url.path == "/object_info":
+                with state.lock:
+                    object_info = dict(state.object_info)
+                self._json(object_info)
+            elif url.path in ("/", "/system_stats"):
+                self._json({"system": {"comfyui_version": "fake"}, "devices": []})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._body()
+            if url.path == "/prompt":
+                payload = json.loads(body or b"{}")
+                prompt_id = state.queue(payload.get("prompt") or {}, payload.get("client_id"))
+                self._json({"prompt_id": prompt_id, "number": 0, "node_errors": {}})
+            elif url.path == "/upload/image":
+                # multipart form: the file part is named "image"
+                found = re.search(rb'name="image"; filename="([^"]+)"', body)
+                name = found.group(1).decode("utf-8", "replace") if found else None
+                name = name or parse_qs(url.query).get("name", [f"{uuid.uuid4().hex}.png"])[0]
+                with state.lock:
+                    state.uploads.append(name)
+                self._json({"name": name, "subfolder": "", "type": "input"})
+            elif url.path == "/queue":
+                state.delete((json.loads(body or b"{}").get("delete") or []))
+                self._json({})
+            elif url.path == "/interrupt":
+                state.interrupt((json.loads(body or b"{}") or {}).get("prompt_id"))
+                self._json({})
+            else:
+                self._json({"error": "not found"}, 404)
+
+    return Handler
+
+
+class FakeComfyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state: FakeComfyState):
+        self.state = state
+        super().__init__(address, make_handler(state))
+
+    def server_close(self):
+        self.state.stop()
+        super().server_close()
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, run_seconds: float = 0.0, **options):
+    """
+    Start in daemon threads; returns (server, state). Use server.server_address for the port.
+
+    options are passed to FakeComfyState (steps, previews, latency, output, ...).
+    """
+    state = FakeComfyState(run_seconds, **options)
+    server = FakeComfyServer((host, port), state)
+    threading.Thread(target=server.serve_forever, name="fake-comfyui", daemon=True).start()
+    threading.Thread(target=state.run_events, name="fake-comfyui-events", daemon=True).start()
+    return server, state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--run-seconds", type=float, default=2.0, help="simulated generation time per prompt")
+    parser.add_argument("--steps", type=int, default=4, help="progress messages per prompt")
+    parser.add_argument("--previews", action="store_true", help="send a binary preview frame with each step")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay before every HTTP response (seconds)")
+    args = parser.parse_args()
+    server, _state = serve(
+        args.host, args.port, args.run_seconds, steps=args.steps, previews=args.previews, latency=args.latency
+    )
+    print(f"fake ComfyUI on http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
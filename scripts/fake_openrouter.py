@@ -0,0 +1,215 @@
+"""Minimal stand-in OpenRouter API (/images, /chat/completions) for tests and local load runs."""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+from scripts.fake_comfyui import PNG_BYTES
+
+
+def _count_image_parts(value: Any) -> int:
+    """image_url parts in an input_references list or a chat message content list."""
+    if not isinstance(value, list):
+        return 0
+    return sum(1 for part in value if isinstance(part, dict) and part.get("type") == "image_url")
+
+
+class FakeOpenRouterState:
+    """
+    Answers after latency seconds with image (base64) or a short text completion.
+
+    429s are injected on every rate_limit_every-th request and whenever more than max_rps
+    requests arrive in one second (token bucket), with a Retry-After of retry_after seconds.
+    Each request is recorded in calls (path, model, prompt, references, timing, status).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        *,
+        image: bytes = PNG_BYTES,
+        rate_limit_every: int = 0,
+        max_rps: float = 0.0,
+        retry_after: int = 1,
+    ):
+        self.latency = max(0.0, float(latency))
+        self.image = image
+        self.rate_limit_every = max(0, int(rate_limit_every))
+        self.max_rps = max(0.0, float(max_rps))
+        self.retry_after = max(0, int(retry_after))
+        self.lock = threading.Lock()
+        self.calls: list[dict] = []
+        self.rate_limited = 0
+        self._count = 0
+        self._tokens = self.max_rps
+        self._refilled_at = time.monotonic()
+
+    def admit(self) -> bool:
+        """False when this request should be answered with 429."""
+        with self.lock:
+            self._count += 1
+            if self.rate_limit_every and self._count % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                return False
+            if self.max_rps > 0:
+                now = time.monotonic()
+                self._tokens = min(max(1.0, self.max_rps), self._tokens + (now - self._refilled_at) * self.max_rps)
+                self._refilled_at = now
+                if self._tokens < 1.0:
+                    self.rate_limited += 1
+                    return False
+                self._tokens -= 1.0
+            return True
+
+    def record(self, call: dict) -> None:
+        with self.lock:
+            self.calls.append(call)
+
+    def image_url(self) -> str:
+        return "data:image/png;base64," + base64.b64encode(self.image).decode("ascii")
+
+
+def _usage(prompt: str, images: int) -> dict:
+    prompt_tokens = max(1, len(prompt) // 4) + 258 * images
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": 1290, "total_tokens": prompt_tokens + 1290, "cost": 0.0}
+
+
+def make_handler(state: FakeOpenRouterState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, data, status: int = 200, headers: Optional[dict] = None):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status: int, message: str, headers: Optional[dict] = None):
+            self._json({"error": {"code": status, "message": message}}, status, headers)
+
+        def do_POST(self):
+            received_at = time.time()
+            path = urlparse(self.path).path.rstrip("/")
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            except ValueError:
+                self._error(400, "invalid JSON body")
+                return
+            if path.endswith("/images"):
+                kind = "images"
+                prompt = str(payload.get("prompt") or "")
+                references = _count_image_parts(payload.get("input_references"))
+            elif path.endswith("/chat/completions"):
+                kind = "chat"
+                messages = payload.get("messages") if isinstance(payload.get("messages"), list) else []
+                content = (messages[-1] or {}).get("content") if messages else ""
+                if isinstance(content, list):
+                    prompt = "".join(str(p.get("text") or "") for p in content if isinstance(p, dict) and p.get("type") == "text")
+                    references = _count_image_parts(content)
+                else:
+                    prompt, references = str(content or ""), 0
+            else:
+                self._error(404, "not found")
+                return
+            call = {
+                "id": f"gen-{uuid.uuid4().hex}",
+                "path": kind,
+                "model": payload.get("model"),
+                "prompt": prompt,
+                "references": references,
+                "received_at": received_at,
+            }
+            if not str(self.headers.get("Authorization") or "").startswith("Bearer "):
+                state.record({**call, "status": 401, "responded_at": time.time()})
+                self._error(401, "No auth credentials found")
+                return
+            if not state.admit():
+                state.record({**call, "status": 429, "responded_at": time.time()})
+                self._error(429, "Rate limit exceeded: too many requests", {"Retry-After": str(state.retry_after)})
+                return
+            if state.latency:
+                time.sleep(state.latency)
+            usage = _usage(prompt, references)
+            if kind == "images":
+                body = {
+                    "created": int(received_at),
+                    "data": [{"b64_json": base64.b64encode(state.image).decode("ascii")}],
+                    "usage": usage,
+                }
+            else:
+                # Image output via chat: modalities ["image", "text"] puts the images on the message.
+                wants_image = "image" in (payload.get("modalities") or [])
+                message = {"role": "assistant", "content": "" if wants_image else f"fake: {prompt[:200]}"}
+                if wants_image:
+                    message["images"] = [{"type": "image_url", "image_url": {"url": state.image_url()}}]
+                body = {
+                    "id": call["id"],
+                    "object": "chat.completion",
+                    "created": int(received_at),
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+                    "usage": usage,
+                }
+            state.record({**call, "status": 200, "responded_at": time.time()})
+            self._json(body)
+
+    return Handler
+
+
+class FakeOpenRouterServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Concurrent lanes open many connections at once; past the default backlog of 5 the
+    # client's SYN is dropped and retried a second later.
+    request_queue_size = 512
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, **options):
+    """
+    Start in a daemon thread; returns (server, state). Base URL: http://host:port/api/v1.
+
+    options are passed to FakeOpenRouterState (image, rate_limit_every, max_rps, retry_after).
+    """
+    state = FakeOpenRouterState(latency, **options)
+    server = FakeOpenRouterServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, name="fake-openrouter", daemon=True).start()
+    return server, state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8190)
+    parser.add_argument("--latency", type=float, default=5.0, help="simulated generation time per request")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="429 above this request rate (0 = off)")
+    args = parser.parse_args()
+    server, _state = serve(
+        args.host, args.port, args.latency, rate_limit_every=args.rate_limit_every, max_rps=args.max_rps
+    )
+    print(f"fake OpenRouter on http://{args.host}:{server.server_address[1]}/api/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+End-to-end load run: the real FastAPI app (uvicorn, job lanes, ComfyUI/OpenRouter processors)
+against the stand-in ComfyUI and OpenRouter servers, with isolated data directories.
+
+    python -m scripts.load_test --jobs 60 --users 6 --mix RMBG2=2,NanoBanana=1
+
+Each virtual user has its own principal cookie and runs a closed loop (submit, poll until
+finished, submit the next). Reports jobs/s, queue wait p50/p95 and per-stage latencies:
+
+  submit         POST /api/v1/generate round trip
+  queue_wait     app queue: job created -> picked up by a lane worker
+  prepare        worker start -> request reaches the backend (input upload, graph build)
+  backend_queue  ComfyUI queue: prompt received -> started executing (pipelining)
+  execute        ComfyUI run time / OpenRouter response time
+  collect        backend done -> job complete (history, /view download, save, metadata)
+  end_to_end     job created -> job complete
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from scripts import fake_comfyui, fake_openrouter
+
+STAGES = ("submit", "queue_wait", "prepare", "backend_queue", "execute", "collect", "end_to_end")
+FINISHED = ("complete", "error", "cancelled", "timeout")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[int(round(q * (len(ordered) - 1)))]
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "mean_ms": None}
+    return {
+        "count": len(values),
+        "p50_ms": round(_percentile(values, 0.50) * 1000.0, 1),
+        "p95_ms": round(_percentile(values, 0.95) * 1000.0, 1),
+        "mean_ms": round(statistics.fmean(values) * 1000.0, 1),
+    }
+
+
+def _input_png(seed: int) -> bytes:
+    """A small distinct PNG per job so the result cache never short-circuits ComfyUI."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", (64, 64), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    out = BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _parse_mix(text: str) -> List[tuple[str, float]]:
+    mix = []
+    for part in str(text or "").split(","):
+        name, _, weight = part.strip().partition("=")
+        if name:
+            mix.append((name.strip(), float(weight or 1)))
+    if not mix:
+        raise SystemExit("--mix must name at least one workflow")
+    return mix
+
+
+class LoadRun:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.mix = _parse_mix(args.mix)
+        self.comfy = [
+            fake_comfyui.serve(
+                run_seconds=args.comfy_run_seconds,
+                steps=args.comfy_steps,
+                previews=args.previews,
+                latency=args.comfy_latency,
+            )
+            for _ in range(max(1, args.comfy_backends))
+        ]
+        self.openrouter = fake_openrouter.serve(
+            latency=args.openrouter_latency,
+            rate_limit_every=args.openrouter_429_every,
+            max_rps=args.openrouter_max_rps,
+        )
+        self.directory = tempfile.TemporaryDirectory(prefix="load_test_")
+        self.lock = threading.Lock()
+        self.remaining = max(1, args.jobs)
+        self.records: List[Dict[str, Any]] = []
+        self.rejected: Dict[str, int] = {}
+
+    # ---- environment / app ----
+
+    def configure_environment(self) -> None:
+        root = self.directory.name
+        output_dir = os.path.join(root, "outputs")
+        os.makedirs(output_dir, exist_ok=True)
+        servers = ",".join(
+            f"gpu{index}=127.0.0.1:{server.server_address[1]}" for index, (server, _) in enumerate(self.comfy, start=1)
+        )
+        os.environ.update(
+            {
+                "COMFYUI_SERVER": f"127.0.0.1:{self.comfy[0][0].server_address[1]}",
+                "COMFYUI_SERVERS": servers if len(self.comfy) > 1 else "",
+                "OPENROUTER_BASE_URL": f"http://127.0.0.1:{self.openrouter[0].server_address[1]}/api/v1",
+                "OPENROUTER_API_KEY": "load-test",
+                "JOB_DB_PATH": os.path.join(root, "app_data.db"),
+                "OUTPUT_DIR": output_dir,
+                "PRINCIPAL_COOKIE_SECRET": "load-test-secret-" + ("x" * 40),
+                "LOG_TO_FILE": "false",
+                "ADMIN_USER": "load-admin",
+                "ADMIN_PASSWORD": "load-pass",
+            }
+        )
+        os.environ.setdefault("LOG_LEVEL", "ERROR")
+        os.environ.setdefault("GEN_RATE_LIMIT_PER_MIN", "0")
+
+    def start_app(self):
+        import uvicorn
+
+        from app.main import app
+
+        self.app = app
+        self.port = _free_port()
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        )
+        self.server_thread = threading.Thread(target=self.server.run, name="load-test-app", daemon=True)
+        self.server_thread.start()
+        deadline = time.time() + 30.0
+        while not self.server.started:
+            if time.time() > deadline or not self.server_thread.is_alive():
+                raise SystemExit("app did not start")
+            time.sleep(0.05)
+        self.base_url = f"http://127.0.0.1:{self.port}"
+
+    def stop(self) -> None:
+        server = getattr(self, "server", None)
+        if server is not None:
+            server.should_exit = True
+            self.server_thread.join(timeout=15.0)
+        for fake, _ in [*self.comfy, self.openrouter]:
+            fake.shutdown()
+            fake.server_close()
+        self.directory.cleanup()
+
+    # ---- virtual users ----
+
+    def _take(self) -> Optional[int]:
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            return self.remaining
+
+    def _pick_workflow(self, rng: random.Random) -> str:
+        total = sum(weight for _, weight in self.mix)
+        point = rng.uniform(0, total)
+        for name, weight in self.mix:
+            point -= weight
+            if point <= 0:
+                return name
+        return self.mix[-1][0]
+
+    def user(self, index: int) -> None:
+        rng = random.Random(index)
+        session = requests.Session()
+        session.get(f"{self.base_url}/create", timeout=30)  # issues the principal cookie
+        while (number := self._take()) is not None:
+            workflow_id = self._pick_workflow(rng)
+            token = f"load-{uuid.uuid4().hex[:12]}"
+            body: Dict[str, Any] = {"user_prompt": f"{token} a lighthouse at dusk", "aspect_ratio": "square", "workflow_id": workflow_id}
+            if workflow_id in self.args.image_workflows:
+                uploaded = session.post(
+                    f"{self.base_url}/api/v1/inputs/upload",
+                    files={"file": (f"{token}.png", _input_png(number), "image/png")},
+                    timeout=30,
+                )
+                uploaded.raise_for_status()
+                body["input_image_id"] = uploaded.json()["id"]
+            submitted_at = time.time()
+            response = session.post(
+                f"{self.base_url}/api/v1/generate", json=body, headers={"X-Cost-Confirmed": "1"}, timeout=30
+            )
+            submit = time.time() - submitted_at
+            if response.status_code != 200:
+                with self.lock:
+                    key = f"{workflow_id}:{response.status_code}"
+                    self.rejected[key] = self.rejected.get(key, 0) + 1
+                time.sleep(0.2)
+                continue
+            job_id = response.json()["job_id"]
+            status = self._wait(session, job_id)
+            with self.lock:
+                self.records.append(
+                    {"job_id": job_id, "workflow_id": workflow_id, "token": token, "submit": submit, "status": status}
+                )
+
+    def _wait(self, session: requests.Session, job_id: str) -> Dict[str, Any]:
+        deadline = time.time() + self.args.job_timeout
+        while time.time() < deadline:
+            data = session.get(f"{self.base_url}/api/v1/jobs/{job_id}", timeout=30).json()
+            if data.get("status") in FINISHED:
+                return data
+            time.sleep(self.args.poll_interval)
+        return {"status": "client_timeout"}
+
+    # ---- report ----
+
+    def _stages(self, record: Dict[str, Any]) -> Dict[str, float]:
+        job = self.app.state.job_manager.get(record["job_id"])
+        stages = {"submit": record["submit"]}
+        if job is None or not job.started_at or not job.ended_at:
+            return stages
+        stages["queue_wait"] = job.started_at - job.created_at
+        stages["end_to_end"] = job.ended_at - job.created_at
+        prompt_id = (job.result or {}).get("comfy_prompt_id")
+        if prompt_id:
+            for _, state in self.comfy:
+                item = state.prompts.get(prompt_id)
+                if item is not None:
+                    stages["prepare"] = item["queued_at"] - job.started_at
+                    stages["backend_queue"] = item["start_at"] - item["queued_at"]
+                    stages["execute"] = item["finish_at"] - item["start_at"]
+                    stages["collect"] = job.ended_at - item["finish_at"]
+                    break
+            return stages
+        calls = [c for c in self.openrouter[1].calls if record["token"] in c["prompt"]]
+        if calls:
+            call = calls[-1]
+            stages["prepare"] = call["received_at"] - job.started_at
+            stages["execute"] = call["responded_at"] - call["received_at"]
+            stages["collect"] = job.ended_at - call["responded_at"]
+        return stages
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        per_workflow: Dict[str, Dict[str, List[float]]] = {}
+        overall: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        statuses: Dict[str, int] = {}
+        errors: Dict[str, int] = {}
+        for record in self.records:
+            status = record["status"].get("status")
+            statuses[status] = statuses.get(status, 0) + 1
+            if status != "complete":
+                message = str(record["status"].get("error") or status)[:80]
+                errors[message] = errors.get(message, 0) + 1
+            stages = self._stages(record)
+            bucket = per_workflow.setdefault(record["workflow_id"], {stage: [] for stage in STAGES})
+            for stage, value in stages.items():
+                bucket[stage].append(max(0.0, value))
+                overall[stage].append(max(0.0, value))
+        completed = statuses.get("complete", 0)
+        comfy_states = [state for _, state in self.comfy]
+        return {
+            "jobs": len(self.records),
+            "wall_seconds": round(wall, 2),
+            "jobs_per_second": round(completed / wall, 3) if wall > 0 else None,
+            "statuses": statuses,
+            "errors": errors,
+            "rejected_submissions": self.rejected,
+            "queue_wait": _summary(overall["queue_wait"]),
+            "stages": {stage: _summary(values) for stage, values in overall.items()},
+            "workflows": {
+                workflow_id: {stage: _summary(values) for stage, values in stages.items() if values}
+                for workflow_id, stages in per_workflow.items()
+            },
+            "fake_comfyui": {
+                "prompts": sum(len(s.prompts) for s in comfy_states),
+                "uploads": sum(len(s.uploads) for s in comfy_states),
+                "http_requests": sum(s.requests for s in comfy_states),
+                "ws_connections": sum(s.ws_connections for s in comfy_states),
+                "interrupts": sum(s.interrupts for s in comfy_states),
+            },
+            "fake_openrouter": {
+                "requests": len(self.openrouter[1].calls),
+                "rate_limited": self.openrouter[1].rate_limited,
+            },
+            "app_metrics": self._app_metrics(),
+        }
+
+    def _app_metrics(self) -> Dict[str, Any]:
+        try:
+            data = requests.get(
+                f"{self.base_url}/api/v1/admin/jobs/metrics", auth=("load-admin", "load-pass"), timeout=30
+            ).json()
+        except Exception as e:
+            return {"error": str(e)}
+        return {key: data.get(key) for key in ("lanes", "comfy_events", "comfy_http", "previews") if key in data}
+
+    def run(self) -> Dict[str, Any]:
+        self.configure_environment()
+        self.start_app()
+        started = time.time()
+        users = [threading.Thread(target=self.user, args=(i,), daemon=True) for i in range(max(1, self.args.users))]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+        return self.report(time.time() - started)
+
+
+def _print(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['jobs']} jobs in {result['wall_seconds']}s: {result['jobs_per_second']} jobs/s, "
+        f"statuses {result['statuses']}"
+    )
+    wait = result["queue_wait"]
+    print(f"queue wait p50 {wait['p50_ms']}ms  p95 {wait['p95_ms']}ms")
+    for workflow_id, stages in [("all", result["stages"]), *result["workflows"].items()]:
+        print(f"\n[{workflow_id}]")
+        print(f"  {'stage':<14} {'n':>5} {'p50':>10} {'p95':>10} {'mean':>10}")
+        for stage in STAGES:
+            s = stages.get(stage)
+            if not s or not s["count"]:
+                continue
+            print(f"  {stage:<14} {s['count']:>5} {s['p50_ms']:>8.1f}ms {s['p95_ms']:>8.1f}ms {s['mean_ms']:>8.1f}ms")
+    if result["errors"] or result["rejected_submissions"]:
+        print(f"\nerrors: {result['errors']}  rejected: {result['rejected_submissions']}")
+    print(f"\nfake ComfyUI: {result['fake_comfyui']}")
+    print(f"fake OpenRouter: {result['fake_openrouter']}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--users", type=int, default=4, help="concurrent virtual users (closed loop)")
+    parser.add_argument("--mix", default="RMBG2=1,NanoBanana=1", help="workflow_id=weight,...")
+    parser.add_argument(
+        "--image-workflows", default="RMBG2,NanoBanana_Img2Img,seethrough-basic",
+        type=lambda v: {x.strip() for x in v.split(",") if x.strip()},
+        help="workflows that get a freshly uploaded input image",
+    )
+    parser.add_argument("--comfy-backends", type=int, default=1)
+    parser.add_argument("--comfy-run-seconds", type=float, default=0.5)
+    parser.add_argument("--comfy-steps", type=int, default=8)
+    parser.add_argument("--comfy-latency", type=float, default=0.0, help="delay per ComfyUI HTTP response")
+    parser.add_argument("--previews", action="store_true", help="stand-in ComfyUI sends preview frames")
+    parser.add_argument("--openrouter-latency", type=float, default=1.0)
+    parser.add_argument("--openrouter-429-every", type=int, default=0)
+    parser.add_argument("--openrouter-max-rps", type=float, default=0.0)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--job-timeout", type=float, default=300.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    run = LoadRun(args)
+    try:
+        result = run.run()
+    finally:
+        run.stop()
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        _print(result)
+
+
+if __name__ == "__main__":
+    main()
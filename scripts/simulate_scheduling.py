@@ -0,0 +1,103 @@
+"""Replay recorded jobs from the jobs table and compare scheduling policies offline."""
+
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Any
+
+from app.config import JOB_DB_PATH, QUEUE_CONFIG
+from app.job_store import JobStore
+from app.scheduling import (
+    DurationEstimator,
+    ModelAffinityPolicy,
+    RoundRobinPolicy,
+    ShortestExpectedJobFirstPolicy,
+    job_model_key,
+    simulate_trace,
+    trace_from_rows,
+)
+from app.workflow_configs import WORKFLOW_CONFIGS
+
+
+def _fmt(value: Any) -> str:
+    return "-" if value is None else f"{float(value):.1f}s"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=JOB_DB_PATH, help="sqlite DB containing the jobs table")
+    parser.add_argument("--limit", type=int, default=5000, help="most recent jobs to replay")
+    parser.add_argument("--workflow-prefix", default="", help="only replay workflows starting with this id")
+    parser.add_argument("--workers", type=int, default=1, help="lane worker count (ComfyUI lane = 1)")
+    parser.add_argument("--aging-factor", type=float, default=float(QUEUE_CONFIG.get("scheduling_aging_factor", 0.5)))
+    parser.add_argument("--max-wait", type=float, default=float(QUEUE_CONFIG.get("scheduling_max_wait_seconds", 600)))
+    parser.add_argument("--time-scale", type=float, default=1.0, help="compress inter-arrival gaps (<1 = more load)")
+    parser.add_argument(
+        "--swap-cost",
+        type=float,
+        default=float(QUEUE_CONFIG.get("comfy_model_swap_cost_seconds", 8)),
+        help="extra seconds charged when consecutive jobs use different models (0 disables)",
+    )
+    parser.add_argument("--max-deferral", type=float, default=float(QUEUE_CONFIG.get("comfy_affinity_max_deferral_seconds", 120)))
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    rows = JobStore(args.db).fetch_recent(limit=max(1, args.limit))
+    trace = trace_from_rows(rows)
+    if args.workflow_prefix:
+        trace = [item for item in trace if str(item["payload"].get("workflow_id") or "").startswith(args.workflow_prefix)]
+    if trace and args.time_scale != 1.0:
+        base = trace[0]["arrival"]
+        for item in trace:
+            item["arrival"] = base + (item["arrival"] - base) * max(0.0, args.time_scale)
+    if not trace:
+        print("No completed jobs with timestamps found.")
+        return
+
+    def sejf():
+        return ShortestExpectedJobFirstPolicy(
+            DurationEstimator(),
+            aging_factor=args.aging_factor,
+            max_wait_seconds=args.max_wait,
+        )
+
+    def model_of(payload: dict) -> str:
+        return job_model_key(payload, WORKFLOW_CONFIGS)
+
+    def sejf_affinity():
+        return ModelAffinityPolicy(
+            sejf(),
+            key_fn=lambda job: model_of(job.payload),
+            max_deferral_seconds=args.max_deferral,
+            max_consecutive=int(QUEUE_CONFIG.get("comfy_affinity_max_consecutive", 6)),
+            swap_cost_seconds=args.swap_cost,
+        )
+
+    swap = {"model_key": model_of, "swap_cost_seconds": args.swap_cost}
+    results = {
+        "round_robin": simulate_trace(trace, RoundRobinPolicy, worker_count=args.workers, **swap),
+        "sejf": simulate_trace(trace, sejf, worker_count=args.workers, **swap),
+        "sejf+affinity": simulate_trace(trace, sejf_affinity, worker_count=args.workers, **swap),
+    }
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2, default=str))
+        return
+
+    print(f"jobs={len(trace)} workers={args.workers} time_scale={args.time_scale}")
+    print(f"{'policy':<14} {'mean wait':>10} {'p95 wait':>10} {'max wait':>10} {'swaps':>6} {'makespan':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<14} {_fmt(result['mean_wait_sec']):>10} {_fmt(result['p95_wait_sec']):>10} "
+            f"{_fmt(result['max_wait_sec']):>10} {result['model_swaps']:>6} {_fmt(result['makespan_sec']):>10}"
+        )
+    print()
+    workflows = sorted({wf for result in results.values() for wf in result["per_workflow_mean_wait_sec"]})
+    print(f"{'workflow':<36}" + "".join(f" {name:>14}" for name in results))
+    for wf in workflows:
+        cells = "".join(f" {_fmt(result['per_workflow_mean_wait_sec'].get(wf)):>14}" for result in results.values())
+        print(f"{wf:<36}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+from app import comfy_client
+from app.comfy_backends import ComfyBackend, ComfyBackendPool, NoBackendAvailable, parse_backends
+from app.comfy_client import close_http_pools
+from scripts.fake_comfyui import serve
+
+
+def _closed_port_address():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+
+class ComfyBackendRoutingTests(unittest.TestCase):
+    def test_least_loaded_capable_backend_wins(self):
+        pool = ComfyBackendPool(
+            [
+                ComfyBackend("gpu1", "h1:8188"),
+                ComfyBackend("gpu2", "h2:8188"),
+                ComfyBackend("psd", "h3:8188", workflows=["SeeThrough*"], nodes=["SeeThrough_SavePSD"]),
+            ],
+            routing="least_loaded",
+        )
+        self.assertEqual(pool.acquire("j1", "Illustrious").name, "gpu1")
+        self.assertEqual(pool.acquire("j2", "Illustrious").name, "gpu2")
+        # gpu1/gpu2 declare no node list, so they are assumed to have every custom node;
+        # psd is the only one whose workflow patterns match.
+        self.assertEqual(pool.acquire("j3", "SeeThrough", node_types={"SeeThrough_SavePSD"}).name, "psd")
+        with self.assertRaises(NoBackendAvailable):
+            ComfyBackendPool([ComfyBackend("psd", "h3:8188", workflows=["SeeThrough*"])]).acquire("j4", "Illustrious")
+
+        pool.release("j1")
+        self.assertEqual(pool.acquire("j5", "Illustrious").name, "gpu1")
+        self.assertEqual(pool.metrics()["backends"]["gpu2"]["inflight"], 1)
+
+    def test_backend_without_a_custom_node_is_skipped(self):
+        pool = ComfyBackendPool([
+            ComfyBackend("plain", "h1:8188", nodes=[]),
+            ComfyBackend("rmbg", "h2:8188", nodes=["BiRefNetRMBG"]),
+        ])
+        for job_id in ("j1", "j2"):
+            self.assertEqual(pool.acquire(job_id, "RMBG2", node_types={"LoadImage", "BiRefNetRMBG"}).name, "rmbg")
+        self.assertEqual(pool.acquire("j3", "Illustrious", node_types={"KSampler"}).name, "plain")
+
+    def test_affinity_prefers_backend_with_model_loaded_within_slack(self):
+        pool = ComfyBackendPool([ComfyBackend("gpu1", "h1"), ComfyBackend("gpu2", "h2")], affinity_slack=1)
+        self.assertEqual(pool.acquire("a1", "W", model_key="sdxl").name, "gpu1")
+        self.assertEqual(pool.acquire("b1", "W", model_key="flux").name, "gpu2")
+        pool.release("a1")
+        pool.release("b1")
+        # Both idle: each model goes back to the GPU that already has it loaded.
+        self.assertEqual(pool.acquire("b2", "W", model_key="flux").name, "gpu2")
+        self.assertEqual(pool.acquire("b3", "W", model_key="flux").name, "gpu2")
+        # gpu2 is now two jobs ahead: beyond the slack, the idle GPU takes the swap.
+        self.assertEqual(pool.acquire("b4", "W", model_key="flux").name, "gpu1")
+        self.assertEqual(pool.metrics()["affinity_hits"], 2)
+
+    def test_sticky_job_stays_on_its_backend(self):
+        pool = ComfyBackendPool([ComfyBackend("gpu1", "h1"), ComfyBackend("gpu2", "h2")])
+        pool.record_health("gpu2", False)
+        pool.record_health("gpu2", False)
+        self.assertEqual(pool.acquire("resumed", "W", sticky="gpu2").name, "gpu2")
+        self.assertEqual(pool.jobs_on("gpu2"), ["resumed"])
+        with self.assertRaises(NoBackendAvailable):
+            pool.acquire("gone", "W", sticky="gpu9")
+
+    def test_parses_address_list_and_json(self):
+        self.assertEqual(
+            [(b.name, b.address, b.input_dir) for b in parse_backends("", default_address="h:1", default_input_dir="/in")],
+            [("default", "h:1", "/in")],
+        )
+        self.assertEqual(
+            [(b.name, b.address) for b in parse_backends("gpu1=h1:8188, h2:8188", default_address="h:1")],
+            [("gpu1", "h1:8188"), ("backend2", "h2:8188")],
+        )
+        [backend] = parse_backends(
+            json.dumps([{"name": "psd", "address": "h3:8188", "workflows": ["SeeThrough"], "output_dir": "/out"}]),
+            default_address="h:1",
+        )
+        self.assertEqual((backend.workflows, backend.output_dir, backend.nodes), (["SeeThrough"], "/out", None))
+
+
+class ComfyBackendHealthTests(unittest.TestCase):
+    def setUp(self):
+        # The stand-in servers speak HTTP only: no shared event websocket.
+        patcher = mock.patch.object(comfy_client, "COMFY_SHARED_EVENTS_ENABLED", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.servers = [serve() for _ in range(2)]
+        self.directory = tempfile.TemporaryDirectory()
+        self.workflow_path = os.path.join(self.directory.name, "workflow.json")
+        with open(self.workflow_path, "w", encoding="utf-8") as f:
+            json.dump({"1": {"class_type": "KSampler", "inputs": {"seed": 0}}}, f)
+
+    def tearDown(self):
+        for server, _ in self.servers:
+            server.shutdown()
+            server.server_close()
+        close_http_pools()
+        self.directory.cleanup()
+
+    def test_failed_backend_leaves_rotation_and_jobs_stick_to_their_server(self):
+        (server_a, state_a), (server_b, state_b) = self.servers
+        pool = ComfyBackendPool(
+            [
+                ComfyBackend("a", f"127.0.0.1:{server_a.server_address[1]}"),
+                ComfyBackend("b", f"127.0.0.1:{server_b.server_address[1]}"),
+                ComfyBackend("down", _closed_port_address()),
+            ],
+            routing="least_loaded",
+            fail_threshold=2,
+        )
+        self.assertEqual(pool.check_health(timeout=1.0), {})
+        self.assertEqual(pool.check_health(timeout=1.0), {"down": "down"})
+        self.assertEqual(pool.healthy_count(), 2)
+
+        # Three jobs over the two healthy servers; each prompt goes to the server it was bound to.
+        state_a.run_seconds = state_b.run_seconds = 5.0
+        prompts = {}
+        for job_id in ("j1", "j2", "j3"):
+            backend = pool.acquire(job_id, "W")
+            self.assertNotEqual(backend.name, "down")
+            prompts[job_id] = (backend, backend.client().queue_prompt(self.workflow_path, {})["prompt_id"])
+        self.assertEqual((len(state_a.prompts), len(state_b.prompts)), (2, 1))
+
+        backend, prompt_id = prompts["j3"]
+        self.assertEqual(backend.name, "a")
+        self.assertTrue(backend.client().cancel_prompt(prompt_id))
+        self.assertEqual((state_a.deleted, state_b.deleted), ([prompt_id], []))
+        self.assertEqual((state_a.interrupts, state_b.interrupts), (0, 0))
+
+        self.assertEqual(pool.record_health("down", True), "up")
+        self.assertEqual(pool.metrics()["backends"]["down"]["healthy"], True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,244 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app import comfy_client
+from app.comfy_client import ComfyUIClient, close_http_pools, http_pool_for
+from scripts.fake_comfyui import PNG_BYTES, serve
+
+
+class _HistoryClient(ComfyUIClient):
+    def __init__(self, outputs, graph, broken=()):
+        super().__init__("127.0.0.1:1")
+        self.history = {"p1": {"outputs": outputs, "prompt": [0, "p1", graph]}}
+        self.broken = set(broken)
+        self.downloads = []
+
+    def get_history(self, prompt_id):
+        return self.history
+
+    def get_image(self, filename, subfolder, folder_type):
+        self.downloads.append(filename)
+        return None if filename in self.broken else filename.encode()
+
+
+def _image(filename, folder_type="output"):
+    return {"filename": filename, "subfolder": "", "type": folder_type}
+
+
+class RankedOutputTests(unittest.TestCase):
+    OUTPUTS = {
+        "1": {"images": [_image("source.png", "input")]},
+        "7": {"images": [_image("preview.png", "temp")]},
+        "9": {"images": [_image("final.png")]},
+    }
+    GRAPH = {"1": {"class_type": "LoadImage"}, "7": {"class_type": "PreviewImage"}, "9": {"class_type": "SaveImage"}}
+
+    def test_downloads_only_the_top_candidate(self):
+        client = _HistoryClient(self.OUTPUTS, self.GRAPH)
+        self.assertEqual(client._download_outputs("p1"), {"final.png": b"final.png"})
+        self.assertEqual(client.downloads, ["final.png"])
+        self.assertEqual([img["filename"] for img in client.rank_outputs("p1")], ["final.png", "preview.png"])
+
+    def test_falls_back_to_the_next_candidate_when_a_download_fails(self):
+        client = _HistoryClient(self.OUTPUTS, self.GRAPH, broken={"final.png"})
+        self.assertEqual(client._download_outputs("p1"), {"preview.png": b"preview.png"})
+        self.assertEqual(client.downloads, ["final.png", "preview.png"])
+
+    def test_configured_output_nodes_take_precedence(self):
+        client = _HistoryClient(self.OUTPUTS, self.GRAPH)
+        self.assertEqual(client._download_outputs("p1", output_nodes=["7"]), {"preview.png": b"preview.png"})
+        # Unknown nodes fall back to the default ranking.
+        self.assertEqual(client._download_outputs("p1", output_nodes=["42"]), {"final.png": b"final.png"})
+
+
+class ComfyHttpPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.server, self.state = serve()
+        self.address = f"127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.TemporaryDirectory()
+        self.workflow_path = os.path.join(self.directory.name, "workflow.json")
+        with open(self.workflow_path, "w", encoding="utf-8") as f:
+            json.dump({"1": {"class_type": "KSampler", "inputs": {"seed": 0}}}, f)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        close_http_pools()
+        self.directory.cleanup()
+
+    def test_jobs_share_one_keep_alive_connection(self):
+        for _ in range(3):
+            client = ComfyUIClient(self.address)
+            self.assertTrue(client.upload_image_to_input("input.png", PNG_BYTES))
+            prompt_id = client.queue_prompt(self.workflow_path, {"1": {"inputs": {"seed": 7}}})["prompt_id"]
+            self.assertEqual(list(client._download_outputs(prompt_id).values()), [PNG_BYTES])
+
+        metrics = http_pool_for(f"http://{self.address}").metrics()
+        self.assertEqual(self.state.connections, 1)
+        self.assertEqual(metrics["requests"], 12)
+        self.assertEqual(metrics["connections_opened"], 1)
+        self.assertEqual(metrics["connections_reused"], 11)
+        self.assertEqual(metrics["requests_by_stage"]["get_history"], 3)
+
+
+    def test_streams_outputs_to_disk_when_output_dir_is_not_local(self):
+        client = ComfyUIClient(self.address)
+        prompt_id = client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        dest_dir = os.path.join(self.directory.name, "incoming")
+        client.output_dir = None
+        staged = client.fetch_outputs(prompt_id, dest_dir)
+        self.assertEqual(list(staged), [f"{prompt_id}.png"])
+        with open(staged[f"{prompt_id}.png"], "rb") as f:
+            self.assertEqual(f.read(), PNG_BYTES)
+        self.assertEqual(os.listdir(dest_dir), [os.path.basename(staged[f"{prompt_id}.png"])])
+
+
+    def test_cancel_dequeues_pending_prompt_without_interrupting_the_running_one(self):
+        self.state.run_seconds = 5.0
+        client = ComfyUIClient(self.address)
+        running = client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        pending = client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        self.assertEqual(client.prompt_state(pending), "pending")
+
+        self.assertTrue(client.cancel_prompt(pending))
+        self.assertEqual(self.state.deleted, [pending])
+        self.assertEqual(self.state.interrupts, 0)
+        self.assertEqual(client.prompt_state(running), "running")
+
+        self.assertTrue(client.cancel_prompt(running))
+        self.assertEqual(self.state.interrupted, [running])
+
+    def test_cancel_never_stops_another_prompt(self):
+        self.state.run_seconds = 0.3
+        client = ComfyUIClient(self.address)
+        finished = client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        other = client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        time.sleep(0.4)
+        self.assertEqual((client.prompt_state(finished), client.prompt_state(other)), ("complete", "running"))
+
+        with self.assertLogs("comfyui_app", level="INFO") as logs:
+            self.assertFalse(client.cancel_prompt(finished))
+        self.assertEqual(self.state.interrupts, 0)
+        self.assertIn("'action': 'none'", "".join(logs.output))
+        # A stale interrupt for a prompt that is no longer executing is ignored by ComfyUI.
+        self.assertTrue(client.interrupt(finished))
+        self.assertEqual(self.state.interrupted, [])
+        self.assertEqual(client.prompt_state(other), "running")
+
+
+class _CancelClient(ComfyUIClient):
+    def __init__(self, states, executing=None):
+        super().__init__("127.0.0.1:1")
+        self.states = list(states)
+        self.calls = []
+        if executing is not None:
+            self.event_stream = mock.Mock(connected=True, executing_prompt=mock.Mock(return_value=executing))
+
+    def prompt_state(self, prompt_id):
+        return self.states.pop(0)
+
+    def delete_queued_prompt(self, prompt_id):
+        self.calls.append(("delete", prompt_id))
+        return True
+
+    def interrupt(self, prompt_id=None):
+        self.calls.append(("interrupt", prompt_id))
+        return True
+
+
+class CancelPromptTests(unittest.TestCase):
+    def test_prompt_that_started_while_being_dequeued_is_interrupted_by_id(self):
+        client = _CancelClient(["pending", "running"])
+        self.assertTrue(client.cancel_prompt("p1"))
+        self.assertEqual(client.calls, [("delete", "p1"), ("interrupt", "p1")])
+
+    def test_unreadable_queue_does_not_interrupt_another_executing_prompt(self):
+        client = _CancelClient(["unknown"], executing="p2")
+        self.assertFalse(client.cancel_prompt("p1"))
+        self.assertEqual(client.calls, [])
+        client = _CancelClient(["unknown"], executing="p1")
+        self.assertTrue(client.cancel_prompt("p1"))
+        self.assertEqual(client.calls, [("interrupt", "p1")])
+
+    def test_running_prompt_is_interrupted_only_while_the_stream_sees_it_executing(self):
+        # It finished between the /queue read and the interrupt and p2 started: an older ComfyUI
+        # would ignore prompt_id and stop p2.
+        client = _CancelClient(["running"], executing="p2")
+        with self.assertLogs("comfyui_app", level="INFO") as logs:
+            self.assertFalse(client.cancel_prompt("p1"))
+        self.assertEqual(client.calls, [])
+        self.assertIn("skipped_not_executing", "".join(logs.output))
+        client = _CancelClient(["running"], executing="p1")
+        self.assertTrue(client.cancel_prompt("p1"))
+        self.assertEqual(client.calls, [("interrupt", "p1")])
+        # Stream disconnected: nothing to confirm with, fall back to the prompt-scoped interrupt.
+        client = _CancelClient(["running"], executing="p2")
+        client.event_stream.connected = False
+        self.assertTrue(client.cancel_prompt("p1"))
+
+    def test_dequeued_prompts_are_forgotten_when_their_wait_ends(self):
+        client = _CancelClient(["pending", "missing"] + ["pending", "missing"] * 300)
+        self.assertTrue(client.cancel_prompt("p1"))
+        self.assertIn("p1", client._deleted_prompts)
+        with mock.patch.object(client, "_wait_on_dedicated_ws", side_effect=RuntimeError("중단")):
+            with self.assertRaises(RuntimeError):
+                client.wait_for_prompt("p1")
+        self.assertNotIn("p1", client._deleted_prompts)
+        # Nobody waits on these: the oldest entries are dropped.
+        for i in range(300):
+            client.cancel_prompt(f"q{i}")
+        self.assertEqual(len(client._deleted_prompts), 256)
+        self.assertNotIn("q0", client._deleted_prompts)
+
+
+class _LocalOutputClient(_HistoryClient):
+    def download_image(self, filename, subfolder, folder_type, dest_path):
+        self.downloads.append(filename)
+        return None
+
+
+class LocalOutputTransportTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.comfy_output = os.path.join(self.directory.name, "comfy_output")
+        os.makedirs(os.path.join(self.comfy_output, "sub"))
+        self.source = os.path.join(self.comfy_output, "sub", "final.png")
+        with open(self.source, "wb") as f:
+            f.write(PNG_BYTES)
+        self.dest_dir = os.path.join(self.directory.name, "incoming")
+        outputs = {"9": {"images": [{"filename": "final.png", "subfolder": "sub", "type": "output"}]}}
+        self.client = _LocalOutputClient(outputs, {"9": {"class_type": "SaveImage"}})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hardlinks_local_output_without_http(self):
+        with mock.patch.object(self.client, "output_dir", self.comfy_output), \
+                mock.patch.object(comfy_client, "COMFY_OUTPUT_TRANSPORT", "link"):
+            staged = self.client.fetch_outputs("p1", self.dest_dir)
+        self.assertEqual(self.client.downloads, [])
+        self.assertTrue(os.path.samefile(staged["final.png"], self.source))
+
+    def test_move_takes_the_file_out_of_comfy_output(self):
+        with mock.patch.object(self.client, "output_dir", self.comfy_output), \
+                mock.patch.object(comfy_client, "COMFY_OUTPUT_TRANSPORT", "move"):
+            staged = self.client.fetch_outputs("p1", self.dest_dir)
+        self.assertFalse(os.path.exists(self.source))
+        with open(staged["final.png"], "rb") as f:
+            self.assertEqual(f.read(), PNG_BYTES)
+
+    def test_paths_outside_comfy_output_use_http(self):
+        with open(os.path.join(self.comfy_output, "secret.png"), "wb") as f:
+            f.write(PNG_BYTES)
+        with mock.patch.object(self.client, "output_dir", os.path.join(self.comfy_output, "sub")):
+            self.assertIsNone(self.client.local_output_path("secret.png", "..", "output"))
+            self.assertIsNotNone(self.client.local_output_path("final.png", "", "output"))
+            self.assertIsNone(self.client.local_output_path("final.png", "", "temp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import websocket
+
+from app.comfy_client import ComfyUIClient, close_http_pools
+from app.comfy_events import COMPLETE, FAILED, INTERRUPTED, ComfyEventStream
+from scripts.fake_comfyui import PNG_BYTES, serve
+
+
+def _msg(kind, **data):
+    return {"type": kind, "data": data}
+
+
+class _FakeSocket:
+    """Replays text messages, then raises the given exception (or blocks until closed)."""
+
+    def __init__(self, messages, end=None):
+        self.messages = list(messages)
+        self.end = end
+        self.closed = threading.Event()
+
+    def settimeout(self, _):
+        pass
+
+    def ping(self):
+        pass
+
+    def recv_data(self):
+        if self.messages:
+            return websocket.ABNF.OPCODE_TEXT, json.dumps(self.messages.pop(0)).encode("utf-8")
+        if self.end is not None:
+            raise self.end
+        self.closed.wait(0.05)
+        raise websocket.WebSocketTimeoutException("idle")
+
+    def close(self):
+        self.closed.set()
+
+
+class _StreamClient(ComfyUIClient):
+    def __init__(self, stream, history):
+        super().__init__("127.0.0.1:1")
+        self.event_stream = stream
+        self.client_id = stream.client_id
+        self.history = history
+        self.history_calls = 0
+
+    def get_history(self, prompt_id):
+        self.history_calls += 1
+        return self.history
+
+    def get_image(self, filename, subfolder, folder_type):
+        return b"png:" + filename.encode()
+
+
+def _history(prompt_id):
+    return {prompt_id: {"outputs": {"9": {"images": [{"filename": "out.png", "subfolder": "", "type": "output"}]}}}}
+
+
+class ComfyEventStreamTests(unittest.TestCase):
+    def test_routes_events_by_prompt_id_and_remembers_early_outcomes(self):
+        stream = ComfyEventStream("ws://fake")
+        other = stream.watch("p-other")
+        # Fast prompt finished before anyone waited on it.
+        stream.dispatch(_msg("executing", node=None, prompt_id="p-fast"))
+        stream.dispatch(_msg("executing", node="3", prompt_id="p-err"))
+        stream.dispatch(_msg("progress", value=1, max=4))  # old builds: no prompt_id
+        stream.dispatch(_msg("execution_error", prompt_id="p-err", exception_message="CUDA out of memory"))
+        stream.dispatch(_msg("executing", node=None, prompt_id="p-err"))
+
+        self.assertEqual(stream.watch("p-fast").wait(idle_timeout=1), COMPLETE)
+        failed = stream.watch("p-err")
+        self.assertEqual(failed.wait(idle_timeout=1), FAILED)
+        self.assertEqual(failed.error, "CUDA out of memory")
+        self.assertTrue(other.events.empty())
+
+    def test_client_waits_on_shared_stream_and_fetches_history_once(self):
+        stream = ComfyEventStream("ws://fake")
+        client = _StreamClient(stream, _history("p1"))
+        client._queued_generation["p1"] = stream.generation
+        progress = []
+
+        def comfy():
+            time.sleep(0.05)
+            stream.dispatch(_msg("executing", node="3", prompt_id="p1"))
+            stream.dispatch(_msg("progress", value=5, max=10, prompt_id="p1", node="3"))
+            stream.dispatch(_msg("executed", node="9", prompt_id="p1", output={"images": []}))
+            stream.dispatch(_msg("executing", node=None, prompt_id="p1"))
+
+        threading.Thread(target=comfy).start()
+        images = client.get_images("p1", on_progress=progress.append)
+        self.assertEqual(images, {"out.png": b"png:out.png"})
+        self.assertEqual(progress, [50.0, 100.0])
+        self.assertEqual(client.history_calls, 1)
+        self.assertEqual(stream.metrics()["waiters"], 0)
+
+    def test_execution_start_is_reported_and_local_finish_ends_the_wait(self):
+        stream = ComfyEventStream("ws://fake")
+        started = []
+        waiter = stream.watch("p-queued")
+        stream.dispatch(_msg("execution_start", prompt_id="p-queued"))
+        # Deleted from ComfyUI's queue: no further events, the canceller ends the wait.
+        stream.finish("p-queued", INTERRUPTED)
+        self.assertEqual(waiter.wait(on_start=lambda: started.append(True), idle_timeout=1), INTERRUPTED)
+        self.assertEqual(started, [True])
+
+    def test_binary_previews_go_to_the_executing_prompt(self):
+        stream = ComfyEventStream("ws://fake")
+        waiter = stream.watch("p1")
+        stream.dispatch_binary(struct.pack(">II", 1, 1) + b"jpeg-before-start")  # nobody executing: dropped
+        stream.dispatch(_msg("executing", node="3", prompt_id="p1"))
+        stream.dispatch_binary(struct.pack(">II", 1, 1) + b"jpeg-1")
+        metadata = json.dumps({"prompt_id": "p1", "node_id": "3"}).encode()
+        stream.dispatch_binary(struct.pack(">II", 4, len(metadata)) + metadata + b"jpeg-2")
+        stream.dispatch_binary(struct.pack(">II", 3, 0) + b"text")  # not a preview
+        stream.dispatch(_msg("executing", node=None, prompt_id="p1"))
+
+        frames = []
+        self.assertEqual(waiter.wait(on_preview=frames.append, idle_timeout=1), COMPLETE)
+        self.assertEqual(frames, [b"jpeg-1", b"jpeg-2"])
+        self.assertEqual(stream.metrics()["previews"], 2)
+
+    def test_reconnect_checks_history_once_for_pending_prompts(self):
+        sockets = [
+            _FakeSocket([_msg("executing", node="3", prompt_id="p1")], end=websocket.WebSocketConnectionClosedException("gone")),
+            _FakeSocket([]),
+        ]
+        connects = []
+
+        def connect(url, timeout):
+            connects.append(url)
+            return sockets.pop(0)
+
+        stream = ComfyEventStream("ws://fake", connect=connect)
+        client = _StreamClient(stream, _history("p1"))
+        stream.start()
+        try:
+            self.assertTrue(stream.wait_connected(1))
+            client._queued_generation["p1"] = stream.generation
+            waiter = stream.watch("p1")
+            # The completion event was lost while disconnected; the reconnect triggers one check.
+            self.assertEqual(waiter.wait(check=lambda: client._history_ready("p1"), idle_timeout=5), COMPLETE)
+        finally:
+            stream.close()
+        self.assertEqual(len(connects), 2)
+        self.assertTrue(all(url.endswith(f"clientId={stream.client_id}") for url in connects))
+        self.assertEqual(stream.metrics()["reconnects"], 1)
+        self.assertEqual(client.history_calls, 1)
+
+    def test_idle_limit_waits_out_the_comfy_queue_and_applies_once_running(self):
+        stream = ComfyEventStream("ws://fake")
+        states = iter(["pending", "pending", "running"])
+        started = []
+        waiter = stream.watch("p-queued")
+        # Behind another prompt: idle periods while pending keep waiting; a missed start is reported.
+        with self.assertRaises(TimeoutError):
+            waiter.wait(
+                on_start=lambda: started.append(True), check=lambda: False, state=lambda: next(states), idle_timeout=0.05
+            )
+        self.assertIsNone(next(states, None))
+        self.assertEqual(started, [True])
+
+        waiter = stream.watch("p-next")
+        threading.Timer(0.2, lambda: stream.dispatch(_msg("executing", node=None, prompt_id="p-next"))).start()
+        self.assertEqual(waiter.wait(check=lambda: False, state=lambda: "pending", idle_timeout=0.05), COMPLETE)
+
+
+class StandInServerEventTests(unittest.TestCase):
+    def setUp(self):
+        self.server, self.state = serve(run_seconds=0.3, steps=4, previews=True)
+        address = f"127.0.0.1:{self.server.server_address[1]}"
+        self.client = ComfyUIClient(address)
+        self.stream = ComfyEventStream(self.client._ws_base()).start()
+        self.client.event_stream = self.stream
+        self.client.client_id = self.stream.client_id
+        self.directory = tempfile.TemporaryDirectory()
+        self.workflow_path = os.path.join(self.directory.name, "workflow.json")
+        with open(self.workflow_path, "w", encoding="utf-8") as f:
+            json.dump({"3": {"class_type": "KSampler", "inputs": {"seed": 0}}}, f)
+
+    def tearDown(self):
+        self.stream.close()
+        self.server.shutdown()
+        self.server.server_close()
+        close_http_pools()
+        self.directory.cleanup()
+
+    def test_progress_previews_and_interrupt_arrive_over_the_websocket(self):
+        self.assertTrue(self.stream.wait_connected(2))
+        prompt_id = self.client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        progress, previews, started = [], [], []
+        self.client.wait_for_prompt(prompt_id, progress.append, lambda: started.append(True), previews.append)
+        self.assertEqual(progress[:4], [25.0, 50.0, 75.0, 100.0])
+        self.assertEqual(previews, [PNG_BYTES] * 4)
+        self.assertEqual(started, [True])
+        self.assertEqual(self.stream.metrics()["history_checks"], 0)
+
+        running = self.client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        time.sleep(0.1)
+        self.assertTrue(self.client.cancel_prompt(running))
+        with self.assertRaisesRegex(RuntimeError, "중단"):
+            self.client.wait_for_prompt(running)
+        self.assertEqual(self.state.interrupted, [running])
+        self.assertEqual(self.client.prompt_state(running), "failed")
+
+
+    def test_prompt_queued_behind_a_long_run_outlives_the_idle_timeout(self):
+        self.state.run_seconds, self.state.steps = 0.8, 16
+        self.assertTrue(self.stream.wait_connected(2))
+        first = self.client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        second = self.client.queue_prompt(self.workflow_path, {})["prompt_id"]
+        started = []
+        with mock.patch.dict("app.comfy_client.WS_TIMEOUTS", {"comfy_ws_idle": 0.3}):
+            # No events for `second` while `first` runs for longer than the idle timeout.
+            self.client.wait_for_prompt(second, on_start=lambda: started.append(time.monotonic()))
+        self.assertEqual(self.client.prompt_state(first), "complete")
+        self.assertEqual(self.client.prompt_state(second), "complete")
+        self.assertEqual(len(started), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from app.comfy_inputs import CACHE_PREFIX, ComfyInputCache
+
+
+class _Uploads:
+    """Writes uploads into a fake ComfyUI input folder and counts calls."""
+
+    def __init__(self, input_dir, delay=0.0):
+        self.input_dir = input_dir
+        self.delay = delay
+        self.names = []
+        self.prepared = 0
+
+    def prepare(self, data):
+        self.prepared += 1
+        return data[:2], {"resized": True}
+
+    def upload(self, name, payload):
+        time.sleep(self.delay)
+        self.names.append(name)
+        with open(os.path.join(self.input_dir, name), "wb") as f:
+            f.write(payload)
+        return name
+
+
+class ComfyInputCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_dir = self.directory.name
+        self.now = [1000.0]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _cache(self, **kwargs):
+        return ComfyInputCache(self.input_dir, clock=lambda: self.now[0], **kwargs)
+
+    def test_reused_image_skips_downscale_and_upload(self):
+        cache, uploads = self._cache(), _Uploads(self.input_dir)
+        first = cache.acquire(b"image-a", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)
+        second = cache.acquire(b"image-a", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)
+        other_size = cache.acquire(b"image-a", max_side=768, prepare=uploads.prepare, upload=uploads.upload)
+
+        self.assertEqual(first, (second[0], {"resized": True}, False))
+        self.assertEqual(second[1:], ({"resized": True}, True))
+        self.assertTrue(first[0].startswith(CACHE_PREFIX))
+        self.assertNotEqual(other_size[0], first[0])
+        self.assertEqual((uploads.prepared, len(uploads.names)), (2, 2))
+        self.assertEqual(cache.metrics()["hits"], 1)
+
+    def test_concurrent_jobs_share_one_upload(self):
+        cache, uploads = self._cache(), _Uploads(self.input_dir, delay=0.1)
+        results = []
+
+        def job():
+            results.append(cache.acquire(b"same", max_side=1536, prepare=uploads.prepare, upload=uploads.upload))
+
+        threads = [threading.Thread(target=job) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(uploads.names), 1)
+        self.assertEqual({name for name, _, _ in results}, set(uploads.names))
+        self.assertEqual(cache.metrics()["in_use"], 1)
+
+    def test_janitor_keeps_referenced_entries_and_evicts_idle_ones(self):
+        cache, uploads = self._cache(max_entries=1, idle_seconds=60), _Uploads(self.input_dir)
+        old, _, _ = cache.acquire(b"old", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)
+        new, _, _ = cache.acquire(b"new", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)
+        self.assertEqual(cache.sweep(), 0)  # both still referenced
+
+        cache.release(old)
+        self.now[0] += 1
+        cache.release(new)
+        self.assertEqual(cache.sweep(), 1)  # over max_entries: least recently used goes first
+        self.assertFalse(os.path.exists(os.path.join(self.input_dir, old)))
+        self.assertTrue(os.path.exists(os.path.join(self.input_dir, new)))
+
+        self.now[0] += 120
+        self.assertEqual(cache.sweep(), 1)  # idle too long
+        self.assertEqual(os.listdir(self.input_dir), [])
+
+    def test_adopts_previous_uploads_and_reuploads_missing_files(self):
+        uploads = _Uploads(self.input_dir)
+        name, _, _ = self._cache().acquire(b"kept", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)
+
+        restarted = self._cache()
+        self.assertEqual(restarted.adopt_existing(), 1)
+        self.assertEqual(restarted.acquire(b"kept", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)[0], name)
+        self.assertEqual(len(uploads.names), 1)
+
+        os.remove(os.path.join(self.input_dir, name))
+        restarted.release(name)
+        self.assertEqual(restarted.acquire(b"kept", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)[2], False)
+        self.assertEqual(len(uploads.names), 2)
+
+    def test_acquire_waits_for_a_pending_eviction_of_the_same_file(self):
+        cache, uploads = self._cache(idle_seconds=60), _Uploads(self.input_dir)
+        name, _, _ = cache.acquire(b"img", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)
+        cache.release(name)
+        self.now[0] += 120
+        deleting, resume = threading.Event(), threading.Event()
+        delete_file = cache._delete_file
+
+        def slow_delete(evicted):
+            deleting.set()
+            resume.wait(2)
+            delete_file(evicted)
+
+        cache._delete_file = slow_delete
+        sweeper = threading.Thread(target=cache.sweep)
+        sweeper.start()
+        self.assertTrue(deleting.wait(2))
+        acquired = []
+        job = threading.Thread(
+            target=lambda: acquired.append(
+                cache.acquire(b"img", max_side=1536, prepare=uploads.prepare, upload=uploads.upload)
+            )
+        )
+        job.start()
+        time.sleep(0.05)
+        self.assertEqual(acquired, [])  # blocked until the old file is gone
+        resume.set()
+        sweeper.join()
+        job.join()
+        self.assertEqual(acquired[0][0], name)
+        self.assertEqual(len(uploads.names), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.input_dir, name)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import comfy_client
+from app.comfy_backends import ComfyBackend, ComfyBackendPool
+from app.comfy_client import close_http_pools
+from app.comfy_schema import NodeSchema, NodeSchemaCache, WorkflowAvailability, WorkflowValidationError
+from scripts.fake_comfyui import serve
+
+
+OBJECT_INFO = {
+    "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [["sdxl.safetensors"]]}}},
+    "KSampler": {
+        "input": {
+            "required": {
+                "model": ["MODEL"],
+                "seed": ["INT", {"min": 0, "max": 2**64 - 1}],
+                "cfg": ["FLOAT", {"min": 0.0, "max": 100.0}],
+            }
+        }
+    },
+    "LoadImage": {"input": {"required": {"image": [["example.png"], {"image_upload": True}]}}},
+}
+
+GRAPH = {
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sdxl.safetensors"}},
+    "3": {"class_type": "KSampler", "inputs": {"model": ["4", 0], "seed": 1, "cfg": 7.0}},
+    "1": {"class_type": "LoadImage", "inputs": {"image": "cas_abc-ds1536.png"}},
+}
+
+
+class NodeSchemaTests(unittest.TestCase):
+    def test_valid_graph_passes_and_upload_combos_are_not_checked(self):
+        self.assertEqual(NodeSchema(OBJECT_INFO, 0.0).validate(GRAPH), [])
+
+    def test_reports_unknown_nodes_missing_inputs_bad_values_and_links(self):
+        graph = json.loads(json.dumps(GRAPH))
+        graph["4"]["inputs"]["ckpt_name"] = "missing.safetensors"
+        graph["3"]["inputs"].update(model=["9", 0], cfg=-1)
+        del graph["3"]["inputs"]["seed"]
+        graph["7"] = {"class_type": "BiRefNetRMBG", "inputs": {}}
+
+        problems = NodeSchema(OBJECT_INFO, 0.0).validate(graph)
+        self.assertEqual(len(problems), 5)
+        self.assertIn("node 7: unknown node type 'BiRefNetRMBG' (custom node not installed?)", problems)
+        self.assertIn("node 3 (KSampler): missing required input 'seed'", problems)
+        self.assertIn("node 3 (KSampler): input 'model' links to missing node 9", problems)
+        self.assertTrue(any("'cfg'=-1 is outside" in p for p in problems))
+        # Only the overridden nodes are checked per request.
+        self.assertEqual(len(NodeSchema(OBJECT_INFO, 0.0).validate(graph, ["4"])), 1)
+
+    def test_stale_schema_is_refetched_before_rejecting(self):
+        now = [100.0]
+        cache = NodeSchemaCache("http://gpu", min_refresh_seconds=30, clock=lambda: now[0])
+        cache._schema = NodeSchema(OBJECT_INFO, 100.0)
+        graph = {"4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "new.safetensors"}}}
+        installed = dict(OBJECT_INFO, CheckpointLoaderSimple={"input": {"required": {"ckpt_name": [["new.safetensors"]]}}})
+
+        with mock.patch.object(cache, "refresh", side_effect=lambda: NodeSchema(installed, now[0])) as refresh:
+            self.assertEqual(len(cache.validate(graph)), 1)  # fetched just now: no refetch
+            now[0] += 60
+            self.assertEqual(cache.validate(graph), [])
+        self.assertEqual(refresh.call_count, 1)
+
+
+class WorkflowAvailabilityTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(comfy_client, "COMFY_SHARED_EVENTS_ENABLED", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.servers = [serve() for _ in range(2)]
+        self.directory = tempfile.TemporaryDirectory()
+        for workflow_id, graph in (("Txt2Img", GRAPH), ("RMBG2", {"7": {"class_type": "BiRefNetRMBG", "inputs": {}}})):
+            with open(os.path.join(self.directory.name, f"{workflow_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(graph, f)
+        self.configs = {"Txt2Img": {}, "RMBG2": {}, "Hosted": {"provider": "openrouter"}}
+
+    def tearDown(self):
+        for server, _ in self.servers:
+            server.shutdown()
+            server.server_close()
+        close_http_pools()
+        self.directory.cleanup()
+
+    def _pool(self):
+        return ComfyBackendPool([
+            ComfyBackend(f"gpu{index}", f"127.0.0.1:{server.server_address[1]}")
+            for index, (server, _) in enumerate(self.servers, start=1)
+        ])
+
+    def test_workflow_runs_only_where_the_schema_allows_and_is_refused_when_nowhere(self):
+        (_, state1), (_, state2) = self.servers
+        state1.object_info = OBJECT_INFO
+        state2.object_info = dict(OBJECT_INFO, BiRefNetRMBG={"input": {"required": {}}})
+        pool, availability = self._pool(), WorkflowAvailability()
+
+        self.assertEqual(availability.check(self.configs, self.directory.name, pool.backends()), {})  # not fetched yet
+        self.assertEqual(pool.refresh_schemas(timeout=2.0), 2)
+        self.assertEqual(availability.check(self.configs, self.directory.name, pool.backends()), {})
+        self.assertEqual(pool.get("gpu1").unavailable_workflows, frozenset({"RMBG2"}))
+        self.assertEqual([pool.acquire(j, "RMBG2").name for j in ("a", "b")], ["gpu2", "gpu2"])
+        self.assertEqual(availability.metrics()["partial"], {"RMBG2": ["gpu1"]})
+
+        state2.object_info = OBJECT_INFO
+        pool.refresh_schemas(["gpu2"], timeout=2.0)
+        unavailable = availability.check(self.configs, self.directory.name, pool.backends())
+        self.assertEqual(list(unavailable), ["RMBG2"])
+        self.assertEqual(availability.problems("RMBG2")[0], "gpu1: node 7: unknown node type 'BiRefNetRMBG' (custom node not installed?)")
+        self.assertIsNone(availability.problems("Txt2Img"))
+
+    def test_bad_override_is_rejected_before_post_prompt(self):
+        (_, state1), _ = self.servers
+        state1.object_info = OBJECT_INFO
+        backend = self._pool().get("gpu1")
+        client = backend.client()
+        client.node_schema().refresh(timeout=2.0)
+        path = os.path.join(self.directory.name, "Txt2Img.json")
+
+        with self.assertRaises(WorkflowValidationError) as raised:
+            client.queue_prompt(path, {"4": {"inputs": {"ckpt_name": "gone.safetensors"}}})
+        self.assertIn("'ckpt_name' value 'gone.safetensors' is not available", raised.exception.problems[0])
+        self.assertEqual(state1.prompts, {})
+        self.assertTrue(client.queue_prompt(path, {"3": {"inputs": {"seed": 42}}}).get("prompt_id"))
+
+
+if __name__ == "__main__":
+    unittest.main()
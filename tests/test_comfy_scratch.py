@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app.comfy_scratch import ScratchManifest, scratch_path
+
+
+class ScratchManifestTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.input_dir = os.path.join(self.root, "input")
+        os.makedirs(self.input_dir)
+        self.now = [1000.0]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _manifest(self, **kwargs):
+        return ScratchManifest(os.path.join(self.root, "jobs.sqlite3"), clock=lambda: self.now[0], **kwargs)
+
+    def _file(self, name):
+        path = os.path.join(self.input_dir, name)
+        with open(path, "wb") as f:
+            f.write(b"x")
+        return path
+
+    def test_files_are_deleted_only_after_release(self):
+        manifest = self._manifest()
+        path = self._file("img_job1_0.png")
+        manifest.track("job1", path, "img2img_input")
+        self.assertEqual(manifest.sweep(), 0)
+        self.assertTrue(os.path.exists(path))
+
+        self.assertEqual(manifest.release("job1"), 1)
+        self.assertTrue(os.path.exists(path))  # release never touches the disk
+        self.assertEqual(manifest.sweep(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(manifest.metrics()["removed"], 1)
+        self.assertEqual(manifest.metrics()["pending"], 0)
+
+    def test_locked_file_is_retried_with_backoff_then_abandoned(self):
+        manifest = self._manifest(retry_base_seconds=2, retry_max_seconds=5, max_attempts=4)
+        path = self._file("img_job1_0.png")
+        manifest.track("job1", path, "img2img_input")
+        manifest.release("job1")
+        with mock.patch("app.comfy_scratch.os.remove", side_effect=PermissionError("in use")):
+            self.assertEqual(manifest.sweep(), 1)
+            self.assertEqual(manifest.sweep(), 0)  # next attempt in 2 s
+            self.now[0] += 2
+            self.assertEqual(manifest.sweep(), 1)
+            self.now[0] += 3.9
+            self.assertEqual(manifest.sweep(), 0)  # 4 s
+            self.now[0] += 0.1
+            self.assertEqual(manifest.sweep(), 1)
+            self.now[0] += 5  # capped at retry_max_seconds
+            with self.assertLogs("comfyui_app", level="WARNING"):
+                self.assertEqual(manifest.sweep(), 1)
+        metrics = manifest.metrics()
+        self.assertEqual((metrics["retries"], metrics["abandoned"], metrics["pending"]), (3, 1, 0))
+
+        # A file released once the handle is gone is simply deleted.
+        manifest.track("job2", path, "img2img_input")
+        manifest.release("job2")
+        manifest.sweep()
+        self.assertFalse(os.path.exists(path))
+
+    def test_pattern_row_deletes_every_file_with_the_prefix(self):
+        manifest = self._manifest()
+        layers = [self._file("st_job1_layers.json"), self._file("st_job1_hair.png")]
+        other = self._file("st_job2_layers.json")
+        manifest.track("job1", os.path.join(self.input_dir, "st_job1"), "seethrough_output", pattern=True)
+        manifest.release("job1")
+        manifest.sweep()
+        self.assertFalse(any(os.path.exists(p) for p in layers))
+        self.assertTrue(os.path.exists(other))
+
+    def test_reconcile_after_a_crash_keeps_resumed_jobs(self):
+        crashed = self._manifest()
+        orphan = self._file("img_job1_0.png")
+        resumed = self._file("img_job2_0.png")
+        crashed.track("job1", orphan, "img2img_input")
+        crashed.track("job2", resumed, "img2img_input")
+
+        restarted = self._manifest()
+        self.assertEqual(restarted.reconcile(["job2"]), 1)
+        restarted.sweep()
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(resumed))
+        # The resumed job releases its earlier files when it ends.
+        restarted.release("job2")
+        restarted.sweep()
+        self.assertFalse(os.path.exists(resumed))
+
+    def test_janitor_thread_deletes_right_after_release(self):
+        manifest = ScratchManifest(os.path.join(self.root, "jobs.sqlite3"))
+        path = self._file("img_job1_0.png")
+        manifest.track("job1", path, "img2img_input")
+        manifest.start(interval_seconds=60)
+        try:
+            manifest.release("job1")
+            deadline = time.monotonic() + 5
+            while os.path.exists(path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertFalse(os.path.exists(path))
+        finally:
+            manifest.stop()
+
+    def test_scratch_path_stays_inside_the_folder(self):
+        self.assertEqual(
+            scratch_path(self.input_dir, "sub/a.png"), os.path.join(os.path.realpath(self.input_dir), "sub", "a.png")
+        )
+        self.assertIsNone(scratch_path(self.input_dir, "../jobs.sqlite3"))
+        self.assertIsNone(scratch_path(self.input_dir, "/etc/passwd"))
+        self.assertIsNone(scratch_path(None, "a.png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -132,6 +132,34 @@ class GenerationControlTests(unittest.TestCase):
         self.assertEqual(summary["total"], 1)
         self.assertEqual(summary["rejected"], 1)
 
+    def test_predicted_wait_above_threshold_rejects_with_retry_after(self):
+        self.controls.set_wait_predictor(lambda payload: {"expected_wait_seconds": 130.2})
+        self.controls.admit(self.payload())
+        self.controls.update_policy({"max_predicted_wait_seconds": 60})
+        with self.assertRaises(GenerationPolicyError) as raised:
+            self.controls.admit(self.payload(request_id="request-2", idempotency_key="idem-key-2"))
+        self.assertEqual(raised.exception.code, "queue_wait_too_long")
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(raised.exception.details["retry_after_seconds"], 71)
+        self.assertEqual(self.controls.summary()["rejected"], 1)
+
+        self.controls.set_wait_predictor(lambda payload: {"expected_wait_seconds": 10.0})
+        self.assertFalse(self.controls.admit(self.payload(request_id="request-3", idempotency_key="idem-key-3")).is_duplicate)
+
+    def test_unrunnable_workflow_is_rejected_without_reserving_quota(self):
+        self.controls.update_policy({"daily_request_limit": 1})
+        self.controls.set_workflow_checker(
+            lambda payload: ["gpu1: node 3: unknown node type 'X'"] if payload["workflow_id"] == "GameUI_Elements" else None
+        )
+        with self.assertRaises(GenerationPolicyError) as raised:
+            self.controls.admit(self.payload())
+        self.assertEqual((raised.exception.code, raised.exception.status_code), ("workflow_unavailable", 503))
+        self.assertEqual(raised.exception.details["problems"], ["gpu1: node 3: unknown node type 'X'"])
+
+        other = dict(self.payload(request_id="request-2", idempotency_key="idem-key-2"), workflow_id="Other")
+        self.assertFalse(self.controls.admit(other).is_duplicate)
+        self.assertEqual(self.controls.summary()["rejected"], 1)
+
     def test_daily_request_limit_is_atomic_under_concurrent_admission(self):
         self.controls.update_policy({"daily_request_limit": 3})
 
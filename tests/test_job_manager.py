@@ -1,8 +1,217 @@
+import asyncio
+import os
+import tempfile
 import threading
 import time
 import unittest
 
-from app.job_manager import JobManager, RoutingJobManager
+from app.job_manager import (
+    AsyncJobManager,
+    DeadlineWatchdog,
+    ExecutionGate,
+    JobManager,
+    RoutingJobManager,
+    to_thread_uncancelled,
+)
+from app.job_store import JobStore
+
+
+class JobManagerDispatchTests(unittest.TestCase):
+    def test_idle_workers_block_instead_of_polling(self):
+        manager = JobManager(worker_count=3)
+        scans = 0
+        original = manager._next_job
+
+        def counting_scan():
+            nonlocal scans
+            scans += 1
+            return original()
+
+        manager._next_job = counting_scan
+        manager.register_processor("generate", lambda job, progress: None)
+        manager.start()
+        try:
+            time.sleep(0.3)
+            # One initial scan per worker; a 50ms poller would have made ~18.
+            self.assertLessEqual(scans, 3)
+        finally:
+            started = time.monotonic()
+            manager.stop()
+            self.assertLess(time.monotonic() - started, 1.0)
+            self.assertFalse(any(t.is_alive() for t in manager._worker_threads))
+
+    def test_enqueue_wakes_idle_worker_immediately(self):
+        manager = JobManager(worker_count=1)
+        started = threading.Event()
+        manager.register_processor("generate", lambda job, progress: started.set())
+        manager.start()
+        try:
+            time.sleep(0.1)
+            enqueued_at = time.monotonic()
+            manager.enqueue("owner", "generate", {})
+            self.assertTrue(started.wait(timeout=1))
+            self.assertLess(time.monotonic() - enqueued_at, 0.03)
+        finally:
+            manager.stop()
+
+    def test_completion_hands_slot_to_same_owner_backlog(self):
+        manager = JobManager(worker_count=2)
+        order: list[str] = []
+        manager.register_processor("generate", lambda job, progress: order.append(job.id))
+        jobs = [manager.enqueue("owner", "generate", {}) for _ in range(3)]
+        manager.start()
+        try:
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and len(order) < 3:
+                time.sleep(0.01)
+            self.assertEqual(order, [job.id for job in jobs])
+        finally:
+            manager.stop()
+
+
+class JobManagerPositionTests(unittest.TestCase):
+    def _enqueue_backlog(self, manager):
+        plan = ["a", "a", "a", "b", "c", "c"]
+        jobs = [manager.enqueue(owner, "generate", {}) for owner in plan]
+        return {f"{owner}{plan[: i + 1].count(owner)}": job for i, (owner, job) in enumerate(zip(plan, jobs))}
+
+    def test_positions_follow_round_robin_dispatch_order(self):
+        manager = JobManager(worker_count=1)
+        jobs = self._enqueue_backlog(manager)
+        expected_order = ["a1", "b1", "c1", "a2", "c2", "a3"]
+        self.assertEqual(
+            [manager.get_global_position(jobs[name].id) for name in expected_order],
+            list(range(6)),
+        )
+        self.assertEqual(manager.get_position(jobs["a3"].id), 2)
+        self.assertEqual(manager.get_position(jobs["c2"].id), 1)
+
+        dispatched: list[str] = []
+        manager.register_processor("generate", lambda job, progress: dispatched.append(job.id))
+        manager.start()
+        try:
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and len(dispatched) < 6:
+                time.sleep(0.01)
+            self.assertEqual(dispatched, [jobs[name].id for name in expected_order])
+            self.assertEqual(manager.get_global_position(jobs["a3"].id), 0)
+            self.assertEqual(manager.queued_count(), 0)
+        finally:
+            manager.stop()
+
+    def test_cancel_and_rotation_update_positions(self):
+        manager = JobManager(worker_count=1)
+        jobs = self._enqueue_backlog(manager)
+        self.assertTrue(manager.cancel(jobs["b1"].id))
+        self.assertEqual(manager.get_global_position(jobs["c1"].id), 1)
+        self.assertEqual(manager.get_global_position(jobs["a3"].id), 4)
+        self.assertTrue(manager.cancel(jobs["a1"].id))
+        self.assertEqual(manager.get_position(jobs["a2"].id), 0)
+        # Remaining order: a2, c1, a3, c2 -> a keeps its rotation slot ahead of c.
+        self.assertEqual(manager.get_global_position(jobs["c1"].id), 1)
+        self.assertEqual(manager.get_global_position(jobs["c2"].id), 3)
+
+        first = manager._next_job()
+        self.assertEqual(first.id, jobs["a2"].id)
+        # Served users move to the back of the rotation, behind "c".
+        self.assertEqual(manager.get_global_position(jobs["c1"].id), 0)
+        self.assertEqual(manager.get_global_position(jobs["a3"].id), 1)
+        self.assertEqual(manager.queued_count(), 3)
+        self.assertIsNone(manager.get_global_position("missing"))
+
+
+class JobManagerRetentionTests(unittest.TestCase):
+    def _run_jobs(self, manager, owners, payload=None):
+        jobs = [manager.enqueue(owner, "generate", dict(payload or {})) for owner in owners]
+        manager.start()
+        try:
+            deadline = time.monotonic() + 3
+            while time.monotonic() < deadline:
+                if all(manager.get(job.id) and manager.get(job.id).status == "complete" for job in jobs):
+                    break
+                time.sleep(0.01)
+        finally:
+            manager.stop()
+        return jobs
+
+    def test_finished_jobs_are_capped_and_fall_back_to_job_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JobStore(os.path.join(tmp, "jobs.db"))
+            manager = JobManager(worker_count=1)
+            manager.max_finished_jobs = 3
+            manager.set_job_store(store)
+
+            def processor(job, progress):
+                job.result = {"n": job.payload["n"]}
+
+            def notifier(owner_id, event):
+                job = manager.get(event["job_id"])
+                store.upsert_job({
+                    "id": job.id, "owner_id": job.owner_id, "type": job.type, "status": job.status,
+                    "progress": job.progress, "created_at": job.created_at, "started_at": job.started_at,
+                    "ended_at": job.ended_at, "error": job.error_message, "result": job.result,
+                    "payload": job.payload,
+                })
+
+            manager.register_processor("generate", processor)
+            manager.set_notifier(notifier)
+            jobs = [manager.enqueue(f"owner-{i}", "generate", {"n": i, "workflow_id": "wf"}) for i in range(8)]
+            manager.start()
+            try:
+                deadline = time.monotonic() + 3
+                while time.monotonic() < deadline and len(manager.recent_completions()) < 8:
+                    time.sleep(0.01)
+            finally:
+                manager.stop()
+
+            self.assertEqual(len(manager._jobs), 3)
+            evicted = jobs[0]
+            self.assertFalse(manager.owns(evicted.id))
+            restored = manager.get(evicted.id)
+            self.assertIsNotNone(restored)
+            self.assertEqual(restored.status, "complete")
+            self.assertEqual(restored.result, {"n": 0})
+            self.assertEqual(restored.owner_id, "owner-0")
+            self.assertIsNone(manager.get("missing"))
+            # Averages survive eviction because they come from the completion log.
+            self.assertEqual(manager.get_recent_averages()["count"], 8)
+            self.assertIn("wf", manager.get_recent_averages()["per_workflow_avg_sec"])
+
+    def test_finished_jobs_expire_by_age(self):
+        manager = JobManager(worker_count=1)
+        manager.finished_job_ttl_seconds = 60
+        manager.register_processor("generate", lambda job, progress: None)
+        old, fresh = self._run_jobs(manager, ["a", "b"])
+        manager._finished[old.id] -= 120
+        manager.enqueue("c", "generate", {})
+        self.assertFalse(manager.owns(old.id))
+        self.assertTrue(manager.owns(fresh.id))
+
+    def test_running_indexes_track_status_changes(self):
+        manager = JobManager(worker_count=2)
+        started = threading.Event()
+        release = threading.Event()
+
+        def processor(job, progress):
+            started.set()
+            release.wait(timeout=2)
+
+        manager.register_processor("generate", processor)
+        job = manager.enqueue("owner", "generate", {})
+        manager.start()
+        try:
+            self.assertTrue(started.wait(timeout=1))
+            self.assertEqual(manager.running_job_ids(), [job.id])
+            self.assertEqual(manager.get_active_for_owner("owner").id, job.id)
+            self.assertIsNone(manager.get_active_for_owner("other"))
+        finally:
+            release.set()
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and manager.get(job.id).status != "complete":
+                time.sleep(0.01)
+            manager.stop()
+        self.assertEqual(manager.running_job_ids(), [])
+        self.assertIsNone(manager.get_active_for_owner("owner"))
 
 
 class RoutingJobManagerTests(unittest.TestCase):
@@ -98,5 +307,434 @@ class RoutingJobManagerTests(unittest.TestCase):
             routing.stop()
 
 
+class ExecutionLaneTests(unittest.TestCase):
+    CONFIGS = {
+        "RMBG2": {"provider": "comfyui", "mcp_execution_class": "fast"},
+        "AceStep15XL": {},
+        "Hosted": {"provider": "openrouter"},
+    }
+
+    def _routing(self, fast_weight: float = 4.0):
+        comfy = JobManager(worker_count=1)
+        external = JobManager(worker_count=1)
+        fast = JobManager(worker_count=1)
+        routing = RoutingJobManager(comfy, external, self.CONFIGS, lanes={"comfyui:fast": fast})
+        gate = ExecutionGate(capacity=1)
+        comfy.set_execution_gate(gate, weight=1.0)
+        fast.set_execution_gate(gate, weight=fast_weight)
+        return routing, comfy, fast
+
+    def test_routes_by_execution_class_and_falls_back_to_provider_lane(self):
+        routing, comfy, fast = self._routing()
+        self.assertEqual(RoutingJobManager.execution_class_lane_keys(self.CONFIGS), ["comfyui:fast"])
+        self.assertEqual(routing.lane_key_for_workflow("RMBG2"), "comfyui:fast")
+        self.assertEqual(routing.lane_key_for_workflow("AceStep15XL"), "comfyui:default")
+        self.assertEqual(routing.lane_key_for_workflow("Hosted"), "openrouter:default")
+        plain = RoutingJobManager(JobManager(), JobManager(), self.CONFIGS)
+        self.assertEqual(plain.lane_key_for_workflow("RMBG2"), "comfyui:default")
+        self.assertEqual(routing.lanes_for_provider("comfyui"), [comfy, fast])
+
+    def test_fast_job_skips_long_backlog_but_gpu_stays_serialized(self):
+        routing, comfy, fast = self._routing()
+        state_lock = threading.Lock()
+        active = 0
+        max_active = 0
+        order: list[str] = []
+        first_started = threading.Event()
+
+        def processor(job, progress):
+            nonlocal active, max_active
+            with state_lock:
+                active += 1
+                max_active = max(max_active, active)
+                order.append(job.payload["workflow_id"])
+            first_started.set()
+            time.sleep(0.05)
+            with state_lock:
+                active -= 1
+
+        routing.register_processor("generate", processor)
+        slow = [routing.enqueue(f"composer-{i}", "generate", {"workflow_id": "AceStep15XL"}) for i in range(4)]
+        routing.start()
+        try:
+            self.assertTrue(first_started.wait(timeout=1))
+            quick = routing.enqueue("editor", "generate", {"workflow_id": "RMBG2"})
+            self.assertTrue(fast.owns(quick.id))
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if all(routing.get(j.id).status == "complete" for j in slow + [quick]):
+                    break
+                time.sleep(0.01)
+        finally:
+            routing.stop()
+        self.assertEqual(max_active, 1)
+        # The fast job runs as soon as the in-flight long job releases the GPU slot.
+        self.assertEqual(order[:2], ["AceStep15XL", "RMBG2"])
+        metrics = routing.lane_metrics()
+        self.assertEqual(metrics["comfyui:fast"]["wait_samples"], 1)
+        self.assertEqual(metrics["comfyui:default"]["gate"]["grants"]["comfyui:default"], 4)
+        self.assertEqual(metrics["comfyui:default"]["gate"]["weights"]["comfyui:fast"], 4.0)
+
+    def test_job_without_processor_gives_back_its_gate_slot(self):
+        comfy = JobManager(worker_count=1)
+        gate = ExecutionGate(capacity=1)
+        comfy.set_execution_gate(gate, "comfyui:default")
+        comfy.register_processor("generate", lambda job, progress: None)
+        unknown = comfy.enqueue("a", "unknown_type", {})
+        valid = comfy.enqueue("a", "generate", {})
+        comfy.start()
+        try:
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and comfy.get(valid.id).status != "complete":
+                time.sleep(0.01)
+            self.assertEqual(comfy.get(unknown.id).status, "error")
+            self.assertEqual(comfy.get(valid.id).status, "complete")
+            self.assertEqual(gate._in_use, 0)
+            self.assertEqual(comfy._running_by_user.get("a", 0), 0)
+        finally:
+            comfy.stop()
+
+    def test_pipelined_lane_overlaps_jobs_but_gpu_stays_serialized(self):
+        comfy = JobManager(worker_count=2)
+        comfy.set_execution_gate(ExecutionGate(capacity=2, parallelism=1), "comfyui:default")
+        # Shorter than queue wait + run: only passes if the deadline restarts at execution start.
+        comfy.job_timeout_seconds = 0.3
+        gpu = threading.Lock()
+        state_lock = threading.Lock()
+        in_flight = max_in_flight = 0
+
+        def processor(job, progress):
+            nonlocal in_flight, max_in_flight
+            with state_lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.02)  # prepare + queue the prompt
+            with gpu:  # ComfyUI runs one prompt at a time
+                comfy.mark_execution_started(job.id)
+                time.sleep(0.2)
+            if comfy.is_cancel_requested(job.id):
+                raise RuntimeError("timed out")
+            time.sleep(0.05)  # download + thumbnail, overlapping the next prompt
+            with state_lock:
+                in_flight -= 1
+
+        comfy.register_processor("generate", processor)
+        jobs = [comfy.enqueue(f"user-{i}", "generate", {"workflow_id": "AceStep15XL"}) for i in range(3)]
+        started = time.monotonic()
+        comfy.start()
+        try:
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and any(comfy.get(j.id).status in ("queued", "running") for j in jobs):
+                time.sleep(0.01)
+        finally:
+            comfy.stop()
+        elapsed = time.monotonic() - started
+        self.assertEqual([comfy.get(j.id).status for j in jobs], ["complete"] * 3)
+        self.assertEqual(max_in_flight, 2)
+        # Serial would be 3 x 0.27s; pipelined hides preparation and post-processing.
+        self.assertLess(elapsed, 0.75)
+        self.assertEqual(comfy._execution_started_at, {})
+        self.assertEqual(comfy.lane_metrics()["gate"]["parallelism"], 1)
+
+    def test_lane_limits_and_timeouts_are_independent(self):
+        routing, comfy, fast = self._routing()
+        comfy.max_per_user_queue = 1
+        fast.max_per_user_queue = 3
+        fast.job_timeout_seconds = 0.05
+        routing.enqueue("u", "generate", {"workflow_id": "AceStep15XL"})
+        with self.assertRaises(RuntimeError):
+            routing.enqueue("u", "generate", {"workflow_id": "AceStep15XL"})
+        for _ in range(3):
+            routing.enqueue("u", "generate", {"workflow_id": "RMBG2"})
+        metrics = routing.lane_metrics()
+        self.assertEqual(metrics["comfyui:default"]["queued"], 1)
+        self.assertEqual(metrics["comfyui:fast"]["queued"], 3)
+        self.assertEqual(metrics["comfyui:fast"]["job_timeout_seconds"], 0.05)
+        self.assertIsNotNone(metrics["comfyui:fast"]["oldest_queued_wait_sec"])
+
+
+class DeadlineWatchdogTests(unittest.TestCase):
+    def _manager(self):
+        manager = JobManager(worker_count=2)
+        manager.set_watchdog(DeadlineWatchdog())
+        release = threading.Event()
+
+        def processor(job, progress):
+            while not manager.is_cancel_requested(job.id):
+                if release.wait(timeout=0.01):
+                    return
+            raise RuntimeError("timed out")
+
+        manager.register_processor("generate", processor)
+        return manager, release
+
+    def _wait_status(self, manager, job_id, status, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and manager.get(job_id).status != status:
+            time.sleep(0.01)
+        return manager.get(job_id).status
+
+    def test_per_job_deadlines_use_one_thread(self):
+        manager, release = self._manager()
+        manager.job_timeout_seconds = 5
+        manager.set_deadline_resolver(lambda job: 0.1 if job.payload.get("workflow_id") == "Quick" else None)
+        threads_before = threading.active_count()
+        quick = manager.enqueue("a", "generate", {"workflow_id": "Quick"})
+        slow = manager.enqueue("b", "generate", {"workflow_id": "Slow"})
+        manager.start()
+        try:
+            self.assertEqual(self._wait_status(manager, quick.id, "cancelled"), "cancelled")
+            self.assertEqual(manager.get(slow.id).status, "running")
+            upcoming = manager.upcoming_deadlines()
+            self.assertEqual([d["job_id"] for d in upcoming], [slow.id])
+            self.assertEqual(upcoming[0]["timeout_sec"], 5.0)
+            # 2 workers + 1 watchdog, no timer thread per job
+            self.assertLessEqual(threading.active_count() - threads_before, 3)
+        finally:
+            release.set()
+            manager.stop()
+        self.assertEqual(manager._watchdog.metrics()["active"], 0)
+
+    def test_changing_timeout_moves_running_deadlines(self):
+        manager, release = self._manager()
+        manager.job_timeout_seconds = 60
+        job = manager.enqueue("a", "generate", {"workflow_id": "Slow"})
+        manager.start()
+        try:
+            self.assertEqual(self._wait_status(manager, job.id, "running"), "running")
+            manager.job_timeout_seconds = 0.05
+            self.assertEqual(self._wait_status(manager, job.id, "cancelled"), "cancelled")
+        finally:
+            release.set()
+            manager.stop()
+
+    def test_slow_cancel_handle_does_not_delay_other_deadlines(self):
+        watchdog = DeadlineWatchdog()
+        lanes = []
+        for _ in range(2):
+            manager, release = self._manager()
+            manager.set_watchdog(watchdog)
+            manager.job_timeout_seconds = 0.1
+            lanes.append((manager, release))
+        (comfy, comfy_release), (hosted, hosted_release) = lanes
+        handle_entered = threading.Event()
+        unblock = threading.Event()
+
+        def slow_cancel():
+            # An unresponsive ComfyUI: the cancel handle blocks on HTTP timeouts.
+            handle_entered.set()
+            unblock.wait(5)
+            return True
+
+        stuck = comfy.enqueue("a", "generate", {})
+        comfy.start()
+        try:
+            self.assertEqual(self._wait_status(comfy, stuck.id, "running"), "running")
+            comfy.set_cancel_handle(stuck.id, slow_cancel)
+            self.assertTrue(handle_entered.wait(timeout=2))
+            started = time.monotonic()
+            other = hosted.enqueue("b", "generate", {})
+            hosted.start()
+            self.assertEqual(self._wait_status(hosted, other.id, "cancelled"), "cancelled")
+            self.assertLess(time.monotonic() - started, 1.0)
+            # The stuck job is cancelled too; only its provider cancel is still pending.
+            self.assertEqual(self._wait_status(comfy, stuck.id, "cancelled"), "cancelled")
+        finally:
+            unblock.set()
+            for manager, release in lanes:
+                release.set()
+                manager.stop()
+
+    def test_watchdog_orders_and_cancels_deadlines(self):
+        watchdog = DeadlineWatchdog()
+        fired: list[str] = []
+        done = threading.Event()
+        now = time.time()
+        watchdog.schedule("late", now + 0.15, lambda: (fired.append("late"), done.set()))
+        watchdog.schedule("early", now + 0.05, lambda: fired.append("early"))
+        watchdog.schedule("dropped", now + 0.01, lambda: fired.append("dropped"))
+        watchdog.cancel("dropped")
+        self.assertEqual([d["job_id"] for d in watchdog.upcoming()], ["early", "late"])
+        self.assertTrue(done.wait(timeout=1))
+        self.assertEqual(fired, ["early", "late"])
+        self.assertEqual(watchdog.metrics()["fired"], 2)
+
+
+
+class AsyncJobManagerTests(unittest.TestCase):
+    def _wait(self, predicate, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not predicate():
+            time.sleep(0.01)
+        return predicate()
+
+    def test_many_jobs_in_flight_on_two_threads(self):
+        manager = AsyncJobManager(worker_count=64)
+        release = asyncio.Event()
+
+        async def processor(job, progress):
+            await release.wait()
+
+        manager.register_async_processor("generate", processor)
+        threads_before = set(threading.enumerate())
+        jobs = [manager.enqueue(f"user{i}", "generate", {}) for i in range(80)]
+        manager.start()
+        try:
+            self.assertTrue(self._wait(lambda: manager.lane_metrics()["in_flight"] == 64))
+            # dispatcher + event loop + status threads, regardless of how many jobs are in flight
+            lane_threads = [t for t in set(threading.enumerate()) - threads_before if t.name != "JobDeadlineWatchdog"]
+            self.assertLessEqual(len(lane_threads), 2 + AsyncJobManager.STATUS_THREADS)
+            self.assertEqual(manager.get(jobs[-1].id).status, "queued")
+            self.assertEqual(manager.get_global_position(jobs[-1].id), 15)
+            manager._loop.call_soon_threadsafe(release.set)
+            self.assertTrue(self._wait(lambda: all(manager.get(j.id).status == "complete" for j in jobs)))
+            self.assertTrue(self._wait(lambda: manager.lane_metrics()["in_flight"] == 0))
+            metrics = manager.lane_metrics()
+            self.assertEqual((metrics["executor"], metrics["peak_in_flight"], metrics["in_flight"]), ("asyncio", 64, 0))
+        finally:
+            manager.stop()
+
+    def test_cancel_aborts_the_awaiting_task(self):
+        manager = AsyncJobManager(worker_count=2)
+        entered, aborted = threading.Event(), threading.Event()
+
+        async def processor(job, progress):
+            entered.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                aborted.set()
+                raise
+
+        manager.register_async_processor("generate", processor)
+        job = manager.enqueue("a", "generate", {})
+        manager.start()
+        try:
+            self.assertTrue(entered.wait(timeout=2))
+            self.assertTrue(manager.cancel(job.id))
+            self.assertTrue(aborted.wait(timeout=1))
+            self.assertTrue(self._wait(lambda: manager.get(job.id).status == "cancelled"))
+            self.assertTrue(self._wait(lambda: manager.lane_metrics()["in_flight"] == 0))
+
+            # Cancelled while its status transition was still running: the processor never starts.
+            entered.clear()
+            begin_job = manager._begin_job
+
+            def slow_begin(job):
+                callback = begin_job(job)
+                time.sleep(0.2)
+                return callback
+
+            manager._begin_job = slow_begin
+            late = manager.enqueue("a", "generate", {})
+            self.assertTrue(self._wait(lambda: manager.get(late.id).status == "running"))
+            self.assertTrue(manager.cancel(late.id))
+            self.assertTrue(self._wait(lambda: manager.get(late.id).status == "cancelled"))
+            self.assertFalse(entered.is_set())
+        finally:
+            manager.stop()
+
+    def test_deadline_and_user_limit_with_blocking_fallback(self):
+        manager = AsyncJobManager(worker_count=4)
+        manager.set_watchdog(DeadlineWatchdog())
+        manager.job_timeout_seconds = 0.1
+        order: list[str] = []
+
+        async def processor(job, progress):
+            order.append(job.id)
+            if job.payload.get("hang"):
+                await asyncio.sleep(30)
+
+        manager.register_async_processor("generate", processor)
+        # A job type without an async processor runs its blocking one in a thread.
+        manager.register_processor("upscale", lambda job, progress: order.append(job.id))
+        hung = manager.enqueue("a", "generate", {"hang": True})
+        # Same owner (max_per_user_concurrent=1): dispatched when the hung job times out.
+        follow = manager.enqueue("a", "upscale", {})
+        manager.start()
+        try:
+            self.assertTrue(self._wait(lambda: manager.get(follow.id).status == "complete"))
+            self.assertEqual(manager.get(hung.id).status, "cancelled")
+            self.assertEqual(order, [hung.id, follow.id])
+        finally:
+            manager.stop()
+
+    def test_job_without_processor_frees_its_owner(self):
+        manager = AsyncJobManager(worker_count=2)
+
+        async def processor(job, progress):
+            return None
+
+        manager.register_async_processor("generate", processor)
+        unknown = manager.enqueue("u1", "unknown_type", {})
+        follow = manager.enqueue("u1", "generate", {})
+        manager.start()
+        try:
+            self.assertTrue(self._wait(lambda: manager.get(follow.id).status == "complete"))
+            self.assertEqual(manager.get(unknown.id).status, "error")
+            self.assertEqual(manager._running_by_user.get("u1", 0), 0)
+        finally:
+            manager.stop()
+
+    def test_blocking_status_notifications_do_not_stall_the_loop(self):
+        manager = AsyncJobManager(worker_count=2)
+        ticks: list[float] = []
+        blocked: list[float] = []
+        stop = asyncio.Event()
+
+        def slow_notifier(owner_id, payload):
+            if payload.get("status") == "complete" and not blocked:
+                blocked.append(time.monotonic())
+                time.sleep(0.3)  # e.g. sqlite under a lock
+                blocked.append(time.monotonic())
+
+        async def processor(job, progress):
+            if job.payload.get("heartbeat"):
+                while not stop.is_set():
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.01)
+                return
+            await asyncio.sleep(0.05)
+
+        manager.set_notifier(slow_notifier)
+        manager.register_async_processor("generate", processor)
+        heartbeat = manager.enqueue("a", "generate", {"heartbeat": True})
+        quick = manager.enqueue("b", "generate", {})
+        manager.start()
+        try:
+            self.assertTrue(self._wait(lambda: len(blocked) == 2))
+            window = [t for t in ticks if blocked[0] <= t <= blocked[1]]
+            # The heartbeat kept running while the completion notification blocked for 0.3 s.
+            self.assertGreater(len(window), 10)
+            manager._loop.call_soon_threadsafe(stop.set)
+            self.assertTrue(self._wait(lambda: manager.get(heartbeat.id).status == "complete"))
+        finally:
+            manager.stop()
+
+    def test_cancel_during_an_uncancelled_thread_step_completes_like_the_thread_lane(self):
+        manager = AsyncJobManager(worker_count=1)
+        saving = threading.Event()
+
+        def save(job):
+            saving.set()
+            time.sleep(0.2)
+            job.result["image_path"] = "/outputs/x.png"
+
+        async def processor(job, progress):
+            await to_thread_uncancelled(save, job)
+
+        manager.register_async_processor("generate", processor)
+        job = manager.enqueue("a", "generate", {})
+        manager.start()
+        try:
+            self.assertTrue(saving.wait(2))
+            manager.cancel(job.id)
+            self.assertTrue(self._wait(lambda: manager.get(job.id).status in ("complete", "cancelled", "error")))
+            self.assertEqual(manager.get(job.id).status, "complete")
+            self.assertEqual(manager.get(job.id).result["image_path"], "/outputs/x.png")
+        finally:
+            manager.stop()
+
+
 if __name__ == "__main__":
     unittest.main()
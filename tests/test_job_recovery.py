@@ -0,0 +1,143 @@
+import gc
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from app.job_manager import JobManager, RoutingJobManager
+from app.job_store import JobStore
+from app.services.generation_controls import GenerationControlService
+from app.services.job_recovery import INTERRUPTED_BY_RESTART, JobRecoveryService
+
+CONFIGS = {
+    "RMBG2": {"provider": "comfyui"},
+    "Hosted": {"provider": "openrouter"},
+}
+
+
+class JobRecoveryTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.directory.name, "app_data.db")
+        self.store = JobStore(db_path)
+        self.controls = GenerationControlService(db_path, timezone_name="Asia/Seoul")
+        self.comfy = JobManager(worker_count=1)
+        self.external = JobManager(worker_count=1)
+        self.routing = RoutingJobManager(self.comfy, self.external, CONFIGS)
+        self.prompt_states = {}
+
+    def tearDown(self):
+        self.controls = None
+        gc.collect()
+        self.directory.cleanup()
+
+    def _persist(self, job_id, owner, workflow_id, status, created_at, result=None):
+        payload = {"workflow_id": workflow_id, "control_request_id": f"req-{job_id}"}
+        admitted = self.controls.admit({
+            "request_id": f"req-{job_id}",
+            "idempotency_key": f"idem-{job_id}",
+            "request_source": "web",
+            "principal_id": owner,
+            "capability": "generate",
+            "workflow_id": workflow_id,
+        })
+        self.controls.sync_job(SimpleNamespace(id=job_id, status=status, payload=payload))
+        self.store.upsert_job({
+            "id": job_id,
+            "owner_id": owner,
+            "type": "generate",
+            "status": status,
+            "progress": 40.0 if status == "running" else 0.0,
+            "created_at": created_at,
+            "started_at": created_at + 1 if status == "running" else None,
+            "payload": payload,
+            "result": result or {},
+        })
+        return admitted
+
+    def _recovery(self):
+        return JobRecoveryService(
+            self.store,
+            self.routing,
+            workflow_configs=CONFIGS,
+            controls=self.controls,
+            prompt_state=lambda prompt_id: self.prompt_states.get(prompt_id, "missing"),
+        )
+
+    def test_requeues_in_order_resumes_finished_prompts_and_fails_the_rest(self):
+        now = time.time()
+        self._persist("queued-a1", "a", "RMBG2", "queued", now - 30)
+        self._persist("queued-b1", "b", "RMBG2", "queued", now - 20)
+        self._persist("queued-a2", "a", "RMBG2", "queued", now - 10)
+        self._persist("run-done", "c", "RMBG2", "running", now - 60, {"comfy_prompt_id": "p-done"})
+        self._persist("run-lost", "d", "RMBG2", "running", now - 50, {"comfy_prompt_id": "p-lost"})
+        self._persist("run-hosted", "e", "Hosted", "running", now - 40)
+        self.prompt_states["p-done"] = "complete"
+
+        report = self._recovery().recover()
+
+        self.assertEqual(report.resumed, ["run-done"])
+        self.assertEqual(report.requeued, ["queued-a1", "queued-b1", "queued-a2"])
+        self.assertEqual(sorted(report.failed), ["run-hosted", "run-lost"])
+        resumed = self.routing.get("run-done")
+        self.assertEqual(resumed.status, "queued")
+        self.assertEqual(resumed.result, {"comfy_prompt_id": "p-done"})
+        self.assertFalse(self.external.owns("run-hosted"))
+        order = []
+        for _ in range(4):
+            job = self.comfy._next_job()
+            order.append(job.id)
+            self.comfy._finish_simulated(job, time.time())
+        self.assertEqual(order, ["run-done", "queued-a1", "queued-b1", "queued-a2"])
+
+        lost = self.store.fetch_by_id("run-lost")
+        self.assertEqual(lost["status"], "error")
+        self.assertEqual(lost["error"], INTERRUPTED_BY_RESTART)
+        self.assertEqual(report.released_requests, 2)
+
+    def test_released_reservations_stop_counting_against_limits(self):
+        self.controls.update_policy({"daily_request_limit": 1})
+        self._persist("run-hosted", "e", "Hosted", "running", time.time())
+        self._recovery().recover()
+        retry = self.controls.admit({
+            "request_id": "req-retry",
+            "idempotency_key": "idem-run-hosted",
+            "request_source": "web",
+            "principal_id": "e",
+            "capability": "generate",
+            "workflow_id": "Hosted",
+        })
+        self.assertFalse(retry.is_duplicate)
+
+    def test_resumed_prompt_is_checked_and_collected_on_its_backend(self):
+        self._persist("run-gpu2", "a", "RMBG2", "running", time.time(), {"comfy_prompt_id": "p2", "comfy_backend": "gpu2"})
+        asked = []
+
+        def prompt_state(prompt_id, backend=None):
+            asked.append((prompt_id, backend))
+            return "running" if backend == "gpu2" else "missing"
+
+        report = JobRecoveryService(
+            self.store, self.routing, workflow_configs=CONFIGS, prompt_state=prompt_state
+        ).recover()
+        self.assertEqual(asked, [("p2", "gpu2")])
+        self.assertEqual(report.resumed, ["run-gpu2"])
+        self.assertEqual(self.routing.get("run-gpu2").result, {"comfy_prompt_id": "p2", "comfy_backend": "gpu2"})
+
+    def test_disabled_or_stale_jobs_are_failed_not_requeued(self):
+        now = time.time()
+        self._persist("old", "a", "RMBG2", "queued", now - 3 * 86400)
+        self._persist("fresh", "a", "RMBG2", "queued", now)
+        report = self._recovery().recover(max_age_seconds=86400)
+        self.assertEqual(report.requeued, ["fresh"])
+        self.assertEqual(report.failed, ["old"])
+
+        self.store.upsert_job(dict(self.store.fetch_by_id("fresh"), status="queued"))
+        report = JobRecoveryService(self.store, JobManager(), workflow_configs=CONFIGS).recover(requeue=False)
+        self.assertEqual(report.failed, ["fresh"])
+        self.assertEqual(self.store.fetch_by_id("fresh")["status"], "error")
+
+
+if __name__ == "__main__":
+    unittest.main()
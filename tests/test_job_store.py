@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from app.job_store import JobSnapshotWriter, JobStore
+
+
+def _snapshot(job_id: str, status: str, progress: float = 0.0, **extra):
+    snapshot = {
+        "id": job_id,
+        "owner_id": "owner",
+        "type": "generate",
+        "status": status,
+        "progress": progress,
+        "created_at": 1.0,
+        "payload": {"workflow_id": "RMBG2"},
+        "result": {},
+    }
+    snapshot.update(extra)
+    return snapshot
+
+
+class CountingJobStore(JobStore):
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.batches: list[int] = []
+
+    def upsert_jobs(self, jobs):
+        jobs = list(jobs)
+        self.batches.append(len(jobs))
+        super().upsert_jobs(jobs)
+
+
+class JobSnapshotWriterTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = CountingJobStore(os.path.join(self._tmp.name, "jobs.db"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_progress_ticks_coalesce_into_one_group_commit(self):
+        writer = JobSnapshotWriter(self.store, flush_interval_seconds=0.2)
+        writer.start()
+        try:
+            for tick in range(1, 51):
+                writer.upsert_job(_snapshot("job-a", "running", progress=tick))
+                writer.upsert_job(_snapshot("job-b", "running", progress=tick))
+            self.assertEqual(self.store.fetch_by_id("job-a"), None)
+            # Pending snapshots are visible through the writer before they hit sqlite.
+            self.assertEqual(writer.fetch_by_id("job-a")["progress"], 50)
+            self.assertTrue(writer.flush(timeout=2))
+        finally:
+            writer.stop()
+        self.assertEqual(self.store.batches, [2])
+        self.assertEqual(self.store.fetch_by_id("job-b")["progress"], 50)
+        metrics = writer.metrics()
+        self.assertEqual(metrics["submitted"], 100)
+        self.assertEqual(metrics["coalesced"], 98)
+        self.assertEqual(metrics["rows_written"], 2)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertIsNotNone(metrics["flush_latency_ms_avg"])
+
+    def test_terminal_state_is_written_without_waiting_for_interval(self):
+        writer = JobSnapshotWriter(self.store, flush_interval_seconds=30)
+        writer.start()
+        try:
+            writer.upsert_job(_snapshot("job-a", "running", progress=10))
+            writer.upsert_job(_snapshot("job-a", "complete", progress=100, result={"image_path": "/outputs/x.png"}))
+            deadline = time.monotonic() + 2
+            row = None
+            while time.monotonic() < deadline:
+                row = self.store.fetch_by_id("job-a")
+                if row:
+                    break
+                time.sleep(0.01)
+            self.assertIsNotNone(row)
+            self.assertEqual(row["status"], "complete")
+            self.assertEqual(row["result"], {"image_path": "/outputs/x.png"})
+        finally:
+            writer.stop()
+
+    def test_stop_drains_pending_snapshots(self):
+        writer = JobSnapshotWriter(self.store, flush_interval_seconds=30)
+        writer.start()
+        writer.upsert_job(_snapshot("job-a", "running", progress=40))
+        writer.stop()
+        self.assertEqual(self.store.fetch_by_id("job-a")["progress"], 40)
+        self.assertFalse(writer.is_running())
+
+    def test_writes_through_when_not_started(self):
+        writer = JobSnapshotWriter(self.store)
+        writer.upsert_job(_snapshot("job-a", "queued"))
+        self.assertEqual(self.store.fetch_by_id("job-a")["status"], "queued")
+
+    def test_failed_flush_is_retried(self):
+        failures = {"left": 1}
+        lock = threading.Lock()
+        original = self.store.upsert_jobs
+
+        def flaky(jobs):
+            with lock:
+                if failures["left"]:
+                    failures["left"] -= 1
+                    raise sqlite3.OperationalError("database is locked")
+            original(jobs)
+
+        self.store.upsert_jobs = flaky
+        writer = JobSnapshotWriter(self.store, flush_interval_seconds=0.05)
+        writer.start()
+        try:
+            writer.upsert_job(_snapshot("job-a", "error", error="boom"))
+            self.assertTrue(writer.flush(timeout=2))
+        finally:
+            writer.stop()
+        self.assertEqual(self.store.fetch_by_id("job-a")["error"], "boom")
+        self.assertEqual(writer.metrics()["errors"], 1)
+
+    def test_batch_being_written_stays_visible(self):
+        writing = threading.Event()
+        release = threading.Event()
+        original = self.store.upsert_jobs
+
+        def slow(jobs):
+            writing.set()
+            release.wait(2)
+            original(jobs)
+
+        self.store.upsert_jobs = slow
+        self.store.upsert_job(_snapshot("job-a", "running", progress=10))
+        writer = JobSnapshotWriter(self.store, flush_interval_seconds=30)
+        writer.start()
+        try:
+            writer.upsert_job(_snapshot("job-a", "complete", progress=100))
+            self.assertTrue(writing.wait(2))
+            # Not committed yet: the sqlite row is older, the writer still answers with the new one.
+            self.assertEqual(self.store.fetch_by_id("job-a")["status"], "running")
+            self.assertEqual(writer.fetch_by_id("job-a")["status"], "complete")
+            release.set()
+            self.assertTrue(writer.flush(timeout=2))
+        finally:
+            release.set()
+            writer.stop()
+        self.assertEqual(writer.fetch_by_id("job-a")["status"], "complete")
+
+    def test_stop_gives_up_on_a_broken_store_with_backoff(self):
+        attempts: list[float] = []
+
+        def broken(jobs):
+            attempts.append(time.monotonic())
+            raise sqlite3.OperationalError("database is locked")
+
+        self.store.upsert_jobs = broken
+        writer = JobSnapshotWriter(self.store, flush_interval_seconds=0.05)
+        writer.start()
+        writer.upsert_job(_snapshot("job-a", "running", progress=10))
+        with self.assertLogs("comfyui_app", level="ERROR"):
+            writer.stop(timeout=5)
+        self.assertFalse(writer.is_running())
+        # A few spaced retries, not a busy loop.
+        self.assertLessEqual(len(attempts), JobSnapshotWriter.STOP_MAX_RETRIES + 1)
+        self.assertGreaterEqual(attempts[-1] - attempts[0], 0.05)
+        self.assertEqual(writer.metrics()["dropped"], 1)
+        self.assertEqual(writer.metrics()["queue_depth"], 0)
+
+    def test_bad_snapshot_does_not_block_the_rest_of_the_batch(self):
+        writer = JobSnapshotWriter(self.store, flush_interval_seconds=30)
+        writer.start()
+        try:
+            with writer._cond:
+                # One batch: a good queued row, a row sqlite rejects (NaN is not JSON), a good terminal row.
+                writer._pending["job-a"] = _snapshot("job-a", "queued")
+                writer._pending["job-bad"] = _snapshot("job-bad", "complete", result={"x": float("nan")})
+                writer._pending["job-c"] = _snapshot("job-c", "complete", progress=100)
+            with self.assertLogs("comfyui_app", level="ERROR") as logs:
+                self.assertTrue(writer.flush(timeout=2))
+        finally:
+            writer.stop()
+        self.assertEqual(self.store.fetch_by_id("job-a")["status"], "queued")
+        self.assertEqual(self.store.fetch_by_id("job-c")["status"], "complete")
+        self.assertIsNone(self.store.fetch_by_id("job-bad"))
+        self.assertIn("job-bad", "".join(logs.output))
+        metrics = writer.metrics()
+        self.assertEqual(metrics["dropped"], 1)
+        self.assertEqual(metrics["rows_written"], 2)
+        self.assertEqual(metrics["queue_depth"], 0)
+
+    def test_store_upsert_job_logs_instead_of_raising(self):
+        with self.assertLogs("comfyui_app", level="WARNING"):
+            self.store.upsert_job(_snapshot("job-bad", "complete", result={"x": float("nan")}))
+        self.assertIsNone(self.store.fetch_by_id("job-bad"))
+
+
+if __name__ == "__main__":
+    unittest.main()
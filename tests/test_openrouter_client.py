@@ -1,9 +1,12 @@
+import asyncio
 import base64
 import os
 import unittest
 from unittest.mock import Mock, patch
 
 from app.services import openrouter_client
+from scripts.fake_comfyui import PNG_BYTES
+from scripts.fake_openrouter import serve
 
 
 class OpenRouterClientTests(unittest.TestCase):
@@ -213,5 +216,48 @@ class OpenRouterClientTests(unittest.TestCase):
         self.assertNotIn("aspect_ratio", payload)
 
 
+class StandInOpenRouterTests(unittest.TestCase):
+    def setUp(self):
+        self.server, self.state = serve(rate_limit_every=2, retry_after=7)
+        self.env = patch.dict(
+            os.environ,
+            {
+                "OPENROUTER_API_KEY": "test-key",
+                "OPENROUTER_BASE_URL": f"http://127.0.0.1:{self.server.server_address[1]}/api/v1",
+            },
+            clear=False,
+        )
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_image_and_text_round_trip_and_429_is_classified(self):
+        image = openrouter_client.generate_image(
+            model="google/gemini-3-pro-image", prompt="a fox", images=[b"reference"], aspect_ratio="1:1"
+        )
+        self.assertEqual(image, PNG_BYTES)
+        self.assertEqual(self.state.calls[0]["references"], 1)
+
+        with self.assertRaises(openrouter_client.OpenRouterUpstreamError) as caught:
+            openrouter_client.generate_text(prompt="translate")
+        self.assertEqual((caught.exception.kind, caught.exception.retry_after), ("openrouter_rate_limited", "7"))
+        self.assertEqual(openrouter_client.generate_text(prompt="translate"), "fake: translate")
+        self.assertEqual([call["status"] for call in self.state.calls], [200, 429, 200])
+
+    def test_async_client_round_trip_and_429_is_classified(self):
+        async def run():
+            image = await openrouter_client.agenerate_image(model="google/gemini-3-pro-image", prompt="a fox")
+            with self.assertRaises(openrouter_client.OpenRouterUpstreamError) as caught:
+                await openrouter_client.agenerate_image(model="google/gemini-3-pro-image", prompt="a fox")
+            return image, caught.exception
+
+        image, error = asyncio.run(run())
+        self.assertEqual(image, PNG_BYTES)
+        self.assertEqual((error.kind, error.retry_after), ("openrouter_rate_limited", "7"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import base64
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from app.ws.manager import ConnectionManager
+from app.ws.previews import PreviewForwarder
+
+
+def _jpeg(size=(640, 480)):
+    out = BytesIO()
+    Image.new("RGB", size, (200, 40, 40)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+class _Socket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+class PreviewForwarderTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.manager = ConnectionManager()
+        self.manager.set_loop(self.loop)
+        self.now = [0.0]
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _connect(self, user_id, previews):
+        socket = _Socket()
+        self.manager.user_to_conns.setdefault(user_id, []).append(socket)
+        self.manager.set_previews(socket, previews)
+        return socket
+
+    def _deliver(self):
+        # run_coroutine_threadsafe from the "worker": let the loop process the queued sends.
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+
+    def test_rate_limited_latest_frame_wins_and_only_subscribers_receive(self):
+        watching = self._connect("owner", True)
+        plain = self._connect("owner", False)
+        forwarder = PreviewForwarder("job1", "owner", manager=self.manager, max_fps=2, max_side=128, clock=lambda: self.now[0])
+
+        forwarder.offer(_jpeg())  # sent at once
+        self.now[0] = 0.2
+        forwarder.offer(b"stale")
+        forwarder.offer(_jpeg((300, 600)))  # held: newer frame replaces the stale one
+        forwarder.flush()
+        self.now[0] = 0.6
+        forwarder.flush()  # progress tick after the interval: the held frame goes out
+        self._deliver()
+
+        self.assertEqual((forwarder.received, forwarder.sent), (3, 2))
+        self.assertEqual(plain.sent, [])
+        self.assertEqual([(m["width"], m["height"]) for m in watching.sent], [(128, 96), (64, 128)])
+        header = base64.b64decode(watching.sent[0]["image"].split(",", 1)[1])[:12]
+        self.assertEqual((header[:4], header[8:12]), (b"RIFF", b"WEBP"))
+        self.assertEqual(self.manager.preview_metrics()["frames_sent"], 2)
+
+    def test_frames_are_not_encoded_without_a_subscriber(self):
+        self._connect("owner", False)
+        forwarder = PreviewForwarder("job1", "owner", manager=self.manager, clock=lambda: self.now[0])
+        forwarder.offer(_jpeg())
+        self.assertEqual(forwarder.sent, 0)
+        self.assertEqual(self.manager.preview_metrics()["bytes_sent"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
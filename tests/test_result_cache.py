@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from app.result_cache import ResultCache, result_cache_key, workflow_cacheable
+
+
+class ResultCacheKeyTests(unittest.TestCase):
+    def test_job_unique_input_names_map_to_the_same_key(self):
+        def key(name, digest, **overrides):
+            inputs = {"image": name, **overrides}
+            return result_cache_key(
+                "RMBG2",
+                {"1": {"inputs": inputs}},
+                workflow_digest="wf",
+                input_digests={name: digest},
+                image_refs=[name],
+            )
+
+        self.assertEqual(key("job_a_1.png", "abc"), key("job_b_1.png", "abc"))
+        self.assertNotEqual(key("job_a_1.png", "abc"), key("job_a_1.png", "def"))
+        self.assertNotEqual(key("x.png", "abc", mask_blur=0), key("x.png", "abc", mask_blur=4))
+        # An input whose bytes were never seen (e.g. resolved another way) disables caching.
+        self.assertIsNone(
+            result_cache_key("RMBG2", {}, workflow_digest="wf", input_digests={}, image_refs=["other.png"])
+        )
+
+    def test_cacheable_needs_opt_in_and_a_requested_seed(self):
+        self.assertTrue(workflow_cacheable({"result_cache": True}, None))
+        self.assertFalse(workflow_cacheable({}, 1))
+        self.assertFalse(workflow_cacheable({"result_cache": True, "seed_node": "3"}, None))
+        self.assertTrue(workflow_cacheable({"result_cache": True, "seed_node": "3"}, 42))
+        self.assertFalse(workflow_cacheable({"result_cache": True, "seethrough_workflow": True}, 42))
+
+
+class ResultCacheStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.now = [1000.0]
+        self.staging = os.path.join(self.root, "incoming")
+        os.makedirs(self.staging)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _cache(self, **kwargs):
+        return ResultCache(
+            os.path.join(self.root, "jobs.sqlite3"),
+            os.path.join(self.root, "cache"),
+            clock=lambda: self.now[0],
+            **kwargs,
+        )
+
+    def _staged(self, data: bytes) -> str:
+        path = os.path.join(self.staging, f"staged_{len(os.listdir(self.staging))}.png")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_hit_links_the_cached_result_into_staging(self):
+        cache = self._cache()
+        self.assertIsNone(cache.stage("k1", "RMBG2", self.staging))
+        source = self._staged(b"result")
+        self.assertTrue(cache.put("k1", source, filename="ComfyUI_0001.PNG", workflow_id="RMBG2", source_job_id="job1"))
+        os.remove(source)  # moved into the gallery by the first job
+
+        hit = cache.stage("k1", "RMBG2", self.staging)
+        self.assertEqual((hit["filename"], hit["source_job_id"]), ("ComfyUI_0001.PNG", "job1"))
+        self.assertTrue(hit["path"].endswith(".png"))
+        with open(hit["path"], "rb") as f:
+            self.assertEqual(f.read(), b"result")
+
+        # The index survives a restart.
+        metrics = self._cache().metrics()
+        self.assertEqual((metrics["entries"], metrics["bytes"]), (1, 6))
+        self.assertEqual(cache.metrics()["hits_by_workflow"], {"RMBG2": 1})
+        self.assertEqual(cache.metrics()["hit_ratio"], 0.5)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self._cache(max_entries=2)
+        for key in ("a", "b"):
+            cache.put(key, self._staged(key.encode()), filename="out.png", workflow_id="W")
+            self.now[0] += 1
+        self.assertIsNotNone(cache.stage("a", "W", self.staging))  # "b" is now the oldest
+        self.now[0] += 1
+        cache.put("c", self._staged(b"c"), filename="out.png", workflow_id="W")
+
+        self.assertIsNone(cache.stage("b", "W", self.staging))
+        self.assertEqual(sorted(os.listdir(cache.cache_dir)), ["a.png", "c.png"])
+        self.assertEqual(cache.metrics()["evictions"], 1)
+
+    def test_missing_cache_file_is_forgotten(self):
+        cache = self._cache()
+        cache.put("k", self._staged(b"x"), filename="out.png", workflow_id="W")
+        os.remove(os.path.join(cache.cache_dir, "k.png"))
+        self.assertIsNone(cache.stage("k", "W", self.staging))
+        self.assertEqual((cache.metrics()["stale"], cache.metrics()["entries"]), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,292 @@
+import threading
+import time
+import unittest
+
+from app.job_manager import ExecutionGate, Job, JobManager
+from app.scheduling import (
+    DurationEstimator,
+    ModelAffinityPolicy,
+    RoundRobinPolicy,
+    ShortestExpectedJobFirstPolicy,
+    job_model_key,
+    predict_start_offset,
+    simulate_trace,
+    trace_from_rows,
+)
+
+CONFIGS = {
+    "RMBG2": {"provider": "comfyui", "model": "RMBG-2.0"},
+    "AceStep15XL": {},
+    "seethrough-basic": {"provider": "comfyui"},
+}
+
+
+def _affinity(inner=None, **options):
+    return ModelAffinityPolicy(
+        inner or RoundRobinPolicy(),
+        key_fn=lambda job: job_model_key(job.payload, CONFIGS),
+        **options,
+    )
+
+
+def _job(owner: str, workflow_id: str, created_at: float, **payload) -> Job:
+    job = Job(owner, "generate", {"workflow_id": workflow_id, **payload})
+    job.created_at = created_at
+    return job
+
+
+class DurationEstimatorTests(unittest.TestCase):
+    def test_falls_back_from_params_to_workflow_to_default(self):
+        estimator = DurationEstimator(alpha=0.5, default_seconds=42.0)
+        self.assertEqual(estimator.estimate({"workflow_id": "AceStep15XL"}), 42.0)
+        estimator.observe({"workflow_id": "AceStep15XL", "duration": 120}, 160.0)
+        estimator.observe({"workflow_id": "AceStep15XL", "duration": 120}, 180.0)
+        self.assertEqual(estimator.estimate({"workflow_id": "AceStep15XL", "duration": 120}), 170.0)
+        # Unknown duration bucket uses the workflow-level estimate.
+        self.assertEqual(estimator.estimate({"workflow_id": "AceStep15XL", "duration": 30}), 170.0)
+        self.assertEqual(estimator.estimate({"workflow_id": "RMBG2"}), 42.0)
+
+    def test_seed_from_rows_uses_completed_jobs_only(self):
+        estimator = DurationEstimator()
+        seeded = estimator.seed_from_rows([
+            {"status": "complete", "started_at": 10.0, "ended_at": 13.0, "payload": {}, "workflow_id": "RMBG2"},
+            {"status": "error", "started_at": 10.0, "ended_at": 99.0, "payload": {"workflow_id": "RMBG2"}},
+        ])
+        self.assertEqual(seeded, 1)
+        self.assertEqual(estimator.estimate({"workflow_id": "RMBG2"}), 3.0)
+
+
+class ShortestExpectedJobFirstPolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.estimator = DurationEstimator()
+        self.estimator.observe({"workflow_id": "AceStep15XL"}, 170.0)
+        self.estimator.observe({"workflow_id": "RMBG2"}, 3.0)
+
+    def test_prefers_short_jobs(self):
+        policy = ShortestExpectedJobFirstPolicy(self.estimator, aging_factor=0.0, max_wait_seconds=None)
+        candidates = [_job("a", "AceStep15XL", 0.0), _job("b", "RMBG2", 5.0)]
+        self.assertEqual(policy.select(candidates, now=10.0), 1)
+        self.assertEqual(policy.metrics()["reordered"], 1)
+
+    def test_aging_and_max_wait_prevent_starvation(self):
+        aged = ShortestExpectedJobFirstPolicy(self.estimator, aging_factor=1.0, max_wait_seconds=None)
+        candidates = [_job("a", "AceStep15XL", 0.0), _job("b", "RMBG2", 199.0)]
+        # Long job has waited 200s: 170 - 200 < 3 - 1
+        self.assertEqual(aged.select(candidates, now=200.0), 0)
+
+        capped = ShortestExpectedJobFirstPolicy(self.estimator, aging_factor=0.0, max_wait_seconds=60.0)
+        candidates = [_job("a", "AceStep15XL", 0.0), _job("b", "RMBG2", 50.0)]
+        self.assertEqual(capped.select(candidates, now=61.0), 0)
+        self.assertEqual(capped.metrics()["starvation_overrides"], 1)
+
+
+class JobManagerPolicyTests(unittest.TestCase):
+    def test_policy_reorders_users_but_keeps_per_user_fifo(self):
+        estimator = DurationEstimator()
+        estimator.observe({"workflow_id": "AceStep15XL"}, 170.0)
+        estimator.observe({"workflow_id": "RMBG2"}, 3.0)
+        manager = JobManager(worker_count=1)
+        manager.set_scheduling_policy(ShortestExpectedJobFirstPolicy(estimator, aging_factor=0.0, max_wait_seconds=None))
+        long_a = manager.enqueue("a", "generate", {"workflow_id": "AceStep15XL"})
+        short_a = manager.enqueue("a", "generate", {"workflow_id": "RMBG2"})
+        short_b = manager.enqueue("b", "generate", {"workflow_id": "RMBG2"})
+        order = [manager._next_job().id]
+        manager._finish_simulated(manager.get(order[0]), time.time())
+        order.append(manager._next_job().id)
+        manager._finish_simulated(manager.get(order[1]), time.time())
+        order.append(manager._next_job().id)
+        # b's short job jumps ahead, but a's RMBG2 never overtakes a's own AceStep job.
+        self.assertEqual(order, [short_b.id, long_a.id, short_a.id])
+
+    def test_live_completions_feed_the_estimator(self):
+        estimator = DurationEstimator(default_seconds=99.0)
+        manager = JobManager(worker_count=1)
+        manager.set_scheduling_policy(ShortestExpectedJobFirstPolicy(estimator))
+        done = threading.Event()
+
+        def processor(job, progress):
+            time.sleep(0.02)
+            done.set()
+
+        manager.register_processor("generate", processor)
+        job = manager.enqueue("a", "generate", {"workflow_id": "RMBG2"})
+        manager.start()
+        try:
+            self.assertTrue(done.wait(timeout=1))
+            deadline = time.monotonic() + 1
+            while time.monotonic() < deadline and manager.get(job.id).status != "complete":
+                time.sleep(0.01)
+        finally:
+            manager.stop()
+        self.assertLess(estimator.estimate({"workflow_id": "RMBG2"}), 1.0)
+
+
+class WaitPredictionTests(unittest.TestCase):
+    def test_predict_start_offset_uses_workers_and_per_user_serialization(self):
+        # One worker: remaining running time plus everything ahead.
+        self.assertEqual(predict_start_offset([("a", 10.0)], [("b", 5.0), ("c", 3.0)], "d"), 18.0)
+        # Two workers: the job starts when the first worker frees up.
+        self.assertEqual(predict_start_offset([("a", 10.0)], [("b", 5.0)], "d", parallelism=2), 5.0)
+        # Same owner as the running job waits for it even with a free worker.
+        self.assertEqual(predict_start_offset([("a", 10.0)], [], "a", parallelism=2), 10.0)
+        self.assertEqual(predict_start_offset([("a", 10.0)], [], "a", parallelism=2, max_per_user_concurrent=2), 0.0)
+
+    def test_job_manager_predicts_round_robin_start_and_finish(self):
+        estimator = DurationEstimator()
+        estimator.observe({"workflow_id": "AceStep15XL"}, 100.0)
+        estimator.observe({"workflow_id": "RMBG2"}, 4.0)
+        manager = JobManager(worker_count=1)
+        manager._clock = lambda: 1000.0
+        manager.set_duration_estimator(estimator)
+        running = manager.enqueue("a", "generate", {"workflow_id": "AceStep15XL"})
+        manager._set_status(manager._next_job(), "running")
+        manager.get(running.id).started_at = 960.0
+        a2 = manager.enqueue("a", "generate", {"workflow_id": "RMBG2"})
+        b1 = manager.enqueue("b", "generate", {"workflow_id": "RMBG2"})
+
+        self.assertEqual(manager.predict(running.id)["expected_finish_at"], 1060.0)
+        # a rejoined the rotation first, so a2 starts when a's running job ends; b1 follows.
+        prediction = manager.predict(a2.id)
+        self.assertEqual(prediction["expected_wait_seconds"], 60.0)
+        self.assertEqual(prediction["expected_finish_at"], 1064.0)
+        self.assertEqual(manager.predict(b1.id)["expected_wait_seconds"], 64.0)
+        self.assertEqual(manager.predict_new("c", {"workflow_id": "RMBG2"})["expected_wait_seconds"], 68.0)
+
+    def test_prediction_follows_sejf_order_and_counts_gate_peers(self):
+        estimator = DurationEstimator()
+        estimator.observe({"workflow_id": "AceStep15XL"}, 170.0)
+        estimator.observe({"workflow_id": "RMBG2"}, 4.0)
+        default_lane = JobManager(worker_count=1)
+        fast_lane = JobManager(worker_count=1)
+        gate = ExecutionGate(capacity=1)
+        default_lane.set_execution_gate(gate, "comfyui:default")
+        fast_lane.set_execution_gate(gate, "comfyui:fast", weight=4.0)
+        policy = ShortestExpectedJobFirstPolicy(estimator)
+        for lane in (default_lane, fast_lane):
+            lane._clock = lambda: 1000.0
+            lane.set_duration_estimator(estimator)
+            lane.set_scheduling_policy(policy if lane is default_lane else RoundRobinPolicy())
+        running = default_lane.enqueue("a", "generate", {"workflow_id": "AceStep15XL"})
+        default_lane._set_status(default_lane._next_job(), "running")
+        default_lane.get(running.id).started_at = 990.0
+        long_job = default_lane.enqueue("b", "generate", {"workflow_id": "AceStep15XL"})
+        long_job.created_at = 1000.0
+        short_job = default_lane.enqueue("c", "generate", {"workflow_id": "RMBG2"})
+        short_job.created_at = 1000.0
+
+        # SEJF dispatches the short job first although b is ahead in the rotation.
+        self.assertEqual(default_lane.get_global_position(short_job.id), 0)
+        self.assertEqual(default_lane.get_global_position(long_job.id), 1)
+        self.assertEqual(default_lane.predict(short_job.id)["expected_wait_seconds"], 160.0)
+        self.assertEqual(default_lane.predict(long_job.id)["expected_wait_seconds"], 164.0)
+        self.assertEqual(default_lane.predict_new("d", {"workflow_id": "RMBG2"})["expected_wait_seconds"], 164.0)
+        # Predictions replay a copy of the policy: its counters do not move.
+        self.assertEqual(policy.metrics()["reordered"], 0)
+        # The fast lane is empty but the default lane's job holds the shared GPU slot.
+        self.assertEqual(fast_lane.predict_new("e", {"workflow_id": "RMBG2"})["expected_wait_seconds"], 160.0)
+
+
+class ModelAffinityPolicyTests(unittest.TestCase):
+    def test_keeps_loaded_model_within_deferral_window(self):
+        policy = _affinity(max_deferral_seconds=60)
+        first = _job("a", "RMBG2", 0.0)
+        policy.on_dispatch(first, 0.0)
+        candidates = [_job("b", "AceStep15XL", 1.0), _job("c", "RMBG2", 2.0)]
+        self.assertEqual(policy.select(candidates, now=10.0), 1)
+        policy.on_dispatch(candidates[1], 10.0)
+        self.assertEqual(policy.metrics()["swaps_avoided"], 1)
+        self.assertEqual(policy.metrics()["swaps"], 0)
+        self.assertEqual(policy.metrics()["current_model"], "RMBG-2.0")
+
+    def test_deferral_limit_and_consecutive_cap_release_the_hold(self):
+        policy = _affinity(max_deferral_seconds=60, max_consecutive=2)
+        policy.on_dispatch(_job("a", "RMBG2", 0.0), 0.0)
+        waited_too_long = [_job("b", "AceStep15XL", 0.0), _job("c", "RMBG2", 50.0)]
+        self.assertEqual(policy.select(waited_too_long, now=61.0), 0)
+        self.assertEqual(policy.metrics()["fairness_releases"], 1)
+
+        policy.on_dispatch(_job("d", "RMBG2", 62.0), 62.0)
+        capped = [_job("b", "AceStep15XL", 60.0), _job("c", "RMBG2", 61.0)]
+        self.assertEqual(policy.select(capped, now=63.0), 0)
+        policy.on_dispatch(capped[0], 63.0)
+        self.assertEqual(policy.metrics()["swaps"], 1)
+
+    def test_learns_swap_cost_from_cold_and_warm_runs(self):
+        policy = _affinity(swap_cost_seconds=1.0)
+        warm_seed = _job("a", "RMBG2", 0.0)
+        policy.on_dispatch(warm_seed, 0.0)
+        policy.on_complete(warm_seed, 3.0)
+        warm = _job("a", "RMBG2", 0.0)
+        policy.on_dispatch(warm, 0.0)
+        policy.on_complete(warm, 3.0)
+        other = _job("b", "AceStep15XL", 0.0)
+        policy.on_dispatch(other, 0.0)
+        policy.on_complete(other, 170.0)
+        cold = _job("a", "RMBG2", 0.0)
+        policy.on_dispatch(cold, 0.0)
+        policy.on_complete(cold, 13.0)
+        self.assertEqual(policy.learned_swap_costs(), {"RMBG-2.0": 10.0})
+        self.assertEqual(policy.metrics()["swap_cost_sec"], 10.0)
+
+    def test_simulation_reduces_swaps_and_makespan(self):
+        rows = []
+        # Three users alternate background removal and layer separation in one burst.
+        for i in range(12):
+            wf = "RMBG2" if i % 2 == 0 else "seethrough-basic"
+            rows.append({
+                "id": f"job-{i}", "owner_id": f"user-{i % 3}", "status": "complete",
+                "created_at": i * 0.1, "started_at": 0.0, "ended_at": 4.0,
+                "payload": {"workflow_id": wf},
+            })
+        trace = trace_from_rows(rows)
+
+        def model_of(payload):
+            return job_model_key(payload, CONFIGS)
+
+        rr = simulate_trace(trace, RoundRobinPolicy, model_key=model_of, swap_cost_seconds=10.0)
+        grouped = simulate_trace(
+            trace,
+            lambda: _affinity(max_deferral_seconds=600, max_consecutive=12),
+            model_key=model_of,
+            swap_cost_seconds=10.0,
+        )
+        self.assertLess(grouped["model_swaps"], rr["model_swaps"])
+        self.assertLess(grouped["makespan_sec"], rr["makespan_sec"])
+        self.assertGreater(grouped["policy"]["estimated_time_saved_sec"], 0)
+
+
+class SimulateTraceTests(unittest.TestCase):
+    def _rows(self):
+        rows = []
+        # One music job every 60s from one user, bursts of background removal from others.
+        for i in range(10):
+            start = i * 60.0
+            rows.append({
+                "id": f"music-{i}", "owner_id": "composer", "status": "complete",
+                "created_at": start, "started_at": start, "ended_at": start + 170.0,
+                "payload": {"workflow_id": "AceStep15XL"},
+            })
+            for u in range(3):
+                rows.append({
+                    "id": f"rmbg-{i}-{u}", "owner_id": f"editor-{u}", "status": "complete",
+                    "created_at": start + 1.0 + u, "started_at": start, "ended_at": start + 3.0,
+                    "payload": {"workflow_id": "RMBG2"},
+                })
+        return rows
+
+    def test_sejf_lowers_mean_wait_against_round_robin(self):
+        trace = trace_from_rows(self._rows())
+        self.assertEqual(len(trace), 40)
+        rr = simulate_trace(trace, RoundRobinPolicy)
+        sejf = simulate_trace(trace, lambda: ShortestExpectedJobFirstPolicy(DurationEstimator(), max_wait_seconds=1200))
+        self.assertEqual(rr["jobs"], 40)
+        self.assertEqual(sejf["jobs"], 40)
+        self.assertLess(sejf["mean_wait_sec"], rr["mean_wait_sec"])
+        self.assertLess(sejf["per_workflow_mean_wait_sec"]["RMBG2"], rr["per_workflow_mean_wait_sec"]["RMBG2"])
+        # Same total work on one worker.
+        self.assertAlmostEqual(sejf["makespan_sec"], rr["makespan_sec"], places=6)
+        self.assertIsNotNone(sejf["p95_wait_sec"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+from app.workflow_configs import WORKFLOW_CONFIGS
+from app.workflow_templates import WorkflowTemplateCache, config_node_refs
+
+GRAPH = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 0, "steps": 20, "model": ["4", 0]}},
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "base.safetensors"}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+}
+
+
+class WorkflowTemplateCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "Example.json")
+        self._write(GRAPH)
+        self.cache = WorkflowTemplateCache()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, graph, mtime=None):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(graph, f)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_build_copies_only_overridden_nodes(self):
+        template = self.cache.get(self.path)
+        graph = template.build({"6": {"inputs": {"text": "a cat"}}, "3": {"class_type": "KSamplerAdvanced"}})
+        self.assertEqual(graph["6"]["inputs"], {"text": "a cat", "clip": ["4", 1]})
+        self.assertEqual(graph["3"]["class_type"], "KSamplerAdvanced")
+        self.assertIs(graph["4"], template.graph["4"])
+        # The cached template is untouched.
+        self.assertEqual(template.graph["6"]["inputs"]["text"], "")
+        self.assertEqual(template.graph["3"]["class_type"], "KSampler")
+        self.assertEqual(template.missing_nodes({"6": {}, "99": {}}), ["99"])
+
+    def test_hits_until_the_file_changes(self):
+        first = self.cache.get(self.path)
+        self.assertIs(self.cache.get(self.path), first)
+        self._write(dict(GRAPH, **{"7": {"class_type": "SaveImage", "inputs": {}}}), mtime=os.stat(self.path).st_mtime + 5)
+        reloaded = self.cache.get(self.path)
+        self.assertIn("7", reloaded.node_ids)
+        metrics = self.cache.metrics()
+        self.assertEqual((metrics["hits"], metrics["misses"], metrics["reloads"]), (1, 2, 1))
+
+    def test_warm_reports_config_nodes_missing_from_the_graph(self):
+        configs = {
+            "Example": {"prompt_node": "6", "seed_node": "30", "image_input": {"image_node": "_openrouter"}},
+            "NoFile": {"prompt_node": "1"},
+        }
+        self.assertEqual(self.cache.warm(configs, self.directory.name), {"Example": ["seed_node=30"]})
+        self.assertEqual(self.cache.metrics()["invalid"], {"Example": ["seed_node=30"]})
+
+    def test_shipped_workflows_match_their_configs(self):
+        workflow_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "workflows")
+        self.assertEqual(self.cache.warm(WORKFLOW_CONFIGS, workflow_dir), {})
+        refs = dict(config_node_refs(WORKFLOW_CONFIGS["AceStep15XL"]))
+        self.assertEqual(refs["audio_params.duration_node_latent"], "98")
+        self.assertEqual(refs["extra_seed_nodes[0].node"], "3")
+
+
+if __name__ == "__main__":
+    unittest.main()